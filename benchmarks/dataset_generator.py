@@ -0,0 +1,158 @@
+# File: DilasaKMLTool_v4/benchmarks/dataset_generator.py
+# ----------------------------------------------------------------------
+# Deterministic generator of synthetic mWater survey exports, in the exact CSV_HEADERS layout.
+# The same (n_rows, seed, mix) always produces byte-identical output, so benchmark runs compare.
+#
+#   python -m benchmarks.dataset_generator --rows 100k --output mwater_100k.csv
+import argparse
+import csv
+import io
+import random
+
+from core.data_processor import CSV_HEADERS
+
+DEFAULT_SEED = 20240601
+SIZE_PRESETS = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+# Share of generated rows per case; the remainder are valid rows
+DEFAULT_ROW_MIX = {
+    "malformed_utm": 0.04,      # One point has an unparseable UTM string (substituted by the processor)
+    "missing_point": 0.04,      # One point is empty (substituted by the processor)
+    "too_many_missing": 0.02,   # Two points empty -> error_too_many_missing_points
+    "mixed_zones": 0.02,        # One point in a neighbouring zone -> error_inconsistent_zones
+    "duplicate": 0.03,          # Repeats an earlier Response Code (and UUID)
+}
+
+# Plots are spread over Maharashtra: UTM zones 43Q/44Q, roughly the state's easting/northing range
+_ZONES = ("43Q", "44Q")
+_EASTING_RANGE = (300_000.0, 700_000.0)
+_NORTHING_RANGE = (1_750_000.0, 2_380_000.0)
+_FIRST_NAMES = ("Ramesh", "Suresh", "Sunita", "Anita", "Vitthal", "Ganesh", "Savita", "Prakash",
+                "Laxmi", "Dnyaneshwar", "Kavita", "Balu", "Shobha", "Santosh", "Mangal", "Dattatray")
+_SURNAMES = ("Patil", "Jadhav", "Pawar", "Shinde", "More", "Gaikwad", "Kale", "Deshmukh",
+             "Chavan", "Bhosale", "Wagh", "Kamble", "Salunkhe", "Thorat")
+_DISTRICTS = {
+    "Nashik": ("Igatpuri", "Trimbakeshwar", "Peth", "Surgana"),
+    "Ahmednagar": ("Akole", "Sangamner", "Rahuri"),
+    "Palghar": ("Jawhar", "Mokhada", "Vikramgad"),
+    "Nandurbar": ("Navapur", "Shahada", "Taloda"),
+}
+_VILLAGE_PREFIXES = ("Khed", "Wadi", "Pimpal", "Amba", "Sawar", "Kund", "Bor", "Nim", "Shiv", "Dhar")
+_VILLAGE_SUFFIXES = ("gaon", "wadi", "pada", "khurd", "budruk", "ner", "pur")
+
+def parse_row_count(value):
+    """Parses '1k', '100k', '1m' or a plain integer."""
+    text = str(value).strip().lower()
+    if text in SIZE_PRESETS: return SIZE_PRESETS[text]
+    if text.endswith("k"): return int(float(text[:-1]) * 1_000)
+    if text.endswith("m"): return int(float(text[:-1]) * 1_000_000)
+    return int(text)
+
+def _utm_string(zone, easting, northing):
+    return f"{zone} {easting:.0f} {northing:.0f}"
+
+def _other_zone(zone):
+    return _ZONES[1] if zone == _ZONES[0] else _ZONES[0]
+
+def generate_mwater_rows(n_rows, seed=DEFAULT_SEED, row_mix=None):
+    """
+    Yields n_rows row dicts keyed by the CSV_HEADERS column titles (as csv.DictReader would return).
+    Each row also carries the generated case under the non-CSV key '_case' (write_mwater_csv drops it).
+    """
+    rng = random.Random(seed)
+    row_mix = DEFAULT_ROW_MIX if row_mix is None else row_mix
+    case_thresholds, cumulative = [], 0.0
+    for case_name, share in row_mix.items():
+        cumulative += share
+        case_thresholds.append((cumulative, case_name))
+    districts = list(_DISTRICTS.items())
+    emitted_identifiers = [] # (uuid, response_code), for duplicates
+
+    for row_index in range(n_rows):
+        draw = rng.random()
+        case = next((case_name for threshold, case_name in case_thresholds if draw < threshold), "valid")
+        if case == "duplicate" and not emitted_identifiers:
+            case = "valid"
+
+        zone = rng.choice(_ZONES)
+        easting = rng.uniform(*_EASTING_RANGE)
+        northing = rng.uniform(*_NORTHING_RANGE)
+        # A rough quadrilateral of 30-120 m sides, a realistic field plot
+        width, height = rng.uniform(30, 120), rng.uniform(30, 120)
+        skew = rng.uniform(-10, 10)
+        corners = [(easting, northing), (easting + width, northing + skew),
+                   (easting + width + skew, northing + height), (easting - skew, northing + height)]
+        point_utms = [_utm_string(zone, e, n) for e, n in corners]
+        altitudes = [f"{rng.uniform(300, 900):.1f}" for _ in range(4)]
+
+        if case == "malformed_utm":
+            point_utms[rng.randrange(4)] = rng.choice(("43Q 5330A9 2196062", "Q43 533039 2196062", "533039 2196062", "43Q;533039;2196062"))
+        elif case == "missing_point":
+            point_utms[rng.randrange(4)] = ""
+        elif case == "too_many_missing":
+            for point_index in rng.sample(range(4), 2): point_utms[point_index] = ""
+        elif case == "mixed_zones":
+            point_index = rng.randrange(1, 4)
+            e, n = corners[point_index]
+            point_utms[point_index] = _utm_string(_other_zone(zone), e, n)
+
+        if case == "duplicate":
+            uuid_val, response_code = emitted_identifiers[rng.randrange(len(emitted_identifiers))]
+        else:
+            uuid_val = f"{rng.getrandbits(32):08x}-{rng.getrandbits(16):04x}-4{rng.getrandbits(12):03x}-{rng.getrandbits(16):04x}-{rng.getrandbits(48):012x}"
+            response_code = f"RC{row_index:08d}"
+            emitted_identifiers.append((uuid_val, response_code))
+
+        district, blocks = districts[rng.randrange(len(districts))]
+        row = {
+            CSV_HEADERS["uuid"]: uuid_val,
+            CSV_HEADERS["response_code"]: response_code,
+            CSV_HEADERS["farmer_name"]: f"{rng.choice(_FIRST_NAMES)} {rng.choice(_SURNAMES)}",
+            CSV_HEADERS["village"]: f"{rng.choice(_VILLAGE_PREFIXES)}{rng.choice(_VILLAGE_SUFFIXES)}",
+            CSV_HEADERS["block"]: rng.choice(blocks),
+            CSV_HEADERS["district"]: district,
+            CSV_HEADERS["area"]: f"{rng.uniform(0.25, 5.0):.2f}",
+        }
+        for i in range(4):
+            row[CSV_HEADERS[f"p{i+1}_utm"]] = point_utms[i]
+            row[CSV_HEADERS[f"p{i+1}_alt"]] = altitudes[i]
+        row["_case"] = case
+        yield row
+
+def write_mwater_csv(output_file, n_rows, seed=DEFAULT_SEED, row_mix=None, bom=True):
+    """
+    Writes a generated dataset to a path or text stream, header row in CSV_HEADERS order.
+    A UTF-8 BOM is written first when bom is True, as mWater exports do. Returns the number of data rows.
+    """
+    fieldnames = list(CSV_HEADERS.values())
+    own_file = isinstance(output_file, str)
+    csv_stream = open(output_file, "w", encoding="utf-8", newline="") if own_file else output_file
+    try:
+        if bom: csv_stream.write("\ufeff")
+        writer = csv.DictWriter(csv_stream, fieldnames=fieldnames, extrasaction="ignore")
+        writer.writeheader()
+        written = 0
+        for row in generate_mwater_rows(n_rows, seed, row_mix):
+            writer.writerow(row); written += 1
+        return written
+    finally:
+        if own_file: csv_stream.close()
+
+def generate_mwater_csv_text(n_rows, seed=DEFAULT_SEED, row_mix=None, bom=True):
+    """Returns a generated dataset as one string (for small/medium sizes, e.g. the mock API server)."""
+    buffer = io.StringIO()
+    write_mwater_csv(buffer, n_rows, seed, row_mix, bom)
+    return buffer.getvalue()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic mWater CSV export.")
+    parser.add_argument("--rows", default="1k", help="Row count: 1k, 100k, 1m or an integer.")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--output", "-o", required=True)
+    parser.add_argument("--no-bom", action="store_true")
+    args = parser.parse_args(argv)
+    written = write_mwater_csv(args.output, parse_row_count(args.rows), args.seed, bom=not args.no_bom)
+    print(f"Wrote {written} rows to {args.output}")
+
+if __name__ == '__main__':
+    main()
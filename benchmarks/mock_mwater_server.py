@@ -0,0 +1,227 @@
+# File: DilasaKMLTool_v4/benchmarks/mock_mwater_server.py
+# ----------------------------------------------------------------------
+# Local stand-in for the mWater CSV API, serving generated datasets for offline, reproducible
+# fetch benchmarks and resilience tests (latency, chunked transfer, gzip, ETag/304, 5xx, encodings).
+#
+#   python -m benchmarks.mock_mwater_server --port 8765 --rows 100k --latency-ms 200 --error-rate 0.1
+#
+# Every option can be overridden per request with query parameters of the same name, e.g.
+#   http://127.0.0.1:8765/api/survey.csv?rows=1k&gzip=1&encoding=utf-16&fail_first=2
+# GET /stats returns request counters as JSON; GET /reset clears them.
+import argparse
+import codecs
+import gzip
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from benchmarks.dataset_generator import DEFAULT_SEED, generate_mwater_csv_text, parse_row_count
+from core.lru_cache import LRUCache
+
+# Encodings a real export might arrive in; "utf-8-sig" is what mWater sends
+RESPONSE_ENCODINGS = ("utf-8-sig", "utf-8", "utf-16", "cp1252")
+DEFAULT_CHUNK_SIZE = 64 * 1024
+MAX_CACHED_DATASETS = 4
+
+
+class MockMWaterServer:
+    """
+    Threaded HTTP server that answers GET /api/<anything>.csv with a generated mWater CSV.
+    Defaults come from the constructor; query parameters override them per request.
+    Failures are deterministic: fail_first answers the first N data requests with 503, and
+    error_rate draws from a seeded RNG, so a run with the same settings fails the same way.
+    """
+    def __init__(self, host="127.0.0.1", port=0, rows=1_000, seed=DEFAULT_SEED, latency_ms=0,
+                 chunked=False, chunk_size=DEFAULT_CHUNK_SIZE, gzip_enabled=False, etag_enabled=True,
+                 error_rate=0.0, fail_first=0, encoding="utf-8-sig"):
+        self.host = host
+        self.requested_port = port
+        self.defaults = {"rows": rows, "seed": seed, "latency_ms": latency_ms, "chunked": chunked,
+                         "chunk_size": chunk_size, "gzip": gzip_enabled, "etag": etag_enabled,
+                         "error_rate": error_rate, "fail_first": fail_first, "encoding": encoding}
+        self._datasets = LRUCache(MAX_CACHED_DATASETS) # (rows, seed, encoding) -> (body_bytes, etag)
+        self._lock = threading.Lock()
+        self._error_rng = random.Random(seed)
+        self._stats = {}
+        self.reset_stats()
+        self._httpd = None
+        self._thread = None
+
+    # --- Lifecycle ---
+    def start(self):
+        """Starts serving in a daemon thread. Returns the base URL."""
+        if self._httpd is None:
+            self._httpd = ThreadingHTTPServer((self.host, self.requested_port), _make_request_handler(self))
+            self._httpd.daemon_threads = True
+            self._thread = threading.Thread(target=self._httpd.serve_forever, name="MockMWaterServer", daemon=True)
+            self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+            self._thread = None
+
+    @property
+    def base_url(self):
+        if self._httpd is None: return None
+        return f"http://{self.host}:{self._httpd.server_address[1]}"
+
+    def dataset_url(self, name="survey", **overrides):
+        """URL of a dataset with per-request overrides, e.g. dataset_url(rows="100k", gzip=1)."""
+        query = "&".join(f"{key}={value}" for key, value in overrides.items())
+        return f"{self.base_url}/api/{name}.csv" + (f"?{query}" if query else "")
+
+    # --- Stats ---
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {"requests": 0, "data_requests": 0, "responses_200": 0, "responses_304": 0,
+                           "responses_5xx": 0, "bytes_sent": 0}
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, **increments):
+        with self._lock:
+            for key, value in increments.items():
+                self._stats[key] += value
+
+    # --- Request decisions ---
+    def resolve_options(self, query):
+        """Merges query parameters over the defaults, with type conversion."""
+        options = dict(self.defaults)
+        for key, values in parse_qs(query).items():
+            if key not in options: continue
+            value = values[-1]
+            if key == "rows": options[key] = parse_row_count(value)
+            elif key in ("chunked", "gzip", "etag"): options[key] = value.lower() in ("1", "true", "yes")
+            elif key in ("seed", "chunk_size", "fail_first"): options[key] = int(value)
+            elif key in ("latency_ms", "error_rate"): options[key] = float(value)
+            elif key == "encoding":
+                if value not in RESPONSE_ENCODINGS: raise ValueError(f"Unsupported encoding '{value}'")
+                options[key] = value
+        return options
+
+    def should_fail(self, options):
+        """Decides (under the lock, so counting is exact) whether this data request gets a 503."""
+        with self._lock:
+            self._stats["data_requests"] += 1
+            if self._stats["data_requests"] <= options["fail_first"]:
+                return True
+            return options["error_rate"] > 0 and self._error_rng.random() < options["error_rate"]
+
+    def get_dataset(self, rows, seed, encoding):
+        """Returns (body_bytes, etag) for a dataset, generating and caching it on first use."""
+        cache_key = (rows, seed, encoding)
+        dataset = self._datasets.get(cache_key)
+        if dataset is None:
+            csv_text = generate_mwater_csv_text(rows, seed, bom=False)
+            if encoding == "utf-8-sig": body = codecs.BOM_UTF8 + csv_text.encode("utf-8")
+            elif encoding == "cp1252": body = csv_text.encode("cp1252", errors="replace")
+            else: body = csv_text.encode(encoding) # utf-16 writes its own BOM
+            dataset = (body, f'"{hashlib.sha1(body).hexdigest()}"')
+            self._datasets.put(cache_key, dataset)
+        return dataset
+
+
+def _make_request_handler(server):
+    class MockMWaterRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1" # Needed for chunked transfer encoding
+
+        def do_GET(self):
+            server._count(requests=1)
+            parsed = urlparse(self.path)
+            if parsed.path == "/stats":
+                return self._send_bytes(json.dumps(server.stats()).encode(), "application/json")
+            if parsed.path == "/reset":
+                server.reset_stats()
+                return self._send_bytes(b"{}", "application/json")
+            if not (parsed.path.startswith("/api/") and parsed.path.endswith(".csv")):
+                return self._send_bytes(b"Not found", "text/plain", status=404)
+            try:
+                options = server.resolve_options(parsed.query)
+            except ValueError as e:
+                return self._send_bytes(str(e).encode(), "text/plain", status=400)
+
+            if options["latency_ms"] > 0:
+                time.sleep(options["latency_ms"] / 1000.0)
+            if server.should_fail(options):
+                server._count(responses_5xx=1)
+                return self._send_bytes(b"Service temporarily unavailable", "text/plain", status=503)
+
+            body, etag = server.get_dataset(options["rows"], options["seed"], options["encoding"])
+            if options["etag"] and self.headers.get("If-None-Match") == etag:
+                server._count(responses_304=1)
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            extra_headers = {"ETag": etag} if options["etag"] else {}
+            if options["gzip"] and "gzip" in self.headers.get("Accept-Encoding", ""):
+                body = gzip.compress(body, compresslevel=5)
+                extra_headers["Content-Encoding"] = "gzip"
+            charset = "utf-8" if options["encoding"] == "utf-8-sig" else options["encoding"]
+            server._count(responses_200=1)
+            self._send_bytes(body, f"text/csv; charset={charset}", extra_headers=extra_headers,
+                             chunk_size=options["chunk_size"] if options["chunked"] else None)
+
+        def _send_bytes(self, body, content_type, status=200, extra_headers=None, chunk_size=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            for name, value in (extra_headers or {}).items():
+                self.send_header(name, value)
+            if chunk_size:
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for start in range(0, len(body), chunk_size):
+                    chunk = body[start:start + chunk_size]
+                    self.wfile.write(f"{len(chunk):X}\r\n".encode() + chunk + b"\r\n")
+                self.wfile.write(b"0\r\n\r\n")
+            else:
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            server._count(bytes_sent=len(body))
+
+        def log_message(self, format, *args):
+            pass # Benchmarks issue many requests; keep the console quiet
+
+    return MockMWaterRequestHandler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve generated mWater CSV datasets locally.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rows", default="1k", help="Default row count: 1k, 100k, 1m or an integer.")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--chunked", action="store_true")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--no-etag", action="store_true")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of data requests answered with 503.")
+    parser.add_argument("--fail-first", type=int, default=0, help="Answer the first N data requests with 503.")
+    parser.add_argument("--encoding", choices=RESPONSE_ENCODINGS, default="utf-8-sig")
+    args = parser.parse_args(argv)
+
+    mock_server = MockMWaterServer(args.host, args.port, parse_row_count(args.rows), args.seed, args.latency_ms,
+                                   args.chunked, args.chunk_size, args.gzip, not args.no_etag,
+                                   args.error_rate, args.fail_first, args.encoding)
+    print(f"Mock mWater API serving {mock_server.start()}/api/survey.csv (Ctrl+C to stop)")
+    try:
+        while True: time.sleep(3600)
+    except KeyboardInterrupt:
+        mock_server.stop()
+
+if __name__ == '__main__':
+    main()
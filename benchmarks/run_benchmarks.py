@@ -0,0 +1,213 @@
+# File: DilasaKMLTool_v4/benchmarks/run_benchmarks.py
+# ----------------------------------------------------------------------
+# Times the import/export hot paths on generated datasets and writes comparable JSON results.
+# --api adds fetch benchmarks against benchmarks.mock_mwater_server.
+#
+#   python -m benchmarks.run_benchmarks --sizes 1k,100k --output bench_results.json
+#   python -m benchmarks.run_benchmarks --sizes 1k --compare bench_results.json
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import simplekml
+
+from benchmarks.dataset_generator import DEFAULT_SEED, parse_row_count, write_mwater_csv
+from core.data_processor import process_csv_row_data
+from core.geometry import update_geometry_metrics
+from core.import_pipeline import iter_csv_file_rows, import_polygon_rows
+from core.kml_generator import add_polygon_to_kml_object, export_kml_files
+from database.db_manager import DatabaseManager
+
+RESULTS_FORMAT_VERSION = 1
+READ_SAMPLE_SIZE = 1_000 # Random records fetched by ID in the "db_read_by_ids" benchmark
+
+
+class BenchmarkRecorder:
+    """Collects timings as result dicts: name, size label, item count, seconds and items/s."""
+    def __init__(self, verbose=True):
+        self.results = []
+        self.verbose = verbose
+
+    def record(self, name, size_label, n_items, seconds, **extra):
+        result = {"name": name, "size": size_label, "items": n_items, "seconds": round(seconds, 6),
+                  "items_per_s": round(n_items / seconds, 1) if seconds > 0 else None, **extra}
+        self.results.append(result)
+        if self.verbose:
+            print(f"  {name:<28} {size_label:>6} {n_items:>10} items {seconds:>10.3f} s {result['items_per_s'] or 0:>12.1f} /s")
+        return result
+
+def _timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    value = function(*args, **kwargs)
+    return value, time.perf_counter() - start
+
+def run_size(recorder, size_label, n_rows, seed, work_dir):
+    """Runs every benchmark for one dataset size. All files live in work_dir."""
+    csv_path = os.path.join(work_dir, f"mwater_{size_label}.csv")
+    _, seconds = _timed(write_mwater_csv, csv_path, n_rows, seed)
+    recorder.record("generate_csv", size_label, n_rows, seconds, bytes=os.path.getsize(csv_path))
+
+    # Parsing/validation only: csv.DictReader + process_csv_row_data
+    def _process_all():
+        valid = 0
+        for row in iter_csv_file_rows(csv_path):
+            if process_csv_row_data(row)["status"] == "valid_for_kml": valid += 1
+        return valid
+    valid_count, seconds = _timed(_process_all)
+    recorder.record("process_csv_row_data", size_label, n_rows, seconds, valid_rows=valid_count)
+
+    # Full import into an empty database (duplicate check + insert per row)
+    db_path = os.path.join(work_dir, f"bench_{size_label}.db")
+    db_manager = DatabaseManager(db_file_path=db_path)
+    try:
+        summary, seconds = _timed(import_polygon_rows, db_manager, iter_csv_file_rows(csv_path), f"bench {size_label}")
+        recorder.record("db_import_csv", size_label, n_rows, seconds, new_added=summary["new_added"], skipped=summary["skipped"])
+
+        display_rows, seconds = _timed(db_manager.get_all_polygon_data_for_display)
+        recorder.record("db_read_display", size_label, len(display_rows), seconds)
+
+        # Full recompute: fetch, NumPy metrics and rewrite of polygon_geometry
+        geometry_result, seconds = _timed(update_geometry_metrics, db_manager, True)
+        recorder.record("geometry_recompute_all", size_label, geometry_result["computed"], seconds,
+                        self_intersecting=geometry_result["self_intersecting"])
+
+        all_ids = [row[0] for row in display_rows]
+        sample_ids = random.Random(seed).sample(all_ids, min(READ_SAMPLE_SIZE, len(all_ids)))
+        sampled, seconds = _timed(db_manager.get_polygon_data_by_ids, sample_ids)
+        recorder.record("db_read_by_ids", size_label, len(sampled), seconds)
+
+        valid_records, seconds = _timed(lambda: list(db_manager.iter_polygon_records({"status": "valid_for_kml"})))
+        recorder.record("db_iter_valid_records", size_label, len(valid_records), seconds)
+
+        def _add_all_to_kml():
+            kml_doc = simplekml.Kml(name="bench")
+            return sum(1 for record in valid_records if add_polygon_to_kml_object(kml_doc, record))
+        added, seconds = _timed(_add_all_to_kml)
+        recorder.record("add_polygon_to_kml_object", size_label, added, seconds)
+
+        export_dir = os.path.join(work_dir, f"kml_{size_label}")
+        os.makedirs(export_dir, exist_ok=True)
+        (files_generated, exported_ids), seconds = _timed(export_kml_files, db_manager.iter_polygon_records({"status": "valid_for_kml"}),
+                                                          export_dir, "single")
+        recorder.record("export_kml_consolidated", size_label, len(exported_ids), seconds,
+                        bytes=sum(os.path.getsize(os.path.join(export_dir, f)) for f in os.listdir(export_dir)))
+    finally:
+        db_manager.close()
+
+def run_api_fetch(recorder, size_label, n_rows, seed):
+    """Fetches the dataset from a local mock mWater server under several transfer/failure scenarios."""
+    import tracemalloc
+    from benchmarks.mock_mwater_server import MockMWaterServer
+    from core.api_handler import fetch_mwater_csv
+
+    mock_server = MockMWaterServer(rows=n_rows, seed=seed)
+    mock_server.start()
+    try:
+        scenarios = {
+            "api_fetch_plain": {},
+            "api_fetch_gzip": {"gzip": 1},
+            "api_fetch_chunked": {"chunked": 1},
+            "api_fetch_utf16": {"encoding": "utf-16"},
+            "api_fetch_cp1252": {"encoding": "cp1252"},
+        }
+        etag = None
+        for name, overrides in scenarios.items():
+            url = mock_server.dataset_url(**overrides)
+            fetch_result = fetch_mwater_csv(url, name) # Warm-up: the server generates and caches the dataset
+            fetch_result, seconds = _timed(fetch_mwater_csv, url, name)
+            recorder.record(name, size_label, len(fetch_result["rows"] or []), seconds,
+                            bytes_received=fetch_result["bytes_received"], error=fetch_result["error"])
+            if name == "api_fetch_plain": etag = fetch_result["etag"]
+
+        fetch_result, seconds = _timed(fetch_mwater_csv, mock_server.dataset_url(), "etag", etag=etag)
+        recorder.record("api_fetch_not_modified", size_label, 1, seconds, not_modified=fetch_result["not_modified"])
+
+        mock_server.reset_stats()
+        fetch_result, seconds = _timed(fetch_mwater_csv, mock_server.dataset_url(fail_first=2), "retry", retry_backoff_s=0.05)
+        recorder.record("api_fetch_retry_2x503", size_label, len(fetch_result["rows"] or []), seconds,
+                        attempts=fetch_result["attempts"], error=fetch_result["error"])
+
+        # Memory ceiling: peak Python allocations while fetching and parsing (timed separately above)
+        tracemalloc.start()
+        try:
+            fetch_result, seconds = _timed(fetch_mwater_csv, mock_server.dataset_url(), "memory")
+            _current, peak_bytes = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        recorder.record("api_fetch_peak_memory", size_label, len(fetch_result["rows"] or []), seconds,
+                        peak_bytes=peak_bytes, bytes_received=fetch_result["bytes_received"])
+    finally:
+        mock_server.stop()
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+def compare_results(current, baseline):
+    """Prints per-benchmark time ratios (current / baseline); below 1.0 is faster."""
+    baseline_by_key = {(r["name"], r["size"]): r for r in baseline.get("results", [])}
+    print(f"\nComparison with baseline ({baseline.get('meta', {}).get('git_commit')}):")
+    print(f"  {'Benchmark':<28} {'Size':>6} {'Baseline s':>12} {'Current s':>12} {'Ratio':>8}")
+    for result in current["results"]:
+        base = baseline_by_key.get((result["name"], result["size"]))
+        if not base or not base["seconds"]: continue
+        ratio = result["seconds"] / base["seconds"]
+        print(f"  {result['name']:<28} {result['size']:>6} {base['seconds']:>12.3f} {result['seconds']:>12.3f} {ratio:>8.2f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark CSV processing, database and KML export paths.")
+    parser.add_argument("--sizes", default="1k,100k", help="Comma-separated dataset sizes: 1k, 100k, 1m or integers.")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--output", "-o", help="Write JSON results to this file.")
+    parser.add_argument("--compare", help="Baseline JSON results to compare against.")
+    parser.add_argument("--api", action="store_true", help="Also benchmark API fetches against a local mock mWater server.")
+    parser.add_argument("--work-dir", help="Keep generated CSV/DB/KML files here instead of a temporary folder.")
+    args = parser.parse_args(argv)
+
+    size_labels = [label.strip() for label in args.sizes.split(",") if label.strip()]
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="dilasa_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+    recorder = BenchmarkRecorder()
+    try:
+        for size_label in size_labels:
+            print(f"Dataset {size_label}:")
+            run_size(recorder, size_label, parse_row_count(size_label), args.seed, work_dir)
+            if args.api:
+                run_api_fetch(recorder, size_label, parse_row_count(size_label), args.seed)
+    finally:
+        if not args.work_dir: shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = {
+        "meta": {
+            "format_version": RESULTS_FORMAT_VERSION,
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "sizes": size_labels,
+        },
+        "results": recorder.results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare_results(results, json.load(f))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
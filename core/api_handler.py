@@ -1,48 +1,154 @@
 # File: DilasaKMLTool_v4/core/api_handler.py
 # ----------------------------------------------------------------------
+import codecs
+import hashlib
+import time
 import requests
 from io import StringIO # To treat string as a file for csv.DictReader
 import csv # For csv.DictReader
 
+from core import perf
+
 # No CSV_HEADERS needed here if process_csv_row_data handles it
 
-def fetch_data_from_mwater_api(api_url, source_title="mWater API"):
+DEFAULT_TIMEOUT_S = 30
+DEFAULT_MAX_RETRIES = 2          # Extra attempts after the first, for connection errors and 5xx responses
+DEFAULT_RETRY_BACKOFF_S = 1.0    # Doubled after every failed attempt
+RETRYABLE_STATUS_CODES = {500, 502, 503, 504}
+
+def decode_csv_response_bytes(content_bytes, declared_charset=None):
     """
-    Fetches data from the given mWater API URL.
-    Decodes the response using 'utf-8-sig' to handle BOM.
-    Returns a list of row dictionaries (from csv.DictReader) or None on error.
-    Also returns any error message.
+    Decodes an API response body to text.
+    A UTF-16 BOM wins, then 'utf-8-sig' (handles a UTF-8 BOM), then the charset declared in
+    the Content-Type header, then cp1252 as a last resort for legacy Windows exports.
     """
-    print(f"CORE: Fetching data from {source_title} ({api_url})...")
+    if content_bytes.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return content_bytes.decode('utf-16')
     try:
-        response = requests.get(api_url, timeout=30) # 30-second timeout
-        response.raise_for_status() # Raises HTTPError for bad responses (4XX or 5XX)
+        return content_bytes.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        pass
+    if declared_charset:
+        try:
+            return content_bytes.decode(declared_charset)
+        except (UnicodeDecodeError, LookupError):
+            pass
+    return content_bytes.decode('cp1252', errors='replace')
+
+DOWNLOAD_CHUNK_BYTES = 64 * 1024 # should_cancel is checked after every chunk of the response body
 
-        # Decode with 'utf-8-sig' to handle BOM from API response bytes.
-        # This should ensure csv.DictReader gets clean fieldnames.
+def _read_body(response, should_cancel):
+    """Downloads the (decompressed) response body chunk by chunk. Returns None if should_cancel() turned True."""
+    body = bytearray()
+    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+        body += chunk
+        if should_cancel and should_cancel(): return None
+    return bytes(body)
+
+def _get_with_retries(api_url, source_title, headers, timeout_s, max_retries, retry_backoff_s, result, should_cancel=None):
+    """
+    GET with retries on connection errors (also while downloading the body) and 5xx.
+    Returns (response or None, body bytes, last failure text); sets result["cancelled"] if
+    should_cancel() turned True during the download or before a retry.
+    """
+    response, body, failure = None, b"", None
+    for attempt in range(max_retries + 1):
+        result["attempts"] = attempt + 1
         try:
-            text_data = response.content.decode('utf-8-sig')
-        except UnicodeDecodeError:
-            print(f"CORE: API Response for {source_title} not utf-8-sig. Trying default (requests' detected) decoding.")
-            text_data = response.text # Fallback to requests' default decoding
-        
-        # Basic check if data looks like CSV (optional, but can help)
-        # content_type = response.headers.get('content-type','').lower()
-        # if 'csv' not in content_type and (not text_data or not text_data.strip()):
-        #     return None, f"Response from {source_title} does not appear to be CSV or is empty. Content-Type: '{content_type}'."
-
-        csv_file_like_object = StringIO(text_data)
-        reader = csv.DictReader(csv_file_like_object)
-        
-        if not reader.fieldnames:
-            return None, f"No CSV headers (fieldnames) found in response from {source_title}."
-            
-        row_list = list(reader) # Consume the reader into a list of dictionaries
-        return row_list, None # Success: return list of rows, no error message
+            response = requests.get(api_url, headers=headers, timeout=timeout_s, stream=True)
+            result["status_code"] = response.status_code
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                with response:
+                    body = _read_body(response, should_cancel)
+                if body is None:
+                    result["cancelled"], body = True, b""
+                break
+            response.close()
+            failure = f"HTTP {response.status_code}"
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError) as e:
+            response, failure = None, str(e)
+        if attempt < max_retries:
+            if should_cancel and should_cancel():
+                result["cancelled"] = True; break
+            delay = retry_backoff_s * (2 ** attempt)
+            print(f"CORE: {source_title} attempt {attempt + 1} failed ({failure}). Retrying in {delay:.1f}s...")
+            time.sleep(delay)
+    return response, body, failure
+
+def fetch_mwater_csv(api_url, source_title="mWater API", etag=None, timeout_s=DEFAULT_TIMEOUT_S,
+                     max_retries=DEFAULT_MAX_RETRIES, retry_backoff_s=DEFAULT_RETRY_BACKOFF_S, should_cancel=None):
+    """
+    Fetches CSV data from an mWater API URL, retrying connection errors and 5xx responses
+    with exponential backoff. If etag is given it is sent as If-None-Match, and a 304 answer
+    is reported as not_modified without downloading the data again. The body is downloaded in
+    chunks; should_cancel() is polled after each one (and before retries) and, once True, the
+    download stops with cancelled set.
+    Returns a dict with keys: rows (list of row dicts or None), error (str or None), etag,
+    not_modified, cancelled, status_code, attempts, bytes_received, phase_seconds (fetch/decode/parse)
+    and content_sha1 (hash of the response body, identifying the snapshot for resumable imports).
+    """
+    result = {"rows": None, "error": None, "etag": None, "not_modified": False, "cancelled": False,
+              "status_code": None, "attempts": 0, "bytes_received": 0, "phase_seconds": {},
+              "content_sha1": None}
+    phase_timer = perf.PhaseTimer("api")
+    headers = {"Accept-Encoding": "gzip, deflate"}
+    if etag: headers["If-None-Match"] = etag
+
+    with perf.span("api.fetch", "io", source=source_title) as fetch_span:
+        phase_timer.start("fetch")
+        response, content_bytes, failure = _get_with_retries(api_url, source_title, headers, timeout_s, max_retries,
+                                                             retry_backoff_s, result, should_cancel)
+        result["bytes_received"] = len(content_bytes) # Body download counts as fetch
+        phase_timer.stop()
+        fetch_span.set_arg("attempts", result["attempts"])
+    result["phase_seconds"] = phase_timer.totals
+    if result["cancelled"]:
+        return result
+    if response is None:
+        result["error"] = f"Network error fetching from {source_title} after {result['attempts']} attempt(s): {failure}"
+        return result
+
+    try:
+        if response.status_code == 304:
+            result["not_modified"] = True
+            result["etag"] = response.headers.get("ETag", etag)
+            return result
+        response.raise_for_status() # Raises HTTPError for bad responses (4XX or 5XX)
+        result["etag"] = response.headers.get("ETag")
+        result["content_sha1"] = hashlib.sha1(content_bytes).hexdigest()
+
+        content_type = response.headers.get('content-type', '').lower()
+        declared_charset = response.encoding if 'charset=' in content_type else None
+        with perf.span("api.decode", "parse", items=result["bytes_received"]):
+            phase_timer.start("decode")
+            text_data = decode_csv_response_bytes(content_bytes, declared_charset)
+        with perf.span("api.parse", "parse") as parse_span:
+            phase_timer.start("parse")
+            reader = csv.DictReader(StringIO(text_data))
+            if not reader.fieldnames:
+                result["error"] = f"No CSV headers (fieldnames) found in response from {source_title}."
+                return result
+            result["rows"] = list(reader) # Consume the reader into a list of dictionaries
+            phase_timer.stop()
+            parse_span.set_items(len(result["rows"]))
+        return result
 
     except requests.exceptions.RequestException as e:
-        return None, f"Network or HTTP error fetching from {source_title}: {e}"
-    except UnicodeDecodeError as e:
-        return None, f"Unicode decoding error for {source_title} (tried utf-8-sig). Response might not be UTF-8. Error: {e}"
+        result["error"] = f"Network or HTTP error fetching from {source_title}: {e}"
     except Exception as e: # Catch other potential errors during processing
-        return None, f"Unexpected error processing data from {source_title}: {e}"
+        result["error"] = f"Unexpected error processing data from {source_title}: {e}"
+    return result
+
+def fetch_data_from_mwater_api(api_url, source_title="mWater API"):
+    """
+    Fetches data from the given mWater API URL.
+    Decodes the response using 'utf-8-sig' to handle BOM (see decode_csv_response_bytes);
+    transient network errors and 5xx responses are retried (see fetch_mwater_csv).
+    Returns a list of row dictionaries (from csv.DictReader) or None on error.
+    Also returns any error message.
+    """
+    print(f"CORE: Fetching data from {source_title} ({api_url})...")
+    fetch_result = fetch_mwater_csv(api_url, source_title)
+    return fetch_result["rows"], fetch_result["error"]
+# ----------------------------------------------------------------------
@@ -0,0 +1,74 @@
+# File: DilasaKMLTool_v4/core/csv_exporter.py
+# ----------------------------------------------------------------------
+# Bulk CSV export of polygon records straight from SQL: the filter spec becomes a WHERE clause
+# (DatabaseManager.build_polygon_filter_clause) and the chosen columns are streamed from one
+# cursor to csv.writer a batch at a time, so any column (points, vertices, geometry metrics)
+# can be exported and memory use does not grow with the export size. No Qt imports here:
+# used by the CLI and by the desktop app's background export worker.
+import csv
+import gzip
+import os
+import time
+
+from core import perf
+from core.data_processor import unpack_vertices
+
+CSV_EXPORT_BATCH_ROWS = 5000 # Rows fetched and written per batch
+CSV_GZIP_LEVEL = 5 # Most of level 9's size reduction at a fraction of its CPU time
+# Columns of the records table in the desktop app, in its order
+CSV_EXPORT_TABLE_COLUMNS = ("id", "evaluation_status", "status", "uuid", "farmer_name", "village_name", "date_added",
+                            "kml_export_count", "last_kml_export_date", "area_acre", "area_deviation_pct")
+CSV_EXPORT_HIDDEN_COLUMNS = ("source_hash",) # Internal bookkeeping, not record data
+
+def csv_export_columns(db_manager):
+    """Columns that can be exported: all polygon_data columns, then the geometry metrics."""
+    return [column for column in db_manager.get_polygon_export_columns() if column not in CSV_EXPORT_HIDDEN_COLUMNS]
+
+def _format_vertices(blob):
+    """The packed vertices BLOB as text: 'easting northing altitude' per vertex, vertices separated by ';'."""
+    return ";".join(f"{easting!r} {northing!r} {altitude!r}" for easting, northing, altitude in unpack_vertices(blob))
+
+def export_polygon_csv(db_manager, output_path, columns, filters=None, use_gzip=False,
+                       batch_size=CSV_EXPORT_BATCH_ROWS, progress_callback=None):
+    """
+    Writes the given columns (names from csv_export_columns; a header row of column names first) of
+    the records matching a filter spec to a CSV file, ordered by id. Plain output is UTF-8 with a
+    BOM, so Excel detects the encoding; use_gzip writes a gzip-compressed file without one. The
+    file is written under a temporary name and only moved into place once complete.
+
+    progress_callback(rows_written) may return False to cancel; nothing is written then.
+    Returns a summary dict: rows, cancelled, output_path, bytes (file size) and seconds.
+    Raises ValueError for unknown columns or filters, sqlite3.Error if reading fails (the partial file is removed).
+    """
+    columns = list(columns)
+    if not columns: raise ValueError("No columns selected for the CSV export.")
+    start = time.perf_counter()
+    row_batches = db_manager.iter_polygon_row_batches(columns, filters, batch_size=batch_size) # Raises before the file is created
+    summary = {"rows": 0, "cancelled": False, "output_path": os.path.abspath(output_path)}
+    vertices_index = columns.index("vertices") if "vertices" in columns else None
+    temp_path = output_path + ".part"
+    completed = False
+    output_file = (gzip.open(temp_path, "wt", encoding="utf-8", newline="", compresslevel=CSV_GZIP_LEVEL) if use_gzip
+                   else open(temp_path, "w", encoding="utf-8-sig", newline=""))
+    try:
+        writer = csv.writer(output_file)
+        writer.writerow(columns)
+        with perf.span("export.csv", "export") as span:
+            for rows in row_batches:
+                if vertices_index is not None:
+                    rows = [row[:vertices_index] + (_format_vertices(row[vertices_index]),) + row[vertices_index + 1:] for row in rows]
+                writer.writerows(rows)
+                summary["rows"] += len(rows)
+                if progress_callback and progress_callback(summary["rows"]) is False:
+                    summary["cancelled"] = True
+                    break
+            span.set_items(summary["rows"])
+        completed = not summary["cancelled"]
+    finally:
+        row_batches.close()
+        output_file.close()
+        if completed: os.replace(temp_path, output_path)
+        else: os.remove(temp_path)
+    summary["bytes"] = os.path.getsize(output_path) if completed else 0
+    summary["seconds"] = round(time.perf_counter() - start, 4)
+    return summary
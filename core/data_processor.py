@@ -1,7 +1,18 @@
 # ----------------------------------------------------------------------
 # File: DilasaKMLTool_v4/core/data_processor.py
 # ----------------------------------------------------------------------
+import os
 import re
+import sys
+import hashlib
+from array import array
+
+# Point column titles; "{n}" is the point number. Exports with other titles can be read by
+# setting DILASA_POINT_UTM_HEADER / DILASA_POINT_ALT_HEADER (e.g. "Vertex {n} UTM").
+POINT_UTM_HEADER_PATTERN = os.getenv("DILASA_POINT_UTM_HEADER", "Point {n} (UTM)")
+POINT_ALT_HEADER_PATTERN = os.getenv("DILASA_POINT_ALT_HEADER", "Point {n} (altitude)")
+MIN_POLYGON_POINTS = 4 # Points 1-4 are always read (and stored in the p1_*..p4_* columns)
+VERTEX_FIELDS = 3 # easting, northing, altitude per vertex in the packed 'vertices' BLOB
 
 # Expected CSV Headers - Centralized here for data_processor
 # The main UI part will also need to be aware of these if it directly interacts with CSVs
@@ -14,12 +25,45 @@ CSV_HEADERS = {
     "block": "Block",
     "district": "District",
     "area": "Proposed Area (Acre)",
-    "p1_utm": "Point 1 (UTM)", "p1_alt": "Point 1 (altitude)",
-    "p2_utm": "Point 2 (UTM)", "p2_alt": "Point 2 (altitude)",
-    "p3_utm": "Point 3 (UTM)", "p3_alt": "Point 3 (altitude)",
-    "p4_utm": "Point 4 (UTM)", "p4_alt": "Point 4 (altitude)",
+    **{f"p{n}_{kind}": pattern.format(n=n) for n in range(1, MIN_POLYGON_POINTS + 1)
+       for kind, pattern in (("utm", POINT_UTM_HEADER_PATTERN), ("alt", POINT_ALT_HEADER_PATTERN))},
 }
 
+_POINT_UTM_HEADER_RE = re.compile(re.escape(POINT_UTM_HEADER_PATTERN).replace(re.escape("{n}"), r"(\d+)") + "$")
+_point_columns_cache = {} # Header tuple -> highest point number among its columns
+
+def _count_polygon_points(row_dict):
+    """
+    Number of points the row describes: the highest "Point N" column with a UTM value, and at
+    least MIN_POLYGON_POINTS (missing ones among those are handled by substitution). Trailing
+    empty point columns, as in exports sized for the largest plot, are not part of the polygon.
+    """
+    header_key = tuple(row_dict)
+    max_point_number = _point_columns_cache.get(header_key)
+    if max_point_number is None:
+        point_numbers = [int(match.group(1)) for match in (_POINT_UTM_HEADER_RE.match(key) for key in header_key if key) if match]
+        max_point_number = max(point_numbers, default=0)
+        if len(_point_columns_cache) > 64: _point_columns_cache.clear()
+        _point_columns_cache[header_key] = max_point_number
+    point_count = max_point_number
+    while point_count > MIN_POLYGON_POINTS and not (row_dict.get(POINT_UTM_HEADER_PATTERN.format(n=point_count)) or "").strip():
+        point_count -= 1
+    return max(point_count, MIN_POLYGON_POINTS)
+
+def pack_vertices(vertices):
+    """Packs (easting, northing, altitude) tuples into the little-endian float64 BLOB stored as polygon_data.vertices."""
+    packed = array('d', [value for vertex in vertices for value in vertex])
+    if sys.byteorder == "big": packed.byteswap()
+    return packed.tobytes()
+
+def unpack_vertices(blob):
+    """Inverse of pack_vertices: a list of (easting, northing, altitude) tuples ([] for None/empty)."""
+    if not blob: return []
+    values = array('d')
+    values.frombytes(blob)
+    if sys.byteorder == "big": values.byteswap()
+    return list(zip(values[0::VERTEX_FIELDS], values[1::VERTEX_FIELDS], values[2::VERTEX_FIELDS]))
+
 def parse_utm_string(utm_str):
     """
     Parses a UTM string like "43Q 533039 2196062" into components.
@@ -48,11 +92,27 @@ def parse_utm_string(utm_str):
     except ValueError:
         return None
 
+def compute_source_row_hash(row_dict_from_reader):
+    """
+    SHA-1 of the source fields process_csv_row_data reads (CSV_HEADERS order, then any points
+    beyond MIN_POLYGON_POINTS, values stripped). Stored per record as source_hash, so a re-import
+    can tell unchanged rows from corrected ones without processing them. Other columns of the
+    export do not affect it, and four-point rows hash as they always have.
+    """
+    row_dict = {k.lstrip('\ufeff'): v for k, v in row_dict_from_reader.items() if k}
+    headers = list(CSV_HEADERS.values())
+    for n in range(MIN_POLYGON_POINTS + 1, _count_polygon_points(row_dict) + 1):
+        headers += [POINT_UTM_HEADER_PATTERN.format(n=n), POINT_ALT_HEADER_PATTERN.format(n=n)]
+    normalized = "\x1f".join((row_dict.get(header) or "").strip() for header in headers)
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
 def process_csv_row_data(row_dict_from_reader):
     """
     Processes a single row dictionary (from csv.DictReader).
     Cleans BOM from keys if present, extracts data based on CSV_HEADERS,
     validates points, attempts substitution for one missing point.
+    Rows may have any number of points (see _count_polygon_points): all of them go to
+    'vertices' (pack_vertices) with 'vertex_count'; the first four also fill p1_*..p4_*.
     Returns a dictionary flattened and ready for database insertion,
     including 'status' and 'error_messages' (as a string).
     """
@@ -69,6 +129,7 @@ def process_csv_row_data(row_dict_from_reader):
         "district": row_dict.get(CSV_HEADERS["district"], "").strip(),
         "proposed_area_acre": row_dict.get(CSV_HEADERS["area"], "").strip(),
         "status": "valid_for_kml", # Default status
+        "source_hash": compute_source_row_hash(row_dict),
         # error_messages will be populated as a string later
     }
     
@@ -84,7 +145,7 @@ def process_csv_row_data(row_dict_from_reader):
         if not any("empty or missing" in msg for msg in error_accumulator): # Add general if specific not present
              error_accumulator.append("Critical: Missing UUID or Response Code.")
         # Populate point fields with defaults for DB consistency even on this critical error
-        for i in range(1, 5):
+        for i in range(1, MIN_POLYGON_POINTS + 1):
             processed_for_db[f"p{i}_utm_str"] = ""
             processed_for_db[f"p{i}_altitude"] = 0.0
             processed_for_db[f"p{i}_easting"] = None
@@ -92,15 +153,17 @@ def process_csv_row_data(row_dict_from_reader):
             processed_for_db[f"p{i}_zone_num"] = None
             processed_for_db[f"p{i}_zone_letter"] = None
             processed_for_db[f"p{i}_substituted"] = False
+        processed_for_db["vertex_count"] = 0
+        processed_for_db["vertices"] = None
         processed_for_db["error_messages"] = "\n".join(error_accumulator) if error_accumulator else None
         return processed_for_db
 
     # This list stores detailed info for each point during processing
     # Each item: {"utm_str", "altitude", "easting", "northing", "zone_num", "zone_letter", "substituted", "is_valid_parse"}
     intermediate_points_data = [] 
-    for i in range(1, 5):
-        utm_header = CSV_HEADERS[f"p{i}_utm"]
-        alt_header = CSV_HEADERS[f"p{i}_alt"]
+    for i in range(1, _count_polygon_points(row_dict) + 1):
+        utm_header = POINT_UTM_HEADER_PATTERN.format(n=i)
+        alt_header = POINT_ALT_HEADER_PATTERN.format(n=i)
         
         utm_str_val = row_dict.get(utm_header, "").strip()
         alt_str_val = row_dict.get(alt_header, "0").strip() # Default to "0" if missing
@@ -135,9 +198,8 @@ def process_csv_row_data(row_dict_from_reader):
         error_accumulator.append(f"Too many missing/invalid UTM points ({len(invalid_point_indices)}).")
     elif len(invalid_point_indices) == 1:
         idx_to_fix = invalid_point_indices[0]
-        # Substitution map: 0->1, 1->2, 2->3, 3->0 (indices for intermediate_points_data)
-        substitute_source_idx_map = {0: 1, 1: 2, 2: 3, 3: 0} 
-        substitute_from_idx = substitute_source_idx_map[idx_to_fix]
+        # Substitute from the next point, wrapping around: 0->1, 1->2, ..., last->0
+        substitute_from_idx = (idx_to_fix + 1) % len(intermediate_points_data)
 
         if intermediate_points_data[substitute_from_idx]["is_valid_parse"]:
             source_point = intermediate_points_data[substitute_from_idx]
@@ -157,8 +219,8 @@ def process_csv_row_data(row_dict_from_reader):
             error_accumulator.append(f"Cannot substitute Point {idx_to_fix+1} as substitute Point {substitute_from_idx+1} is also invalid.")
     
     # --- Flatten point data into processed_for_db and final status checks ---
-    all_points_structurally_valid = True
-    for i in range(4):
+    all_points_structurally_valid = all(p_data_item["is_valid_parse"] for p_data_item in intermediate_points_data)
+    for i in range(MIN_POLYGON_POINTS):
         p_data_item = intermediate_points_data[i]
         processed_for_db[f"p{i+1}_utm_str"] = p_data_item["utm_str"]
         processed_for_db[f"p{i+1}_altitude"] = p_data_item["altitude"]
@@ -167,8 +229,9 @@ def process_csv_row_data(row_dict_from_reader):
         processed_for_db[f"p{i+1}_zone_num"] = p_data_item["zone_num"]
         processed_for_db[f"p{i+1}_zone_letter"] = p_data_item["zone_letter"]
         processed_for_db[f"p{i+1}_substituted"] = p_data_item["substituted"]
-        if not p_data_item["is_valid_parse"]: # Check internal flag after substitution
-            all_points_structurally_valid = False
+    processed_for_db["vertex_count"] = len(intermediate_points_data)
+    processed_for_db["vertices"] = pack_vertices([(p["easting"], p["northing"], p["altitude"]) for p in intermediate_points_data]) \
+                                   if all_points_structurally_valid else None
 
     if processed_for_db["status"] == "valid_for_kml": # Only if no major errors so far
         if not all_points_structurally_valid:
@@ -180,9 +243,9 @@ def process_csv_row_data(row_dict_from_reader):
             p1_zl = processed_for_db.get("p1_zone_letter")
             if p1_zn is not None and p1_zl is not None:
                 first_point_zone = (p1_zn, p1_zl)
-                for i in range(2, 5): # Check P2, P3, P4 against P1
-                    current_point_zn = processed_for_db.get(f"p{i}_zone_num")
-                    current_point_zl = processed_for_db.get(f"p{i}_zone_letter")
+                for i in range(2, len(intermediate_points_data) + 1): # Check P2..PN against P1
+                    current_point_zn = intermediate_points_data[i - 1]["zone_num"]
+                    current_point_zl = intermediate_points_data[i - 1]["zone_letter"]
                     if current_point_zn is not None and current_point_zl is not None:
                         if (current_point_zn, current_point_zl) != first_point_zone:
                             processed_for_db["status"] = "error_inconsistent_zones"
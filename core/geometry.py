@@ -0,0 +1,201 @@
+# File: DilasaKMLTool_v4/core/geometry.py
+# ----------------------------------------------------------------------
+# Planar geometry metrics of the stored polygons (area, perimeter, centroid, self-intersection),
+# computed with NumPy over the whole table at once: all rings are laid end to end in flat
+# easting/northing arrays and reduced per polygon with np.add.reduceat.
+# UTM coordinates are in metres, so the results are in metres / square metres.
+import operator
+import struct
+import time
+
+import numpy as np
+import utm
+
+from core import perf
+from core.data_processor import MIN_POLYGON_POINTS, VERTEX_FIELDS
+
+SQUARE_METRES_PER_ACRE = 4046.8564224
+MAX_PAIR_CHECKS_PER_BATCH = 2_000_000 # Bounds the (polygons x edge pairs) arrays of the self-intersection test
+# Range utm.to_latlon accepts (strict mode); checked here once for all vertices instead
+UTM_EASTING_RANGE = (100_000, 1_000_000)
+UTM_NORTHING_RANGE = (0, 10_000_000)
+# polygon_data columns polygon_records_to_lonlat reads
+LONLAT_SOURCE_COLUMNS = ("vertices", *(f"p{i}_{field}" for i in range(1, 5) for field in ("easting", "northing", "zone_num", "zone_letter")))
+_LEGACY_POINT_GETTERS = [operator.itemgetter(f"p{i}_easting", f"p{i}_northing", f"p{i}_zone_num", f"p{i}_zone_letter") for i in range(1, 5)]
+_LEGACY_VERTICES = struct.Struct(f"<{MIN_POLYGON_POINTS * VERTEX_FIELDS}d") # p1..p4 packed like the 'vertices' BLOB
+
+def polygon_inputs_to_arrays(vertex_rows, legacy_rows):
+    """
+    Turns the two row lists of DatabaseManager.get_geometry_inputs into flat arrays: (ids,
+    vertex_counts, eastings, northings, proposed_acres). Rings from the 'vertices' BLOB come first,
+    then the 4-point rings of records stored before it existed. proposed_acres is NaN where unknown.
+    """
+    ids, counts, proposed, eastings, northings = [], [], [], [], []
+    if vertex_rows:
+        blob_ids, blob_proposed, blobs = zip(*vertex_rows)
+        packed = np.frombuffer(b"".join(blobs), dtype="<f8").reshape(-1, VERTEX_FIELDS)
+        ids.append(np.asarray(blob_ids, dtype=np.int64))
+        counts.append(np.fromiter((len(blob) for blob in blobs), dtype=np.int64, count=len(blobs)) // (8 * VERTEX_FIELDS))
+        proposed.append(np.asarray(blob_proposed, dtype=np.float64)) # None -> NaN
+        eastings.append(packed[:, 0]); northings.append(packed[:, 1])
+    if legacy_rows:
+        legacy = np.asarray(legacy_rows, dtype=np.float64) # (id, proposed, e1, n1, ..., e4, n4) per record
+        ids.append(legacy[:, 0].astype(np.int64))
+        counts.append(np.full(len(legacy), MIN_POLYGON_POINTS, dtype=np.int64))
+        proposed.append(legacy[:, 1])
+        eastings.append(legacy[:, 2::2].ravel()); northings.append(legacy[:, 3::2].ravel())
+    if not ids:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0), np.empty(0), np.empty(0)
+    return (np.concatenate(ids), np.concatenate(counts), np.concatenate(eastings),
+            np.concatenate(northings), np.concatenate(proposed))
+
+def compute_polygon_metrics(vertex_counts, eastings, northings):
+    """
+    Metrics for rings laid end to end (vertex_counts[i] vertices each, not closed, counts >= 1).
+    Returns a dict of per-polygon arrays: area_m2 (shoelace, absolute), perimeter_m, centroid_easting,
+    centroid_northing and self_intersecting (two non-adjacent edges properly cross, e.g. a bow tie).
+    """
+    n_polygons = len(vertex_counts)
+    starts = np.zeros(n_polygons, dtype=np.int64)
+    np.cumsum(vertex_counts[:-1], out=starts[1:])
+    # Relative to each ring's first vertex: keeps the cross products small (UTM values are ~1e6 m)
+    polygon_of_vertex = np.repeat(np.arange(n_polygons), vertex_counts)
+    x = eastings - eastings[starts][polygon_of_vertex]
+    y = northings - northings[starts][polygon_of_vertex]
+    next_index = np.arange(len(x)) + 1
+    next_index[starts + vertex_counts - 1] = starts # Last vertex wraps to the first
+    x_next, y_next = x[next_index], y[next_index]
+
+    cross = x * y_next - x_next * y
+    signed_area2 = np.add.reduceat(cross, starts) # Twice the signed area
+    perimeter = np.add.reduceat(np.hypot(x_next - x, y_next - y), starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        centroid_x = np.add.reduceat((x + x_next) * cross, starts) / (3.0 * signed_area2)
+        centroid_y = np.add.reduceat((y + y_next) * cross, starts) / (3.0 * signed_area2)
+    degenerate = np.abs(signed_area2) < 1e-9 # No area: fall back to the vertex mean
+    if degenerate.any():
+        centroid_x[degenerate] = (np.add.reduceat(x, starts) / vertex_counts)[degenerate]
+        centroid_y[degenerate] = (np.add.reduceat(y, starts) / vertex_counts)[degenerate]
+
+    return {"area_m2": np.abs(signed_area2) / 2.0, "perimeter_m": perimeter,
+            "centroid_easting": centroid_x + eastings[starts], "centroid_northing": centroid_y + northings[starts],
+            "self_intersecting": _find_self_intersections(vertex_counts, starts, x, y)}
+
+def _find_self_intersections(vertex_counts, starts, x, y):
+    """Per polygon: does any pair of non-adjacent edges cross? Polygons are tested in groups of equal vertex count."""
+    result = np.zeros(len(vertex_counts), dtype=bool)
+    for n_vertices in np.unique(vertex_counts):
+        if n_vertices < 4: continue # A triangle cannot self-intersect
+        edge_i, edge_j = [], []
+        for i in range(n_vertices):
+            for j in range(i + 2, n_vertices):
+                if i == 0 and j == n_vertices - 1: continue # Adjacent through the wrap-around
+                edge_i.append(i); edge_j.append(j)
+        edge_i, edge_j = np.asarray(edge_i), np.asarray(edge_j)
+        polygon_indices = np.flatnonzero(vertex_counts == n_vertices)
+        batch_size = max(1, MAX_PAIR_CHECKS_PER_BATCH // len(edge_i))
+        for batch_start in range(0, len(polygon_indices), batch_size):
+            batch = polygon_indices[batch_start:batch_start + batch_size]
+            vertex_index = starts[batch][:, None] + np.arange(n_vertices) # (polygons, n) indices into x/y
+            ring_x, ring_y = x[vertex_index], y[vertex_index]
+            ax, ay = ring_x[:, edge_i], ring_y[:, edge_i]
+            bx, by = ring_x[:, (edge_i + 1) % n_vertices], ring_y[:, (edge_i + 1) % n_vertices]
+            cx, cy = ring_x[:, edge_j], ring_y[:, edge_j]
+            dx, dy = ring_x[:, (edge_j + 1) % n_vertices], ring_y[:, (edge_j + 1) % n_vertices]
+            # Proper crossing: each edge's end points lie strictly on opposite sides of the other edge
+            side_c = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+            side_d = (bx - ax) * (dy - ay) - (by - ay) * (dx - ax)
+            side_a = (dx - cx) * (ay - cy) - (dy - cy) * (ax - cx)
+            side_b = (dx - cx) * (by - cy) - (dy - cy) * (bx - cx)
+            crosses = (side_c * side_d < 0) & (side_a * side_b < 0)
+            result[batch] = crosses.any(axis=1)
+    return result
+
+def polygon_records_to_lonlat(polygon_records):
+    """
+    Converts the UTM vertices of a batch of polygon records to WGS84, the way the KML export does
+    ('vertices' BLOB in P1's zone, else p1..p4 each in its own zone), but with one vectorized
+    utm.to_latlon call per zone for the whole batch. Needs the LONLAT_SOURCE_COLUMNS of each record.
+    Returns (lonlat, vertex_counts, usable): all rings end to end as an (n, 2) array of (lon, lat),
+    not closed, in record order; and per record its vertex count and whether its coordinates are
+    complete and inside the UTM range (rings of unusable records contain NaN or are empty).
+    """
+    packed_parts, zone_numbers, northern, counts = [], [], [], []
+    for record in polygon_records:
+        vertices_blob = record['vertices']
+        if vertices_blob:
+            zone_num, zone_letter = record['p1_zone_num'], record['p1_zone_letter']
+            if zone_num is None or not zone_letter:
+                counts.append(0); continue
+            n_vertices = len(vertices_blob) // (8 * VERTEX_FIELDS)
+            packed_parts.append(vertices_blob)
+            zone_numbers.extend([zone_num] * n_vertices); northern.extend([zone_letter.upper() >= "N"] * n_vertices)
+            counts.append(n_vertices)
+        else:
+            points = [itemgetter(record) for itemgetter in _LEGACY_POINT_GETTERS]
+            if any(None in point or not point[3] for point in points):
+                counts.append(0); continue
+            packed_parts.append(_LEGACY_VERTICES.pack(*(value for easting, northing, _, _ in points for value in (easting, northing, 0.0))))
+            zone_numbers.extend(point[2] for point in points); northern.extend(point[3].upper() >= "N" for point in points)
+            counts.append(MIN_POLYGON_POINTS)
+    counts = np.asarray(counts, dtype=np.int64)
+    packed = np.frombuffer(b"".join(packed_parts), dtype="<f8").reshape(-1, VERTEX_FIELDS)
+    eastings, northings = packed[:, 0], packed[:, 1]
+    zone_keys = np.asarray(zone_numbers, dtype=np.int64) * 2 + np.asarray(northern, dtype=np.int64)
+    in_range = ((eastings >= UTM_EASTING_RANGE[0]) & (eastings < UTM_EASTING_RANGE[1]) &
+                (northings >= UTM_NORTHING_RANGE[0]) & (northings <= UTM_NORTHING_RANGE[1]))
+    lonlat = np.full((len(packed), 2), np.nan)
+    for zone_key in np.unique(zone_keys[in_range]):
+        in_zone = in_range & (zone_keys == zone_key)
+        lat, lon = utm.to_latlon(eastings[in_zone], northings[in_zone], int(zone_key // 2), northern=bool(zone_key % 2), strict=False)
+        lonlat[in_zone, 0], lonlat[in_zone, 1] = lon, lat
+    usable = counts > 0
+    if not in_range.all():
+        vertex_record = np.repeat(np.arange(len(counts)), counts)
+        usable[vertex_record[~in_range]] = False
+    return lonlat, counts, usable
+
+def polygon_records_to_lonlat_rings(polygon_records):
+    """Like polygon_records_to_lonlat, as one (n, 2) array of (lon, lat) per record, or None where the record is unusable."""
+    lonlat, counts, usable = polygon_records_to_lonlat(polygon_records)
+    rings = np.split(lonlat, np.cumsum(counts)[:-1]) if len(counts) else []
+    return [ring if ok else None for ring, ok in zip(rings, usable.tolist())]
+
+def close_rings(lonlat, vertex_counts):
+    """
+    Rings laid end to end (as from polygon_records_to_lonlat) with each ring's first vertex repeated
+    at its end, as KML, WKB and GeoJSON expect. Returns (closed, closed_starts, closed_counts).
+    """
+    starts = np.zeros(len(vertex_counts), dtype=np.int64)
+    np.cumsum(vertex_counts[:-1], out=starts[1:])
+    closed_counts = vertex_counts + 1
+    closed_starts = starts + np.arange(len(vertex_counts))
+    offsets = np.arange(int(closed_counts.sum())) - np.repeat(closed_starts, closed_counts)
+    closed = lonlat[np.repeat(starts, closed_counts) + offsets % np.repeat(vertex_counts, closed_counts)]
+    return closed, closed_starts, closed_counts
+
+def update_geometry_metrics(db_manager, recompute_all=False):
+    """
+    Computes the metrics of valid records and stores them in polygon_geometry (area_deviation_pct =
+    computed area vs proposed_area_acre, in percent). By default only records without metrics are
+    computed: new ones, and those whose coordinates, area or status changed (a trigger deletes them).
+    Returns {"computed", "self_intersecting", "seconds"}, or None if the metrics could not be saved.
+    """
+    start = time.perf_counter()
+    with perf.span("geometry.update", "geometry") as span:
+        ids, counts, eastings, northings, proposed_acre = polygon_inputs_to_arrays(*db_manager.get_geometry_inputs(only_missing=not recompute_all))
+        if len(ids) == 0:
+            if recompute_all: db_manager.save_geometry_metrics([], replace_all=True)
+            return {"computed": 0, "self_intersecting": 0, "seconds": round(time.perf_counter() - start, 4)}
+        metrics = compute_polygon_metrics(counts, eastings, northings)
+        area_acre = metrics["area_m2"] / SQUARE_METRES_PER_ACRE
+        deviation_pct = (area_acre - proposed_acre) / proposed_acre * 100.0
+        deviation_values = [None if value != value else value for value in deviation_pct.tolist()] # NaN -> NULL
+        saved = db_manager.save_geometry_metrics(zip(ids.tolist(), area_acre.tolist(), metrics["perimeter_m"].tolist(),
+                                                     metrics["centroid_easting"].tolist(), metrics["centroid_northing"].tolist(),
+                                                     metrics["self_intersecting"].astype(np.int8).tolist(), deviation_values),
+                                                 replace_all=recompute_all)
+        span.set_items(len(ids))
+    if saved is None: return None
+    return {"computed": len(ids), "self_intersecting": int(metrics["self_intersecting"].sum()),
+            "seconds": round(time.perf_counter() - start, 4)}
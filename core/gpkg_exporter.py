@@ -0,0 +1,213 @@
+# File: DilasaKMLTool_v4/core/gpkg_exporter.py
+# ----------------------------------------------------------------------
+# Writes polygon records to an OGC GeoPackage (.gpkg): one WGS84 polygon layer with the record
+# attributes and an R-tree spatial index, readable by QGIS/GDAL without conversion. A GeoPackage
+# is an SQLite file, so it is written with the sqlite3 module; no GDAL needed.
+# No Qt imports here: also used by the headless CLI.
+import operator
+import os
+import sqlite3
+import struct
+import time
+
+import numpy as np
+
+from core import perf
+from core.geometry import LONLAT_SOURCE_COLUMNS, close_rings, polygon_records_to_lonlat
+
+GPKG_APPLICATION_ID = 0x47504B47 # "GPKG"
+GPKG_USER_VERSION = 10300 # GeoPackage 1.3
+GPKG_LAYER_NAME = "dilasa_plots"
+GPKG_GEOMETRY_COLUMN = "geom"
+GPKG_BATCH_ROWS = 5000 # Records converted and inserted per executemany
+GPKG_COMMIT_ROWS = 100_000 # Rows per transaction
+WGS84_SRS_ID = 4326
+WGS84_DEFINITION = ('GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563,AUTHORITY["EPSG","7030"]],'
+                    'AUTHORITY["EPSG","6326"]],PRIMEM["Greenwich",0,AUTHORITY["EPSG","8901"]],'
+                    'UNIT["degree",0.0174532925199433,AUTHORITY["EPSG","9122"]],AUTHORITY["EPSG","4326"]]')
+
+GEOMETRY_METRIC_KEYS = ("area_acre", "perimeter_m", "self_intersecting", "area_deviation_pct")
+# (layer column, GeoPackage type, record key) - record keys as in iter_polygon_records(include_geometry_metrics=True)
+GPKG_ATTRIBUTE_COLUMNS = (
+    ("polygon_id", "INTEGER", "id"), ("uuid", "TEXT", "uuid"), ("response_code", "TEXT", "response_code"),
+    ("farmer_name", "TEXT", "farmer_name"), ("village_name", "TEXT", "village_name"), ("block", "TEXT", "block"),
+    ("district", "TEXT", "district"), ("proposed_area_acre", "TEXT", "proposed_area_acre"),
+    ("evaluation_status", "TEXT", "evaluation_status"), ("date_added", "TEXT", "date_added"),
+    ("kml_export_count", "INTEGER", "kml_export_count"), ("area_acre", "DOUBLE", "area_acre"),
+    ("perimeter_m", "DOUBLE", "perimeter_m"), ("self_intersecting", "BOOLEAN", "self_intersecting"),
+    ("area_deviation_pct", "DOUBLE", "area_deviation_pct"),
+)
+
+# polygon_data columns to read for export_geopackage (plus include_geometry_metrics)
+GPKG_SOURCE_COLUMNS = tuple(dict.fromkeys(["status", *LONLAT_SOURCE_COLUMNS,
+                                           *(key for _, _, key in GPKG_ATTRIBUTE_COLUMNS if key not in GEOMETRY_METRIC_KEYS)]))
+
+_GPKG_HEADER = struct.Struct("<2sBBi4d") # magic, version, flags, srs_id, envelope (minx, maxx, miny, maxy)
+_GPKG_HEADER_FLAGS = 0b011 # Little endian, envelope type 1 (XY)
+_WKB_POLYGON_HEADER = struct.Struct("<BIII") # byte order, type 3 (Polygon), ring count, point count
+
+def encode_gpkg_polygons(lonlat, vertex_counts):
+    """
+    GeoPackage geometry BLOBs (header with envelope + little-endian WKB polygon) for rings laid end to
+    end as in polygon_records_to_lonlat (all usable, not closed). Returns (blobs, envelopes) with
+    envelopes as [min_x, max_x, min_y, max_y]. Closing and envelopes are computed for the whole batch.
+    """
+    if len(vertex_counts) == 0: return [], []
+    starts = np.zeros(len(vertex_counts), dtype=np.int64)
+    np.cumsum(vertex_counts[:-1], out=starts[1:])
+    closed, closed_starts, closed_counts = close_rings(lonlat, vertex_counts)
+    envelopes = np.column_stack((np.minimum.reduceat(lonlat[:, 0], starts), np.maximum.reduceat(lonlat[:, 0], starts),
+                                 np.minimum.reduceat(lonlat[:, 1], starts), np.maximum.reduceat(lonlat[:, 1], starts))).tolist()
+    points_bytes = np.ascontiguousarray(closed, dtype="<f8").tobytes()
+    point_size = 2 * 8
+    blobs = [_GPKG_HEADER.pack(b"GP", 0, _GPKG_HEADER_FLAGS, WGS84_SRS_ID, *envelope) + _WKB_POLYGON_HEADER.pack(1, 3, 1, count)
+             + points_bytes[start * point_size:(start + count) * point_size]
+             for envelope, start, count in zip(envelopes, closed_starts.tolist(), closed_counts.tolist())]
+    return blobs, envelopes
+
+def _create_gpkg_schema(conn, layer_name):
+    conn.execute(f"PRAGMA application_id = {GPKG_APPLICATION_ID}")
+    conn.execute(f"PRAGMA user_version = {GPKG_USER_VERSION}")
+    conn.execute('''
+        CREATE TABLE gpkg_spatial_ref_sys (
+            srs_name TEXT NOT NULL, srs_id INTEGER PRIMARY KEY, organization TEXT NOT NULL,
+            organization_coordsys_id INTEGER NOT NULL, definition TEXT NOT NULL, description TEXT
+        )
+    ''')
+    conn.executemany("INSERT INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)", [
+        ("Undefined cartesian SRS", -1, "NONE", -1, "undefined", "undefined cartesian coordinate reference system"),
+        ("Undefined geographic SRS", 0, "NONE", 0, "undefined", "undefined geographic coordinate reference system"),
+        ("WGS 84 geodetic", WGS84_SRS_ID, "EPSG", WGS84_SRS_ID, WGS84_DEFINITION, "longitude/latitude coordinates in decimal degrees on the WGS 84 spheroid"),
+    ])
+    conn.execute('''
+        CREATE TABLE gpkg_contents (
+            table_name TEXT NOT NULL PRIMARY KEY, data_type TEXT NOT NULL, identifier TEXT UNIQUE,
+            description TEXT DEFAULT '', last_change DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now')),
+            min_x DOUBLE, min_y DOUBLE, max_x DOUBLE, max_y DOUBLE,
+            srs_id INTEGER REFERENCES gpkg_spatial_ref_sys(srs_id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE gpkg_geometry_columns (
+            table_name TEXT NOT NULL UNIQUE REFERENCES gpkg_contents(table_name), column_name TEXT NOT NULL,
+            geometry_type_name TEXT NOT NULL, srs_id INTEGER NOT NULL REFERENCES gpkg_spatial_ref_sys(srs_id),
+            z TINYINT NOT NULL, m TINYINT NOT NULL,
+            PRIMARY KEY (table_name, column_name)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE gpkg_extensions (
+            table_name TEXT, column_name TEXT, extension_name TEXT NOT NULL, definition TEXT NOT NULL, scope TEXT NOT NULL,
+            UNIQUE (table_name, column_name, extension_name)
+        )
+    ''')
+    attribute_sql = ", ".join(f"{name} {sql_type}" for name, sql_type, _ in GPKG_ATTRIBUTE_COLUMNS)
+    conn.execute(f"CREATE TABLE {layer_name} (fid INTEGER PRIMARY KEY AUTOINCREMENT, {GPKG_GEOMETRY_COLUMN} POLYGON, {attribute_sql})")
+    conn.execute("INSERT INTO gpkg_contents (table_name, data_type, identifier, description, srs_id) VALUES (?, 'features', ?, ?, ?)",
+                 (layer_name, layer_name, "Plot polygons exported by the Dilasa KML Tool", WGS84_SRS_ID))
+    conn.execute("INSERT INTO gpkg_geometry_columns VALUES (?, ?, 'POLYGON', ?, 0, 0)", (layer_name, GPKG_GEOMETRY_COLUMN, WGS84_SRS_ID))
+    conn.execute(f"CREATE VIRTUAL TABLE rtree_{layer_name}_{GPKG_GEOMETRY_COLUMN} USING rtree(id, minx, maxx, miny, maxy)")
+    conn.execute("INSERT INTO gpkg_extensions VALUES (?, ?, 'gpkg_rtree_index', 'http://www.geopackage.org/spec120/#extension_rtree', 'write-only')",
+                 (layer_name, GPKG_GEOMETRY_COLUMN))
+
+def _create_rtree_triggers(conn, layer_name):
+    """
+    The triggers GeoPackage readers expect to keep the R-tree in sync when the layer is edited (e.g.
+    in QGIS). They call ST_* functions that only GIS readers register, so they are created after
+    the bulk load, which fills the R-tree directly.
+    """
+    t, c, rtree = layer_name, GPKG_GEOMETRY_COLUMN, f"rtree_{layer_name}_{GPKG_GEOMETRY_COLUMN}"
+    bounds = f"ST_MinX(NEW.{c}), ST_MaxX(NEW.{c}), ST_MinY(NEW.{c}), ST_MaxY(NEW.{c})"
+    conn.executescript(f'''
+        CREATE TRIGGER {rtree}_insert AFTER INSERT ON {t} WHEN (NEW.{c} NOT NULL AND NOT ST_IsEmpty(NEW.{c}))
+        BEGIN INSERT OR REPLACE INTO {rtree} VALUES (NEW.fid, {bounds}); END;
+        CREATE TRIGGER {rtree}_update1 AFTER UPDATE OF {c} ON {t} WHEN OLD.fid = NEW.fid AND (NEW.{c} NOTNULL AND NOT ST_IsEmpty(NEW.{c}))
+        BEGIN INSERT OR REPLACE INTO {rtree} VALUES (NEW.fid, {bounds}); END;
+        CREATE TRIGGER {rtree}_update2 AFTER UPDATE OF {c} ON {t} WHEN OLD.fid = NEW.fid AND (NEW.{c} ISNULL OR ST_IsEmpty(NEW.{c}))
+        BEGIN DELETE FROM {rtree} WHERE id = OLD.fid; END;
+        CREATE TRIGGER {rtree}_update3 AFTER UPDATE ON {t} WHEN OLD.fid != NEW.fid AND (NEW.{c} NOTNULL AND NOT ST_IsEmpty(NEW.{c}))
+        BEGIN DELETE FROM {rtree} WHERE id = OLD.fid; INSERT OR REPLACE INTO {rtree} VALUES (NEW.fid, {bounds}); END;
+        CREATE TRIGGER {rtree}_update4 AFTER UPDATE ON {t} WHEN OLD.fid != NEW.fid AND (NEW.{c} ISNULL OR ST_IsEmpty(NEW.{c}))
+        BEGIN DELETE FROM {rtree} WHERE id IN (OLD.fid, NEW.fid); END;
+        CREATE TRIGGER {rtree}_delete AFTER DELETE ON {t} WHEN OLD.{c} NOT NULL
+        BEGIN DELETE FROM {rtree} WHERE id = OLD.fid; END;
+    ''')
+
+def export_geopackage(polygon_records, output_path, layer_name=GPKG_LAYER_NAME, batch_size=GPKG_BATCH_ROWS, progress_callback=None):
+    """
+    Writes the 'valid_for_kml' records of an iterable (e.g. DatabaseManager.iter_polygon_records with
+    columns=GPKG_SOURCE_COLUMNS, include_geometry_metrics=True) to a new GeoPackage at output_path, replacing any existing file.
+    Records are consumed batch by batch, converted to WGS84 and inserted with executemany; the file
+    is built under a temporary name and only moved into place once complete.
+
+    progress_callback(records_read) may return False to cancel; nothing is written then.
+    Returns a summary dict: exported, skipped (not valid or no usable coordinates), cancelled,
+    output_path and seconds.
+    """
+    start = time.perf_counter()
+    summary = {"exported": 0, "skipped": 0, "cancelled": False, "output_path": os.path.abspath(output_path)}
+    temp_path = output_path + ".part"
+    if os.path.exists(temp_path): os.remove(temp_path)
+    conn = sqlite3.connect(temp_path)
+    try:
+        # Nothing to protect until the file is complete: no journal, no fsync per commit
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        _create_gpkg_schema(conn, layer_name)
+        column_names = ", ".join(name for name, _, _ in GPKG_ATTRIBUTE_COLUMNS)
+        insert_feature_sql = (f"INSERT INTO {layer_name} (fid, {GPKG_GEOMETRY_COLUMN}, {column_names}) "
+                              f"VALUES ({', '.join('?' * (len(GPKG_ATTRIBUTE_COLUMNS) + 2))})")
+        insert_rtree_sql = f"INSERT INTO rtree_{layer_name}_{GPKG_GEOMETRY_COLUMN} VALUES (?, ?, ?, ?, ?)"
+        extent = [np.inf, np.inf, -np.inf, -np.inf] # min_x, min_y, max_x, max_y
+        attribute_getter = operator.itemgetter(*(key for _, _, key in GPKG_ATTRIBUTE_COLUMNS))
+        records_read, rows_since_commit = 0, 0
+        record_iterator = iter(polygon_records)
+        phase_timer = perf.PhaseTimer("gpkg")
+        while True:
+            phase_timer.start("read")
+            batch = [record for _, record in zip(range(batch_size), record_iterator)]
+            if not batch: break
+            records_read += len(batch)
+            valid_records = [record for record in batch if record['status'] == 'valid_for_kml']
+            phase_timer.start("convert")
+            lonlat, vertex_counts, usable = polygon_records_to_lonlat(valid_records)
+            exported_records = [record for record, ok in zip(valid_records, usable.tolist()) if ok]
+            blobs, envelopes = encode_gpkg_polygons(lonlat[np.repeat(usable, vertex_counts)], vertex_counts[usable])
+            first_fid = summary["exported"] + 1
+            feature_rows = [(fid, blob, *attribute_getter(record))
+                            for fid, blob, record in zip(range(first_fid, first_fid + len(blobs)), blobs, exported_records)]
+            rtree_rows = [(fid, *envelope) for fid, envelope in zip(range(first_fid, first_fid + len(blobs)), envelopes)]
+            if envelopes:
+                batch_extent = np.asarray(envelopes)
+                extent = [min(extent[0], batch_extent[:, 0].min()), min(extent[1], batch_extent[:, 2].min()),
+                          max(extent[2], batch_extent[:, 1].max()), max(extent[3], batch_extent[:, 3].max())]
+            summary["skipped"] += len(batch) - len(feature_rows)
+            phase_timer.start("write")
+            conn.executemany(insert_feature_sql, feature_rows)
+            conn.executemany(insert_rtree_sql, rtree_rows)
+            summary["exported"] += len(feature_rows)
+            rows_since_commit += len(feature_rows)
+            if rows_since_commit >= GPKG_COMMIT_ROWS:
+                conn.commit(); rows_since_commit = 0
+            if progress_callback and progress_callback(records_read) is False:
+                summary["cancelled"] = True
+                break
+        phase_timer.start("finish")
+        if not summary["cancelled"]:
+            if summary["exported"]:
+                conn.execute("UPDATE gpkg_contents SET min_x = ?, min_y = ?, max_x = ?, max_y = ? WHERE table_name = ?",
+                             (*(float(value) for value in extent), layer_name))
+            conn.commit()
+            _create_rtree_triggers(conn, layer_name)
+            conn.commit()
+        phase_timer.emit(items=summary["exported"])
+        completed = not summary["cancelled"]
+    except BaseException:
+        completed = False
+        raise
+    finally:
+        conn.close()
+        if completed: os.replace(temp_path, output_path)
+        else: os.remove(temp_path)
+    summary["seconds"] = round(time.perf_counter() - start, 4)
+    return summary
@@ -0,0 +1,475 @@
+# File: DilasaKMLTool_v4/core/import_pipeline.py
+# ----------------------------------------------------------------------
+import csv
+import datetime
+import hashlib
+import itertools
+import os
+import time
+
+from core import perf
+from core.data_processor import process_csv_row_data, compute_source_row_hash, CSV_HEADERS
+from core.source_archive import encode_source_row
+from core.geometry import update_geometry_metrics
+
+# Shared by the GUI import handlers and the headless CLI (dilasa_kml). No Qt imports here.
+MAX_VALIDATION_ERRORS_REPORTED = 100
+IMPORT_CHUNK_ROWS = 500 # Rows per duplicate lookup / insert transaction; bounds memory for streamed files
+FINGERPRINT_SAMPLE_BYTES = 64 * 1024
+
+class CsvFileRowStream:
+    """
+    Iterable over a CSV file's row dictionaries, read incrementally. Lines are read from the
+    binary file and decoded one by one ('utf-8-sig', so a BOM is dropped), which keeps bytes_read
+    exact: it is the offset just past the last row yielded. That gives progress as a share of
+    total_bytes without counting rows first, and lets an import resume at a saved offset (resume_at).
+    """
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.total_bytes = os.path.getsize(filepath)
+        self.bytes_read = 0
+        self.start_offset = 0
+
+    def resume_at(self, byte_offset):
+        """Makes iteration continue at byte_offset (a bytes_read value saved earlier) after reading the header."""
+        self.start_offset = byte_offset
+
+    def __iter__(self):
+        with open(self.filepath, mode='rb') as binary_file:
+            self.bytes_read = 0
+            def _decoded_lines():
+                # csv.reader asks for one line at a time, so the count never runs ahead of the rows
+                for raw_line in iter(binary_file.readline, b''):
+                    self.bytes_read += len(raw_line)
+                    yield raw_line.decode('utf-8-sig')
+            reader = csv.DictReader(_decoded_lines())
+            if reader.fieldnames and self.start_offset > self.bytes_read:
+                binary_file.seek(self.start_offset)
+                self.bytes_read = self.start_offset
+            for row_dict in reader:
+                yield row_dict
+
+    @property
+    def fraction_read(self):
+        return self.bytes_read / self.total_bytes if self.total_bytes else 1.0
+
+def iter_csv_file_rows(filepath):
+    """
+    Yields row dictionaries from a CSV file one at a time (see CsvFileRowStream).
+    The file is never loaded whole.
+    """
+    yield from CsvFileRowStream(filepath)
+
+def fingerprint_csv_file(filepath):
+    return fingerprint_source_file(filepath, "csv")
+
+def fingerprint_source_file(filepath, kind):
+    """
+    Identifies a file's content for import checkpoints without reading it all: size,
+    modification time and SHA-1 of the first and last FINGERPRINT_SAMPLE_BYTES.
+    kind ('csv', 'kml') prefixes the result.
+    """
+    file_stat = os.stat(filepath)
+    digest = hashlib.sha1(f"{file_stat.st_size}:{file_stat.st_mtime_ns}".encode())
+    with open(filepath, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_SAMPLE_BYTES))
+        if file_stat.st_size > FINGERPRINT_SAMPLE_BYTES:
+            f.seek(max(FINGERPRINT_SAMPLE_BYTES, file_stat.st_size - FINGERPRINT_SAMPLE_BYTES))
+            digest.update(f.read())
+    return f"{kind}:{digest.hexdigest()}"
+
+def get_response_code_from_row(original_row_dict):
+    """Returns the stripped Response Code of a raw row (BOM-tolerant header lookup), or ''."""
+    for k, v in original_row_dict.items():
+        if k and k.lstrip('\ufeff') == CSV_HEADERS["response_code"]:
+            return (v or "").strip()
+    return ""
+
+def import_polygon_rows(db_manager, row_iterable, source_description,
+                        log_callback=None, progress_callback=None, chunk_size=IMPORT_CHUNK_ROWS,
+                        row_offset=0, chunk_committed_callback=None, update_changed=False):
+    """
+    Validates raw rows with process_csv_row_data and adds new records to the database.
+    Rows whose Response Code already exists are skipped, as are rows missing identifiers.
+    Rows are taken from row_iterable chunk_size at a time: one duplicate lookup and one
+    insert transaction per chunk, so a streaming source is never held in memory whole.
+    With update_changed, existing records are compared by source row hash instead: unchanged
+    rows are skipped without being processed, changed ones are rewritten (update_polygon_data_bulk).
+
+    Args:
+        db_manager: DatabaseManager to write to.
+        row_iterable: Any iterable of row dictionaries (a list, or a streaming reader).
+        source_description (str): Used in log messages, e.g. "CSV 'file.csv'".
+        log_callback (callable, optional): log_callback(message, level), level as in MainWindow.log_message.
+        progress_callback (callable, optional): progress_callback(processed, skipped, new_added),
+            called after every chunk. Returning False stops the import (cancel); rows of the
+            chunks already written stay in the database.
+        chunk_size (int): Rows per chunk.
+        row_offset (int): Rows of the source already imported (resumed imports); used for row numbers in logs.
+        chunk_committed_callback (callable, optional): chunk_committed_callback(processed), called once
+            a chunk is written, before progress_callback. run_import saves checkpoints with it.
+
+    Returns a summary dict: processed, new_added, skipped, cancelled, and phase_seconds
+    (time spent reading rows, validating, writing to the DB and in the progress callback).
+    Per-outcome counts are included too: new_with_errors (added, but not valid for KML),
+    skipped_duplicate, skipped_missing_rc, skipped_invalid, failed_db_write and updated_changed.
+    """
+    log = log_callback or (lambda message, level="info": None)
+    summary = {"processed": 0, "new_added": 0, "skipped": 0, "cancelled": False,
+               "new_with_errors": 0, "skipped_duplicate": 0, "skipped_missing_rc": 0,
+               "skipped_invalid": 0, "failed_db_write": 0, "updated_changed": 0}
+    phase_timer = perf.PhaseTimer("import")
+    # A Response Code repeated later in the file is a duplicate, never an "update". Without update_changed
+    # the stored-hash lookup already catches repeats across chunks; with it, the codes taken so far are
+    # kept in a TEMP table (memory stays bounded whatever the file size).
+    if update_changed: db_manager.reset_import_run_codes()
+    row_iterator = iter(row_iterable)
+
+    try:
+        while True:
+            phase_timer.start("read") # Streaming sources do their I/O and CSV parsing here
+            chunk = list(itertools.islice(row_iterator, chunk_size))
+            if not chunk:
+                break
+            _import_row_chunk(db_manager, chunk, row_offset + summary["processed"] + 1, source_description, log, summary,
+                              phase_timer, update_changed)
+            if chunk_committed_callback:
+                chunk_committed_callback(summary["processed"])
+
+            phase_timer.start("progress")
+            if progress_callback and progress_callback(summary["processed"], summary["skipped"], summary["new_added"]) is False:
+                summary["cancelled"] = True
+                log("Import cancelled by user.", "info")
+                break
+    finally:
+        if update_changed: db_manager.drop_import_run_codes()
+
+    phase_timer.emit(items=summary["processed"])
+    summary["phase_seconds"] = {phase: round(seconds, 4) for phase, seconds in phase_timer.totals.items()}
+    return summary
+
+def _import_row_chunk(db_manager, chunk, first_row_number, source_description, log, summary, phase_timer,
+                      update_changed=False):
+    """
+    Classifies, validates and writes one chunk of raw rows, updating summary in place. The raw rows
+    of written records are archived (polygon_source_rows), as are those of unchanged duplicates
+    whose record has no archived row yet.
+    """
+    phase_timer.start("db_write")
+    summary["processed"] += len(chunk)
+    response_codes = [get_response_code_from_row(row) for row in chunk]
+    chunk_codes = {rc for rc in response_codes if rc}
+    existing_hashes = db_manager.get_existing_source_hashes(chunk_codes)
+    earlier_codes = db_manager.get_import_run_codes(chunk_codes) if update_changed else set() # Taken by earlier chunks
+    seen_codes = set()
+
+    phase_timer.start("validate")
+    records_to_add, records_to_update = [], []
+    raw_rows_by_code, unchanged_rows_by_code = {}, {}
+    for i, (original_row_dict, rc_from_row) in enumerate(zip(chunk, response_codes)):
+        if not rc_from_row:
+            log(f"Row {first_row_number + i} from {source_description} skipped: Missing Response Code.", "error")
+            summary["skipped"] += 1; summary["skipped_missing_rc"] += 1
+            continue
+        is_stored, is_repeat = rc_from_row in existing_hashes, rc_from_row in seen_codes or rc_from_row in earlier_codes
+        seen_codes.add(rc_from_row)
+        is_unchanged = is_stored and not is_repeat and existing_hashes[rc_from_row] == compute_source_row_hash(original_row_dict)
+        if is_unchanged: unchanged_rows_by_code[rc_from_row] = original_row_dict
+        if is_repeat or (is_stored and (not update_changed or is_unchanged)):
+            log(f"Skipped duplicate Response Code '{rc_from_row}'.", "info")
+            summary["skipped"] += 1; summary["skipped_duplicate"] += 1
+            continue
+        processed_flat = _process_row_or_log(original_row_dict, rc_from_row, source_description, log, summary)
+        if processed_flat is not None:
+            (records_to_update if is_stored else records_to_add).append(processed_flat)
+            raw_rows_by_code[rc_from_row] = original_row_dict
+
+    phase_timer.start("db_write")
+    if update_changed: db_manager.add_import_run_codes(seen_codes)
+    written_records = []
+    if records_to_update:
+        update_counts = db_manager.update_polygon_data_bulk(records_to_update)
+        if update_counts is None:
+            log(f"Failed to update {len(records_to_update)} changed record(s) in the DB.", "error")
+            summary["skipped"] += len(records_to_update); summary["failed_db_write"] += len(records_to_update)
+        else:
+            written_records.extend(records_to_update)
+            summary["updated_changed"] += update_counts["updated"]
+            # Records without a stored hash whose data was identical only had the hash filled in
+            summary["skipped"] += len(records_to_update) - update_counts["updated"]
+            summary["skipped_duplicate"] += len(records_to_update) - update_counts["updated"]
+    if db_manager.add_polygon_data_bulk(records_to_add) is not None:
+        added_records = records_to_add
+    else: # Something in the chunk conflicts (e.g. a UUID already stored); write row by row to isolate it
+        added_records = []
+        for processed_flat in records_to_add:
+            if db_manager.add_or_update_polygon_data(processed_flat, overwrite=False) is not None:
+                added_records.append(processed_flat)
+            else:
+                log(f"Failed to save RC '{processed_flat.get('response_code')}' to DB.", "error")
+                summary["skipped"] += 1 # Count as skipped if DB operation failed
+                summary["failed_db_write"] += 1
+    summary["new_added"] += len(added_records)
+    summary["new_with_errors"] += sum(1 for record in added_records if record.get("status") != "valid_for_kml")
+
+    phase_timer.start("archive")
+    written_records.extend(added_records)
+    db_manager.save_source_rows([(record["response_code"], *encode_source_row(raw_rows_by_code[record["response_code"]]))
+                                 for record in written_records])
+    if unchanged_rows_by_code:
+        unarchived_codes = db_manager.get_unarchived_response_codes(unchanged_rows_by_code)
+        db_manager.save_source_rows([(rc, *encode_source_row(unchanged_rows_by_code[rc])) for rc in unarchived_codes], replace=False)
+
+def run_import(db_manager, row_iterable, source_type, source_description, byte_size=None,
+               pre_phase_seconds=None, log_callback=None, progress_callback=None,
+               fingerprint=None, resume=True, update_changed=False):
+    """
+    Runs import_polygon_rows and records the run in the import_runs ledger.
+    update_changed is passed on (rewrite records whose source row hash changed).
+    source_type is 'csv', 'api' or 'kml'. byte_size is the size of the file or response, if known.
+    pre_phase_seconds holds phases that ran before the rows were available, e.g. the API
+    fetch/decode/parse timings (streamed CSV files are read inside the import's "read" phase).
+
+    fingerprint identifies the source content (fingerprint_csv_file, or "api:<content_sha1>"
+    from fetch_mwater_csv). With it, a checkpoint is saved after every committed chunk and
+    removed when the import finishes. If an earlier run of the same content was cancelled or
+    crashed, the import resumes after its last committed chunk: a CsvFileRowStream seeks to the
+    saved byte offset, other iterables skip the rows already done. A checkpoint lags its chunk
+    by at most one commit, so a crash re-reads at most one chunk, whose rows then count as
+    duplicates. resume=False discards any checkpoint and starts over.
+
+    Returns the import summary plus total_seconds, rows_per_s, resumed_from_row and run_id
+    (None if the ledger write failed).
+    """
+    log = log_callback or (lambda message, level="info": None)
+    started_at = datetime.datetime.now().isoformat(timespec="seconds")
+    records_before = db_manager.count_polygon_records()
+    start = time.perf_counter()
+
+    row_stream = row_iterable if hasattr(row_iterable, "resume_at") else None
+    resumed_from_row = 0
+    if fingerprint and update_changed:
+        fingerprint += ":update-changed" # Rows before a checkpoint were handled in that mode
+    if fingerprint and not resume:
+        db_manager.delete_import_checkpoint(fingerprint)
+    checkpoint = db_manager.get_import_checkpoint(fingerprint) if (fingerprint and resume) else None
+    if checkpoint:
+        resumed_from_row = checkpoint["rows_done"]
+        if row_stream and checkpoint["byte_offset"]:
+            row_stream.resume_at(checkpoint["byte_offset"])
+        else:
+            row_iterable = itertools.islice(row_iterable, resumed_from_row, None)
+        log(f"Resuming import of {source_description} after row {resumed_from_row} (checkpoint of {checkpoint['updated_at']}).", "info")
+
+    def _save_checkpoint(processed_count):
+        db_manager.save_import_checkpoint(fingerprint, source_type, source_description, resumed_from_row + processed_count,
+                                          row_stream.bytes_read if row_stream else None)
+
+    summary = import_polygon_rows(db_manager, row_iterable, source_description,
+                                  log_callback=log_callback, progress_callback=progress_callback, row_offset=resumed_from_row,
+                                  chunk_committed_callback=_save_checkpoint if fingerprint else None, update_changed=update_changed)
+    if fingerprint and not summary["cancelled"]:
+        db_manager.delete_import_checkpoint(fingerprint)
+    summary["resumed_from_row"] = resumed_from_row
+    phase_start = time.perf_counter()
+    update_geometry_metrics(db_manager) # Area/perimeter/deviation of the records just written
+    summary["phase_seconds"]["geometry"] = round(time.perf_counter() - phase_start, 4)
+    phase_seconds = {phase: round(seconds, 4) for phase, seconds in (pre_phase_seconds or {}).items()}
+    phase_seconds.update(summary["phase_seconds"])
+    _finish_import_run(db_manager, summary, source_type, source_description, started_at, byte_size, phase_seconds,
+                       (time.perf_counter() - start) + sum((pre_phase_seconds or {}).values()), records_before)
+    return summary
+
+def sync_api_source(db_manager, source_id, title, url, if_changed=True, update_changed=False, resume=True,
+                    log_callback=None, progress_callback=None, fetch_options=None, should_cancel=None):
+    """
+    Fetches one mWater API source (fetch_mwater_csv, with retries) and imports its rows with run_import.
+    With if_changed and a configured source (source_id), the ETag of the last completed sync is sent
+    and a 304 answer skips the import; the new ETag is stored once an import completes.
+    fetch_options (timeout_s, max_retries, retry_backoff_s) go to fetch_mwater_csv; should_cancel() is
+    polled during the download (the import is cancelled through progress_callback).
+    Returns a dict: source, attempts and either error, not_modified, cancelled (during the fetch), or
+    the run_import summary plus rows_fetched and bytes_received.
+    """
+    from core.api_handler import fetch_mwater_csv # Needs requests; imported only when syncing
+    known_etag = db_manager.get_mwater_source_etag(source_id) if (if_changed and source_id) else None
+    fetch_result = fetch_mwater_csv(url, title, etag=known_etag, should_cancel=should_cancel, **(fetch_options or {}))
+    if fetch_result["cancelled"]:
+        return {"source": title, "cancelled": True, "attempts": fetch_result["attempts"]}
+    if fetch_result["error"]:
+        return {"source": title, "error": fetch_result["error"], "attempts": fetch_result["attempts"]}
+    if fetch_result["not_modified"]:
+        return {"source": title, "not_modified": True, "attempts": fetch_result["attempts"]}
+    rows_from_api = fetch_result["rows"]
+    summary = run_import(db_manager, rows_from_api or [], "api", title, byte_size=fetch_result["bytes_received"],
+                         pre_phase_seconds=fetch_result["phase_seconds"], log_callback=log_callback,
+                         progress_callback=progress_callback, fingerprint=f"api:{fetch_result['content_sha1']}",
+                         resume=resume, update_changed=update_changed)
+    if source_id and not summary["cancelled"]:
+        db_manager.set_mwater_source_etag(source_id, fetch_result["etag"])
+    return {"source": title, "rows_fetched": len(rows_from_api or []), "bytes_received": fetch_result["bytes_received"],
+            "attempts": fetch_result["attempts"], **summary}
+
+def preview_import(db_manager, row_iterable, source_description, log_callback=None, progress_callback=None,
+                   chunk_size=IMPORT_CHUNK_ROWS):
+    """
+    Dry run of an import. Rows are validated and loaded chunk by chunk into the TEMP staging
+    table, then classified against polygon_data in one set-based statement: new, changed,
+    duplicate, duplicate_in_batch or uuid_conflict (see DatabaseManager.classify_staged_polygon_rows).
+    polygon_data is not touched; follow with apply_import_preview or discard_import_preview.
+    progress_callback(processed, skipped, staged) works as for import_polygon_rows; cancelling
+    discards the staged rows.
+
+    Returns a preview dict: processed, skipped, skipped_missing_rc, skipped_invalid, staged,
+    cancelled, categories {category: count}, new_with_errors, samples {category: [rows]},
+    phase_seconds, plus started_at/db_records_before/seconds for the ledger. On failure,
+    "error" holds a message.
+    """
+    log = log_callback or (lambda message, level="info": None)
+    preview = {"processed": 0, "skipped": 0, "skipped_missing_rc": 0, "skipped_invalid": 0, "staged": 0,
+               "cancelled": False, "started_at": datetime.datetime.now().isoformat(timespec="seconds"),
+               "db_records_before": db_manager.count_polygon_records()}
+    start = time.perf_counter()
+    if not db_manager.reset_import_staging():
+        preview["error"] = "Could not create the import staging table."
+        return preview
+    phase_timer = perf.PhaseTimer("preview")
+    row_iterator = iter(row_iterable)
+    while True:
+        phase_timer.start("read")
+        chunk = list(itertools.islice(row_iterator, chunk_size))
+        if not chunk:
+            break
+        phase_timer.start("validate")
+        first_row_number = preview["processed"] + 1
+        preview["processed"] += len(chunk)
+        records_to_stage = []
+        for i, original_row_dict in enumerate(chunk):
+            rc_from_row = get_response_code_from_row(original_row_dict)
+            if not rc_from_row:
+                log(f"Row {first_row_number + i} from {source_description} skipped: Missing Response Code.", "error")
+                preview["skipped"] += 1; preview["skipped_missing_rc"] += 1
+                continue
+            processed_flat = _process_row_or_log(original_row_dict, rc_from_row, source_description, log, preview)
+            if processed_flat is not None:
+                processed_flat["source_codec"], processed_flat["source_row"] = encode_source_row(original_row_dict)
+                records_to_stage.append(processed_flat)
+        phase_timer.start("stage")
+        if db_manager.stage_polygon_rows(records_to_stage) is None:
+            db_manager.drop_import_staging()
+            preview["error"] = "Could not write rows to the import staging table."
+            return preview
+        preview["staged"] += len(records_to_stage)
+
+        phase_timer.start("progress")
+        if progress_callback and progress_callback(preview["processed"], preview["skipped"], preview["staged"]) is False:
+            db_manager.drop_import_staging()
+            preview["cancelled"] = True
+            log("Import preview cancelled by user.", "info")
+            return preview
+
+    phase_timer.start("classify")
+    if not db_manager.classify_staged_polygon_rows():
+        db_manager.drop_import_staging()
+        preview["error"] = "Could not classify the staged rows."
+        return preview
+    preview.update(db_manager.get_staging_summary())
+    phase_timer.emit(items=preview["processed"])
+    preview["phase_seconds"] = {phase: round(seconds, 4) for phase, seconds in phase_timer.totals.items()}
+    preview["seconds"] = time.perf_counter() - start
+    return preview
+
+def apply_import_preview(db_manager, preview, source_type, source_description, update_changed=False, byte_size=None):
+    """
+    Applies a preview from preview_import in one transaction: inserts the 'new' rows and, with
+    update_changed, overwrites the data of 'changed' records (export counts, evaluation status
+    and date_added are kept). Duplicates and UUID conflicts are left out. Drops the staged rows
+    and records the run in the import_runs ledger. Returns an import summary like run_import
+    (plus updated_changed), with "error" set if the transaction was rolled back.
+    """
+    start = time.perf_counter()
+    with perf.span("preview.apply", "db"):
+        applied = db_manager.apply_staged_polygon_rows(update_changed=update_changed)
+    db_manager.drop_import_staging()
+    categories = preview["categories"]
+    summary = {"processed": preview["processed"], "new_added": 0, "updated_changed": 0, "cancelled": False,
+               "new_with_errors": 0, "skipped_missing_rc": preview["skipped_missing_rc"],
+               "skipped_invalid": preview["skipped_invalid"],
+               "skipped_duplicate": categories["duplicate"] + categories["duplicate_in_batch"] + (0 if update_changed else categories["changed"]),
+               "failed_db_write": categories["uuid_conflict"]}
+    if applied is None:
+        summary["error"] = "Applying the import failed; nothing was written."
+        summary["failed_db_write"] = preview["staged"]
+    else:
+        summary["new_added"], summary["updated_changed"] = applied["inserted"], applied["updated"]
+        summary["new_with_errors"] = preview["new_with_errors"]
+    summary["skipped"] = summary["processed"] - summary["new_added"] - summary["updated_changed"]
+    apply_seconds = time.perf_counter() - start
+    update_geometry_metrics(db_manager)
+    geometry_seconds = time.perf_counter() - start - apply_seconds
+    phase_seconds = dict(preview["phase_seconds"], apply=round(apply_seconds, 4), geometry=round(geometry_seconds, 4))
+    _finish_import_run(db_manager, summary, source_type, source_description, preview["started_at"], byte_size,
+                       phase_seconds, preview["seconds"] + apply_seconds + geometry_seconds, preview["db_records_before"])
+    return summary
+
+def discard_import_preview(db_manager):
+    """Drops the staged rows of a preview that will not be applied."""
+    db_manager.drop_import_staging()
+
+def _process_row_or_log(original_row_dict, rc_from_row, source_description, log, summary):
+    """Runs process_csv_row_data; rows it cannot identify are logged and counted as skipped_invalid (returns None)."""
+    processed_flat = process_csv_row_data(original_row_dict)
+    if not processed_flat.get("uuid") or not processed_flat.get("response_code"):
+        error_detail = processed_flat.get('error_messages', 'Unknown processing error')
+        log(f"Data processing error for original RC '{rc_from_row}'. Details: {error_detail}", "error")
+        summary["skipped"] += 1; summary["skipped_invalid"] += 1
+        return None
+    return processed_flat
+
+def _finish_import_run(db_manager, summary, source_type, source_description, started_at, byte_size,
+                       phase_seconds, total_seconds, records_before):
+    """Adds total_seconds, rows_per_s and run_id to an import summary and writes its import_runs row."""
+    summary["total_seconds"] = round(total_seconds, 4)
+    summary["rows_per_s"] = round(summary["processed"] / total_seconds, 1) if total_seconds > 0 else None
+    summary["run_id"] = db_manager.add_import_run({
+        "source_type": source_type,
+        "source": source_description,
+        "started_at": started_at,
+        "finished_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "byte_size": byte_size,
+        "rows_total": summary["processed"],
+        "rows_new": summary["new_added"],
+        "rows_new_with_errors": summary["new_with_errors"],
+        "rows_duplicate": summary["skipped_duplicate"],
+        "rows_missing_rc": summary["skipped_missing_rc"],
+        "rows_invalid": summary["skipped_invalid"],
+        "rows_failed": summary["failed_db_write"],
+        "cancelled": summary["cancelled"],
+        "total_seconds": summary["total_seconds"],
+        "rows_per_s": summary["rows_per_s"],
+        "phase_seconds": phase_seconds,
+        "db_records_before": records_before,
+        "resumed_from_row": summary.get("resumed_from_row", 0),
+        "rows_updated": summary.get("updated_changed", 0),
+    })
+
+def validate_polygon_rows(row_iterable):
+    """
+    Runs process_csv_row_data over rows without touching the database.
+    Returns a dict: total rows, per-status counts and the first few errors (row number, RC, messages).
+    """
+    report = {"total": 0, "status_counts": {}, "errors": []}
+    with perf.span("import.validate_only", "parse") as validate_span:
+        _validate_rows_into_report(row_iterable, report)
+        validate_span.set_items(report["total"])
+    return report
+
+def _validate_rows_into_report(row_iterable, report):
+    for i, original_row_dict in enumerate(row_iterable):
+        report["total"] += 1
+        processed_flat = process_csv_row_data(original_row_dict)
+        status = processed_flat.get("status")
+        report["status_counts"][status] = report["status_counts"].get(status, 0) + 1
+        if status != "valid_for_kml" and len(report["errors"]) < MAX_VALIDATION_ERRORS_REPORTED:
+            report["errors"].append({"row": i + 1, "response_code": processed_flat.get("response_code"),
+                                     "status": status, "messages": processed_flat.get("error_messages")})
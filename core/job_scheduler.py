@@ -0,0 +1,170 @@
+# File: DilasaKMLTool_v4/core/job_scheduler.py
+# ----------------------------------------------------------------------
+# Scheduled background jobs: "sync all mWater sources every 30 min", "KMZ per district nightly".
+# Jobs are rows of the scheduled_jobs table; every run is recorded in job_runs. Syncs go through
+# sync_api_source (ETag conditional fetch, resumable import) and exports through the incremental
+# paths (folder manifest, per-district KMZ signatures), so a run with nothing new is cheap.
+# Start times get random jitter, so jobs of several machines do not all hit the API at the same
+# moment, and failed runs are retried with exponential backoff. No Qt imports here: the desktop
+# app runs execute_job in a worker thread; the CLI's run-jobs command runs due jobs directly.
+import datetime
+import random
+import sqlite3
+import time
+
+JOB_TYPES = ("sync_sources", "export_kml")
+EXPORT_JOB_MODES = ("incremental", "district_kmz")
+JOB_JITTER_FRACTION = 0.1 # Interval jobs start up to this share of their interval late...
+MAX_JOB_JITTER_S = 300 # ...but at most this many seconds
+DAILY_JOB_JITTER_S = 600 # Daily jobs start up to this many seconds after their time
+RETRY_BACKOFF_BASE_S = 60 # First retry after a failed run; doubles with each further failure
+RETRY_BACKOFF_MAX_S = 3600
+# A job's fetch fails fast and is not retried in place (the run is retried with backoff instead), so a
+# cancelled job never waits long on the network
+JOB_FETCH_OPTIONS = {"timeout_s": 10, "max_retries": 0}
+
+def _now():
+    return datetime.datetime.now().replace(microsecond=0)
+
+def _timestamp(moment):
+    return moment.isoformat(timespec="seconds")
+
+def _parse_daily_at(daily_at):
+    try:
+        return datetime.datetime.strptime(str(daily_at).strip(), "%H:%M").time()
+    except ValueError:
+        raise ValueError(f"Invalid daily time '{daily_at}'. Expected HH:MM.")
+
+def validate_job(job):
+    """Raises ValueError if a job dict (scheduled_jobs columns, params as a dict) cannot be run."""
+    if not str(job.get("name") or "").strip(): raise ValueError("A scheduled job needs a name.")
+    if job.get("job_type") not in JOB_TYPES:
+        raise ValueError(f"Unknown job type '{job.get('job_type')}'. Expected one of {JOB_TYPES}.")
+    if job.get("daily_at"):
+        _parse_daily_at(job["daily_at"])
+    elif not job.get("interval_minutes") or int(job["interval_minutes"]) < 1:
+        raise ValueError("A scheduled job needs an interval of at least 1 minute or a daily time.")
+    params = job.get("params") or {}
+    if job["job_type"] == "export_kml":
+        if not params.get("output_folder"): raise ValueError("An export job needs an output folder.")
+        if params.get("mode", "incremental") not in EXPORT_JOB_MODES:
+            raise ValueError(f"Unknown export mode '{params.get('mode')}'. Expected one of {EXPORT_JOB_MODES}.")
+
+def scheduled_run_time(job, after, rng=random):
+    """The job's next regular start after the moment `after`, with jitter."""
+    if job.get("daily_at"):
+        run_at = datetime.datetime.combine(after.date(), _parse_daily_at(job["daily_at"]))
+        if run_at <= after: run_at += datetime.timedelta(days=1)
+        return run_at + datetime.timedelta(seconds=rng.uniform(0, DAILY_JOB_JITTER_S))
+    interval_s = int(job["interval_minutes"]) * 60
+    return after + datetime.timedelta(seconds=interval_s + rng.uniform(0, min(interval_s * JOB_JITTER_FRACTION, MAX_JOB_JITTER_S)))
+
+def first_run_time(job, now=None, rng=random):
+    """When a new (or re-enabled) job first runs: interval jobs shortly, daily jobs at their next time."""
+    now = now or _now()
+    if job.get("daily_at"): return scheduled_run_time(job, now, rng)
+    interval_s = int(job["interval_minutes"]) * 60
+    return now + datetime.timedelta(seconds=rng.uniform(0, min(interval_s * JOB_JITTER_FRACTION, MAX_JOB_JITTER_S)))
+
+def retry_run_time(job, after, consecutive_failures, rng=random):
+    """
+    Start of the retry after consecutive_failures failed runs: RETRY_BACKOFF_BASE_S doubling per
+    failure up to RETRY_BACKOFF_MAX_S, plus jitter; never later than the next regular start.
+    """
+    backoff_s = min(RETRY_BACKOFF_BASE_S * 2 ** max(consecutive_failures - 1, 0), RETRY_BACKOFF_MAX_S)
+    retry_at = after + datetime.timedelta(seconds=backoff_s * (1 + rng.uniform(0, JOB_JITTER_FRACTION)))
+    return min(retry_at, scheduled_run_time(job, after, rng))
+
+# --- Job runners. Each returns (status, message, result_dict). ---
+def _run_sync_job(db_manager, params, log_callback, should_cancel):
+    from core.import_pipeline import sync_api_source
+    sources = db_manager.get_mwater_sources() # (id, title, url)
+    if params.get("sources"):
+        wanted = {str(source) for source in params["sources"]}
+        sources = [source for source in sources if source[1] in wanted or str(source[0]) in wanted]
+    if not sources:
+        return "failed", "No matching mWater API sources configured.", {"syncs": []}
+    syncs, status = [], "ok"
+    for source_id, title, url in sources:
+        if should_cancel():
+            status = "cancelled"; break
+        sync_result = sync_api_source(db_manager, source_id, title, url, if_changed=params.get("if_changed", True),
+                                      update_changed=params.get("update_changed", False), log_callback=log_callback,
+                                      progress_callback=lambda *_counts: not should_cancel(),
+                                      fetch_options=JOB_FETCH_OPTIONS, should_cancel=should_cancel)
+        syncs.append(sync_result)
+        if sync_result.get("cancelled"): status = "cancelled"; break
+    failed = [sync for sync in syncs if sync.get("error")]
+    if failed and status == "ok": status = "failed"
+    records_changed = sum(sync.get("new_added", 0) + sync.get("updated_changed", 0) for sync in syncs)
+    message = (f"{len(syncs)} source(s): {sum(1 for sync in syncs if 'processed' in sync)} imported, "
+               f"{sum(1 for sync in syncs if sync.get('not_modified'))} not modified, {len(failed)} failed; "
+               f"{records_changed} record(s) added or updated.")
+    if failed: message += " " + "; ".join(sync["error"] for sync in failed)
+    return status, message, {"syncs": syncs, "records_changed": records_changed}
+
+def _run_export_job(db_manager, params, log_callback, should_cancel):
+    from core.kml_incremental import export_district_kmz, export_kml_incremental
+    output_folder, mode = params["output_folder"], params.get("mode", "incremental")
+    filters = dict(params.get("filters") or {}, status="valid_for_kml")
+    if mode == "district_kmz":
+        summary = export_district_kmz(db_manager, output_folder, filters, progress_callback=lambda _done: not should_cancel())
+        message = (f"{summary['districts_written']} district KMZ(s) written ({len(summary['written_ids'])} records), "
+                   f"{summary['districts_unchanged']} unchanged, {summary['removed']} removed.")
+    else:
+        record_ids = [row[0] for rows in db_manager.iter_polygon_row_batches(["id"], filters) for row in rows]
+        summary = export_kml_incremental(db_manager, record_ids, output_folder, progress_callback=lambda _phase, _done: not should_cancel())
+        message = (f"{len(summary['written_ids'])} KML(s) written (new or changed), {summary['unchanged']} unchanged, "
+                   f"{summary['removed']} removed.")
+    if params.get("mark_exported", True):
+        db_manager.update_kml_export_status_bulk(summary["written_ids"])
+    result = {key: value for key, value in summary.items() if key != "written_ids"}
+    result["records_changed"] = len(summary["written_ids"]) if params.get("mark_exported", True) else 0 # Export counts changed
+    return ("cancelled" if summary["cancelled"] else "ok"), message, result
+
+_JOB_RUNNERS = {"sync_sources": _run_sync_job, "export_kml": _run_export_job}
+
+def execute_job(db_manager, job, trigger="schedule", log_callback=None, should_cancel=None):
+    """
+    Runs a scheduled job on db_manager's connection, records the run in job_runs and reschedules the
+    job: next regular start (with jitter) after a run that did not fail, retry_run_time after a failure.
+    should_cancel() is polled during downloads and between chunks, files and districts; a cancelled
+    import resumes from its checkpoint.
+    Never raises for a failing job: the error is the run's message. Returns the job_runs row as a dict.
+    """
+    should_cancel = should_cancel or (lambda: False)
+    started_at, start = _now(), time.perf_counter()
+    try:
+        validate_job(job)
+        status, message, result = _JOB_RUNNERS[job["job_type"]](db_manager, job.get("params") or {}, log_callback, should_cancel)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        status, message, result = "failed", str(e), {}
+    except Exception as e: # A job must never take the scheduler down with it
+        status, message, result = "failed", f"Unexpected error: {e}", {}
+    if status == "failed" and should_cancel(): status = "cancelled" # E.g. a fetch cut short by the cancel: no backoff
+    finished_at = _now()
+    consecutive_failures = (job.get("consecutive_failures") or 0) + 1 if status == "failed" else 0
+    try:
+        next_run = (retry_run_time(job, finished_at, consecutive_failures) if status == "failed"
+                    else scheduled_run_time(job, finished_at))
+    except (KeyError, TypeError, ValueError): # Schedule itself is invalid: retried once it is fixed
+        next_run = finished_at + datetime.timedelta(seconds=RETRY_BACKOFF_MAX_S)
+    run = {"job_id": job["id"], "job_name": job["name"], "job_type": job["job_type"], "trigger": trigger,
+           "started_at": _timestamp(started_at), "finished_at": _timestamp(finished_at), "status": status,
+           "seconds": round(time.perf_counter() - start, 3), "message": message, "result": result}
+    run["id"] = db_manager.record_job_run(run, _timestamp(next_run), consecutive_failures)
+    run["next_run_at"] = _timestamp(next_run)
+    return run
+
+def due_jobs(db_manager, now=None):
+    """Enabled jobs whose next start has come, soonest first."""
+    return db_manager.get_scheduled_jobs(due_before=_timestamp(now or _now()))
+
+def schedule_job(db_manager, job, job_id=None):
+    """
+    Validates and saves a job (insert, or update of job_id) with its first start set by first_run_time.
+    Returns the job ID, or None if it could not be saved. Raises ValueError for an invalid job.
+    """
+    validate_job(job)
+    job = dict(job, next_run_at=_timestamp(first_run_time(job)), consecutive_failures=0)
+    return db_manager.save_scheduled_job(job, job_id)
@@ -0,0 +1,60 @@
+# File: DilasaKMLTool_v4/core/kml_fragment_cache.py
+# ----------------------------------------------------------------------
+# Persistent cache of each record's <Placemark> KML (core.kml_generator.build_placemark_fragment)
+# in the kml_fragments table, keyed by record id and last_modified. A trigger drops a record's
+# fragment when the columns it is drawn from change, and a fragment from another last_modified or
+# KML_FRAGMENT_FORMAT is never used, so exports, Google Earth uploads and the live link mostly
+# concatenate stored text instead of converting coordinates and formatting placemarks again.
+# No Qt imports here: also used by the headless CLI and the KML network server's threads.
+from core import perf
+from core.kml_generator import KML_FRAGMENT_FORMAT, build_placemark_fragment, write_kml_documents
+from database.db_manager import KML_SOURCE_COLUMNS
+
+FRAGMENT_BATCH_IDS = 1000 # Record ids looked up (and missing fragments built and stored) per batch
+_FRAGMENT_SOURCE_COLUMNS = ("id", "status", "last_modified", *KML_SOURCE_COLUMNS)
+
+def iter_placemark_fragments(db_manager, record_ids, batch_size=FRAGMENT_BATCH_IDS):
+    """
+    Yields (record_id, uuid, placemark_fragment) for the valid, drawable records among record_ids, in
+    id order. Cached fragments are used where current; the others are built from the record and
+    stored, one transaction per batch (a failed store only means they are built again next time).
+    """
+    sorted_ids = sorted(set(record_ids))
+    for start in range(0, len(sorted_ids), batch_size):
+        id_batch = sorted_ids[start:start + batch_size]
+        with perf.span("kml.fragments.lookup", "kml") as span:
+            fragments = db_manager.get_kml_fragments(id_batch, KML_FRAGMENT_FORMAT)
+            span.set_items(len(fragments))
+        missing_ids = [record_id for record_id in id_batch if record_id not in fragments]
+        if missing_ids:
+            with perf.span("kml.fragments.build", "kml") as span:
+                new_rows = []
+                for polygon_record in db_manager.iter_polygon_records(record_ids=missing_ids, columns=_FRAGMENT_SOURCE_COLUMNS):
+                    if polygon_record['status'] != 'valid_for_kml': continue
+                    placemark_fragment = build_placemark_fragment(polygon_record)
+                    if placemark_fragment is None: continue
+                    fragments[polygon_record['id']] = (polygon_record['uuid'], placemark_fragment)
+                    new_rows.append((polygon_record['id'], polygon_record['last_modified'], KML_FRAGMENT_FORMAT, placemark_fragment))
+                db_manager.save_kml_fragments(new_rows)
+                span.set_items(len(new_rows))
+        for record_id in id_batch:
+            if record_id in fragments:
+                uuid, placemark_fragment = fragments[record_id]
+                yield record_id, uuid, placemark_fragment
+
+def get_placemark_fragment(db_manager, record_id):
+    """(uuid, placemark_fragment) of one record via the cache, or None if it is not valid or cannot be drawn."""
+    for _record_id, uuid, placemark_fragment in iter_placemark_fragments(db_manager, [record_id]):
+        return uuid, placemark_fragment
+    return None
+
+def export_cached_kml_files(db_manager, record_ids, output_folder, output_mode):
+    """
+    export_kml_files for database records: writes the valid records among record_ids ("single" or
+    "multiple" mode, same files) from their cached fragments. Returns (files_generated, exported_record_ids).
+    """
+    phase_timer = perf.PhaseTimer("kml") # "read" includes fragment lookups and building missing ones
+    files_generated, exported_record_ids = write_kml_documents(iter_placemark_fragments(db_manager, record_ids),
+                                                               output_folder, output_mode, phase_timer)
+    phase_timer.emit(items=len(exported_record_ids))
+    return files_generated, exported_record_ids
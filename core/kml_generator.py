@@ -1,7 +1,13 @@
 # File: DilasaKMLTool_v4/core/kml_generator.py
 # ----------------------------------------------------------------------
+import os
+import datetime
 import simplekml
 import utm # For UTM to Lat/Lon conversion
+from xml.sax.saxutils import escape
+
+from core import perf
+from core.data_processor import unpack_vertices
 
 # No CSV_HEADERS needed here directly if data is passed pre-processed
 
@@ -22,39 +28,61 @@ def create_kml_description_for_placemark(polygon_db_record):
     )
     return description
 
-def add_polygon_to_kml_object(kml_document, polygon_db_record):
+def polygon_record_to_kml_coordinates(polygon_db_record):
     """
-    Adds a single polygon to a simplekml.Kml object.
-    polygon_db_record is a dictionary containing all necessary data for one polygon,
-    including p1_easting, p1_northing, p1_altitude, p1_zone_num, p1_zone_letter, etc.
-    Returns True if polygon was added successfully, False otherwise.
+    Converts the UTM points of a polygon record to a closed ring of (lon, lat, altitude) tuples,
+    the coordinate order KML expects. Uses all vertices of the 'vertices' BLOB (one zone, that of
+    P1), or the p1_*..p4_* columns for records stored before it existed.
+    Returns None if any point is missing UTM components.
+    Raises utm.error.OutOfRangeError for coordinates outside the valid UTM range.
     """
-    kml_coordinates_with_altitude = []
-    
-    try:
-        for i in range(1, 5): # Points P1 to P4
-            easting = polygon_db_record.get(f'p{i}_easting')
-            northing = polygon_db_record.get(f'p{i}_northing')
-            altitude = polygon_db_record.get(f'p{i}_altitude', 0.0) # Default altitude if missing
-            zone_num = polygon_db_record.get(f'p{i}_zone_num')
-            zone_letter = polygon_db_record.get(f'p{i}_zone_letter')
-
-            if None in [easting, northing, zone_num, zone_letter]:
-                # This check should ideally be redundant if status is 'valid_for_kml'
-                print(f"KML GEN Error: Missing critical UTM components for Point {i} in UUID {polygon_db_record.get('uuid')}")
-                return False 
-            
-            # Convert UTM to Latitude/Longitude
-            # The `utm` library typically handles zone letters to determine N/S hemisphere.
+    vertices = unpack_vertices(polygon_db_record.get('vertices'))
+    if vertices:
+        zone_num, zone_letter = polygon_db_record.get('p1_zone_num'), polygon_db_record.get('p1_zone_letter')
+        if zone_num is None or zone_letter is None:
+            print(f"KML GEN Error: Missing UTM zone for the vertices of UUID {polygon_db_record.get('uuid')}")
+            return None
+        kml_coordinates_with_altitude = []
+        for easting, northing, altitude in vertices:
             lat, lon = utm.to_latlon(easting, northing, zone_num, zone_letter)
             kml_coordinates_with_altitude.append((lon, lat, altitude))
+        kml_coordinates_with_altitude.append(kml_coordinates_with_altitude[0])
+        return kml_coordinates_with_altitude
+
+    kml_coordinates_with_altitude = []
+    for i in range(1, 5): # Points P1 to P4
+        easting = polygon_db_record.get(f'p{i}_easting')
+        northing = polygon_db_record.get(f'p{i}_northing')
+        altitude = polygon_db_record.get(f'p{i}_altitude', 0.0) # Default altitude if missing
+        zone_num = polygon_db_record.get(f'p{i}_zone_num')
+        zone_letter = polygon_db_record.get(f'p{i}_zone_letter')
+
+        if None in [easting, northing, zone_num, zone_letter]:
+            # This check should ideally be redundant if status is 'valid_for_kml'
+            print(f"KML GEN Error: Missing critical UTM components for Point {i} in UUID {polygon_db_record.get('uuid')}")
+            return None
         
-        if len(kml_coordinates_with_altitude) != 4:
-            print(f"KML GEN Error: Could not form 4 valid coordinates for UUID {polygon_db_record.get('uuid')}")
-            return False
+        # Convert UTM to Latitude/Longitude
+        # The `utm` library typically handles zone letters to determine N/S hemisphere.
+        lat, lon = utm.to_latlon(easting, northing, zone_num, zone_letter)
+        kml_coordinates_with_altitude.append((lon, lat, altitude))
 
-        # Close the polygon by adding the first point at the end
-        kml_coordinates_with_altitude.append(kml_coordinates_with_altitude[0])
+    # Close the polygon by adding the first point at the end
+    kml_coordinates_with_altitude.append(kml_coordinates_with_altitude[0])
+    return kml_coordinates_with_altitude
+
+def add_polygon_to_kml_object(kml_document, polygon_db_record):
+    """
+    Adds a single polygon to a simplekml.Kml object (or any simplekml container, e.g. a Folder).
+    polygon_db_record is a dictionary containing all necessary data for one polygon:
+    'vertices' (or p1_easting, p1_northing, p1_altitude, ...) and p1_zone_num, p1_zone_letter.
+    Returns True if polygon was added successfully, False otherwise.
+    """
+    try:
+        kml_coordinates_with_altitude = polygon_record_to_kml_coordinates(polygon_db_record)
+        if not kml_coordinates_with_altitude:
+            print(f"KML GEN Error: Could not form valid coordinates for UUID {polygon_db_record.get('uuid')}")
+            return False
 
         # Create KML Polygon
         placemark_name = polygon_db_record.get("uuid", "Unnamed Polygon")
@@ -79,6 +107,110 @@ def add_polygon_to_kml_object(kml_document, polygon_db_record):
         print(f"KML GEN Error (General): Adding polygon {polygon_db_record.get('uuid', 'N/A')} to KML failed: {e}")
         return False
 
+KML_OUTPUT_MODES = ("single", "multiple")
+
+# --- Placemark fragments ---
+# The same placemarks as add_polygon_to_kml_object, serialized directly: one <Placemark> per record
+# sharing a single document style, so a document is just its placemark fragments laid end to end
+# (and fragments can be cached per record version, see core.kml_fragment_cache).
+KML_FRAGMENT_FORMAT = 1 # Bump when build_placemark_fragment's output changes: cached fragments are rebuilt then
+KML_POLYGON_STYLE_ID = "dilasa_polygon"
+_KML_DOCUMENT_HEADER = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                        '<kml xmlns="http://www.opengis.net/kml/2.2">\n<Document>\n<name>%s</name>\n'
+                        f'<Style id="{KML_POLYGON_STYLE_ID}"><LineStyle><color>ff00ffff</color><width>2</width></LineStyle>'
+                        '<PolyStyle><fill>0</fill><outline>1</outline></PolyStyle></Style>\n')
+_KML_DOCUMENT_FOOTER = "</Document>\n</kml>\n"
+
+def build_placemark_fragment(polygon_db_record):
+    """
+    The record's polygon as a <Placemark> XML string (UUID as name, the usual description, yellow
+    outline via the document style), or None if it cannot be drawn (same checks as add_polygon_to_kml_object).
+    """
+    try:
+        kml_coordinates_with_altitude = polygon_record_to_kml_coordinates(polygon_db_record)
+        if not kml_coordinates_with_altitude:
+            print(f"KML GEN Error: Could not form valid coordinates for UUID {polygon_db_record.get('uuid')}")
+            return None
+        coordinates_text = " ".join(f"{lon},{lat},{0.0 if altitude is None else altitude}"
+                                    for lon, lat, altitude in kml_coordinates_with_altitude)
+        return (f"<Placemark><name>{escape(str(polygon_db_record.get('uuid', 'Unnamed Polygon')))}</name>"
+                f"<description>{escape(create_kml_description_for_placemark(polygon_db_record))}</description>"
+                f"<styleUrl>#{KML_POLYGON_STYLE_ID}</styleUrl><Polygon><outerBoundaryIs><LinearRing>"
+                f"<coordinates>{coordinates_text}</coordinates></LinearRing></outerBoundaryIs></Polygon></Placemark>\n")
+    except utm.error.OutOfRangeError as e_utm: # type: ignore
+        print(f"KML GEN Error (UTM Conversion): {e_utm} for UUID {polygon_db_record.get('uuid')}")
+        return None
+    except Exception as e:
+        print(f"KML GEN Error (General): Building placemark for {polygon_db_record.get('uuid', 'N/A')} failed: {e}")
+        return None
+
+def kml_document_text(document_name, placemark_fragments):
+    """A complete KML document holding the given placemark fragments."""
+    return _KML_DOCUMENT_HEADER % escape(str(document_name)) + "".join(placemark_fragments) + _KML_DOCUMENT_FOOTER
+
+def write_kml_documents(fragment_items, output_folder, output_mode, phase_timer=None):
+    """
+    Writes (record_id, uuid, placemark_fragment) items as export_kml_files does: "single" streams them
+    into one consolidated file, "multiple" writes one <uuid>.kml per item. Returns (files_generated, record_ids).
+    """
+    if output_mode not in KML_OUTPUT_MODES:
+        raise ValueError(f"Unknown KML output mode '{output_mode}'. Expected one of {KML_OUTPUT_MODES}.")
+    phase_timer = phase_timer or perf.PhaseTimer("kml")
+    files_generated, exported_record_ids = 0, []
+    item_iterator = iter(fragment_items)
+    if output_mode == "single":
+        ts = datetime.datetime.now().strftime('%d.%m.%y')
+        temp_path = os.path.join(output_folder, f"Consolidate_ALL_KML_{ts}.kml.part") # Count in the name is known at the end
+        completed = False
+        kml_file = open(temp_path, "w", encoding="utf-8") # Outside the try: if it fails, there is no temp file to remove
+        try:
+            kml_file.write(_KML_DOCUMENT_HEADER % escape(f"Consolidated - {ts}"))
+            while True:
+                phase_timer.start("read")
+                item = next(item_iterator, None)
+                if item is None: break
+                phase_timer.start("save")
+                kml_file.write(item[2]); exported_record_ids.append(item[0])
+            kml_file.write(_KML_DOCUMENT_FOOTER)
+            kml_file.close() # Flush errors (e.g. disk full) still count as failure
+            completed = True
+        finally:
+            kml_file.close()
+            if completed and exported_record_ids:
+                os.replace(temp_path, os.path.join(output_folder, f"Consolidate_ALL_KML_{ts}_{len(exported_record_ids)}.kml"))
+                files_generated = 1
+            else:
+                os.remove(temp_path)
+    else:
+        while True:
+            phase_timer.start("read")
+            item = next(item_iterator, None)
+            if item is None: break
+            record_id, uuid, placemark_fragment = item
+            phase_timer.start("save")
+            with open(os.path.join(output_folder, f"{uuid}.kml"), "w", encoding="utf-8") as kml_file:
+                kml_file.write(kml_document_text(uuid, [placemark_fragment]))
+            exported_record_ids.append(record_id); files_generated += 1
+    return files_generated, exported_record_ids
+
+def export_kml_files(polygon_records, output_folder, output_mode):
+    """
+    Writes KML files for an iterable of polygon records (records not 'valid_for_kml' are skipped).
+    output_mode "single" writes one consolidated file, "multiple" one file per record named by UUID.
+    Records are consumed one at a time, so a streaming DB iterator can be passed directly.
+    Returns (files_generated, exported_record_ids).
+    """
+    phase_timer = perf.PhaseTimer("kml") # "read" is time spent pulling records and building their placemarks
+
+    def _fragment_items():
+        for polygon_record in polygon_records:
+            if polygon_record.get('status') != 'valid_for_kml': continue
+            placemark_fragment = build_placemark_fragment(polygon_record)
+            if placemark_fragment is not None: yield polygon_record['id'], polygon_record['uuid'], placemark_fragment
+    files_generated, exported_record_ids = write_kml_documents(_fragment_items(), output_folder, output_mode, phase_timer)
+    phase_timer.emit(items=len(exported_record_ids))
+    return files_generated, exported_record_ids
+
 # Example usage (if testing kml_generator.py directly)
 if __name__ == '__main__':
     print("Testing KML Generator module...")
@@ -0,0 +1,221 @@
+# File: DilasaKMLTool_v4/core/kml_importer.py
+# ----------------------------------------------------------------------
+# Reads KML/KMZ files (exported by this tool, or plots digitized in Google Earth and similar) as
+# import rows. Placemark polygons are parsed incrementally with ElementTree.iterparse, each
+# Placemark being dropped from the tree once read, and converted to UTM a batch at a time. Rows are
+# produced in the CSV_HEADERS layout, so they go through core.import_pipeline like CSV/API rows:
+# same validation, duplicate rules, source archive and import_runs ledger. No Qt imports here.
+import html
+import os
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import utm
+
+from core.data_processor import CSV_HEADERS, POINT_UTM_HEADER_PATTERN, POINT_ALT_HEADER_PATTERN
+
+KML_CONVERT_BATCH_PLACEMARKS = 1000 # Placemarks converted to UTM (and looked up in the DB) per batch
+KML_RESPONSE_CODE_PREFIX = "KML-" # Response Code given to placemarks without one: prefix + UUID
+_CONTAINER_TAGS = {"kml", "Document", "Folder"} # Children of these are dropped from the tree once parsed
+_HTML_BREAK_RE = re.compile(r"<\s*(br|/p|/div|/tr)\s*/?\s*>", re.IGNORECASE)
+_HTML_TAG_RE = re.compile(r"<[^>]+>")
+
+# Field labels of a placemark description (as written by create_kml_description_for_placemark) or of
+# its ExtendedData, lower-cased, to CSV_HEADERS keys. CSV column titles and DB column names work too.
+_FIELD_LABELS = {
+    "farmer name": "farmer_name", "village": "village", "block": "block", "district": "district",
+    "proposed area (acre)": "area", "response code": "response_code", "uuid": "uuid",
+    "village_name": "village", "proposed_area_acre": "area",
+    **{title.lower(): key for key, title in CSV_HEADERS.items() if not key.startswith("p")},
+    **{key: key for key in CSV_HEADERS if not key.startswith("p")},
+}
+
+_local_names = {} # Tag -> local name; a file uses few distinct tags
+
+def _local_name(tag):
+    """Tag without its namespace: KML 2.2, the older Google Earth namespaces and none all occur."""
+    try:
+        return _local_names[tag]
+    except KeyError:
+        local_name = _local_names[tag] = tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+        return local_name
+
+def _parse_description(text):
+    """'Label: value' lines of a placemark description (plain or HTML) as {CSV_HEADERS key: value}."""
+    fields = {}
+    text = html.unescape(_HTML_TAG_RE.sub("", _HTML_BREAK_RE.sub("\n", text)))
+    for line in text.splitlines():
+        label, sep, value = line.partition(":")
+        key = _FIELD_LABELS.get(label.strip().lower())
+        if sep and key: fields[key] = value.strip()
+    return fields
+
+def _parse_coordinates(text):
+    """KML 'lon,lat[,alt] ...' tuples as a list of (lon, lat, alt); the closing vertex of a ring is dropped."""
+    ring = []
+    for coordinate in text.split():
+        values = coordinate.split(",")
+        try:
+            ring.append((float(values[0]), float(values[1]), float(values[2]) if len(values) > 2 and values[2] else 0.0))
+        except (ValueError, IndexError):
+            continue
+    if len(ring) > 1 and ring[0][:2] == ring[-1][:2]: ring.pop()
+    return ring
+
+def _read_placemark(placemark):
+    """
+    Name, fields (description, then ExtendedData) and the outer ring of the first Polygon of a
+    Placemark element. Returns None for placemarks without a polygon (points, paths...).
+    """
+    name, fields, ring, polygon_count = (placemark.get("id") or "").strip(), {}, None, 0
+    for element in placemark.iter():
+        tag = _local_name(element.tag)
+        if tag == "name" and element.text and element.text.strip():
+            name = element.text.strip()
+        elif tag == "description" and element.text:
+            fields.update({key: value for key, value in _parse_description(element.text).items() if key not in fields})
+        elif tag in ("Data", "SimpleData"):
+            key = _FIELD_LABELS.get((element.get("name") or "").strip().lower())
+            value = element.text if tag == "SimpleData" else next((child.text for child in element if _local_name(child.tag) == "value"), None)
+            if key and value is not None: fields[key] = value.strip()
+        elif tag == "Polygon":
+            polygon_count += 1
+            if ring is None:
+                outer = next((child for child in element.iter() if _local_name(child.tag) == "outerBoundaryIs"), element)
+                coordinates = next((child for child in outer.iter() if _local_name(child.tag) == "coordinates"), None)
+                ring = _parse_coordinates(coordinates.text or "") if coordinates is not None else []
+    if ring is None: return None
+    return {"name": name, "fields": fields, "ring": ring, "polygon_count": polygon_count}
+
+class _CountingReader:
+    """Binary file wrapper counting the bytes iterparse has read, for progress."""
+    def __init__(self, raw_file, stream):
+        self._raw_file, self._stream = raw_file, stream
+
+    def read(self, size=-1):
+        data = self._raw_file.read(size)
+        self._stream.bytes_read += len(data)
+        return data
+
+class KmlPlacemarkStream:
+    """
+    Iterable over the polygon placemarks of a KML or KMZ file as import row dictionaries (CSV_HEADERS
+    layout; all vertices of the outer ring as "Point N" columns, in the UTM zone of the first vertex).
+    Like CsvFileRowStream it reports fraction_read, so the import dialogs show progress by bytes.
+
+    The placemark name is the UUID unless the fields give one. The Response Code comes from the
+    fields, else from the stored record with that UUID (response_code_lookup(uuids) -> {uuid: code},
+    e.g. DatabaseManager.get_response_codes_for_uuids), else KML_RESPONSE_CODE_PREFIX + UUID; so a
+    KML exported by this tool maps back onto its records and duplicates are skipped as usual.
+    After iteration, placemarks_read, placemarks_without_polygon and multi_polygon_placemarks
+    (only the first polygon of those is imported) describe the file.
+    """
+    def __init__(self, filepath, response_code_lookup=None):
+        self.filepath = filepath
+        self.response_code_lookup = response_code_lookup
+        self.is_kmz = zipfile.is_zipfile(filepath)
+        self.kml_entry_name = None
+        if self.is_kmz:
+            with zipfile.ZipFile(filepath) as kmz_file:
+                entry = self._find_kml_entry(kmz_file)
+                self.kml_entry_name, self.total_bytes = entry.filename, entry.file_size
+        else:
+            self.total_bytes = os.path.getsize(filepath)
+        self.bytes_read = 0
+        self.placemarks_read = self.placemarks_without_polygon = self.multi_polygon_placemarks = 0
+
+    @staticmethod
+    def _find_kml_entry(kmz_file):
+        """The main document of a KMZ: doc.kml if present, else its first .kml entry. Raises ValueError if it has none."""
+        kml_entries = [entry for entry in kmz_file.infolist() if entry.filename.lower().endswith(".kml")]
+        if not kml_entries: raise ValueError("The KMZ file contains no .kml document.")
+        return next((entry for entry in kml_entries if entry.filename.lower() == "doc.kml"), kml_entries[0])
+
+    @property
+    def fraction_read(self):
+        return min(self.bytes_read / self.total_bytes, 1.0) if self.total_bytes else 1.0
+
+    def __iter__(self):
+        self.bytes_read = 0
+        self.placemarks_read = self.placemarks_without_polygon = self.multi_polygon_placemarks = 0
+        if self.is_kmz:
+            with zipfile.ZipFile(self.filepath) as kmz_file, kmz_file.open(self.kml_entry_name) as kml_file:
+                yield from self._iter_rows(_CountingReader(kml_file, self))
+        else:
+            with open(self.filepath, "rb") as kml_file:
+                yield from self._iter_rows(_CountingReader(kml_file, self))
+
+    def _iter_rows(self, kml_file):
+        pending = []
+        for placemark in self._iter_placemarks(kml_file):
+            pending.append(placemark)
+            if len(pending) >= KML_CONVERT_BATCH_PLACEMARKS:
+                yield from self._placemarks_to_rows(pending)
+                pending = []
+        yield from self._placemarks_to_rows(pending)
+
+    def _iter_placemarks(self, kml_file):
+        """Parsed polygon placemarks in document order. Raises xml.etree.ElementTree.ParseError for malformed XML."""
+        open_elements = []
+        for event, element in ET.iterparse(kml_file, events=("start", "end")):
+            if event == "start":
+                open_elements.append(element)
+                continue
+            open_elements.pop()
+            if _local_name(element.tag) == "Placemark":
+                self.placemarks_read += 1
+                placemark = _read_placemark(element)
+                if placemark is None: self.placemarks_without_polygon += 1
+                else:
+                    if placemark["polygon_count"] > 1: self.multi_polygon_placemarks += 1
+                    yield placemark
+            if open_elements and _local_name(open_elements[-1].tag) in _CONTAINER_TAGS:
+                element.clear() # Parsed: drop it, so the tree never holds more than one placemark
+                open_elements[-1].remove(element)
+
+    def _placemarks_to_rows(self, placemarks):
+        """Converts a batch of placemarks to import rows: one vectorized utm.from_latlon call per UTM zone."""
+        if not placemarks: return []
+        counts = np.array([len(placemark["ring"]) for placemark in placemarks], dtype=np.int64)
+        coordinates = np.array([vertex for placemark in placemarks for vertex in placemark["ring"]], dtype=np.float64).reshape(-1, 3)
+        lon, lat = coordinates[:, 0], coordinates[:, 1]
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        has_ring = counts > 0
+        first_lat, first_lon = lat[starts[has_ring]], lon[starts[has_ring]]
+        # The whole ring goes in the zone of its first vertex, as process_csv_row_data requires one zone per polygon
+        in_range = (lat >= -80) & (lat <= 84) & (np.abs(lon) <= 180)
+        zone_numbers = np.zeros(len(placemarks), dtype=np.int64)
+        zone_letters = [""] * len(placemarks)
+        for index, ring_lat, ring_lon in zip(np.flatnonzero(has_ring).tolist(), first_lat.tolist(), first_lon.tolist()):
+            if -80 <= ring_lat <= 84 and -180 <= ring_lon <= 180:
+                zone_numbers[index], zone_letters[index] = utm.latlon_to_zone_number(ring_lat, ring_lon), utm.latitude_to_zone_letter(ring_lat)
+        vertex_zone_numbers = np.repeat(zone_numbers, counts)
+        vertex_zone_letters = np.repeat(np.array(zone_letters, dtype=object), counts)
+        eastings, northings = np.full(len(coordinates), np.nan), np.full(len(coordinates), np.nan)
+        for zone_number, zone_letter in {(int(number), letter) for number, letter in zip(zone_numbers.tolist(), zone_letters) if letter}:
+            in_zone = in_range & (vertex_zone_numbers == zone_number) & (vertex_zone_letters == zone_letter)
+            if in_zone.any():
+                eastings[in_zone], northings[in_zone], _, _ = utm.from_latlon(lat[in_zone], lon[in_zone], zone_number, zone_letter)
+
+        fields_list = [placemark["fields"] for placemark in placemarks]
+        uuids = [fields.get("uuid") or placemark["name"] for fields, placemark in zip(fields_list, placemarks)]
+        known_codes = self.response_code_lookup({uuid for uuid, fields in zip(uuids, fields_list)
+                                                 if uuid and not fields.get("response_code")}) if self.response_code_lookup else {}
+        rows = []
+        for index, (placemark, fields, uuid) in enumerate(zip(placemarks, fields_list, uuids)):
+            response_code = fields.get("response_code") or known_codes.get(uuid) or (f"{KML_RESPONSE_CODE_PREFIX}{uuid}" if uuid else "")
+            area = fields.get("area", "")
+            row = {CSV_HEADERS["uuid"]: uuid, CSV_HEADERS["response_code"]: response_code,
+                   CSV_HEADERS["area"]: "" if area.upper() == "N/A" else area,
+                   **{CSV_HEADERS[key]: fields.get(key, "") for key in ("farmer_name", "village", "block", "district")}}
+            zone = f"{zone_numbers[index]}{zone_letters[index]}"
+            ring_slice = slice(starts[index], starts[index] + counts[index])
+            for point_number, (easting, northing, altitude) in enumerate(zip(eastings[ring_slice].tolist(), northings[ring_slice].tolist(),
+                                                                             coordinates[ring_slice, 2].tolist()), start=1):
+                # Out-of-range vertices are left empty: validation then substitutes or rejects them as for CSV rows
+                row[POINT_UTM_HEADER_PATTERN.format(n=point_number)] = "" if easting != easting else f"{zone} {easting:.2f} {northing:.2f}"
+                row[POINT_ALT_HEADER_PATTERN.format(n=point_number)] = f"{altitude:.2f}"
+            rows.append(row)
+        return rows
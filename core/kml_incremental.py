@@ -0,0 +1,241 @@
+# File: DilasaKMLTool_v4/core/kml_incremental.py
+# ----------------------------------------------------------------------
+# Incremental per-record KML export: the output folder holds one <uuid>.kml per record (as the
+# "multiple" mode writes them) plus a manifest of what each file was built from. A re-export only
+# rebuilds the files of new or changed records and deletes those of records no longer exported,
+# so a daily re-export of a large, mostly unchanged folder touches a handful of files. The same
+# manifest approach keeps one consolidated KMZ per district, rewritten only when the district changed.
+# No Qt imports here: also used by the headless CLI.
+import collections
+import datetime
+import hashlib
+import json
+import os
+import re
+import time
+import zipfile
+
+from core import perf
+from core.kml_fragment_cache import iter_placemark_fragments
+from core.kml_generator import KML_FRAGMENT_FORMAT, build_placemark_fragment, kml_document_text
+from database.db_manager import KML_SOURCE_COLUMNS
+
+KML_MANIFEST_FILE_NAME = "dilasa_kml_manifest.json"
+DISTRICT_KMZ_MANIFEST_FILE_NAME = "dilasa_district_kmz_manifest.json"
+KML_MANIFEST_FORMAT = 1 # Bump when the manifest layout changes: every file is rebuilt then
+INCREMENTAL_BATCH_ROWS = 1000 # Records read per batch (and progress reports)
+_SCAN_COLUMNS = ("id", "uuid", "status", "last_modified")
+
+def kml_content_hash(polygon_record):
+    """SHA-1 of the record's KML_SOURCE_COLUMNS (and KML_FRAGMENT_FORMAT): equal hashes give the same KML."""
+    digest = hashlib.sha1(str(KML_FRAGMENT_FORMAT).encode())
+    for column in KML_SOURCE_COLUMNS:
+        value = polygon_record.get(column)
+        digest.update(b"\x1f" + (value if isinstance(value, bytes) else repr(value).encode("utf-8")))
+    return digest.hexdigest()
+
+def load_kml_manifest(output_folder, file_name=KML_MANIFEST_FILE_NAME):
+    """
+    Manifest entries of a folder, {uuid: {"id", "hash", "last_modified", "file"}} (district KMZ manifest:
+    {district: {"signature", "records", "file"}}). A missing, unreadable or other-format manifest gives {}
+    (everything is then written again).
+    """
+    manifest_path = os.path.join(output_folder, file_name)
+    if not os.path.exists(manifest_path): return {}
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError) as e:
+        print(f"KML GEN Warning: Ignoring unreadable manifest {manifest_path}: {e}")
+        return {}
+    if not isinstance(manifest, dict) or manifest.get("format") != KML_MANIFEST_FORMAT: return {}
+    return manifest.get("records") or {}
+
+def save_kml_manifest(output_folder, entries, file_name=KML_MANIFEST_FILE_NAME):
+    """Writes the manifest (under a temporary name first, so a crash never leaves half a manifest)."""
+    manifest_path = os.path.join(output_folder, file_name)
+    manifest = {"format": KML_MANIFEST_FORMAT, "updated": datetime.datetime.now().isoformat(),
+                "records": dict(sorted(entries.items()))}
+    with open(manifest_path + ".part", "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file, indent=1)
+    os.replace(manifest_path + ".part", manifest_path)
+    return manifest_path
+
+def _remove_file(output_folder, file_name):
+    try:
+        os.remove(os.path.join(output_folder, file_name))
+        return True
+    except FileNotFoundError:
+        return False
+
+def export_kml_incremental(db_manager, record_ids, output_folder, progress_callback=None):
+    """
+    Brings output_folder up to date with the valid records among record_ids: one <uuid>.kml per record,
+    described by the folder's manifest (KML_MANIFEST_FILE_NAME). A record is rebuilt only if it is new,
+    its file is missing, or its last_modified differs from the manifest's and its content hash does too;
+    files listed in the manifest for records no longer exported (deleted, invalid or not selected)
+    are deleted. Other files in the folder are never touched.
+
+    progress_callback(phase, records_done) ("scan", then "write") may return False to cancel; the
+    files written so far are kept and recorded in the manifest. Returns a summary dict: written_ids,
+    unchanged, removed (files deleted), skipped (not valid or no usable coordinates), cancelled,
+    output_folder, manifest_path and seconds.
+    """
+    start = time.perf_counter()
+    os.makedirs(output_folder, exist_ok=True)
+    summary = {"written_ids": [], "unchanged": 0, "removed": 0, "skipped": 0, "cancelled": False,
+               "output_folder": os.path.abspath(output_folder)}
+    manifest = load_kml_manifest(output_folder)
+    existing_files = set(os.listdir(output_folder))
+    phase_timer = perf.PhaseTimer("kml_incremental")
+
+    # Scan: which selected records may need writing (cheap columns only)
+    phase_timer.start("scan")
+    exported_uuids, candidate_ids, records_scanned = set(), [], 0
+    for record in db_manager.iter_polygon_records(record_ids=record_ids, columns=_SCAN_COLUMNS):
+        records_scanned += 1
+        if record['status'] != 'valid_for_kml':
+            summary["skipped"] += 1
+        else:
+            exported_uuids.add(record['uuid'])
+            entry = manifest.get(record['uuid'])
+            if (entry and record['last_modified'] and entry.get("last_modified") == record['last_modified']
+                    and entry.get("file") in existing_files):
+                summary["unchanged"] += 1
+            else:
+                candidate_ids.append(record['id'])
+        if progress_callback and records_scanned % INCREMENTAL_BATCH_ROWS == 0 and progress_callback("scan", records_scanned) is False:
+            summary["cancelled"] = True
+            break
+    if summary["cancelled"]:
+        summary["seconds"] = round(time.perf_counter() - start, 4)
+        return summary
+
+    # Files of records no longer exported
+    phase_timer.start("remove")
+    for uuid in [uuid for uuid in manifest if uuid not in exported_uuids]:
+        if _remove_file(output_folder, manifest.pop(uuid)["file"]): summary["removed"] += 1
+
+    # New or changed records: rebuilt unless only fields the KML does not show changed
+    try:
+        records_done = 0
+        record_iterator = db_manager.iter_polygon_records(record_ids=candidate_ids, columns=("id", "last_modified", *KML_SOURCE_COLUMNS))
+        while True:
+            phase_timer.start("read")
+            polygon_record = next(record_iterator, None)
+            if polygon_record is None: break
+            uuid, content_hash = polygon_record['uuid'], kml_content_hash(polygon_record)
+            entry = manifest.get(uuid)
+            file_name = f"{uuid}.kml"
+            if entry and entry.get("hash") == content_hash and entry.get("file") in existing_files:
+                entry["last_modified"] = polygon_record['last_modified']
+                summary["unchanged"] += 1
+            else:
+                phase_timer.start("build")
+                placemark_fragment = build_placemark_fragment(polygon_record)
+                if placemark_fragment is not None:
+                    phase_timer.start("save")
+                    with open(os.path.join(output_folder, file_name), "w", encoding="utf-8") as kml_file:
+                        kml_file.write(kml_document_text(uuid, [placemark_fragment]))
+                    manifest[uuid] = {"id": polygon_record['id'], "hash": content_hash,
+                                      "last_modified": polygon_record['last_modified'], "file": file_name}
+                    summary["written_ids"].append(polygon_record['id'])
+                else: # Cannot be drawn any more: its old file would be stale
+                    if entry and _remove_file(output_folder, manifest.pop(uuid)["file"]): summary["removed"] += 1
+                    summary["skipped"] += 1
+            records_done += 1
+            if progress_callback and records_done % INCREMENTAL_BATCH_ROWS == 0 and progress_callback("write", records_done) is False:
+                summary["cancelled"] = True
+                break
+        record_iterator.close()
+    finally:
+        phase_timer.start("manifest")
+        summary["manifest_path"] = save_kml_manifest(output_folder, manifest)
+        phase_timer.emit(items=len(summary["written_ids"]))
+    summary["seconds"] = round(time.perf_counter() - start, 4)
+    return summary
+
+def district_kmz_file_name(district):
+    """
+    KMZ file name for a district: characters not allowed in file names replaced by '_'. If anything was
+    replaced (or the district is empty), a short hash of the raw name is appended, so "A/B", "A_B" and
+    "" / "No District" get different files.
+    """
+    safe_name = re.sub(r'[^\w\- ]', '_', district).strip() or "No District"
+    if safe_name != district:
+        safe_name += "_" + hashlib.sha1(district.encode("utf-8")).hexdigest()[:8]
+    return f"District_{safe_name}.kmz"
+
+def export_district_kmz(db_manager, output_folder, filters=None, progress_callback=None):
+    """
+    Keeps one consolidated KMZ per district (district_kmz_file_name) of the valid records matching a filter
+    spec in output_folder. A district's KMZ is only rewritten when its records changed: the manifest
+    (DISTRICT_KMZ_MANIFEST_FILE_NAME) stores a signature of each district's record ids and
+    last_modified values. KMZs of districts without records any more are deleted, as are files a district
+    was written to under an older name, unless another district's manifest entry names them.
+
+    progress_callback(districts_done) is called after each district (and every INCREMENTAL_BATCH_ROWS
+    records within a large one) and may return False to cancel; KMZs written so far are kept and
+    recorded in the manifest. Returns a summary dict: written_ids (records in rewritten KMZs),
+    districts_written, districts_unchanged, removed, cancelled, output_folder, manifest_path and seconds.
+    """
+    start = time.perf_counter()
+    os.makedirs(output_folder, exist_ok=True)
+    summary = {"written_ids": [], "districts_written": 0, "districts_unchanged": 0, "removed": 0, "cancelled": False,
+               "output_folder": os.path.abspath(output_folder)}
+    filters = dict(filters or {}, status="valid_for_kml")
+    manifest = load_kml_manifest(output_folder, DISTRICT_KMZ_MANIFEST_FILE_NAME)
+    existing_files = set(os.listdir(output_folder))
+    phase_timer = perf.PhaseTimer("district_kmz")
+
+    phase_timer.start("scan")
+    district_records = {} # district -> [(id, last_modified)], in id order
+    for rows in db_manager.iter_polygon_row_batches(["id", "district", "last_modified"], filters):
+        for record_id, district, last_modified in rows:
+            district_records.setdefault((district or "").strip(), []).append((record_id, last_modified))
+
+    # Names shared by several districts (older manifests) hold only the last one written: rewrite them
+    file_name_counts = collections.Counter(entry.get("file") for entry in manifest.values())
+    # Files of districts without records (or written under an older name): removed at the end
+    stale_files = {manifest.pop(district)["file"] for district in [district for district in manifest if district not in district_records]}
+
+    try:
+        for districts_done, (district, records) in enumerate(sorted(district_records.items()), start=1):
+            signature = hashlib.sha1(f"{KML_FRAGMENT_FORMAT}|{records!r}".encode("utf-8")).hexdigest()
+            entry = manifest.get(district)
+            file_name = district_kmz_file_name(district)
+            if (entry and entry.get("signature") == signature and entry.get("file") == file_name and file_name in existing_files
+                    and file_name_counts[file_name] == 1):
+                summary["districts_unchanged"] += 1
+            else:
+                phase_timer.start("build")
+                fragment_items = []
+                for fragment_item in iter_placemark_fragments(db_manager, [record_id for record_id, _ in records]):
+                    fragment_items.append(fragment_item)
+                    if (progress_callback and len(fragment_items) % INCREMENTAL_BATCH_ROWS == 0
+                            and progress_callback(districts_done - 1) is False):
+                        summary["cancelled"] = True
+                        break
+                if summary["cancelled"]: break # This district's KMZ (and manifest entry) stays as it was
+                document_name = f"{district or '(No District)'} - {len(fragment_items)} plots"
+                phase_timer.start("write")
+                temp_path = os.path.join(output_folder, file_name + ".part")
+                with zipfile.ZipFile(temp_path, "w", zipfile.ZIP_DEFLATED) as kmz_file:
+                    kmz_file.writestr("doc.kml", kml_document_text(document_name, [fragment for _record_id, _uuid, fragment in fragment_items]))
+                os.replace(temp_path, os.path.join(output_folder, file_name))
+                if entry and entry.get("file") != file_name: stale_files.add(entry["file"])
+                manifest[district] = {"signature": signature, "records": len(fragment_items), "file": file_name}
+                summary["written_ids"].extend(record_id for record_id, _uuid, _fragment in fragment_items)
+                summary["districts_written"] += 1
+            if progress_callback and progress_callback(districts_done) is False:
+                summary["cancelled"] = True
+                break
+    finally:
+        phase_timer.start("remove")
+        kept_files = {entry["file"] for entry in manifest.values()}
+        summary["removed"] += sum(_remove_file(output_folder, stale_file) for stale_file in stale_files - kept_files)
+        phase_timer.start("manifest")
+        summary["manifest_path"] = save_kml_manifest(output_folder, manifest, DISTRICT_KMZ_MANIFEST_FILE_NAME)
+        phase_timer.emit(items=len(summary["written_ids"]))
+    summary["seconds"] = round(time.perf_counter() - start, 4)
+    return summary
@@ -0,0 +1,232 @@
+# File: DilasaKMLTool_v4/core/kml_network_server.py
+# ----------------------------------------------------------------------
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+
+import simplekml
+import utm
+
+from database.db_manager import DatabaseManager
+from core.kml_fragment_cache import iter_placemark_fragments
+from core.kml_generator import kml_document_text
+
+LIVE_LINK_PATH = "/live.kml"         # What the user adds to Google Earth, once
+POLYGONS_PATH = "/polygons.kml"      # Refreshed by Google Earth through the live link
+CHUNK_PATH_PREFIX = "/chunk/"        # /chunk/<version>/<index>.kml
+DEFAULT_CHUNK_SIZE = 500             # Placemarks per regionated chunk
+DEFAULT_REFRESH_INTERVAL_S = 5
+CHUNK_MIN_LOD_PIXELS = 128           # A chunk loads once its region covers this many pixels on screen
+CHUNK_REGION_PADDING_DEG = 0.005     # Regions are built from first vertices; pad to cover whole plots
+KML_MIME_TYPE = "application/vnd.google-earth.kml+xml"
+
+
+class KMLNetworkLinkServer:
+    """
+    Embedded localhost HTTP server that lets Google Earth review many polygons live.
+    Google Earth loads /live.kml once; its NetworkLink re-fetches /polygons.kml every few
+    seconds. That document is built on request from the database for the record IDs last
+    pushed by the UI (checked or filtered rows). Large selections are split into
+    spatial chunks, each behind a NetworkLink with a Region/Lod, so Google Earth only
+    downloads the chunks in view.
+    """
+    def __init__(self, db_file_path, host="127.0.0.1", port=0,
+                 chunk_size=DEFAULT_CHUNK_SIZE, refresh_interval_s=DEFAULT_REFRESH_INTERVAL_S):
+        self.db_file_path = db_file_path
+        self.host = host
+        self.requested_port = port # 0 lets the OS pick a free port
+        self.chunk_size = chunk_size
+        self.refresh_interval_s = refresh_interval_s
+
+        self._lock = threading.Lock()
+        self._record_ids = ()
+        self._version = 0
+        self._chunk_layout = None # (version, [(id_list, (north, south, east, west)), ...])
+        self._httpd = None
+        self._thread = None
+
+    # --- Lifecycle ---
+    def start(self):
+        """Starts serving in a daemon thread. Returns the live link URL."""
+        if self._httpd is None:
+            handler_class = _make_request_handler(self)
+            self._httpd = ThreadingHTTPServer((self.host, self.requested_port), handler_class)
+            self._httpd.daemon_threads = True
+            self._thread = threading.Thread(target=self._httpd.serve_forever, name="KMLNetworkLinkServer", daemon=True)
+            self._thread.start()
+            print(f"KML SERVER: Serving live link at {self.live_link_url}")
+        return self.live_link_url
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+            self._thread = None
+            print("KML SERVER: Stopped.")
+
+    def is_running(self):
+        return self._httpd is not None
+
+    @property
+    def base_url(self):
+        if self._httpd is None: return None
+        return f"http://{self.host}:{self._httpd.server_address[1]}"
+
+    @property
+    def live_link_url(self):
+        return f"{self.base_url}{LIVE_LINK_PATH}" if self._httpd else None
+
+    # --- State pushed from the UI thread ---
+    def set_record_ids(self, record_ids):
+        """Sets the records to serve. The version only changes if the set of IDs changed."""
+        new_ids = tuple(sorted(set(record_ids)))
+        with self._lock:
+            if new_ids != self._record_ids:
+                self._record_ids = new_ids
+                self._version += 1
+
+    def notify_data_changed(self):
+        """Forces a new version, e.g. after an import changed record contents but not the ID set."""
+        with self._lock:
+            self._version += 1
+
+    def current_version(self):
+        with self._lock:
+            return self._version
+
+    def _snapshot(self):
+        with self._lock:
+            return self._version, self._record_ids
+
+    # --- KML document builders (run on request threads) ---
+    def build_live_link_kml(self):
+        kml_doc = simplekml.Kml(name="Dilasa Live Polygons")
+        network_link = kml_doc.newnetworklink(name="Checked / filtered polygons")
+        network_link.link.href = f"{self.base_url}{POLYGONS_PATH}"
+        network_link.link.refreshmode = simplekml.RefreshMode.oninterval
+        network_link.link.refreshinterval = self.refresh_interval_s
+        network_link.flytoview = 0
+        return kml_doc.kml()
+
+    def build_polygons_kml(self):
+        version, record_ids = self._snapshot()
+        document_name = f"Dilasa Polygons ({len(record_ids)})"
+        if len(record_ids) <= self.chunk_size:
+            return version, self._records_kml(document_name, record_ids)
+
+        kml_doc = simplekml.Kml(name=document_name)
+
+        for index, (_chunk_ids, bounds) in enumerate(self._get_chunk_layout(version, record_ids)):
+            north, south, east, west = bounds
+            chunk_link = kml_doc.newnetworklink(name=f"Chunk {index + 1}")
+            chunk_link.link.href = f"{self.base_url}{CHUNK_PATH_PREFIX}{version}/{index}.kml"
+            chunk_link.link.viewrefreshmode = simplekml.ViewRefreshMode.onregion
+            chunk_link.region = simplekml.Region(
+                latlonaltbox=simplekml.LatLonAltBox(north=north, south=south, east=east, west=west),
+                lod=simplekml.Lod(minlodpixels=CHUNK_MIN_LOD_PIXELS, maxlodpixels=-1))
+        return version, kml_doc.kml()
+
+    def build_chunk_kml(self, version, chunk_index):
+        current_version, record_ids = self._snapshot()
+        if version != current_version:
+            return None # Stale link; Google Earth picks up the new layout on its next refresh
+        layout = self._get_chunk_layout(version, record_ids)
+        if not 0 <= chunk_index < len(layout):
+            return None
+        return self._records_kml(f"Chunk {chunk_index + 1}", layout[chunk_index][0])
+
+    def _open_db(self):
+        """
+        Connection for one request (ThreadingHTTPServer runs each on a new thread). The app's own
+        DatabaseManager has set the schema up already, so no table creation or migration DDL runs
+        on Google Earth's polls.
+        """
+        return DatabaseManager(db_file_path=self.db_file_path, ensure_schema=False)
+
+    def _records_kml(self, document_name, record_ids):
+        """KML document of the valid records among record_ids, from their cached placemark fragments."""
+        if not record_ids: return kml_document_text(document_name, [])
+        db_manager = self._open_db()
+        try:
+            return kml_document_text(document_name, [fragment for _record_id, _uuid, fragment
+                                                     in iter_placemark_fragments(db_manager, record_ids)])
+        finally:
+            db_manager.close()
+
+    def _get_chunk_layout(self, version, record_ids):
+        """
+        Splits records into spatially coherent chunks, ordered on a coarse lon/lat grid so
+        neighbouring plots share a chunk. Cached per version; one UTM conversion per record.
+        """
+        with self._lock:
+            if self._chunk_layout and self._chunk_layout[0] == version:
+                return self._chunk_layout[1]
+
+        anchors = [] # (grid_key, lon, lat, record_id)
+        db_manager = self._open_db()
+        try:
+            for record in db_manager.get_polygon_data_by_ids(list(record_ids), status='valid_for_kml'):
+                try:
+                    lat, lon = utm.to_latlon(record['p1_easting'], record['p1_northing'],
+                                             record['p1_zone_num'], record['p1_zone_letter'])
+                except Exception:
+                    continue # Not renderable; build_placemark_fragment would skip it as well
+                anchors.append(((round(lat, 1), round(lon, 1)), lon, lat, record['id']))
+        finally:
+            db_manager.close()
+        anchors.sort()
+
+        layout = []
+        for start in range(0, len(anchors), self.chunk_size):
+            chunk = anchors[start:start + self.chunk_size]
+            lons = [a[1] for a in chunk]; lats = [a[2] for a in chunk]
+            bounds = (max(lats) + CHUNK_REGION_PADDING_DEG, min(lats) - CHUNK_REGION_PADDING_DEG,
+                      max(lons) + CHUNK_REGION_PADDING_DEG, min(lons) - CHUNK_REGION_PADDING_DEG)
+            layout.append(([a[3] for a in chunk], bounds))
+
+        with self._lock:
+            self._chunk_layout = (version, layout)
+        return layout
+
+
+def _make_request_handler(server):
+    class KMLNetworkLinkRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = urlparse(self.path).path
+            try:
+                if path == LIVE_LINK_PATH:
+                    self._send_kml(server.build_live_link_kml())
+                elif path == POLYGONS_PATH:
+                    # Unchanged selection: answer 304 without touching the database
+                    if self.headers.get("If-None-Match") == f'"v{server.current_version()}"':
+                        self.send_response(304); self.end_headers(); return
+                    version, kml_text = server.build_polygons_kml()
+                    self._send_kml(kml_text, etag=f'"v{version}"')
+                elif path.startswith(CHUNK_PATH_PREFIX) and path.endswith(".kml"):
+                    version_str, index_str = path[len(CHUNK_PATH_PREFIX):-len(".kml")].split("/", 1)
+                    kml_text = server.build_chunk_kml(int(version_str), int(index_str))
+                    if kml_text is None: self.send_error(404, "Chunk not found")
+                    else: self._send_kml(kml_text)
+                else:
+                    self.send_error(404, "Not found")
+            except (ValueError, TypeError):
+                self.send_error(400, "Bad request")
+            except Exception as e:
+                print(f"KML SERVER Error: {e}")
+                self.send_error(500, "Internal error")
+
+        def _send_kml(self, kml_text, etag=None):
+            body = kml_text.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", KML_MIME_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-cache")
+            if etag: self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass # Google Earth polls every few seconds; keep the console quiet
+
+    return KMLNetworkLinkRequestHandler
@@ -0,0 +1,217 @@
+# File: DilasaKMLTool_v4/core/kml_superoverlay.py
+# ----------------------------------------------------------------------
+# Regionated ("super-overlay") KML export for large selections. Plots are partitioned spatially
+# (quadtree) or administratively (district > block > village) into many small KML files linked by
+# NetworkLinks with a Region/Lod each, so Google Earth only loads the tiles in view instead of one
+# document with every placemark. Written as a folder (doc.kml + tiles/) or as one KMZ.
+# No Qt imports here: also used by the headless CLI.
+import datetime
+import os
+import shutil
+import time
+import zipfile
+
+import numpy as np
+import simplekml
+
+from core import perf
+from core.geometry import LONLAT_SOURCE_COLUMNS, polygon_records_to_lonlat
+from core.kml_fragment_cache import iter_placemark_fragments
+from core.kml_generator import kml_document_text
+
+SUPEROVERLAY_PARTITIONS = ("quadtree", "admin")
+DEFAULT_TILE_PLACEMARKS = 500 # Most placemarks in one tile file
+TILE_MIN_LOD_PIXELS = 128 # A tile (or the links below it) loads once its region covers this many pixels on screen
+MAX_QUADTREE_DEPTH = 18 # Below this, plots sharing a spot stay in one tile whatever their number
+LAYOUT_BATCH_ROWS = 5000 # Records read per batch to compute the layout
+_LAYOUT_COLUMNS = ("id", "status", "district", "block", "village_name", *LONLAT_SOURCE_COLUMNS)
+_ADMIN_LEVELS = (("district", "District"), ("block", "Block"), ("village_name", "Village"))
+
+class _TileNode:
+    """One file of the super-overlay: either placemarks (record_ids) or NetworkLinks to child nodes."""
+    def __init__(self, key, name, indices):
+        self.key, self.name, self.indices = key, name, indices
+        self.children = []
+        self.bounds = None # (north, south, east, west) of the plots below this node
+
+def _compute_layout_inputs(db_manager, record_ids, progress_callback):
+    """
+    Ids, admin names and per-plot lon/lat bounding boxes and centres of the valid, convertible
+    records among record_ids (records read LAYOUT_BATCH_ROWS at a time, converted vectorized).
+    Returns (ids, admin_names [(district, block, village)], boxes (n, 4) west/south/east/north,
+    centres (n, 2) lon/lat), or None if progress_callback cancelled.
+    """
+    ids, admin_names, boxes, centres = [], [], [], []
+    records_read = 0
+    record_iterator = db_manager.iter_polygon_records(record_ids=record_ids, columns=_LAYOUT_COLUMNS)
+    while True:
+        batch = [record for _, record in zip(range(LAYOUT_BATCH_ROWS), record_iterator)]
+        if not batch: break
+        records_read += len(batch)
+        valid_records = [record for record in batch if record['status'] == 'valid_for_kml']
+        lonlat, counts, usable = polygon_records_to_lonlat(valid_records)
+        has_ring = counts > 0
+        if has_ring.any():
+            starts = (np.cumsum(counts) - counts)[has_ring]
+            ring_counts, ok = counts[has_ring], usable[has_ring]
+            box = np.column_stack((np.minimum.reduceat(lonlat[:, 0], starts), np.minimum.reduceat(lonlat[:, 1], starts),
+                                   np.maximum.reduceat(lonlat[:, 0], starts), np.maximum.reduceat(lonlat[:, 1], starts)))
+            boxes.append(box[ok])
+            centres.append((np.add.reduceat(lonlat, starts) / ring_counts[:, None])[ok])
+            ring_records = [record for record, count in zip(valid_records, counts.tolist()) if count]
+            usable_records = [record for record, record_ok in zip(ring_records, ok.tolist()) if record_ok]
+            ids.extend(record['id'] for record in usable_records)
+            admin_names.extend(tuple((record[column] or "").strip() for column, _ in _ADMIN_LEVELS) for record in usable_records)
+        if progress_callback and progress_callback("layout", records_read) is False:
+            return None
+    if not ids: return [], [], np.empty((0, 4)), np.empty((0, 2))
+    return ids, admin_names, np.concatenate(boxes), np.concatenate(centres)
+
+def _set_bounds(node, boxes):
+    west, south = boxes[node.indices, 0].min(), boxes[node.indices, 1].min()
+    east, north = boxes[node.indices, 2].max(), boxes[node.indices, 3].max()
+    node.bounds = (float(north), float(south), float(east), float(west))
+
+def _split_quadtree(node, centres, boxes, tile_placemarks, depth=0):
+    """Splits node into up to four quadrants (by plot centre) until each leaf has at most tile_placemarks plots."""
+    _set_bounds(node, boxes)
+    if len(node.indices) <= tile_placemarks or depth >= MAX_QUADTREE_DEPTH: return node
+    node_centres = centres[node.indices]
+    mid_lon = (node_centres[:, 0].min() + node_centres[:, 0].max()) / 2
+    mid_lat = (node_centres[:, 1].min() + node_centres[:, 1].max()) / 2
+    quadrant = (node_centres[:, 0] > mid_lon).astype(np.int64) + 2 * (node_centres[:, 1] > mid_lat)
+    if np.all(quadrant == quadrant[0]): return node # All plots at one spot: cannot split further
+    for quadrant_index, quadrant_name in enumerate(("SW", "SE", "NW", "NE")):
+        child_indices = node.indices[quadrant == quadrant_index]
+        if len(child_indices):
+            # 'q' keeps quadrant keys apart from admin group numbers ('_1' + quadrant 0 vs group '_10')
+            child = _TileNode(f"{node.key}q{quadrant_index}", f"{node.name} {quadrant_name}".strip(), child_indices)
+            node.children.append(_split_quadtree(child, centres, boxes, tile_placemarks, depth + 1))
+    node.indices = None
+    return node
+
+def _split_admin(node, admin_names, centres, boxes, tile_placemarks, level=0):
+    """
+    District > block > village nodes, down to the first level whose nodes have at most tile_placemarks
+    plots (one tile each); villages with more are split by quadtree.
+    """
+    if level == len(_ADMIN_LEVELS): return _split_quadtree(node, centres, boxes, tile_placemarks)
+    _set_bounds(node, boxes)
+    if len(node.indices) <= tile_placemarks: return node
+    groups = {}
+    for index in node.indices.tolist():
+        groups.setdefault(admin_names[index][level], []).append(index)
+    level_label = _ADMIN_LEVELS[level][1]
+    for group_number, (group_name, group_indices) in enumerate(sorted(groups.items())):
+        child = _TileNode(f"{node.key}_{group_number}", group_name or f"(No {level_label})", np.asarray(group_indices, dtype=np.int64))
+        node.children.append(_split_admin(child, admin_names, centres, boxes, tile_placemarks, level + 1))
+    node.indices = None
+    return node
+
+def _add_region_link(kml_doc, child, href):
+    north, south, east, west = child.bounds
+    link = kml_doc.newnetworklink(name=child.name)
+    link.link.href = href
+    link.link.viewrefreshmode = simplekml.ViewRefreshMode.onregion
+    link.region = simplekml.Region(latlonaltbox=simplekml.LatLonAltBox(north=north, south=south, east=east, west=west),
+                                   lod=simplekml.Lod(minlodpixels=TILE_MIN_LOD_PIXELS, maxlodpixels=-1))
+
+class _OutputWriter:
+    """Writes the super-overlay files into a folder, or into a KMZ (written under a temporary name)."""
+    def __init__(self, output_path, package_kmz):
+        self.output_path, self.package_kmz = output_path, package_kmz
+        if package_kmz:
+            self.temp_path = output_path + ".part"
+            self.kmz_file = zipfile.ZipFile(self.temp_path, "w", zipfile.ZIP_DEFLATED)
+        else:
+            os.makedirs(os.path.join(output_path, "tiles"))
+
+    def write(self, relative_path, kml_text):
+        if self.package_kmz:
+            self.kmz_file.writestr(relative_path, kml_text)
+        else:
+            with open(os.path.join(self.output_path, relative_path), "w", encoding="utf-8") as kml_file:
+                kml_file.write(kml_text)
+
+    def close(self, completed):
+        if self.package_kmz:
+            self.kmz_file.close()
+            if completed: os.replace(self.temp_path, self.output_path)
+            else: os.remove(self.temp_path)
+        elif not completed:
+            shutil.rmtree(self.output_path, ignore_errors=True)
+
+def super_overlay_output_path(output_folder, record_count, package_kmz):
+    """Default file/folder name in output_folder, like the consolidated KML's; never an existing one."""
+    base_name = f"SuperOverlay_KML_{datetime.datetime.now().strftime('%d.%m.%y')}_{record_count}"
+    extension = ".kmz" if package_kmz else ""
+    output_path, copy_number = os.path.join(output_folder, base_name + extension), 1
+    while os.path.exists(output_path):
+        copy_number += 1
+        output_path = os.path.join(output_folder, f"{base_name} ({copy_number}){extension}")
+    return output_path
+
+def export_super_overlay(db_manager, record_ids, output_path, partition="quadtree", package_kmz=False,
+                         tile_placemarks=DEFAULT_TILE_PLACEMARKS, progress_callback=None):
+    """
+    Writes the valid records among record_ids as a super-overlay: doc.kml links to tiles/<key>.kml
+    files, each holding at most tile_placemarks placemarks (cached fragments, see core.kml_fragment_cache)
+    or links to the tiles below it, every link with the Region of the plots it leads to. partition
+    is "quadtree" (spatial) or "admin" (district > block > village, large villages split by quadtree).
+    output_path is a folder to create (it must not exist) or, with package_kmz, the KMZ file to write.
+
+    progress_callback(phase, records_done) ("layout", then "tiles") may return False to cancel;
+    nothing is left on disk then. Returns a summary dict: exported_ids, tiles (files written),
+    skipped (not valid or no usable coordinates), cancelled, output_path and seconds.
+    """
+    if partition not in SUPEROVERLAY_PARTITIONS:
+        raise ValueError(f"Unknown partition '{partition}'. Expected one of {SUPEROVERLAY_PARTITIONS}.")
+    start = time.perf_counter()
+    summary = {"exported_ids": [], "tiles": 0, "skipped": 0, "cancelled": False, "output_path": os.path.abspath(output_path)}
+    phase_timer = perf.PhaseTimer("superoverlay")
+    phase_timer.start("layout")
+    layout_inputs = _compute_layout_inputs(db_manager, record_ids, progress_callback)
+    if layout_inputs is None:
+        summary["cancelled"] = True
+        return summary
+    ids, admin_names, boxes, centres = layout_inputs
+    summary["skipped"] = len(record_ids) - len(ids) # Exported records are counted once the tiles are written
+    if not ids:
+        summary["seconds"] = round(time.perf_counter() - start, 4)
+        return summary
+    root = _TileNode("", "", np.arange(len(ids)))
+    if partition == "admin": _split_admin(root, admin_names, centres, boxes, tile_placemarks)
+    else: _split_quadtree(root, centres, boxes, tile_placemarks)
+
+    writer = _OutputWriter(output_path, package_kmz)
+    completed = False
+    try:
+        doc_name = f"Super-overlay - {len(ids)} plots ({'District > Block > Village' if partition == 'admin' else 'spatial tiles'})"
+        pending = [(root, "doc.kml", doc_name)]
+        while pending:
+            node, relative_path, document_name = pending.pop()
+            if node.indices is not None: # Leaf: the placemarks themselves
+                phase_timer.start("read")
+                leaf_fragments = list(iter_placemark_fragments(db_manager, [ids[index] for index in node.indices.tolist()]))
+                summary["exported_ids"].extend(record_id for record_id, _uuid, _fragment in leaf_fragments)
+                kml_text = kml_document_text(document_name, [fragment for _record_id, _uuid, fragment in leaf_fragments])
+            else:
+                kml_doc = simplekml.Kml(name=document_name)
+                for child in node.children:
+                    tile_name = f"tile{child.key}.kml"
+                    _add_region_link(kml_doc, child, tile_name if node is not root else f"tiles/{tile_name}")
+                    pending.append((child, f"tiles/{tile_name}", child.name))
+                kml_text = kml_doc.kml()
+            phase_timer.start("write")
+            writer.write(relative_path, kml_text)
+            summary["tiles"] += 1
+            if node.indices is not None and progress_callback and progress_callback("tiles", len(summary["exported_ids"])) is False:
+                summary["cancelled"] = True
+                break
+        phase_timer.emit(items=len(summary["exported_ids"]))
+        completed = not summary["cancelled"]
+    finally:
+        writer.close(completed)
+    if not completed: summary["exported_ids"] = []
+    summary["seconds"] = round(time.perf_counter() - start, 4)
+    return summary
@@ -0,0 +1,48 @@
+# File: DilasaKMLTool_v4/core/lru_cache.py
+# ----------------------------------------------------------------------
+import threading
+from collections import OrderedDict
+
+class LRUCache:
+    """
+    Small thread-safe least-recently-used cache backed by an OrderedDict.
+    Used for in-memory map/KML content and prefetched records, where only a
+    handful of recent entries are worth keeping.
+    """
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        """Stores value under key and returns the list of (key, value) pairs evicted to make room."""
+        evicted = []
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False))
+        return evicted
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._entries.pop(key, default)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
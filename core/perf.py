@@ -0,0 +1,214 @@
+# File: DilasaKMLTool_v4/core/perf.py
+# ----------------------------------------------------------------------
+# Lightweight timing spans and counters for the hot paths (fetch, decode, parse, validate,
+# DB write, KML build/save, map render, table reload). Recording is off by default; while
+# off, span() returns a shared no-op context manager and count() returns immediately.
+# Enable with DILASA_PERF=1, `--perf` on main_app, or the Performance dock.
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+MAX_RECORDED_SPANS = 5000
+
+_enabled = os.getenv("DILASA_PERF", "") not in ("", "0")
+_lock = threading.Lock()
+_spans = deque(maxlen=MAX_RECORDED_SPANS) # Completed spans, oldest dropped first
+_counters = {}
+_origin = time.perf_counter() # Trace timestamps are relative to module import
+_connections = set() # SQLite connections whose statements are counted while enabled
+
+
+def is_enabled():
+    return _enabled
+
+def set_enabled(enabled):
+    """Turns recording on or off, including SQL statement counting on registered connections."""
+    global _enabled
+    _enabled = bool(enabled)
+    with _lock:
+        connections = list(_connections)
+    for conn in connections:
+        _install_trace_callback(conn)
+
+
+class _NullSpan:
+    """Returned by span() while recording is off."""
+    __slots__ = ()
+    def __enter__(self): return self
+    def __exit__(self, *exc_info): return False
+    def set_items(self, n_items): pass
+    def set_arg(self, key, value): pass
+
+_NULL_SPAN = _NullSpan()
+
+class Span:
+    """A timed section. items (rows, records, bytes...) gives the throughput shown by the panel."""
+    __slots__ = ("name", "category", "args", "items", "_start")
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.items = None
+        self._start = None
+
+    def set_items(self, n_items):
+        self.items = n_items
+
+    def set_arg(self, key, value):
+        self.args[key] = value
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = time.perf_counter()
+        if exc_type is not None: self.args["error"] = exc_type.__name__
+        record_span(self.name, self._start, end - self._start, self.category, self.items, self.args)
+        return False
+
+def span(name, category="app", **args):
+    """Context manager timing a block: `with perf.span("kml.save", items=n): ...`"""
+    if not _enabled:
+        return _NULL_SPAN
+    items = args.pop("items", None)
+    new_span = Span(name, category, args)
+    new_span.items = items
+    return new_span
+
+def timed(name, category="app"):
+    """Decorator form of span(); the enabled check happens per call."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with Span(name, category, {}):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record_span(name, start, duration_s, category="app", items=None, args=None):
+    """Records a completed span. start is a time.perf_counter() value."""
+    if not _enabled: return
+    entry = {"name": name, "cat": category, "start": start - _origin, "dur": duration_s,
+             "tid": threading.get_ident(), "items": items, "args": args or {}}
+    with _lock:
+        _spans.append(entry)
+
+def count(counter_name, n=1):
+    if not _enabled: return
+    with _lock:
+        _counters[counter_name] = _counters.get(counter_name, 0) + n
+
+
+class PhaseTimer:
+    """
+    Accumulates time per phase across a loop, e.g. validate vs DB write for every imported row,
+    without recording one span per row. Always measures (callers may report the totals, e.g.
+    in an import summary); emit() records one span per phase when recording is on.
+    """
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.totals = {}
+        self._start = time.perf_counter()
+        self._phase_name = None
+        self._phase_start = 0.0
+
+    def start(self, phase_name):
+        """Ends the current phase (if any) and starts phase_name."""
+        now = time.perf_counter()
+        if self._phase_name is not None:
+            self.totals[self._phase_name] = self.totals.get(self._phase_name, 0.0) + (now - self._phase_start)
+        self._phase_name, self._phase_start = phase_name, now
+
+    def stop(self):
+        self.start(None)
+
+    def add(self, phase_name, seconds):
+        self.totals[phase_name] = self.totals.get(phase_name, 0.0) + seconds
+
+    def emit(self, items=None):
+        """Records the totals as spans laid end to end from the timer's start (when enabled)."""
+        self.stop()
+        cursor = self._start
+        for phase_name, seconds in self.totals.items():
+            record_span(f"{self.prefix}.{phase_name}", cursor, seconds, "phase", items, {"aggregated": True})
+            cursor += seconds
+
+
+# --- SQLite statement counting ---
+def _count_sql_statement(_statement):
+    count("db.statements")
+
+def _install_trace_callback(conn):
+    try:
+        conn.set_trace_callback(_count_sql_statement if _enabled else None)
+    except sqlite3.ProgrammingError:
+        pass # Connection owned by another thread (or closed); it picks up the setting when next registered
+
+def register_connection(conn):
+    """Counts the connection's SQL statements under 'db.statements' while recording is on."""
+    with _lock:
+        _connections.add(conn)
+    _install_trace_callback(conn)
+
+def unregister_connection(conn):
+    with _lock:
+        _connections.discard(conn)
+
+
+# --- Reading and exporting ---
+def get_recent_spans(limit=200):
+    """Returns the most recent completed spans, newest last."""
+    with _lock:
+        return list(_spans)[-limit:]
+
+def get_counters():
+    with _lock:
+        return dict(_counters)
+
+def summarize_spans():
+    """Returns {span_name: {"calls", "total_s", "max_s", "items"}} over all recorded spans."""
+    summary = {}
+    for entry in get_recent_spans(MAX_RECORDED_SPANS):
+        stats = summary.setdefault(entry["name"], {"calls": 0, "total_s": 0.0, "max_s": 0.0, "items": 0})
+        stats["calls"] += 1
+        stats["total_s"] += entry["dur"]
+        stats["max_s"] = max(stats["max_s"], entry["dur"])
+        stats["items"] += entry["items"] or 0
+    return summary
+
+def clear():
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+
+def export_chrome_trace(file_path):
+    """
+    Writes recorded spans and counters as a Chrome trace (JSON object format), viewable in
+    chrome://tracing or ui.perfetto.dev. Returns the number of span events written.
+    """
+    pid = os.getpid()
+    with _lock:
+        spans = list(_spans)
+        counters = dict(_counters)
+    trace_events = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": "Dilasa KML Tool"}}]
+    for entry in spans:
+        event_args = dict(entry["args"])
+        if entry["items"] is not None:
+            event_args["items"] = entry["items"]
+            if entry["dur"] > 0: event_args["items_per_s"] = round(entry["items"] / entry["dur"], 1)
+        trace_events.append({"name": entry["name"], "cat": entry["cat"], "ph": "X", "pid": pid, "tid": entry["tid"],
+                             "ts": round(entry["start"] * 1e6, 3), "dur": round(entry["dur"] * 1e6, 3), "args": event_args})
+    end_ts = max((e["ts"] + e["dur"] for e in trace_events if e.get("ph") == "X"), default=0)
+    for counter_name, value in counters.items():
+        trace_events.append({"name": counter_name, "ph": "C", "pid": pid, "tid": 0, "ts": end_ts, "args": {"value": value}})
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+    return len(spans)
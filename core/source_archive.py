@@ -0,0 +1,127 @@
+# File: DilasaKMLTool_v4/core/source_archive.py
+# ----------------------------------------------------------------------
+# Compressed copies of the original mWater rows (table polygon_source_rows). process_csv_row_data
+# flattens a row and drops its other columns; the archive keeps the row as read, so records can be
+# re-validated after the rules change (substitution, zone checks...) without re-fetching or
+# re-importing every source. No Qt imports here: also used by the headless CLI and worker processes.
+import json
+import os
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import zstandard # Optional: smaller and faster than zlib when installed
+except ImportError:
+    zstandard = None
+
+from core import perf
+from core.data_processor import process_csv_row_data
+
+REPROCESS_BATCH_ROWS = 2000 # Archived rows per worker task / update transaction
+MAX_REPROCESS_WORKERS = 4
+ZSTD_LEVEL = 3
+ZLIB_LEVEL = 6
+
+_zstd_compressor = None
+_zstd_decompressor = None
+
+def encode_source_row(row_dict):
+    """Returns (codec, blob): the row dict as compact JSON, zstd-compressed if available, else zlib."""
+    global _zstd_compressor
+    payload = json.dumps(row_dict, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if zstandard is not None:
+        if _zstd_compressor is None: _zstd_compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        return "zstd", _zstd_compressor.compress(payload)
+    return "zlib", zlib.compress(payload, ZLIB_LEVEL)
+
+def decode_source_row(codec, blob):
+    """Inverse of encode_source_row. Raises ValueError for an unknown codec or a zstd row without zstandard."""
+    global _zstd_decompressor
+    if codec == "zlib":
+        payload = zlib.decompress(blob)
+    elif codec == "zstd":
+        if zstandard is None:
+            raise ValueError("row was archived with zstd, but the zstandard package is not installed")
+        if _zstd_decompressor is None: _zstd_decompressor = zstandard.ZstdDecompressor()
+        payload = _zstd_decompressor.decompress(blob)
+    else:
+        raise ValueError(f"unknown archive codec '{codec}'")
+    return json.loads(payload.decode("utf-8"))
+
+def _reprocess_batch(archived_rows):
+    """
+    Decodes and re-validates one batch of (response_code, codec, raw_row). Runs in a worker process,
+    so it only takes and returns plain data. Returns (processed row dicts, [(response_code, error)]).
+    """
+    processed_rows, unreadable = [], []
+    for response_code, codec, raw_row in archived_rows:
+        try:
+            processed_rows.append(process_csv_row_data(decode_source_row(codec, raw_row)))
+        except (ValueError, zlib.error, UnicodeDecodeError) as e: # json.JSONDecodeError is a ValueError
+            unreadable.append((response_code, str(e)))
+    return processed_rows, unreadable
+
+def default_reprocess_workers():
+    return max(1, min(MAX_REPROCESS_WORKERS, (os.cpu_count() or 1) - 1))
+
+def _iter_reprocessed_batches(batches, workers):
+    """Yields _reprocess_batch results in order; with workers > 1, up to 2 * workers batches are in flight."""
+    if workers <= 1:
+        for batch in batches:
+            yield _reprocess_batch(batch)
+        return
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.submit(_reprocess_batch, batch))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True) # Also on cancel: queued batches are dropped
+
+def reprocess_archived_rows(db_manager, workers=None, batch_size=REPROCESS_BATCH_ROWS, log_callback=None, progress_callback=None):
+    """
+    Re-runs process_csv_row_data on every archived source row and writes back only records whose
+    data changed (update_reprocessed_polygon_data). Batches are validated in worker processes
+    (workers defaults to default_reprocess_workers(); small archives run in-process) while the
+    results are written here, one transaction per batch.
+
+    progress_callback(done, total, changed) may return False to cancel; batches already written stay.
+    Returns a summary dict: archived, not_archived (records without an archived row, e.g. imported
+    before the archive existed), processed, changed, unreadable, failed_db_write, cancelled,
+    workers and seconds.
+    """
+    log = log_callback or (lambda message, level="info": None)
+    start = time.perf_counter()
+    archived_count = db_manager.count_source_rows() or 0
+    record_count = db_manager.count_polygon_records() or 0
+    if workers is None: workers = default_reprocess_workers()
+    if archived_count <= 2 * batch_size: workers = 1 # Starting worker processes would cost more than it saves
+    summary = {"archived": archived_count, "not_archived": max(record_count - archived_count, 0), "processed": 0,
+               "changed": 0, "unreadable": 0, "failed_db_write": 0, "cancelled": False, "workers": workers}
+
+    with perf.span("reprocess.all", "db", items=archived_count):
+        for processed_rows, unreadable in _iter_reprocessed_batches(db_manager.iter_source_row_batches(batch_size), workers):
+            for response_code, error in unreadable:
+                log(f"Archived row of RC '{response_code}' could not be read: {error}", "error")
+            summary["unreadable"] += len(unreadable)
+            changed_count = db_manager.update_reprocessed_polygon_data(processed_rows)
+            if changed_count is None:
+                log(f"Failed to write {len(processed_rows)} reprocessed record(s) to the DB.", "error")
+                summary["failed_db_write"] += len(processed_rows)
+            else:
+                summary["changed"] += changed_count
+            summary["processed"] += len(processed_rows) + len(unreadable)
+            if progress_callback and progress_callback(summary["processed"], archived_count, summary["changed"]) is False:
+                summary["cancelled"] = True
+                log("Reprocessing cancelled by user.", "info")
+                break
+    from core.geometry import update_geometry_metrics # NumPy is only needed here, not in the worker processes
+    update_geometry_metrics(db_manager) # Records whose coordinates or status changed
+    summary["seconds"] = round(time.perf_counter() - start, 4)
+    return summary
@@ -1,5 +1,6 @@
 import os
 import sys
+import time
 
 def resource_path(relative_path):
     """
@@ -18,3 +19,33 @@ def resource_path(relative_path):
     
     # Assets are expected to be in an 'assets' subdirectory of the project root
     return os.path.join(base_path, "assets", relative_path)
+
+
+class StartupProfiler:
+    """
+    Records named startup phases so `--profile-startup` can print where the time
+    goes between launching the app and the main window becoming interactive.
+    When disabled, mark() is a no-op.
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._start_time = time.perf_counter()
+        self._last_mark_time = self._start_time
+        self._phases = [] # Each item: (phase_name, phase_duration_s, elapsed_since_start_s)
+
+    def mark(self, phase_name):
+        """Closes the current phase under the given name."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._phases.append((phase_name, now - self._last_mark_time, now - self._start_time))
+        self._last_mark_time = now
+
+    def report(self):
+        """Prints a per-phase timing breakdown to stdout."""
+        if not self.enabled:
+            return
+        print("Startup profile (ms):")
+        print(f"  {'Phase':<40} {'Duration':>10} {'Elapsed':>10}")
+        for phase_name, duration, elapsed in self._phases:
+            print(f"  {phase_name:<40} {duration * 1000:>10.1f} {elapsed * 1000:>10.1f}")
@@ -1,20 +1,48 @@
 import sqlite3
 import os
+import json
 import datetime
 
+from core import perf
+
 # --- Database Configuration ---
 # These constants will be used by the main application to instantiate the DB manager
 # For modularity, the DB_FOLDER_NAME and DB_FILE_NAME could also be passed
 # to the DatabaseManager constructor if you prefer more flexibility later.
 DB_FOLDER_NAME_CONST = "DilasaKMLTool_v4" # AppData subfolder for this version
 DB_FILE_NAME_CONST = "app_data_v4.db"   # Specific DB file for this version
+SQL_IN_BATCH_SIZE = 500 # Max IDs per "IN (...)" query, well below SQLite's bound-parameter limit
+# Keys accepted by DatabaseManager.build_polygon_filter_clause; they mirror the main window filter panel
+POLYGON_FILTER_KEYS = ("uuid", "added_after", "added_before", "export_status", "error_status",
+                       "status", "evaluation_status", "area_deviation_over")
+# polygon_geometry metrics (core.geometry) are deleted by a trigger when any of these columns is updated
+GEOMETRY_SOURCE_COLUMNS = ("status", "proposed_area_acre", "vertices",
+                           *(f"p{i}_{axis}" for i in range(1, 5) for axis in ("easting", "northing")))
+# polygon_data columns a record's KML placemark is drawn from (core.kml_generator); cached
+# kml_fragments rows are deleted by a trigger when any of these columns is updated
+KML_SOURCE_COLUMNS = ("uuid", "farmer_name", "village_name", "block", "district", "proposed_area_acre", "vertices",
+                      *(f"p{i}_{part}" for i in range(1, 5) for part in ("easting", "northing", "altitude", "zone_num", "zone_letter")))
+# Metric columns of polygon_geometry, per polygon_id (see core.geometry)
+GEOMETRY_METRIC_COLUMNS = ("area_acre", "perimeter_m", "centroid_easting", "centroid_northing", "self_intersecting", "area_deviation_pct")
+# Indexes of polygon_geometry; the area_deviation_over filter compares abs(area_deviation_pct)
+GEOMETRY_INDEXES = {"idx_polygon_geometry_area": "area_acre", "idx_polygon_geometry_deviation": "abs(area_deviation_pct)"}
+# polygon_data columns maintained by the app rather than taken from imported rows. Staged imports
+# never compare or overwrite them (see classify_staged_polygon_rows / apply_staged_polygon_rows).
+POLYGON_MANAGED_COLUMNS = ("id", "kml_export_count", "last_kml_export_date", "date_added", "last_modified",
+                           "evaluation_status")
+# Records imported before packed vertices existed have vertex_count/vertices NULL and always four points
+# (p1_*..p4_*); data comparisons treat them as equal to a four-point row with the same point columns
+LEGACY_VERTEX_COUNT = 4
+STAGING_CATEGORIES = ("new", "changed", "duplicate", "duplicate_in_batch", "uuid_conflict")
+STAGING_SAMPLE_ROWS = 20 # Rows per category returned by get_staging_summary for previews
+STAGING_ARCHIVE_COLUMNS = ("source_codec", "source_row") # Compressed original row, staged for polygon_source_rows
 
 class DatabaseManager:
     """
     Manages all interactions with the SQLite database for the Dilasa KML Tool.
     Handles creation of tables, and CRUD operations for API sources and polygon data.
     """
-    def __init__(self, db_folder_name=None, db_file_name=None):
+    def __init__(self, db_folder_name=None, db_file_name=None, db_file_path=None, ensure_schema=True):
         """
         Initializes the DatabaseManager.
         Connects to the database and creates tables if they don't exist.
@@ -24,24 +52,35 @@ class DatabaseManager:
                                             Defaults to DB_FOLDER_NAME_CONST.
             db_file_name (str, optional): Name of the SQLite database file.
                                           Defaults to DB_FILE_NAME_CONST.
+            db_file_path (str, optional): Full path to the database file. Overrides the two
+                                          arguments above; used to open a second connection to
+                                          the same DB from a worker thread.
+            ensure_schema (bool, optional): Create missing tables and run schema migrations (default).
+                                            False skips that DDL, for short-lived connections to a
+                                            database another DatabaseManager has already set up.
         """
-        folder_name = db_folder_name or DB_FOLDER_NAME_CONST
-        file_name = db_file_name or DB_FILE_NAME_CONST
-        
-        app_data_dir = os.getenv('APPDATA')
-        if not app_data_dir:  # Fallback for systems where APPDATA might not be set
-            app_data_dir = os.path.expanduser("~")
-            print(f"Warning: APPDATA environment variable not found. Using user home directory: {app_data_dir}")
+        if db_file_path:
+            self.db_path = db_file_path
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        else:
+            folder_name = db_folder_name or DB_FOLDER_NAME_CONST
+            file_name = db_file_name or DB_FILE_NAME_CONST
+            
+            app_data_dir = os.getenv('APPDATA')
+            if not app_data_dir:  # Fallback for systems where APPDATA might not be set
+                app_data_dir = os.path.expanduser("~")
+                print(f"Warning: APPDATA environment variable not found. Using user home directory: {app_data_dir}")
 
-        self.db_path = os.path.join(app_data_dir, folder_name)
-        os.makedirs(self.db_path, exist_ok=True) # Ensure the directory exists
-        self.db_path = os.path.join(self.db_path, file_name)
+            self.db_path = os.path.join(app_data_dir, folder_name)
+            os.makedirs(self.db_path, exist_ok=True) # Ensure the directory exists
+            self.db_path = os.path.join(self.db_path, file_name)
 
         self.conn = None
         self.cursor = None
         self._connect()
-        self._create_tables()
-        self._migrate_schema() # Add migration step
+        if ensure_schema:
+            self._create_tables()
+            self._migrate_schema() # Add migration step
         # print(f"Database initialized at: {self.db_path}") # For debugging
 
     def _migrate_schema(self):
@@ -54,6 +93,41 @@ class DatabaseManager:
                 self.cursor.execute("ALTER TABLE polygon_data ADD COLUMN evaluation_status TEXT DEFAULT 'Not Evaluated Yet'")
                 self.conn.commit()
                 print("'evaluation_status' column added successfully.")
+            if 'source_hash' not in columns:
+                # Filled in on import; records imported earlier get it on their next "update changed" re-import
+                self.cursor.execute("ALTER TABLE polygon_data ADD COLUMN source_hash TEXT")
+                self.conn.commit()
+            for column_name, column_def in (("vertex_count", "INTEGER"), ("vertices", "BLOB")):
+                if column_name not in columns:
+                    # Records imported earlier keep their four p1_*..p4_* points (KML export falls back to them)
+                    self.cursor.execute(f"ALTER TABLE polygon_data ADD COLUMN {column_name} {column_def}")
+                    self.conn.commit()
+            # Created here rather than in _create_tables: it names columns the steps above may have just added
+            self.cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS polygon_geometry_stale AFTER UPDATE OF {', '.join(GEOMETRY_SOURCE_COLUMNS)} ON polygon_data
+                BEGIN
+                    DELETE FROM polygon_geometry WHERE polygon_id = NEW.id;
+                END
+            ''')
+            self.cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS kml_fragment_stale AFTER UPDATE OF {', '.join(KML_SOURCE_COLUMNS)} ON polygon_data
+                BEGIN
+                    DELETE FROM kml_fragments WHERE polygon_id = NEW.id;
+                END
+            ''')
+            self.conn.commit()
+            self.cursor.execute("PRAGMA table_info(mwater_sources)")
+            source_columns = [row[1] for row in self.cursor.fetchall()]
+            if 'etag' not in source_columns:
+                # ETag of the last full fetch, for conditional (If-None-Match) re-syncs
+                self.cursor.execute("ALTER TABLE mwater_sources ADD COLUMN etag TEXT")
+                self.conn.commit()
+            self.cursor.execute("PRAGMA table_info(import_runs)")
+            run_columns = [row[1] for row in self.cursor.fetchall()]
+            for column_name, column_def in (("resumed_from_row", "INTEGER DEFAULT 0"), ("rows_updated", "INTEGER DEFAULT 0")):
+                if column_name not in run_columns:
+                    self.cursor.execute(f"ALTER TABLE import_runs ADD COLUMN {column_name} {column_def}")
+                    self.conn.commit()
         except sqlite3.Error as e:
             print(f"Schema migration error: {e}")
 
@@ -61,6 +135,7 @@ class DatabaseManager:
         """Establishes a connection to the SQLite database."""
         try:
             self.conn = sqlite3.connect(self.db_path)
+            perf.register_connection(self.conn) # Statement counts for the Performance panel
             self.cursor = self.conn.cursor()
             self.cursor.execute("PRAGMA foreign_keys = ON;") # Good practice
         except sqlite3.Error as e:
@@ -95,13 +170,121 @@ class DatabaseManager:
                     p2_utm_str TEXT, p2_altitude REAL, p2_easting REAL, p2_northing REAL, p2_zone_num INTEGER, p2_zone_letter TEXT, p2_substituted BOOLEAN DEFAULT 0,
                     p3_utm_str TEXT, p3_altitude REAL, p3_easting REAL, p3_northing REAL, p3_zone_num INTEGER, p3_zone_letter TEXT, p3_substituted BOOLEAN DEFAULT 0,
                     p4_utm_str TEXT, p4_altitude REAL, p4_easting REAL, p4_northing REAL, p4_zone_num INTEGER, p4_zone_letter TEXT, p4_substituted BOOLEAN DEFAULT 0,
+                    vertex_count INTEGER, -- All points of the polygon (p1_*..p4_* hold the first four)
+                    vertices BLOB, -- Packed float64 (easting, northing, altitude) per vertex, zone p1_zone_*; see core.data_processor.pack_vertices
                     status TEXT NOT NULL, -- e.g., 'valid_for_kml', 'error_missing_points', 'error_parsing'
                     error_messages TEXT,  -- Store as newline-separated string or JSON string
                     kml_export_count INTEGER DEFAULT 0,
                     last_kml_export_date TIMESTAMP,
                     date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     last_modified TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    evaluation_status TEXT DEFAULT 'Not Evaluated Yet'
+                    evaluation_status TEXT DEFAULT 'Not Evaluated Yet',
+                    source_hash TEXT -- Hash of the normalized source row (core.data_processor.compute_source_row_hash)
+                )
+            ''')
+
+            # Geometry Metrics - computed by core.geometry from the stored coordinates of valid records.
+            # A separate narrow table: a full recompute rewrites these rows, not the wide polygon_data rows.
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS polygon_geometry (
+                    polygon_id INTEGER PRIMARY KEY REFERENCES polygon_data(id) ON DELETE CASCADE,
+                    area_acre REAL, -- Planar area of the surveyed polygon
+                    perimeter_m REAL,
+                    centroid_easting REAL, centroid_northing REAL, -- Same UTM zone as P1
+                    self_intersecting BOOLEAN,
+                    area_deviation_pct REAL -- (area_acre - proposed_area_acre) / proposed_area_acre * 100; NULL if not numeric
+                )
+            ''')
+            self._create_geometry_indexes()
+
+            # KML Fragment Cache - each valid record's serialized <Placemark> (core.kml_fragment_cache), valid
+            # while polygon_data.last_modified still equals the one stored here; exports concatenate them
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS kml_fragments (
+                    polygon_id INTEGER PRIMARY KEY REFERENCES polygon_data(id) ON DELETE CASCADE,
+                    last_modified TIMESTAMP, -- polygon_data.last_modified of the version the fragment was built from
+                    format INTEGER NOT NULL, -- core.kml_generator.KML_FRAGMENT_FORMAT at build time
+                    fragment TEXT NOT NULL
+                )
+            ''')
+
+            # Source Row Archive - the original mWater row of each record, compressed (core.source_archive),
+            # so records can be re-validated after rule changes without re-fetching
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS polygon_source_rows (
+                    response_code TEXT PRIMARY KEY REFERENCES polygon_data(response_code) ON DELETE CASCADE,
+                    codec TEXT NOT NULL, -- 'zstd' or 'zlib'
+                    raw_row BLOB NOT NULL -- Compressed JSON of the row dict as read from the CSV/API
+                )
+            ''')
+
+            # Import Runs Ledger - one row per CSV/API import, for throughput history
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS import_runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    source_type TEXT NOT NULL, -- 'csv', 'api' or 'kml'
+                    source TEXT,
+                    started_at TIMESTAMP,
+                    finished_at TIMESTAMP,
+                    byte_size INTEGER,
+                    rows_total INTEGER DEFAULT 0,
+                    rows_new INTEGER DEFAULT 0,
+                    rows_new_with_errors INTEGER DEFAULT 0, -- Added, but status is not 'valid_for_kml'
+                    rows_duplicate INTEGER DEFAULT 0,
+                    rows_missing_rc INTEGER DEFAULT 0,
+                    rows_invalid INTEGER DEFAULT 0,
+                    rows_failed INTEGER DEFAULT 0,
+                    cancelled BOOLEAN DEFAULT 0,
+                    total_seconds REAL,
+                    rows_per_s REAL,
+                    phase_seconds TEXT, -- JSON object: phase name -> seconds
+                    db_records_before INTEGER,
+                    resumed_from_row INTEGER DEFAULT 0, -- Rows skipped via an import checkpoint
+                    rows_updated INTEGER DEFAULT 0 -- Existing records overwritten with changed data
+                )
+            ''')
+
+            # Scheduled Jobs - background syncs/exports run by the desktop app's job scheduler (core.job_scheduler)
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS scheduled_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL UNIQUE,
+                    job_type TEXT NOT NULL, -- 'sync_sources' or 'export_kml'
+                    interval_minutes INTEGER, -- Runs every N minutes, or
+                    daily_at TEXT, -- 'HH:MM' local time, once a day
+                    params TEXT, -- JSON object of job options
+                    enabled BOOLEAN DEFAULT 1,
+                    next_run_at TIMESTAMP, -- Includes jitter, or the retry backoff after a failure
+                    consecutive_failures INTEGER DEFAULT 0
+                )
+            ''')
+
+            # Job Runs - history of scheduled job runs
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS job_runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id INTEGER REFERENCES scheduled_jobs(id) ON DELETE CASCADE,
+                    job_name TEXT,
+                    job_type TEXT,
+                    trigger TEXT, -- 'schedule' or 'manual'
+                    started_at TIMESTAMP,
+                    finished_at TIMESTAMP,
+                    status TEXT, -- 'ok', 'failed' or 'cancelled'
+                    seconds REAL,
+                    message TEXT,
+                    result TEXT -- JSON object: per-source sync / export summaries
+                )
+            ''')
+
+            # Import Checkpoints - progress of unfinished imports, so a re-run resumes instead of redoing
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS import_checkpoints (
+                    fingerprint TEXT PRIMARY KEY, -- Identifies the file/API snapshot (see core.import_pipeline)
+                    source_type TEXT,
+                    source TEXT,
+                    rows_done INTEGER NOT NULL DEFAULT 0, -- Rows of the source covered by committed chunks
+                    byte_offset INTEGER, -- File sources: offset just past the last committed row
+                    updated_at TIMESTAMP
                 )
             ''')
             self.conn.commit()
@@ -141,6 +324,24 @@ class DatabaseManager:
             print(f"DB: Error updating mWater source: {e}")
             return False
 
+    def get_mwater_source_etag(self, source_id):
+        try:
+            self.cursor.execute("SELECT etag FROM mwater_sources WHERE id = ?", (source_id,))
+            row = self.cursor.fetchone()
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            print(f"DB: Error fetching ETag for mWater source {source_id}: {e}")
+            return None
+
+    def set_mwater_source_etag(self, source_id, etag):
+        try:
+            self.cursor.execute("UPDATE mwater_sources SET etag = ? WHERE id = ?", (etag, source_id))
+            self.conn.commit()
+            return self.cursor.rowcount > 0
+        except sqlite3.Error as e:
+            print(f"DB: Error storing ETag for mWater source {source_id}: {e}")
+            return False
+
     def delete_mwater_source(self, source_id):
         try:
             self.cursor.execute("DELETE FROM mwater_sources WHERE id = ?", (source_id,))
@@ -150,7 +351,195 @@ class DatabaseManager:
             print(f"DB: Error deleting mWater source: {e}")
             return False
 
+    # --- Import Runs Ledger Methods ---
+    def add_import_run(self, run_dict):
+        """Inserts an import_runs row. phase_seconds may be a dict (stored as JSON). Returns the new ID or None."""
+        run_values = dict(run_dict)
+        if isinstance(run_values.get("phase_seconds"), dict):
+            run_values["phase_seconds"] = json.dumps(run_values["phase_seconds"])
+        columns = list(run_values.keys())
+        try:
+            self.cursor.execute(f"INSERT INTO import_runs ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})",
+                                [run_values[col] for col in columns])
+            self.conn.commit()
+            return self.cursor.lastrowid
+        except sqlite3.Error as e:
+            print(f"DB: Error recording import run: {e}")
+            return None
+
+    def get_import_runs(self, limit=None, source_type=None):
+        """Returns import runs as dicts, newest first, with phase_seconds parsed back into a dict."""
+        sql, params = "SELECT * FROM import_runs", []
+        if source_type:
+            sql += " WHERE source_type = ?"; params.append(source_type)
+        sql += " ORDER BY id DESC"
+        if limit:
+            sql += " LIMIT ?"; params.append(int(limit))
+        try:
+            self.cursor.execute(sql, params)
+            col_names = [desc[0] for desc in self.cursor.description]
+            runs = [dict(zip(col_names, row)) for row in self.cursor.fetchall()]
+            for run in runs:
+                try: run["phase_seconds"] = json.loads(run["phase_seconds"]) if run["phase_seconds"] else {}
+                except ValueError: run["phase_seconds"] = {}
+                run["cancelled"] = bool(run["cancelled"])
+            return runs
+        except sqlite3.Error as e:
+            print(f"DB: Error fetching import runs: {e}")
+            return []
+
+    # --- Scheduled Job Methods ---
+    @staticmethod
+    def _job_from_row(col_names, row):
+        job = dict(zip(col_names, row))
+        try: job["params"] = json.loads(job["params"]) if job["params"] else {}
+        except ValueError: job["params"] = {}
+        job["enabled"] = bool(job["enabled"])
+        return job
+
+    def get_scheduled_jobs(self, due_before=None):
+        """
+        Scheduled jobs as dicts (params parsed from JSON), by name. With due_before (ISO timestamp),
+        only enabled jobs whose next_run_at is not after it, soonest first.
+        """
+        sql, params = "SELECT * FROM scheduled_jobs ORDER BY name COLLATE NOCASE", []
+        if due_before is not None:
+            sql, params = "SELECT * FROM scheduled_jobs WHERE enabled = 1 AND next_run_at <= ? ORDER BY next_run_at", [due_before]
+        try:
+            self.cursor.execute(sql, params)
+            col_names = [desc[0] for desc in self.cursor.description]
+            return [self._job_from_row(col_names, row) for row in self.cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"DB: Error fetching scheduled jobs: {e}")
+            return []
+
+    def get_scheduled_job(self, job_id):
+        try:
+            self.cursor.execute("SELECT * FROM scheduled_jobs WHERE id = ?", (job_id,))
+            row = self.cursor.fetchone()
+            return self._job_from_row([desc[0] for desc in self.cursor.description], row) if row else None
+        except sqlite3.Error as e:
+            print(f"DB: Error fetching scheduled job {job_id}: {e}")
+            return None
+
+    def save_scheduled_job(self, job_dict, job_id=None):
+        """
+        Inserts a scheduled job (job_id None) or updates one. job_dict holds scheduled_jobs columns;
+        params may be a dict (stored as JSON). Returns the job ID, or None on error (e.g. duplicate name).
+        """
+        job_values = dict(job_dict)
+        job_values.pop("id", None)
+        if isinstance(job_values.get("params"), dict):
+            job_values["params"] = json.dumps(job_values["params"])
+        columns = list(job_values.keys())
+        try:
+            if job_id is None:
+                self.cursor.execute(f"INSERT INTO scheduled_jobs ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})",
+                                    [job_values[col] for col in columns])
+                job_id = self.cursor.lastrowid
+            else:
+                self.cursor.execute(f"UPDATE scheduled_jobs SET {', '.join(f'{col} = ?' for col in columns)} WHERE id = ?",
+                                    [job_values[col] for col in columns] + [job_id])
+            self.conn.commit()
+            return job_id
+        except sqlite3.Error as e:
+            print(f"DB: Error saving scheduled job '{job_dict.get('name')}': {e}")
+            return None
+
+    def delete_scheduled_job(self, job_id):
+        """Deletes a scheduled job and its run history."""
+        try:
+            self.cursor.execute("DELETE FROM scheduled_jobs WHERE id = ?", (job_id,))
+            self.conn.commit()
+            return self.cursor.rowcount > 0
+        except sqlite3.Error as e:
+            print(f"DB: Error deleting scheduled job {job_id}: {e}")
+            return False
+
+    def record_job_run(self, run_dict, next_run_at, consecutive_failures):
+        """
+        Inserts a job_runs row (result may be a dict, stored as JSON) and sets the job's next_run_at and
+        consecutive_failures, in one transaction. Returns the new run ID or None.
+        """
+        run_values = dict(run_dict)
+        if isinstance(run_values.get("result"), dict):
+            run_values["result"] = json.dumps(run_values["result"], default=str)
+        columns = list(run_values.keys())
+        try:
+            self.cursor.execute(f"INSERT INTO job_runs ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})",
+                                [run_values[col] for col in columns])
+            run_id = self.cursor.lastrowid
+            self.cursor.execute("UPDATE scheduled_jobs SET next_run_at = ?, consecutive_failures = ? WHERE id = ?",
+                                (next_run_at, consecutive_failures, run_values.get("job_id")))
+            self.conn.commit()
+            return run_id
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            print(f"DB: Error recording run of job '{run_values.get('job_name')}': {e}")
+            return None
+
+    def get_job_runs(self, limit=None, job_id=None):
+        """Returns job runs as dicts, newest first, with result parsed back into a dict."""
+        sql, params = "SELECT * FROM job_runs", []
+        if job_id is not None:
+            sql += " WHERE job_id = ?"; params.append(job_id)
+        sql += " ORDER BY id DESC"
+        if limit:
+            sql += " LIMIT ?"; params.append(int(limit))
+        try:
+            self.cursor.execute(sql, params)
+            col_names = [desc[0] for desc in self.cursor.description]
+            runs = [dict(zip(col_names, row)) for row in self.cursor.fetchall()]
+            for run in runs:
+                try: run["result"] = json.loads(run["result"]) if run["result"] else {}
+                except ValueError: run["result"] = {}
+            return runs
+        except sqlite3.Error as e:
+            print(f"DB: Error fetching job runs: {e}")
+            return []
+
+    # --- Import Checkpoint Methods ---
+    def get_import_checkpoint(self, fingerprint):
+        """Returns {"rows_done", "byte_offset", "source", "updated_at"} for an unfinished import, or None."""
+        try:
+            self.cursor.execute("SELECT rows_done, byte_offset, source, updated_at FROM import_checkpoints WHERE fingerprint = ?", (fingerprint,))
+            result = self.cursor.fetchone()
+            return dict(zip(("rows_done", "byte_offset", "source", "updated_at"), result)) if result else None
+        except sqlite3.Error as e:
+            print(f"DB: Error fetching import checkpoint: {e}")
+            return None
+
+    def save_import_checkpoint(self, fingerprint, source_type, source, rows_done, byte_offset=None):
+        try:
+            self.cursor.execute("""INSERT OR REPLACE INTO import_checkpoints (fingerprint, source_type, source, rows_done, byte_offset, updated_at)
+                                   VALUES (?, ?, ?, ?, ?, ?)""",
+                                (fingerprint, source_type, source, rows_done, byte_offset, datetime.datetime.now().isoformat()))
+            self.conn.commit()
+            return True
+        except sqlite3.Error as e:
+            print(f"DB: Error saving import checkpoint: {e}")
+            return False
+
+    def delete_import_checkpoint(self, fingerprint):
+        try:
+            self.cursor.execute("DELETE FROM import_checkpoints WHERE fingerprint = ?", (fingerprint,))
+            self.conn.commit()
+            return True
+        except sqlite3.Error as e:
+            print(f"DB: Error deleting import checkpoint: {e}")
+            return False
+
     # --- Polygon Data Methods ---
+    def count_polygon_records(self, filters=None):
+        """Number of records, optionally only those matching a filter spec (see build_polygon_filter_clause)."""
+        where_sql, params = self.build_polygon_filter_clause(filters)
+        try:
+            self.cursor.execute(f"SELECT COUNT(*) FROM polygon_data{where_sql}", params)
+            return self.cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"DB: Error counting polygon data: {e}")
+            return None
+
     def check_duplicate_response_code(self, response_code):
         """Checks if a response_code already exists. Returns the record ID if found, else None."""
         try:
@@ -161,6 +550,489 @@ class DatabaseManager:
             print(f"DB: Error checking duplicate response code: {e}")
             return None # Treat as not found on error to be safe
 
+    def get_existing_source_hashes(self, response_code_list):
+        """
+        Returns {response_code: source_hash} for the codes of response_code_list already in the
+        database (one query per SQL_IN_BATCH_SIZE codes). source_hash is None for records imported
+        before hashes were stored.
+        """
+        existing = {}
+        codes = list(response_code_list)
+        try:
+            for start in range(0, len(codes), SQL_IN_BATCH_SIZE):
+                batch = codes[start:start + SQL_IN_BATCH_SIZE]
+                self.cursor.execute(f"SELECT response_code, source_hash FROM polygon_data WHERE response_code IN ({', '.join(['?'] * len(batch))})", batch)
+                existing.update(self.cursor.fetchall())
+        except sqlite3.Error as e:
+            print(f"DB: Error checking existing response codes: {e}")
+        return existing
+
+    def get_response_codes_for_uuids(self, uuid_list):
+        """Returns {uuid: response_code} for the UUIDs of uuid_list already in the database (one query per SQL_IN_BATCH_SIZE UUIDs)."""
+        found = {}
+        uuids = list(uuid_list)
+        try:
+            for start in range(0, len(uuids), SQL_IN_BATCH_SIZE):
+                batch = uuids[start:start + SQL_IN_BATCH_SIZE]
+                self.cursor.execute(f"SELECT uuid, response_code FROM polygon_data WHERE uuid IN ({', '.join(['?'] * len(batch))})", batch)
+                found.update(self.cursor.fetchall())
+        except sqlite3.Error as e:
+            print(f"DB: Error looking up response codes by UUID: {e}")
+        return found
+
+    def add_polygon_data_bulk(self, data_dict_list):
+        """
+        Inserts new polygon records in a single transaction (executemany per distinct column set).
+        Records are prepared like add_or_update_polygon_data (error_messages joined, unknown keys dropped,
+        date_added/last_modified set). All or nothing: returns the number of inserted records, or None
+        after rolling back if any insert failed (e.g. a UNIQUE conflict), so the caller can retry row by row.
+        """
+        if not data_dict_list: return 0
+        try:
+            for columns, rows in self._group_polygon_rows_by_columns(data_dict_list).items():
+                self.cursor.executemany(f"INSERT INTO polygon_data ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})", rows)
+            self.conn.commit()
+            return len(data_dict_list)
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            print(f"DB: Bulk insert of {len(data_dict_list)} polygon records rolled back: {e}")
+            return None
+
+    @staticmethod
+    def _stored_data_matches_sql(data_columns, stored_prefix, new_value_sql):
+        """
+        SQL condition: the stored record ({stored_prefix}<col>) holds the same data as the new values
+        (new_value_sql(col), e.g. '?' or 's.<col>'), with legacy records (LEGACY_VERTEX_COUNT) matching
+        four-point rows. Returns (sql, columns): the columns in the order new_value_sql was used, for '?' parameters.
+        """
+        conditions, value_columns = [], []
+        vertex_columns = ("vertex_count", "vertices") if {"vertex_count", "vertices"} <= set(data_columns) else ()
+        for col in data_columns:
+            if col in vertex_columns: continue
+            conditions.append(f"{stored_prefix}{col} IS {new_value_sql(col)}"); value_columns.append(col)
+        if vertex_columns:
+            count_sql, vertices_sql = f"{stored_prefix}vertex_count", f"{stored_prefix}vertices"
+            conditions.append(f"(({count_sql} IS {new_value_sql('vertex_count')} AND {vertices_sql} IS {new_value_sql('vertices')}) OR "
+                              f"({count_sql} IS NULL AND {vertices_sql} IS NULL AND {new_value_sql('vertex_count')} = {LEGACY_VERTEX_COUNT}))")
+            value_columns += ["vertex_count", "vertices", "vertex_count"]
+        return " AND ".join(conditions), value_columns
+
+    def update_polygon_data_bulk(self, data_dict_list):
+        """
+        Overwrites existing records (matched by response_code) with processed rows that carry a
+        source_hash, in one transaction. Only the imported data columns, source_hash and
+        last_modified are written; kml_export_count, last_kml_export_date, evaluation_status and
+        date_added are kept. Records whose stored hash already matches are left alone, and records
+        without a stored hash whose data is identical (legacy records without vertices included, see
+        _stored_data_matches_sql) only get the hash filled in.
+        Returns {"updated", "hash_backfilled"}, or None after rolling back on error.
+        """
+        counts = {"updated": 0, "hash_backfilled": 0}
+        if not data_dict_list: return counts
+        try:
+            for columns, rows in self._group_polygon_rows_by_columns(data_dict_list).items():
+                data_columns = [col for col in columns if col not in POLYGON_MANAGED_COLUMNS and col not in ('response_code', 'source_hash')]
+                position = {col: i for i, col in enumerate(columns)}
+                matches_sql, value_columns = self._stored_data_matches_sql(data_columns, "", lambda col: "?")
+                backfill_sql = f"UPDATE polygon_data SET source_hash = ? WHERE response_code = ? AND source_hash IS NULL AND {matches_sql}"
+                self.cursor.executemany(backfill_sql, [[row[position['source_hash']], row[position['response_code']]]
+                                                       + [row[position[col]] for col in value_columns] for row in rows])
+                counts["hash_backfilled"] += max(self.cursor.rowcount, 0)
+                update_sql = (f"UPDATE polygon_data SET {', '.join(f'{col} = ?' for col in data_columns)}, source_hash = ?, last_modified = ? "
+                              "WHERE response_code = ? AND source_hash IS NOT ?")
+                self.cursor.executemany(update_sql, [[row[position[col]] for col in data_columns]
+                                                     + [row[position['source_hash']], row[position['last_modified']],
+                                                        row[position['response_code']], row[position['source_hash']]] for row in rows])
+                counts["updated"] += max(self.cursor.rowcount, 0)
+            self.conn.commit()
+            return counts
+        except (sqlite3.Error, KeyError) as e: # KeyError: a row without source_hash
+            self.conn.rollback()
+            print(f"DB: Bulk update of {len(data_dict_list)} polygon records rolled back: {e}")
+            return None
+
+    def update_reprocessed_polygon_data(self, data_dict_list):
+        """
+        Writes re-validated rows (matched by response_code) in one transaction, touching only records
+        where some data column differs from what is stored (status, error messages, coordinates...).
+        Export counts, evaluation status and date_added are kept. Returns the number of records
+        changed, or None after rolling back on error.
+        """
+        if not data_dict_list: return 0
+        changed_count = 0
+        try:
+            for columns, rows in self._group_polygon_rows_by_columns(data_dict_list).items():
+                data_columns = [col for col in columns if col not in POLYGON_MANAGED_COLUMNS and col != 'response_code']
+                position = {col: i for i, col in enumerate(columns)}
+                update_sql = (f"UPDATE polygon_data SET {', '.join(f'{col} = ?' for col in data_columns)}, last_modified = ? "
+                              f"WHERE response_code = ? AND NOT ({' AND '.join(f'{col} IS ?' for col in data_columns)})")
+                self.cursor.executemany(update_sql, [[row[position[col]] for col in data_columns]
+                                                     + [row[position['last_modified']], row[position['response_code']]]
+                                                     + [row[position[col]] for col in data_columns] for row in rows])
+                changed_count += max(self.cursor.rowcount, 0)
+            self.conn.commit()
+            return changed_count
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            print(f"DB: Update of {len(data_dict_list)} reprocessed polygon records rolled back: {e}")
+            return None
+
+    # --- Geometry Metrics Methods ---
+    def _create_geometry_indexes(self):
+        for index_name, indexed_expression in GEOMETRY_INDEXES.items():
+            self.cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON polygon_geometry ({indexed_expression})")
+
+    def get_geometry_inputs(self, only_missing=True):
+        """
+        Returns (vertex_rows, legacy_rows) for valid records, by default only those without a
+        polygon_geometry row. vertex_rows: (id, proposed_area, vertices BLOB); legacy_rows, for
+        records stored before the 'vertices' column: (id, proposed_area, p1_easting, p1_northing, ...,
+        p4_northing), all numeric. proposed_area is proposed_area_acre as a positive number, else NULL.
+        """
+        proposed_sql = "CASE WHEN CAST(trim(p.proposed_area_acre) AS REAL) > 0 THEN CAST(trim(p.proposed_area_acre) AS REAL) END"
+        point_columns = [f"p.p{i}_{axis}" for i in range(1, 5) for axis in ("easting", "northing")]
+        from_sql = "FROM polygon_data p" + (" LEFT JOIN polygon_geometry g ON g.polygon_id = p.id" if only_missing else "")
+        where_sql = "WHERE p.status = 'valid_for_kml'" + (" AND g.polygon_id IS NULL" if only_missing else "")
+        try:
+            self.cursor.execute(f"SELECT p.id, {proposed_sql}, p.vertices {from_sql} {where_sql} AND p.vertices IS NOT NULL")
+            vertex_rows = self.cursor.fetchall()
+            self.cursor.execute(f"""SELECT p.id, {proposed_sql}, {', '.join(point_columns)} {from_sql} {where_sql}
+                                    AND p.vertices IS NULL AND {' AND '.join(f'{col} IS NOT NULL' for col in point_columns)}""")
+            return vertex_rows, self.cursor.fetchall()
+        except sqlite3.Error as e:
+            print(f"DB: Error reading polygon geometry: {e}")
+            return [], []
+
+    def save_geometry_metrics(self, metric_rows, replace_all=False):
+        """
+        Stores (polygon_id, area_acre, perimeter_m, centroid_easting, centroid_northing,
+        self_intersecting, area_deviation_pct) tuples in one transaction; with replace_all, all
+        existing metrics are deleted first. Returns the number of rows stored, or None on error.
+        """
+        try:
+            if replace_all:
+                # Rewriting every row: building the indexes once afterwards is much cheaper than
+                # updating them row by row. DDL does not open a transaction by itself, hence BEGIN.
+                self.cursor.execute("BEGIN")
+                for index_name in GEOMETRY_INDEXES: self.cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+                self.cursor.execute("DELETE FROM polygon_geometry")
+            self.cursor.executemany(f"INSERT OR REPLACE INTO polygon_geometry (polygon_id, {', '.join(GEOMETRY_METRIC_COLUMNS)}) "
+                                    f"VALUES (?, {', '.join('?' * len(GEOMETRY_METRIC_COLUMNS))})", metric_rows)
+            stored_count = self.cursor.rowcount
+            if replace_all: self._create_geometry_indexes()
+            self.conn.commit()
+            return stored_count
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            print(f"DB: Error saving geometry metrics: {e}")
+            return None
+
+    # --- KML Fragment Cache Methods ---
+    def get_kml_fragments(self, record_id_list, fragment_format):
+        """
+        Cached placemarks of the 'valid_for_kml' records among record_id_list (in batches) that are still
+        current: built in fragment_format from the record's present last_modified.
+        Returns {record_id: (uuid, fragment)}; records without a current fragment are left out.
+        """
+        fragments = {}
+        try:
+            for start in range(0, len(record_id_list), SQL_IN_BATCH_SIZE):
+                id_batch = list(record_id_list[start:start + SQL_IN_BATCH_SIZE])
+                self.cursor.execute(f"""
+                    SELECT p.id, p.uuid, f.fragment FROM polygon_data p JOIN kml_fragments f ON f.polygon_id = p.id
+                    WHERE p.id IN ({','.join(['?'] * len(id_batch))}) AND p.status = 'valid_for_kml'
+                      AND f.format = ? AND f.last_modified IS p.last_modified
+                """, id_batch + [fragment_format])
+                fragments.update((record_id, (uuid, fragment)) for record_id, uuid, fragment in self.cursor.fetchall())
+        except sqlite3.Error as e:
+            print(f"DB: Error reading cached KML fragments: {e}")
+        return fragments
+
+    def save_kml_fragments(self, fragment_rows):
+        """Stores (polygon_id, last_modified, format, fragment) tuples in one transaction. Returns rows stored, or None on error."""
+        if not fragment_rows: return 0
+        try:
+            self.cursor.executemany("INSERT OR REPLACE INTO kml_fragments (polygon_id, last_modified, format, fragment) "
+                                    "VALUES (?, ?, ?, ?)", fragment_rows)
+            stored_count = self.cursor.rowcount
+            self.conn.commit()
+            return stored_count
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            print(f"DB: Error saving {len(fragment_rows)} KML fragments: {e}")
+            return None
+
+    # --- Source Row Archive Methods ---
+    def save_source_rows(self, archive_entries, replace=True):
+        """
+        Stores (response_code, codec, raw_row) entries in polygon_source_rows. With replace=False,
+        codes that already have an archived row are left alone. Returns the number of entries
+        given, or None on error.
+        """
+        if not archive_entries: return 0
+        try:
+            self.cursor.executemany(f"INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO polygon_source_rows (response_code, codec, raw_row) VALUES (?, ?, ?)",
+                                    archive_entries)
+            self.conn.commit()
+            return len(archive_entries)
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            print(f"DB: Error archiving {len(archive_entries)} source rows: {e}")
+            return None
+
+    def get_unarchived_response_codes(self, response_code_list):
+        """Returns the codes of response_code_list that have a polygon record but no archived source row."""
+        unarchived = set()
+        codes = list(response_code_list)
+        try:
+            for start in range(0, len(codes), SQL_IN_BATCH_SIZE):
+                batch = codes[start:start + SQL_IN_BATCH_SIZE]
+                self.cursor.execute(f"""
+                    SELECT p.response_code FROM polygon_data p LEFT JOIN polygon_source_rows s ON s.response_code = p.response_code
+                    WHERE s.response_code IS NULL AND p.response_code IN ({', '.join(['?'] * len(batch))})""", batch)
+                unarchived.update(row[0] for row in self.cursor.fetchall())
+        except sqlite3.Error as e:
+            print(f"DB: Error checking archived source rows: {e}")
+        return unarchived
+
+    def count_source_rows(self):
+        try:
+            self.cursor.execute("SELECT COUNT(*) FROM polygon_source_rows")
+            return self.cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"DB: Error counting archived source rows: {e}")
+            return None
+
+    def iter_source_row_batches(self, batch_size=SQL_IN_BATCH_SIZE):
+        """
+        Yields lists of (response_code, codec, raw_row) in response_code order. Each batch is a
+        separate keyset query, so callers can write to the database between batches.
+        """
+        last_code = ""
+        while True:
+            try:
+                self.cursor.execute("SELECT response_code, codec, raw_row FROM polygon_source_rows WHERE response_code > ? ORDER BY response_code LIMIT ?",
+                                    (last_code, batch_size))
+                batch = self.cursor.fetchall()
+            except sqlite3.Error as e:
+                print(f"DB: Error reading archived source rows: {e}")
+                return
+            if not batch: return
+            yield batch
+            last_code = batch[-1][0]
+
+    def _get_polygon_columns(self):
+        """Returns polygon_data's columns as (name, declared type, default value SQL) tuples."""
+        self.cursor.execute("PRAGMA table_info(polygon_data)")
+        return [(row[1], row[2], row[4]) for row in self.cursor.fetchall()]
+
+    def _group_polygon_rows_by_columns(self, data_dict_list, extra_columns=()):
+        """
+        Prepares processed rows for executemany, like add_or_update_polygon_data does for one row
+        (error_messages joined, unknown keys and 'id' dropped, date_added/last_modified set).
+        extra_columns are kept too (target tables other than polygon_data, e.g. the staging table).
+        Returns {column_tuple: [value_list, ...]}; rows from one import usually share one column set.
+        """
+        current_time_iso = datetime.datetime.now().isoformat()
+        valid_columns = {name for name, _type, _default in self._get_polygon_columns()} | set(extra_columns)
+        rows_by_columns = {}
+        for data_dict in data_dict_list:
+            filtered_data = {k: v for k, v in data_dict.items() if k in valid_columns and k != 'id'}
+            if isinstance(filtered_data.get('error_messages'), list):
+                filtered_data['error_messages'] = "\n".join(filtered_data['error_messages']) if filtered_data['error_messages'] else None
+            filtered_data['last_modified'] = current_time_iso
+            filtered_data.setdefault('date_added', current_time_iso)
+            columns = tuple(filtered_data.keys())
+            rows_by_columns.setdefault(columns, []).append([filtered_data[col] for col in columns])
+        return rows_by_columns
+
+    # --- Import Run Codes ---
+    # Response Codes taken by an update_changed import so far, kept in the connection-local TEMP
+    # table import_run_codes (SQLite spills it to disk) instead of a Python set of the whole file.
+    def reset_import_run_codes(self):
+        try:
+            self.cursor.execute("DROP TABLE IF EXISTS temp.import_run_codes")
+            self.cursor.execute("CREATE TEMP TABLE import_run_codes (response_code TEXT PRIMARY KEY)")
+            self.conn.commit()
+            return True
+        except sqlite3.Error as e:
+            print(f"DB: Error creating import run codes table: {e}")
+            return False
+
+    def drop_import_run_codes(self):
+        try:
+            self.cursor.execute("DROP TABLE IF EXISTS temp.import_run_codes")
+            self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"DB: Error dropping import run codes table: {e}")
+
+    def get_import_run_codes(self, response_code_list):
+        """Returns the codes of response_code_list already in import_run_codes (one query per SQL_IN_BATCH_SIZE codes)."""
+        found = set()
+        codes = list(response_code_list)
+        try:
+            for start in range(0, len(codes), SQL_IN_BATCH_SIZE):
+                batch = codes[start:start + SQL_IN_BATCH_SIZE]
+                self.cursor.execute(f"SELECT response_code FROM import_run_codes WHERE response_code IN ({', '.join(['?'] * len(batch))})", batch)
+                found.update(row[0] for row in self.cursor.fetchall())
+        except sqlite3.Error as e:
+            print(f"DB: Error checking import run codes: {e}")
+        return found
+
+    def add_import_run_codes(self, response_code_list):
+        try:
+            self.cursor.executemany("INSERT OR IGNORE INTO import_run_codes (response_code) VALUES (?)",
+                                    [(rc,) for rc in response_code_list])
+            self.conn.commit()
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            print(f"DB: Error recording import run codes: {e}")
+
+    # --- Import Staging Methods (dry-run previews) ---
+    # Incoming rows are loaded into the connection-local TEMP table import_staging, classified
+    # against polygon_data with one set-based statement, and applied with one statement per category.
+    def reset_import_staging(self):
+        """
+        (Re)creates an empty import_staging table: polygon_data's columns plus staging_row, category,
+        existing_id and STAGING_ARCHIVE_COLUMNS.
+        """
+        column_defs = ", ".join(f"{name} {col_type}" + (f" DEFAULT {default}" if default is not None else "")
+                                for name, col_type, default in self._get_polygon_columns() if name != 'id')
+        try:
+            self.cursor.execute("DROP TABLE IF EXISTS temp.import_staging")
+            self.cursor.execute(f"CREATE TEMP TABLE import_staging (staging_row INTEGER PRIMARY KEY, category TEXT, existing_id INTEGER, "
+                                f"source_codec TEXT, source_row BLOB, {column_defs})")
+            self.cursor.execute("CREATE INDEX temp.idx_import_staging_rc ON import_staging (response_code)")
+            self.cursor.execute("CREATE INDEX temp.idx_import_staging_uuid ON import_staging (uuid)")
+            self.conn.commit()
+            return True
+        except sqlite3.Error as e:
+            print(f"DB: Error creating import staging table: {e}")
+            return False
+
+    def drop_import_staging(self):
+        try:
+            self.cursor.execute("DROP TABLE IF EXISTS temp.import_staging")
+            self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"DB: Error dropping import staging table: {e}")
+
+    def stage_polygon_rows(self, data_dict_list):
+        """Appends processed rows to import_staging (in input order). Returns the number staged, or None on error."""
+        if not data_dict_list: return 0
+        try:
+            for columns, rows in self._group_polygon_rows_by_columns(data_dict_list, STAGING_ARCHIVE_COLUMNS).items():
+                self.cursor.executemany(f"INSERT INTO import_staging ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})", rows)
+            self.conn.commit()
+            return len(data_dict_list)
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            print(f"DB: Error staging {len(data_dict_list)} polygon rows: {e}")
+            return None
+
+    def _get_polygon_data_columns(self):
+        """Columns that come from imported rows (everything but POLYGON_MANAGED_COLUMNS)."""
+        return [name for name, _type, _default in self._get_polygon_columns() if name not in POLYGON_MANAGED_COLUMNS]
+
+    def classify_staged_polygon_rows(self):
+        """
+        Sets category and existing_id for every staged row in one UPDATE, first match wins:
+        duplicate_in_batch (Response Code seen earlier in the batch), uuid_conflict (UUID stored,
+        or staged earlier, under another Response Code), new, changed (any data column differs
+        from the stored record), duplicate. Returns True on success.
+        """
+        # source_hash is not compared: records imported before hashes existed have none
+        data_columns = [col for col in self._get_polygon_data_columns() if col not in ('response_code', 'source_hash')]
+        differs_sql = "NOT (" + self._stored_data_matches_sql(data_columns, "p.", lambda col: f"s.{col}")[0] + ")"
+        try:
+            self.cursor.execute(f"""
+                UPDATE import_staging AS s SET
+                    existing_id = (SELECT p.id FROM polygon_data p WHERE p.response_code = s.response_code),
+                    category = CASE
+                        WHEN EXISTS (SELECT 1 FROM import_staging s2
+                                     WHERE s2.response_code = s.response_code AND s2.staging_row < s.staging_row) THEN 'duplicate_in_batch'
+                        WHEN EXISTS (SELECT 1 FROM polygon_data p WHERE p.uuid = s.uuid AND p.response_code <> s.response_code)
+                          OR EXISTS (SELECT 1 FROM import_staging s3
+                                     WHERE s3.uuid = s.uuid AND s3.response_code <> s.response_code AND s3.staging_row < s.staging_row) THEN 'uuid_conflict'
+                        WHEN NOT EXISTS (SELECT 1 FROM polygon_data p WHERE p.response_code = s.response_code) THEN 'new'
+                        WHEN EXISTS (SELECT 1 FROM polygon_data p WHERE p.response_code = s.response_code AND ({differs_sql})) THEN 'changed'
+                        ELSE 'duplicate'
+                    END
+            """)
+            self.conn.commit()
+            return True
+        except sqlite3.Error as e:
+            print(f"DB: Error classifying staged rows: {e}")
+            return False
+
+    def get_staging_summary(self, sample_limit=STAGING_SAMPLE_ROWS):
+        """
+        Returns {"categories": {category: count}, "new_with_errors": n, "samples": {category: [row dicts]}}.
+        Sample rows carry staging_row, response_code, farmer_name, village_name, status and, for
+        changed rows, changed_columns (data columns that differ from the stored record).
+        """
+        summary = {"categories": {category: 0 for category in STAGING_CATEGORIES}, "new_with_errors": 0, "samples": {}}
+        try:
+            self.cursor.execute("SELECT category, COUNT(*), SUM(status <> 'valid_for_kml') FROM import_staging GROUP BY category")
+            for category, row_count, error_count in self.cursor.fetchall():
+                summary["categories"][category] = row_count
+                if category == "new": summary["new_with_errors"] = error_count or 0
+            self.cursor.execute("""
+                SELECT category, staging_row, existing_id, response_code, farmer_name, village_name, status FROM (
+                    SELECT *, ROW_NUMBER() OVER (PARTITION BY category ORDER BY staging_row) AS category_rank FROM import_staging)
+                WHERE category_rank <= ? ORDER BY staging_row
+            """, (sample_limit,))
+            sample_keys = ("staging_row", "existing_id", "response_code", "farmer_name", "village_name", "status")
+            for category, *values in self.cursor.fetchall():
+                summary["samples"].setdefault(category, []).append(dict(zip(sample_keys, values)))
+            data_columns = [col for col in self._get_polygon_data_columns() if col not in ('response_code', 'source_hash')]
+            for sample in summary["samples"].get("changed", []):
+                self.cursor.execute(f"SELECT {', '.join(data_columns)} FROM import_staging WHERE staging_row = ?", (sample["staging_row"],))
+                staged_values = self.cursor.fetchone()
+                self.cursor.execute(f"SELECT {', '.join(data_columns)} FROM polygon_data WHERE id = ?", (sample["existing_id"],))
+                stored_values = self.cursor.fetchone()
+                sample["changed_columns"] = [col for col, new, old in zip(data_columns, staged_values, stored_values) if new != old]
+        except sqlite3.Error as e:
+            print(f"DB: Error summarizing staged rows: {e}")
+        return summary
+
+    def apply_staged_polygon_rows(self, update_changed=False):
+        """
+        Writes classified staged rows in one transaction: one INSERT ... SELECT for 'new' rows and,
+        if update_changed, one UPDATE for 'changed' rows. Updates replace the data columns and
+        last_modified only; export counts, evaluation status and date_added are kept.
+        Other categories are left out. Staged source rows are archived for the records written, and
+        for unchanged duplicates that have none yet. Returns {"inserted", "updated"}, or None after a rollback.
+        """
+        data_columns = self._get_polygon_data_columns()
+        insert_columns = ", ".join(data_columns + ["date_added", "last_modified"])
+        update_columns = [col for col in data_columns if col != 'response_code'] + ["last_modified"]
+        try:
+            self.cursor.execute(f"INSERT INTO polygon_data ({insert_columns}) SELECT {insert_columns} FROM import_staging WHERE category = 'new' ORDER BY staging_row")
+            inserted_count = self.cursor.rowcount
+            updated_count = 0
+            if update_changed:
+                self.cursor.execute(f"""
+                    UPDATE polygon_data SET ({', '.join(update_columns)}) =
+                        (SELECT {', '.join('s.' + col for col in update_columns)} FROM import_staging s
+                         WHERE s.response_code = polygon_data.response_code AND s.category = 'changed')
+                    WHERE response_code IN (SELECT response_code FROM import_staging WHERE category = 'changed')
+                """)
+                updated_count = self.cursor.rowcount
+            archived_categories = "('new', 'changed')" if update_changed else "('new')"
+            self.cursor.execute(f"""INSERT OR REPLACE INTO polygon_source_rows (response_code, codec, raw_row)
+                                    SELECT response_code, source_codec, source_row FROM import_staging
+                                    WHERE category IN {archived_categories} AND source_row IS NOT NULL""")
+            self.cursor.execute("""INSERT OR IGNORE INTO polygon_source_rows (response_code, codec, raw_row)
+                                   SELECT response_code, source_codec, source_row FROM import_staging
+                                   WHERE category = 'duplicate' AND source_row IS NOT NULL""")
+            self.conn.commit()
+            return {"inserted": inserted_count, "updated": updated_count}
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            print(f"DB: Applying staged rows failed, nothing written: {e}")
+            return None
+
     def add_or_update_polygon_data(self, data_dict, overwrite=False):
         """
         Adds a new polygon record or updates an existing one based on response_code if overwrite is True.
@@ -240,8 +1112,9 @@ class DatabaseManager:
         """Fetches specific columns for display in the Treeview."""
         try:
             self.cursor.execute("""
-                SELECT id, status, uuid, farmer_name, village_name, date_added, kml_export_count, last_kml_export_date, evaluation_status
-                FROM polygon_data 
+                SELECT id, status, uuid, farmer_name, village_name, date_added, kml_export_count, last_kml_export_date, evaluation_status,
+                       g.area_acre, g.area_deviation_pct
+                FROM polygon_data LEFT JOIN polygon_geometry g ON g.polygon_id = polygon_data.id
                 ORDER BY date_added DESC
             """) 
             return self.cursor.fetchall()
@@ -262,31 +1135,226 @@ class DatabaseManager:
             print(f"DB: Error fetching polygon data by ID '{record_id}': {e}")
             return None
 
+    def get_polygon_data_by_ids(self, record_id_list, status=None):
+        """
+        Fetches full polygon records for a list of database IDs, in batches.
+        Optionally restricted to one status (e.g. 'valid_for_kml'). Returns a list of dicts.
+        """
+        records = []
+        try:
+            for start in range(0, len(record_id_list), SQL_IN_BATCH_SIZE):
+                id_batch = list(record_id_list[start:start + SQL_IN_BATCH_SIZE])
+                placeholders = ','.join(['?'] * len(id_batch))
+                sql = f"SELECT * FROM polygon_data WHERE id IN ({placeholders})"
+                params = id_batch
+                if status is not None:
+                    sql += " AND status = ?"
+                    params = id_batch + [status]
+                self.cursor.execute(sql, params)
+                col_names = [desc[0] for desc in self.cursor.description]
+                records.extend(dict(zip(col_names, row)) for row in self.cursor.fetchall())
+            return records
+        except sqlite3.Error as e:
+            print(f"DB: Error fetching polygon data by IDs: {e}")
+            return records
+
+    def count_polygon_records_by_ids(self, record_id_list, status=None):
+        """Number of records among a list of database IDs (in batches), optionally only those with one status."""
+        count = 0
+        try:
+            for start in range(0, len(record_id_list), SQL_IN_BATCH_SIZE):
+                id_batch = list(record_id_list[start:start + SQL_IN_BATCH_SIZE])
+                sql = f"SELECT COUNT(*) FROM polygon_data WHERE id IN ({','.join(['?'] * len(id_batch))})"
+                if status is not None:
+                    sql += " AND status = ?"; id_batch.append(status)
+                self.cursor.execute(sql, id_batch)
+                count += self.cursor.fetchone()[0]
+            return count
+        except sqlite3.Error as e:
+            print(f"DB: Error counting polygon data by IDs: {e}")
+            return None
+
+    @staticmethod
+    def build_polygon_filter_clause(filters=None):
+        """
+        Translates a filter spec (dict, keys in POLYGON_FILTER_KEYS) to a SQL WHERE clause over polygon_data.
+        Values follow the filter panel: uuid is a case-insensitive substring, added_after/added_before
+        are 'YYYY-MM-DD' (inclusive), export_status is 'All' / 'Exported' / 'Not Exported', error_status
+        is 'All' / 'Error Records' / 'Valid Records'; status and evaluation_status match exactly;
+        area_deviation_over is a percentage: computed area differs from the proposed area by more than that.
+        Returns (where_sql, params); where_sql is '' when nothing filters. Raises ValueError for unknown keys/values.
+        """
+        clauses, params = [], []
+        for key, value in (filters or {}).items():
+            if key not in POLYGON_FILTER_KEYS:
+                raise ValueError(f"Unknown filter '{key}'. Expected one of {POLYGON_FILTER_KEYS}.")
+            if value is None or str(value).strip() == "": continue
+            value = str(value).strip()
+            normalized = value.lower().replace('-', ' ').replace('_', ' ')
+            if key == "uuid":
+                clauses.append("instr(lower(uuid), ?) > 0"); params.append(value.lower())
+            elif key == "added_after":
+                clauses.append("substr(date_added, 1, 10) >= ?"); params.append(value)
+            elif key == "added_before":
+                clauses.append("substr(date_added, 1, 10) <= ?"); params.append(value)
+            elif key == "export_status":
+                if normalized == "exported": clauses.append("COALESCE(kml_export_count, 0) > 0")
+                elif normalized == "not exported": clauses.append("COALESCE(kml_export_count, 0) = 0")
+                elif normalized != "all": raise ValueError(f"Invalid export_status '{value}'.")
+            elif key == "error_status":
+                if normalized in ("error records", "error", "errors"): clauses.append("status LIKE '%error%'")
+                elif normalized in ("valid records", "valid"): clauses.append("status NOT LIKE '%error%'")
+                elif normalized != "all": raise ValueError(f"Invalid error_status '{value}'.")
+            elif key == "area_deviation_over":
+                try: threshold_pct = float(value.rstrip('%'))
+                except ValueError: raise ValueError(f"Invalid area_deviation_over '{value}'. Expected a percentage.")
+                clauses.append("id IN (SELECT polygon_id FROM polygon_geometry WHERE abs(area_deviation_pct) > ?)"); params.append(threshold_pct)
+            else: # status, evaluation_status
+                clauses.append(f"{key} = ?"); params.append(value)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def iter_polygon_records(self, filters=None, batch_size=SQL_IN_BATCH_SIZE, record_ids=None, include_geometry_metrics=False, columns=None):
+        """
+        Yields full polygon records (dicts) matching a filter spec, ordered by id, fetching
+        batch_size rows at a time on a dedicated cursor so large tables are never loaded whole.
+        record_ids, if given, further restricts the records to those IDs (queried in batches).
+        include_geometry_metrics adds the polygon_geometry columns (None where not computed).
+        columns limits the polygon_data columns read (default: all), e.g. for exports of large tables.
+        """
+        where_sql, params = self.build_polygon_filter_clause(filters)
+        select_sql = "SELECT " + (", ".join(f"polygon_data.{column}" for column in columns) if columns else "polygon_data.*")
+        if include_geometry_metrics:
+            select_sql += "".join(f", g.{column}" for column in GEOMETRY_METRIC_COLUMNS)
+            select_sql += " FROM polygon_data LEFT JOIN polygon_geometry g ON g.polygon_id = polygon_data.id"
+        else:
+            select_sql += " FROM polygon_data"
+        if record_ids is None:
+            queries = [(f"{select_sql}{where_sql} ORDER BY id", params)]
+        else:
+            sorted_ids = sorted(set(record_ids))
+            id_batches = (sorted_ids[start:start + SQL_IN_BATCH_SIZE] for start in range(0, len(sorted_ids), SQL_IN_BATCH_SIZE))
+            queries = ((f"{select_sql}{where_sql}{' AND' if where_sql else ' WHERE'} id IN ({','.join('?' * len(id_batch))}) ORDER BY id",
+                        params + id_batch) for id_batch in id_batches)
+        cursor = self.conn.cursor() # Separate cursor: callers may use self.cursor while iterating
+        try:
+            for sql, query_params in queries:
+                cursor.execute(sql, query_params)
+                col_names = [desc[0] for desc in cursor.description]
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows: break
+                    for row in rows:
+                        yield dict(zip(col_names, row))
+        except sqlite3.Error as e:
+            print(f"DB: Error iterating polygon data: {e}")
+        finally:
+            cursor.close()
+
+    def get_polygon_export_columns(self):
+        """Columns iter_polygon_row_batches can read: all polygon_data columns, then GEOMETRY_METRIC_COLUMNS."""
+        return [name for name, _type, _default in self._get_polygon_columns()] + list(GEOMETRY_METRIC_COLUMNS)
+
+    def iter_polygon_row_batches(self, columns, filters=None, batch_size=SQL_IN_BATCH_SIZE):
+        """
+        Returns a generator of lists of up to batch_size row tuples with the given columns (names from
+        get_polygon_export_columns; geometry metrics are None where not computed) for records matching
+        a filter spec, ordered by id. Plain tuples from one cursor: meant for bulk exports.
+        Columns and filters are checked before anything is read: raises ValueError for unknown ones.
+        """
+        polygon_columns = {name for name, _type, _default in self._get_polygon_columns()}
+        unknown = [column for column in columns if column not in polygon_columns and column not in GEOMETRY_METRIC_COLUMNS]
+        if unknown: raise ValueError(f"Unknown column(s) {unknown}.")
+        where_sql, params = self.build_polygon_filter_clause(filters)
+        select_list = ", ".join(f"polygon_data.{column}" if column in polygon_columns else f"g.{column}" for column in columns)
+        from_sql = "polygon_data"
+        if any(column in GEOMETRY_METRIC_COLUMNS for column in columns):
+            from_sql += " LEFT JOIN polygon_geometry g ON g.polygon_id = polygon_data.id"
+        return self._fetch_row_batches(f"SELECT {select_list} FROM {from_sql}{where_sql} ORDER BY polygon_data.id", params, batch_size)
+
+    def _fetch_row_batches(self, sql, params, batch_size):
+        cursor = self.conn.cursor() # Separate cursor: callers may use self.cursor while iterating
+        try:
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows: break
+                yield rows
+        except sqlite3.Error as e:
+            print(f"DB: Error reading polygon rows for export: {e}")
+            raise
+        finally:
+            cursor.close()
+
+    def get_polygon_stats(self, filters=None):
+        """Returns summary counts (total, by status, by evaluation status, exported) for records matching a filter spec."""
+        where_sql, params = self.build_polygon_filter_clause(filters)
+        stats = {"total": 0, "by_status": {}, "by_evaluation_status": {}, "exported": 0, "not_exported": 0}
+        try:
+            self.cursor.execute(f"SELECT status, COUNT(*) FROM polygon_data{where_sql} GROUP BY status", params)
+            stats["by_status"] = {row[0]: row[1] for row in self.cursor.fetchall()}
+            stats["total"] = sum(stats["by_status"].values())
+            self.cursor.execute(f"SELECT evaluation_status, COUNT(*) FROM polygon_data{where_sql} GROUP BY evaluation_status", params)
+            stats["by_evaluation_status"] = {row[0]: row[1] for row in self.cursor.fetchall()}
+            self.cursor.execute(f"SELECT COUNT(*) FROM polygon_data{where_sql}{' AND' if where_sql else ' WHERE'} COALESCE(kml_export_count, 0) > 0", params)
+            stats["exported"] = self.cursor.fetchone()[0]
+            stats["not_exported"] = stats["total"] - stats["exported"]
+        except sqlite3.Error as e:
+            print(f"DB: Error computing polygon stats: {e}")
+        return stats
+
     def update_kml_export_status(self, record_id):
-        """Updates the KML export count and date for a given record ID."""
+        """
+        Updates the KML export count and date for a given record ID. last_modified is left alone: it
+        marks changes to the record's data (incremental KML exports and the KML/map caches rely on it).
+        """
         try:
             current_time_iso = datetime.datetime.now().isoformat()
             self.cursor.execute("""
                 UPDATE polygon_data
                 SET kml_export_count = kml_export_count + 1,
-                    last_kml_export_date = ?,
-                    last_modified = ? 
+                    last_kml_export_date = ?
                 WHERE id = ?
-            """, (current_time_iso, current_time_iso, record_id))
+            """, (current_time_iso, record_id))
             self.conn.commit()
             return self.cursor.rowcount > 0
         except sqlite3.Error as e:
             print(f"DB: Error updating KML export status for ID '{record_id}': {e}")
             return False
 
+    def update_kml_export_status_bulk(self, record_id_list):
+        """Updates the KML export count and date for many records in one transaction (last_modified kept). Returns rows updated."""
+        if not record_id_list: return 0
+        try:
+            current_time_iso = datetime.datetime.now().isoformat()
+            updated = 0
+            for start in range(0, len(record_id_list), SQL_IN_BATCH_SIZE):
+                id_batch = list(record_id_list[start:start + SQL_IN_BATCH_SIZE])
+                placeholders = ','.join(['?'] * len(id_batch))
+                self.cursor.execute(f"""
+                    UPDATE polygon_data
+                    SET kml_export_count = kml_export_count + 1,
+                        last_kml_export_date = ?
+                    WHERE id IN ({placeholders})
+                """, [current_time_iso] + id_batch)
+                updated += self.cursor.rowcount
+            self.conn.commit()
+            return updated
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            print(f"DB: Error updating KML export status for {len(record_id_list)} records: {e}")
+            return 0
+
     def delete_polygon_data(self, record_id_list):
         if not isinstance(record_id_list, list): record_id_list = [record_id_list]
         if not record_id_list: return False # No IDs to delete
         try:
             placeholders = ','.join(['?'] * len(record_id_list))
             self.cursor.execute(f"DELETE FROM polygon_data WHERE id IN ({placeholders})", record_id_list)
+            deleted_count = self.cursor.rowcount
+            if deleted_count > 0:
+                self.cursor.execute("DELETE FROM import_checkpoints") # A resumed import would not re-add the deleted rows
             self.conn.commit()
-            return self.cursor.rowcount > 0
+            return deleted_count > 0
         except sqlite3.Error as e:
             print(f"DB: Error deleting polygon data: {e}")
             return False
@@ -294,6 +1362,7 @@ class DatabaseManager:
     def delete_all_polygon_data(self):
         try:
             self.cursor.execute("DELETE FROM polygon_data")
+            self.cursor.execute("DELETE FROM import_checkpoints") # Their rows are gone; a re-run must start over
             # Optionally, reset the autoincrement sequence if desired (usually not necessary)
             # self.cursor.execute("DELETE FROM sqlite_sequence WHERE name='polygon_data';")
             self.conn.commit()
@@ -321,6 +1390,7 @@ class DatabaseManager:
     def close(self):
         """Closes the database connection."""
         if self.conn:
+            perf.unregister_connection(self.conn)
             self.conn.close()
             self.conn = None # Mark as closed
             # print("Database connection closed.")
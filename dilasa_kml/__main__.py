@@ -0,0 +1,8 @@
+# File: DilasaKMLTool_v4/dilasa_kml/__main__.py
+# ----------------------------------------------------------------------
+import sys
+
+from dilasa_kml.cli import main
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,405 @@
+# File: DilasaKMLTool_v4/dilasa_kml/cli.py
+# ----------------------------------------------------------------------
+# Headless command line interface: python -m dilasa_kml <command> ...
+# Reuses core/ and database/ only; PySide6 and folium are never imported, so it runs
+# on machines without a display (scheduled/nightly batch jobs).
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+
+from database.db_manager import DatabaseManager, POLYGON_FILTER_KEYS
+
+EXIT_OK = 0
+EXIT_FAILURE = 1
+
+
+def _open_db(args):
+    return DatabaseManager(db_file_path=args.db) if args.db else DatabaseManager()
+
+def _parse_filters(filter_args):
+    """Turns repeated --filter KEY=VALUE arguments into a filter spec dict."""
+    filters = {}
+    for filter_arg in filter_args or []:
+        key, sep, value = filter_arg.partition("=")
+        key = key.strip().replace('-', '_')
+        if not sep or key not in POLYGON_FILTER_KEYS:
+            raise ValueError(f"Invalid --filter '{filter_arg}'. Use KEY=VALUE with KEY one of: {', '.join(POLYGON_FILTER_KEYS)}.")
+        filters[key] = value
+    return filters
+
+def _make_logger(args):
+    """Log callback for core functions. Messages go to stderr; info-level ones only with --verbose."""
+    def _log(message, level="info"):
+        if args.verbose or level in ("error", "warning"):
+            print(f"[{level.upper()}] {message}", file=sys.stderr)
+    return _log
+
+
+# --- Commands. Each returns (exit_code, result_dict). ---
+def cmd_import_csv(args):
+    from core.import_pipeline import CsvFileRowStream, fingerprint_csv_file, run_import
+    db_manager = _open_db(args)
+    results, exit_code = [], EXIT_OK
+    try:
+        for csv_path in args.csv_files:
+            try:
+                if args.dry_run:
+                    result = _staged_csv_import(db_manager, csv_path, args)
+                    results.append({"file": csv_path, **result})
+                    if result.get("error"): exit_code = EXIT_FAILURE
+                    continue
+                row_stream = CsvFileRowStream(csv_path)
+                summary = run_import(db_manager, row_stream, "csv", f"CSV '{os.path.basename(csv_path)}'",
+                                     byte_size=row_stream.total_bytes, log_callback=_make_logger(args),
+                                     fingerprint=fingerprint_csv_file(csv_path), resume=not args.restart,
+                                     update_changed=args.update_changed)
+                results.append({"file": csv_path, **summary})
+            except (OSError, UnicodeDecodeError) as e:
+                results.append({"file": csv_path, "error": f"Could not read CSV file: {e}"})
+                exit_code = EXIT_FAILURE
+    finally:
+        db_manager.close()
+    return exit_code, {"imports": results}
+
+def cmd_import_kml(args):
+    import xml.etree.ElementTree as ET
+    import zipfile
+    from core.kml_importer import KmlPlacemarkStream
+    from core.import_pipeline import fingerprint_source_file, run_import
+    db_manager = _open_db(args)
+    results, exit_code = [], EXIT_OK
+    try:
+        for kml_path in args.kml_files:
+            try:
+                placemark_stream = KmlPlacemarkStream(kml_path, response_code_lookup=db_manager.get_response_codes_for_uuids)
+                summary = run_import(db_manager, placemark_stream, "kml", f"KML '{os.path.basename(kml_path)}'",
+                                     byte_size=os.path.getsize(kml_path), log_callback=_make_logger(args),
+                                     fingerprint=fingerprint_source_file(kml_path, "kml"), resume=not args.restart,
+                                     update_changed=args.update_changed)
+                results.append({"file": kml_path, **summary, "placemarks_without_polygon": placemark_stream.placemarks_without_polygon,
+                                "multi_polygon_placemarks": placemark_stream.multi_polygon_placemarks})
+            except (OSError, ValueError, ET.ParseError, zipfile.BadZipFile) as e:
+                results.append({"file": kml_path, "error": f"Could not read KML file: {e}"})
+                exit_code = EXIT_FAILURE
+    finally:
+        db_manager.close()
+    return exit_code, {"imports": results}
+
+def _staged_csv_import(db_manager, csv_path, args):
+    """--dry-run: classify the file's rows through the staging table and report, without writing any record."""
+    from core.import_pipeline import CsvFileRowStream, preview_import, discard_import_preview
+    row_stream = CsvFileRowStream(csv_path)
+    source_description = f"CSV '{os.path.basename(csv_path)}'"
+    preview = preview_import(db_manager, row_stream, source_description, log_callback=_make_logger(args))
+    if preview.get("error"):
+        return {"error": preview["error"]}
+    discard_import_preview(db_manager)
+    return {"dry_run": True, **{key: preview[key] for key in ("processed", "skipped_missing_rc", "skipped_invalid",
+                                                              "categories", "new_with_errors", "samples", "phase_seconds")}}
+
+def cmd_sync_api(args):
+    from core.import_pipeline import sync_api_source
+    db_manager = _open_db(args)
+    results, exit_code = [], EXIT_OK
+    try:
+        if args.url:
+            sources = [(None, args.title or args.url, args.url)]
+        else:
+            sources = db_manager.get_mwater_sources() # (id, title, url)
+            if args.source:
+                wanted = set(args.source)
+                sources = [s for s in sources if s[1] in wanted or str(s[0]) in wanted]
+            if not sources:
+                return EXIT_FAILURE, {"syncs": [], "error": "No matching mWater API sources configured."}
+
+        for source_id, title, url in sources:
+            result = sync_api_source(db_manager, source_id, title, url, if_changed=args.if_changed, update_changed=args.update_changed,
+                                     resume=not args.restart, log_callback=_make_logger(args))
+            if result.get("error"): exit_code = EXIT_FAILURE
+            results.append(result)
+    finally:
+        db_manager.close()
+    return exit_code, {"syncs": results}
+
+def cmd_validate(args):
+    from core.import_pipeline import iter_csv_file_rows, validate_polygon_rows
+    results, exit_code = [], EXIT_OK
+    for csv_path in args.csv_files:
+        try:
+            report = validate_polygon_rows(iter_csv_file_rows(csv_path))
+        except (OSError, UnicodeDecodeError) as e:
+            results.append({"file": csv_path, "error": f"Could not read CSV file: {e}"}); exit_code = EXIT_FAILURE
+            continue
+        report["invalid"] = report["total"] - report["status_counts"].get("valid_for_kml", 0)
+        if args.fail_on_invalid and report["invalid"]:
+            exit_code = EXIT_FAILURE
+        results.append({"file": csv_path, **report})
+    return exit_code, {"validations": results}
+
+def cmd_export_kml(args):
+    from core.kml_fragment_cache import export_cached_kml_files
+    filters = _parse_filters(args.filter)
+    filters["status"] = "valid_for_kml"
+    os.makedirs(args.output, exist_ok=True)
+    db_manager = _open_db(args)
+    try:
+        if args.mode == "superoverlay":
+            from core.kml_superoverlay import export_super_overlay, super_overlay_output_path
+            record_ids = [row[0] for rows in db_manager.iter_polygon_row_batches(["id"], filters) for row in rows]
+            summary = export_super_overlay(db_manager, record_ids, super_overlay_output_path(args.output, len(record_ids), args.kmz),
+                                           args.partition, args.kmz)
+            files_generated, exported_ids = summary["tiles"], summary["exported_ids"]
+        elif args.mode == "incremental":
+            from core.kml_incremental import export_kml_incremental
+            record_ids = [row[0] for rows in db_manager.iter_polygon_row_batches(["id"], filters) for row in rows]
+            summary = export_kml_incremental(db_manager, record_ids, args.output)
+            files_generated, exported_ids = len(summary["written_ids"]), summary["written_ids"]
+        else:
+            record_ids = [row[0] for rows in db_manager.iter_polygon_row_batches(["id"], filters) for row in rows]
+            files_generated, exported_ids = export_cached_kml_files(db_manager, record_ids, args.output, args.mode)
+        marked = 0 if args.no_mark_exported else db_manager.update_kml_export_status_bulk(exported_ids)
+    finally:
+        db_manager.close()
+    result = {"output_folder": os.path.abspath(args.output), "mode": args.mode, "filters": filters,
+              "files_generated": files_generated, "records_exported": len(exported_ids), "records_marked_exported": marked}
+    if args.mode == "superoverlay": result["super_overlay"] = {"output_path": summary["output_path"], "partition": args.partition,
+                                                               "skipped": summary["skipped"], "seconds": summary["seconds"]}
+    if args.mode == "incremental": result["incremental"] = {key: summary[key] for key in ("unchanged", "removed", "skipped", "manifest_path", "seconds")}
+    return EXIT_OK, result
+
+def cmd_export_gpkg(args):
+    from core.gpkg_exporter import export_geopackage, GPKG_SOURCE_COLUMNS
+    filters = _parse_filters(args.filter)
+    filters["status"] = "valid_for_kml"
+    db_manager = _open_db(args)
+    try:
+        records = db_manager.iter_polygon_records(filters, columns=GPKG_SOURCE_COLUMNS, include_geometry_metrics=True)
+        summary = export_geopackage(records, args.output)
+    finally:
+        db_manager.close()
+    return EXIT_OK, {"filters": filters, "gpkg": summary}
+
+def cmd_export_geojson(args):
+    from core.geojson_exporter import export_geojson, geojson_options_for_path, GEOJSON_SOURCE_COLUMNS
+    filters = _parse_filters(args.filter)
+    filters["status"] = "valid_for_kml"
+    implied_format, implied_gzip = geojson_options_for_path(args.output)
+    output_format = args.format or implied_format
+    db_manager = _open_db(args)
+    try:
+        records = db_manager.iter_polygon_records(filters, columns=GEOJSON_SOURCE_COLUMNS, include_geometry_metrics=True)
+        summary = export_geojson(records, args.output, output_format, precision=args.precision, use_gzip=args.gzip or implied_gzip)
+    finally:
+        db_manager.close()
+    return EXIT_OK, {"filters": filters, "format": output_format, "geojson": summary}
+
+def cmd_export_csv(args):
+    from core.csv_exporter import export_polygon_csv, csv_export_columns, CSV_EXPORT_TABLE_COLUMNS
+    filters = _parse_filters(args.filter)
+    db_manager = _open_db(args)
+    try:
+        if args.columns == "all": columns = csv_export_columns(db_manager)
+        elif args.columns: columns = [column.strip() for column in args.columns.split(",") if column.strip()]
+        else: columns = list(CSV_EXPORT_TABLE_COLUMNS)
+        summary = export_polygon_csv(db_manager, args.output, columns, filters, use_gzip=args.gzip or args.output.lower().endswith(".gz"))
+    finally:
+        db_manager.close()
+    return EXIT_OK, {"filters": filters, "columns": columns, "csv": summary}
+
+def cmd_stats(args):
+    filters = _parse_filters(args.filter)
+    db_manager = _open_db(args)
+    try:
+        stats = db_manager.get_polygon_stats(filters)
+        stats["api_sources"] = len(db_manager.get_mwater_sources())
+        stats["db_path"] = db_manager.db_path
+    finally:
+        db_manager.close()
+    return EXIT_OK, {"filters": filters, **stats}
+
+
+def cmd_reprocess(args):
+    from core.source_archive import reprocess_archived_rows
+    db_manager = _open_db(args)
+    try:
+        summary = reprocess_archived_rows(db_manager, workers=args.workers, batch_size=args.batch_size, log_callback=_make_logger(args))
+    finally:
+        db_manager.close()
+    return (EXIT_FAILURE if summary["failed_db_write"] else EXIT_OK), {"reprocess": summary}
+
+def cmd_compute_geometry(args):
+    from core.geometry import update_geometry_metrics
+    db_manager = _open_db(args)
+    try:
+        result = update_geometry_metrics(db_manager, recompute_all=args.all)
+    finally:
+        db_manager.close()
+    if result is None: return EXIT_FAILURE, {"error": "Geometry metrics could not be saved."}
+    return EXIT_OK, {"geometry": result}
+
+def cmd_import_runs(args):
+    db_manager = _open_db(args)
+    try:
+        runs = db_manager.get_import_runs(limit=args.limit, source_type=args.type)
+    finally:
+        db_manager.close()
+    return EXIT_OK, {"import_runs": runs}
+
+def cmd_run_jobs(args):
+    from core.job_scheduler import due_jobs, execute_job
+    db_manager = _open_db(args)
+    runs, exit_code = [], EXIT_OK
+    try:
+        if args.job: # Named jobs run now, whatever their schedule
+            jobs = [job for job in db_manager.get_scheduled_jobs() if job["name"] in set(args.job) or str(job["id"]) in set(args.job)]
+            if not jobs: return EXIT_FAILURE, {"runs": [], "error": "No matching scheduled jobs."}
+        else:
+            jobs = due_jobs(db_manager)
+        for job in jobs:
+            run = execute_job(db_manager, job, trigger="manual" if args.job else "schedule", log_callback=_make_logger(args))
+            if run["status"] == "failed": exit_code = EXIT_FAILURE
+            runs.append(run)
+    finally:
+        db_manager.close()
+    return exit_code, {"runs": runs}
+
+
+def _print_human(value, indent=0):
+    pad = "  " * indent
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if isinstance(item, (dict, list)) and item:
+                print(f"{pad}{key}:"); _print_human(item, indent + 1)
+            else:
+                print(f"{pad}{key}: {item}")
+    elif isinstance(value, list):
+        for item in value:
+            if isinstance(item, dict):
+                print(f"{pad}-"); _print_human(item, indent + 1)
+            else:
+                print(f"{pad}- {item}")
+    else:
+        print(f"{pad}{value}")
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(prog="python -m dilasa_kml",
+                                     description="Dilasa KML Tool headless batch mode (import, validate, export, stats).")
+    parser.add_argument("--db", help="Path to the SQLite database. Defaults to the desktop app's database in APPDATA.")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON on stdout.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Also log per-row info messages to stderr.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    filter_help = f"KEY=VALUE, repeatable. Keys: {', '.join(POLYGON_FILTER_KEYS)}."
+
+    p_import = subparsers.add_parser("import-csv", help="Import one or more CSV files (new Response Codes only).")
+    p_import.add_argument("csv_files", nargs="+")
+    p_import.add_argument("--restart", action="store_true", help="Ignore the checkpoint of an interrupted import and start over.")
+    p_import.add_argument("--dry-run", action="store_true",
+                          help="Only report how rows would be classified (new, changed, duplicate, duplicate_in_batch, uuid_conflict).")
+    p_import.add_argument("--update-changed", action="store_true",
+                          help="Also overwrite existing records whose source row changed (compared by row hash; "
+                               "export counts and evaluation status are kept).")
+    p_import.set_defaults(handler=cmd_import_csv)
+
+    p_import_kml = subparsers.add_parser("import-kml", help="Import the polygon placemarks of KML/KMZ files (same duplicate rules as CSV).")
+    p_import_kml.add_argument("kml_files", nargs="+")
+    p_import_kml.add_argument("--restart", action="store_true", help="Ignore the checkpoint of an interrupted import and start over.")
+    p_import_kml.add_argument("--update-changed", action="store_true",
+                              help="Also overwrite existing records whose placemark changed (compared by row hash).")
+    p_import_kml.set_defaults(handler=cmd_import_kml)
+
+    p_sync = subparsers.add_parser("sync-api", help="Fetch and import from configured mWater API sources.")
+    p_sync.add_argument("--source", action="append", help="Source title or ID (repeatable). Default: all sources.")
+    p_sync.add_argument("--url", help="Fetch from this URL instead of the configured sources.")
+    p_sync.add_argument("--title", help="Display title for --url.")
+    p_sync.add_argument("--if-changed", action="store_true",
+                        help="Send the ETag of the last sync; sources answering 304 Not Modified are skipped.")
+    p_sync.add_argument("--restart", action="store_true", help="Ignore the checkpoint of an interrupted import and start over.")
+    p_sync.add_argument("--update-changed", action="store_true",
+                        help="Also overwrite existing records whose source row changed (compared by row hash).")
+    p_sync.set_defaults(handler=cmd_sync_api)
+
+    p_validate = subparsers.add_parser("validate", help="Validate CSV files without writing to the database.")
+    p_validate.add_argument("csv_files", nargs="+")
+    p_validate.add_argument("--fail-on-invalid", action="store_true", help="Exit with status 1 if any row is not valid for KML.")
+    p_validate.set_defaults(handler=cmd_validate)
+
+    p_export = subparsers.add_parser("export-kml", help="Export KML for valid records matching the filters.")
+    p_export.add_argument("--mode", choices=("single", "multiple", "incremental", "superoverlay"), default="single",
+                          help="incremental: one KML per record, only new/changed records rewritten (folder manifest); "
+                               "superoverlay: many small tiles linked by NetworkLink/Region, for large selections.")
+    p_export.add_argument("--partition", choices=("quadtree", "admin"), default="quadtree",
+                          help="Super-overlay tiles by location (quadtree) or by district > block > village (admin).")
+    p_export.add_argument("--kmz", action="store_true", help="Package the super-overlay as one KMZ file.")
+    p_export.add_argument("--output", "-o", required=True, help="Output folder.")
+    p_export.add_argument("--filter", action="append", help=filter_help)
+    p_export.add_argument("--no-mark-exported", action="store_true", help="Do not increment the records' KML export count.")
+    p_export.set_defaults(handler=cmd_export_kml)
+
+    p_gpkg = subparsers.add_parser("export-gpkg", help="Export valid records matching the filters to a GeoPackage with a spatial index.")
+    p_gpkg.add_argument("-o", "--output", required=True, help="GeoPackage file to write (replaced if it exists).")
+    p_gpkg.add_argument("--filter", action="append", help=filter_help)
+    p_gpkg.set_defaults(handler=cmd_export_gpkg)
+
+    p_geojson = subparsers.add_parser("export-geojson", help="Export valid records matching the filters as GeoJSON or newline-delimited GeoJSON.")
+    p_geojson.add_argument("-o", "--output", required=True,
+                           help="File to write (replaced if it exists). .ndjson/.geojsonl imply --format ndjson, .gz implies --gzip.")
+    p_geojson.add_argument("--format", choices=("geojson", "ndjson"), help="FeatureCollection or one Feature per line. Default: from the file name.")
+    p_geojson.add_argument("--precision", type=int, help="Round coordinates to this many decimal places (7 is about 1 cm). Default: full precision.")
+    p_geojson.add_argument("--gzip", action="store_true", help="Gzip the output.")
+    p_geojson.add_argument("--filter", action="append", help=filter_help)
+    p_geojson.set_defaults(handler=cmd_export_geojson)
+
+    p_csv = subparsers.add_parser("export-csv", help="Export records matching the filters as CSV, any columns, straight from the database.")
+    p_csv.add_argument("-o", "--output", required=True, help="CSV file to write (replaced if it exists). .gz implies --gzip.")
+    p_csv.add_argument("--columns", help="Comma-separated column names, or 'all' (every record column and geometry metric). "
+                                         "Default: the columns of the desktop app's records table.")
+    p_csv.add_argument("--gzip", action="store_true", help="Gzip the output.")
+    p_csv.add_argument("--filter", action="append", help=filter_help)
+    p_csv.set_defaults(handler=cmd_export_csv)
+
+    p_stats = subparsers.add_parser("stats", help="Show record counts by status, evaluation and export state.")
+    p_stats.add_argument("--filter", action="append", help=filter_help)
+    p_stats.set_defaults(handler=cmd_stats)
+
+    p_reprocess = subparsers.add_parser("reprocess", help="Re-validate all records from their archived source rows (no re-fetch).")
+    p_reprocess.add_argument("--workers", type=int, help="Worker processes. Default: CPU count - 1, at most 4.")
+    p_reprocess.add_argument("--batch-size", type=int, default=2000, help="Archived rows per batch/transaction. Default: 2000.")
+    p_reprocess.set_defaults(handler=cmd_reprocess)
+
+    p_geometry = subparsers.add_parser("compute-geometry", help="Compute area, perimeter, centroid and area deviation of valid polygons.")
+    p_geometry.add_argument("--all", action="store_true", help="Recompute every polygon, not only those without metrics.")
+    p_geometry.set_defaults(handler=cmd_compute_geometry)
+
+    p_runs = subparsers.add_parser("import-runs", help="Show the import run ledger (newest first) with per-phase timings and rows/s.")
+    p_runs.add_argument("--limit", type=int, default=20, help="Number of runs to show (0 for all). Default: 20.")
+    p_runs.add_argument("--type", choices=("csv", "api", "kml"), help="Only show CSV, API or KML imports.")
+    p_runs.set_defaults(handler=cmd_import_runs)
+
+    p_jobs = subparsers.add_parser("run-jobs", help="Run the scheduled jobs that are due (e.g. from cron or Task Scheduler) and record the runs.")
+    p_jobs.add_argument("--job", action="append", help="Run this job (name or ID, repeatable) now, whether due or not.")
+    p_jobs.set_defaults(handler=cmd_run_jobs)
+    return parser
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    result_stdout = sys.stdout
+    start_time = time.perf_counter()
+    # core/ and database/ report through print(); keep stdout clean for the result
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            exit_code, result = args.handler(args)
+        except ValueError as e:
+            exit_code, result = EXIT_FAILURE, {"error": str(e)}
+        except Exception as e:
+            exit_code, result = EXIT_FAILURE, {"error": f"Unexpected error: {e}"}
+    result = {"command": args.command, "ok": exit_code == EXIT_OK,
+              "duration_s": round(time.perf_counter() - start_time, 3), **result}
+    if args.json:
+        json.dump(result, result_stdout, indent=2, default=str); result_stdout.write("\n")
+    else:
+        with contextlib.redirect_stdout(result_stdout):
+            _print_human(result)
+    return exit_code
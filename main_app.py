@@ -4,10 +4,12 @@ import sys
 import os # Import the os module
 from PySide6.QtWidgets import QApplication, QSplashScreen 
 from PySide6.QtGui import QPixmap, QFont, QPainter, QColor 
-from PySide6.QtCore import QTimer, Qt                 
+from PySide6.QtCore import QCoreApplication, Qt                 
 
-from ui.main_window import MainWindow   
-from core.utils import resource_path  
+# ui.main_window (and through it folium, simplekml and the QtWebEngine widgets) is imported
+# inside main() once the splash is on screen, so the splash appears immediately. Only
+# QtWebEngineCore is loaded before the splash, for the dilasa:// scheme registration.
+from core.utils import resource_path, StartupProfiler
 
 APP_NAME_MAIN = "Dilasa Advance KML Tool"
 APP_VERSION_MAIN = "Beta.v4.001.Dv-A.Das"
@@ -57,17 +59,33 @@ class CustomSplashScreen(QSplashScreen):
 
 
 def main():
+    # --profile-startup prints a per-phase timing breakdown once the main window is interactive
+    profile_startup = "--profile-startup" in sys.argv
+    if profile_startup: sys.argv.remove("--profile-startup")
+    profiler = StartupProfiler(enabled=profile_startup)
+    # --perf starts with span recording on (View > Performance Panel shows it)
+    if "--perf" in sys.argv:
+        sys.argv.remove("--perf")
+        from core import perf
+        perf.set_enabled(True)
+
     # Set environment variable to pass Chromium flags
     # Disable GPU acceleration to prevent rendering issues
     # Attempt to resolve rendering issues by disabling GPU compositing, while keeping WebGL enabled.
     os.environ["QTWEBENGINE_CHROMIUM_FLAGS"] = "--disable-gpu-compositing"
+    # Required because QtWebEngineWidgets is only imported after QApplication exists (lazy map/GE views)
+    QCoreApplication.setAttribute(Qt.ApplicationAttribute.AA_ShareOpenGLContexts)
+    # dilasa:// serves generated map HTML/KML from memory; schemes must be registered before QApplication
+    from ui.widgets.content_scheme_handler import register_dilasa_url_scheme
+    register_dilasa_url_scheme()
+    profiler.mark("QtWebEngineCore loaded, dilasa:// registered")
 
     app = QApplication(sys.argv)
     app.setApplicationName(APP_NAME_MAIN)
     app.setApplicationVersion(APP_VERSION_MAIN)
+    profiler.mark("QApplication created")
 
     logo_full_path = resource_path(LOGO_FILE_NAME_MAIN)
-    main_window = MainWindow() 
     splash = CustomSplashScreen(APP_NAME_MAIN, APP_VERSION_MAIN, ORGANIZATION_TAGLINE_MAIN, logo_full_path)
     splash.show()
     
@@ -75,15 +93,28 @@ def main():
         screen_geo = splash.screen().geometry()
         splash.move((screen_geo.width() - splash.width()) // 2,
                     (screen_geo.height() - splash.height()) // 2)
+    app.processEvents() # Paint the splash before the heavy imports below
+    profiler.mark("Splash shown")
+
+    from ui.main_window import MainWindow
+    profiler.mark("Main window module imported")
+
+    main_window = MainWindow(startup_profiler=profiler)
 
-    def show_main_window_after_splash():
-        splash.close()
+    def show_main_window_when_ready():
         main_window.show() 
+        splash.finish(main_window)
         main_window.activateWindow() 
         main_window.raise_()         
+        profiler.mark("Main window shown")
+        # Map view is built after the window is up; the profile report is printed once it is ready.
+        main_window.start_deferred_views()
 
-    QTimer.singleShot(4000, show_main_window_after_splash) 
+    # The splash closes as soon as the window signals it is ready instead of after a fixed delay
+    main_window.startup_ready.connect(show_main_window_when_ready)
     sys.exit(app.exec())
 
 if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support() # "Reprocess All" worker processes in a frozen (PyInstaller) build
     main()
@@ -0,0 +1,122 @@
+# File: DilasaKMLTool_v4/tests/test_geometry.py
+# ----------------------------------------------------------------------
+# Vectorized polygon metrics: shoelace area, perimeter and centroid per ring via
+# np.add.reduceat, the edge-crossing self-intersection test, and the ring/id order of
+# polygon_inputs_to_arrays when 'vertices' BLOB rows and legacy 4-point rows are mixed.
+import numpy as np
+import pytest
+
+from core.data_processor import CSV_HEADERS, POINT_ALT_HEADER_PATTERN, POINT_UTM_HEADER_PATTERN, pack_vertices
+from core.geometry import (SQUARE_METRES_PER_ACRE, compute_polygon_metrics, polygon_inputs_to_arrays,
+                           update_geometry_metrics)
+from core.import_pipeline import import_polygon_rows
+from database.db_manager import DatabaseManager
+
+BASE_EASTING, BASE_NORTHING = 533000.0, 2196000.0 # Realistic UTM magnitudes (zone 43Q)
+# 100 x 200 m rectangle with a 20 m point on each long side: 20000 + 2 * 2000 = 24000 m2
+HEXAGON = [(0, 0), (100, 0), (120, 100), (100, 200), (0, 200), (-20, 100)]
+HEXAGON_PERIMETER = 200 + 4 * np.hypot(20, 100)
+BOW_TIE = [(0, 0), (100, 100), (100, 0), (0, 100)] # Edges 0-1 and 2-3 cross; the halves cancel out
+SQUARE = [(0, 0), (50, 0), (50, 50), (0, 50)]
+TRIANGLE = [(0, 0), (60, 0), (0, 40)]
+
+def _utm(ring, offset=0):
+    # Each ring of a batch at its own place: a ring wrapped to another ring's first vertex must show
+    return [(BASE_EASTING + 1000 * offset + x, BASE_NORTHING + 700 * offset + y) for x, y in ring]
+
+def _metrics(*rings):
+    counts = np.asarray([len(ring) for ring in rings], dtype=np.int64)
+    points = np.asarray([point for offset, ring in enumerate(rings) for point in _utm(ring, offset)], dtype=np.float64)
+    return compute_polygon_metrics(counts, points[:, 0], points[:, 1])
+
+def test_hexagon_area_perimeter_centroid():
+    metrics = _metrics(HEXAGON)
+    assert metrics["area_m2"][0] == pytest.approx(24000.0)
+    assert metrics["area_m2"][0] / SQUARE_METRES_PER_ACRE == pytest.approx(5.93, abs=0.005)
+    assert metrics["perimeter_m"][0] == pytest.approx(HEXAGON_PERIMETER)
+    assert metrics["centroid_easting"][0] == pytest.approx(BASE_EASTING + 50)
+    assert metrics["centroid_northing"][0] == pytest.approx(BASE_NORTHING + 100)
+    assert not metrics["self_intersecting"][0]
+
+def test_clockwise_ring_has_the_same_area():
+    assert _metrics(HEXAGON[::-1])["area_m2"][0] == pytest.approx(24000.0)
+
+def test_bow_tie_is_self_intersecting_with_zero_area():
+    metrics = _metrics(BOW_TIE)
+    assert metrics["self_intersecting"][0]
+    assert metrics["area_m2"][0] == pytest.approx(0.0, abs=1e-6)
+    # Degenerate area: the centroid falls back to the vertex mean
+    assert metrics["centroid_easting"][0] == pytest.approx(BASE_EASTING + 50)
+    assert metrics["centroid_northing"][0] == pytest.approx(BASE_NORTHING + 50)
+
+def test_batch_of_mixed_rings_keeps_per_ring_results():
+    metrics = _metrics(SQUARE, HEXAGON, TRIANGLE, BOW_TIE, SQUARE)
+    np.testing.assert_allclose(metrics["area_m2"], [2500.0, 24000.0, 1200.0, 0.0, 2500.0], atol=1e-6)
+    np.testing.assert_allclose(metrics["perimeter_m"], [200.0, HEXAGON_PERIMETER, 60 + 40 + np.hypot(60, 40),
+                                                        200 + 2 * np.hypot(100, 100), 200.0])
+    assert metrics["self_intersecting"].tolist() == [False, False, False, True, False]
+    offsets = np.arange(5)
+    np.testing.assert_allclose(metrics["centroid_easting"] - BASE_EASTING - 1000 * offsets, [25.0, 50.0, 20.0, 50.0, 25.0])
+    np.testing.assert_allclose(metrics["centroid_northing"] - BASE_NORTHING - 700 * offsets, [25.0, 100.0, 40 / 3, 50.0, 25.0])
+
+def _blob(ring, offset=0, altitude=600.0):
+    return pack_vertices([(easting, northing, altitude) for easting, northing in _utm(ring, offset)])
+
+def _legacy_row(record_id, proposed, ring, offset=0):
+    return (record_id, proposed, *(value for point in _utm(ring, offset) for value in point))
+
+def test_inputs_mix_blob_and_legacy_rows_in_id_order():
+    vertex_rows = [(7, 5.9, _blob(HEXAGON, 0)), (3, None, _blob(TRIANGLE, 1)), (9, 1.0, _blob(BOW_TIE, 2))]
+    legacy_rows = [_legacy_row(4, 0.6, SQUARE, 3), _legacy_row(1, None, [(0, 0), (100, 0), (100, 30), (0, 30)], 4)]
+    ids, counts, eastings, northings, proposed = polygon_inputs_to_arrays(vertex_rows, legacy_rows)
+
+    assert ids.tolist() == [7, 3, 9, 4, 1]
+    assert counts.tolist() == [6, 3, 4, 4, 4]
+    assert len(eastings) == len(northings) == counts.sum()
+    np.testing.assert_allclose(proposed, [5.9, np.nan, 1.0, 0.6, np.nan])
+    metrics = compute_polygon_metrics(counts, eastings, northings)
+    area_by_id = dict(zip(ids.tolist(), metrics["area_m2"].tolist()))
+    assert area_by_id == pytest.approx({7: 24000.0, 3: 1200.0, 9: 0.0, 4: 2500.0, 1: 3000.0}, abs=1e-6)
+    assert dict(zip(ids.tolist(), metrics["self_intersecting"].tolist())) == {7: False, 3: False, 9: True, 4: False, 1: False}
+
+def test_inputs_with_only_one_kind_or_none():
+    ids, counts, *_ = polygon_inputs_to_arrays([], [_legacy_row(2, 1.0, SQUARE)])
+    assert ids.tolist() == [2] and counts.tolist() == [4]
+    ids, counts, *_ = polygon_inputs_to_arrays([(5, 1.0, _blob(HEXAGON))], [])
+    assert ids.tolist() == [5] and counts.tolist() == [6]
+    ids, counts, eastings, northings, proposed = polygon_inputs_to_arrays([], [])
+    assert len(ids) == len(counts) == len(eastings) == len(proposed) == 0
+
+def _csv_row(response_code, ring, proposed_acre):
+    row = {CSV_HEADERS["uuid"]: f"uuid-{response_code}", CSV_HEADERS["response_code"]: response_code,
+           CSV_HEADERS["farmer_name"]: "Test Farmer", CSV_HEADERS["village"]: "Khedgaon", CSV_HEADERS["block"]: "Dindori",
+           CSV_HEADERS["district"]: "Nashik", CSV_HEADERS["area"]: proposed_acre}
+    for n, (easting, northing) in enumerate(_utm(ring), start=1):
+        row[POINT_UTM_HEADER_PATTERN.format(n=n)] = f"43Q {easting:.0f} {northing:.0f}"
+        row[POINT_ALT_HEADER_PATTERN.format(n=n)] = "600.0"
+    return row
+
+def test_update_geometry_metrics_stores_each_record_its_own_metrics(tmp_path):
+    db = DatabaseManager(db_file_path=str(tmp_path / "test.db"))
+    try:
+        rows = [_csv_row("RC-HEX", HEXAGON, "5.00"), _csv_row("RC-SQUARE", SQUARE, "0.50"), _csv_row("RC-BOWTIE", BOW_TIE, "")]
+        assert import_polygon_rows(db, rows, "test")["new_added"] == 3
+        # The square as stored before the 'vertices' column existed
+        db.cursor.execute("UPDATE polygon_data SET vertices = NULL, vertex_count = NULL WHERE response_code = 'RC-SQUARE'")
+        db.conn.commit()
+
+        result = update_geometry_metrics(db)
+        assert result["computed"] == 3
+        assert result["self_intersecting"] == 1
+        db.cursor.execute("""SELECT p.response_code, g.area_acre, g.perimeter_m, g.self_intersecting, g.area_deviation_pct
+                             FROM polygon_geometry g JOIN polygon_data p ON p.id = g.polygon_id""")
+        stored = {code: values for code, *values in db.cursor.fetchall()}
+        hexagon_acre = 24000.0 / SQUARE_METRES_PER_ACRE
+        assert stored["RC-HEX"] == pytest.approx([hexagon_acre, HEXAGON_PERIMETER, 0, (hexagon_acre - 5.0) / 5.0 * 100])
+        square_acre = 2500.0 / SQUARE_METRES_PER_ACRE
+        assert stored["RC-SQUARE"] == pytest.approx([square_acre, 200.0, 0, (square_acre - 0.5) / 0.5 * 100])
+        assert stored["RC-BOWTIE"][0] == pytest.approx(0.0, abs=1e-9)
+        assert stored["RC-BOWTIE"][2] == 1
+        assert stored["RC-BOWTIE"][3] is None # No proposed area: no deviation
+    finally:
+        db.close()
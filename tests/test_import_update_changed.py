@@ -0,0 +1,175 @@
+# File: DilasaKMLTool_v4/tests/test_import_update_changed.py
+# ----------------------------------------------------------------------
+# Re-import with update_changed: source row hashes decide which existing records are
+# rewritten, export counts and evaluation status survive, legacy records without a hash get it
+# filled in, and repeats of a Response Code within one import are never counted as updates.
+import pytest
+
+from core.data_processor import CSV_HEADERS, compute_source_row_hash
+from core.import_pipeline import apply_import_preview, import_polygon_rows, preview_import
+from database.db_manager import DatabaseManager
+
+PLOT_CORNERS = ((533000, 2196000), (533080, 2196005), (533085, 2196070), (532995, 2196065))
+
+def make_row(response_code, uuid, farmer_name="Ramesh Patil", district="Nashik"):
+    row = {
+        CSV_HEADERS["uuid"]: uuid,
+        CSV_HEADERS["response_code"]: response_code,
+        CSV_HEADERS["farmer_name"]: farmer_name,
+        CSV_HEADERS["village"]: "Khedgaon",
+        CSV_HEADERS["block"]: "Dindori",
+        CSV_HEADERS["district"]: district,
+        CSV_HEADERS["area"]: "1.50",
+    }
+    for n, (easting, northing) in enumerate(PLOT_CORNERS, start=1):
+        row[CSV_HEADERS[f"p{n}_utm"]] = f"43Q {easting} {northing}"
+        row[CSV_HEADERS[f"p{n}_alt"]] = "600.0"
+    return row
+
+@pytest.fixture
+def db(tmp_path):
+    db_manager = DatabaseManager(db_file_path=str(tmp_path / "test.db"))
+    yield db_manager
+    db_manager.close()
+
+def _record(db_manager, response_code):
+    db_manager.cursor.execute("SELECT id FROM polygon_data WHERE response_code = ?", (response_code,))
+    return db_manager.get_polygon_data_by_id(db_manager.cursor.fetchone()[0])
+
+def test_unchanged_reimport_updates_nothing(db):
+    rows = [make_row("RC1", "uuid-1"), make_row("RC2", "uuid-2")]
+    assert import_polygon_rows(db, rows, "test")["new_added"] == 2
+    before = _record(db, "RC1")
+
+    summary = import_polygon_rows(db, rows, "test", update_changed=True)
+    assert summary["updated_changed"] == 0
+    assert summary["new_added"] == 0
+    assert summary["skipped_duplicate"] == 2
+    assert _record(db, "RC1")["last_modified"] == before["last_modified"]
+
+def test_changed_row_is_updated_and_managed_columns_kept(db):
+    import_polygon_rows(db, [make_row("RC1", "uuid-1"), make_row("RC2", "uuid-2")], "test")
+    record_id = _record(db, "RC1")["id"]
+    db.update_kml_export_status(record_id)
+    db.update_kml_export_status(record_id)
+    db.update_evaluation_status(record_id, "Eligible")
+    before = _record(db, "RC1")
+
+    corrected_row = make_row("RC1", "uuid-1", farmer_name="Ramesh B. Patil")
+    summary = import_polygon_rows(db, [corrected_row, make_row("RC2", "uuid-2")], "test", update_changed=True)
+    assert summary["updated_changed"] == 1
+    assert summary["skipped_duplicate"] == 1
+
+    after = _record(db, "RC1")
+    assert after["farmer_name"] == "Ramesh B. Patil"
+    assert after["source_hash"] == compute_source_row_hash(corrected_row)
+    assert after["id"] == record_id
+    for column in ("kml_export_count", "last_kml_export_date", "evaluation_status", "date_added"):
+        assert after[column] == before[column], column
+    assert after["kml_export_count"] == 2
+    assert after["evaluation_status"] == "Eligible"
+
+def test_changed_row_without_update_changed_is_skipped(db):
+    import_polygon_rows(db, [make_row("RC1", "uuid-1")], "test")
+    summary = import_polygon_rows(db, [make_row("RC1", "uuid-1", farmer_name="Someone Else")], "test")
+    assert summary["updated_changed"] == 0
+    assert summary["skipped_duplicate"] == 1
+    assert _record(db, "RC1")["farmer_name"] == "Ramesh Patil"
+
+def _make_legacy(db_manager, response_code):
+    # Imported before source hashes and packed vertices existed: both columns NULL
+    db_manager.cursor.execute("UPDATE polygon_data SET source_hash = NULL, vertices = NULL, vertex_count = NULL "
+                              "WHERE response_code = ?", (response_code,))
+    db_manager.conn.commit()
+
+def test_legacy_row_without_hash_is_backfilled_not_updated(db):
+    row = make_row("RC1", "uuid-1")
+    import_polygon_rows(db, [row], "test")
+    _make_legacy(db, "RC1")
+    before = _record(db, "RC1")
+
+    summary = import_polygon_rows(db, [row], "test", update_changed=True)
+    assert summary["updated_changed"] == 0
+    assert summary["skipped_duplicate"] == 1
+    after = _record(db, "RC1")
+    assert after["source_hash"] == compute_source_row_hash(row)
+    assert after["last_modified"] == before["last_modified"]
+
+def test_legacy_row_with_changed_data_is_updated(db):
+    import_polygon_rows(db, [make_row("RC1", "uuid-1")], "test")
+    _make_legacy(db, "RC1")
+    corrected_row = make_row("RC1", "uuid-1", district="Palghar")
+
+    summary = import_polygon_rows(db, [corrected_row], "test", update_changed=True)
+    assert summary["updated_changed"] == 1
+    after = _record(db, "RC1")
+    assert after["district"] == "Palghar"
+    assert after["source_hash"] == compute_source_row_hash(corrected_row)
+    assert after["vertex_count"] == 4
+
+def test_legacy_row_with_extra_points_is_updated(db):
+    import_polygon_rows(db, [make_row("RC1", "uuid-1")], "test")
+    _make_legacy(db, "RC1")
+    row = make_row("RC1", "uuid-1")
+    row["Point 5 (UTM)"], row["Point 5 (altitude)"] = "43Q 532990 2196030", "600.0"
+
+    summary = import_polygon_rows(db, [row], "test", update_changed=True)
+    assert summary["updated_changed"] == 1
+    assert _record(db, "RC1")["vertex_count"] == 5
+
+@pytest.mark.parametrize("chunk_size", [500, 1])
+def test_repeated_response_code_in_one_file_is_a_duplicate(db, chunk_size):
+    rows = [make_row("RC1", "uuid-1"), make_row("RC1", "uuid-1", farmer_name="Second Copy")]
+    summary = import_polygon_rows(db, rows, "test", update_changed=True, chunk_size=chunk_size)
+    assert summary["new_added"] == 1
+    assert summary["updated_changed"] == 0
+    assert summary["skipped_duplicate"] == 1
+    assert _record(db, "RC1")["farmer_name"] == "Ramesh Patil"
+
+@pytest.mark.parametrize("chunk_size", [500, 1])
+def test_repeated_changed_row_updates_stored_record_once(db, chunk_size):
+    import_polygon_rows(db, [make_row("RC1", "uuid-1")], "test")
+    rows = [make_row("RC1", "uuid-1", farmer_name="First Fix"), make_row("RC1", "uuid-1", farmer_name="Second Fix")]
+    summary = import_polygon_rows(db, rows, "test", update_changed=True, chunk_size=chunk_size)
+    assert summary["updated_changed"] == 1
+    assert summary["skipped_duplicate"] == 1
+    assert _record(db, "RC1")["farmer_name"] == "First Fix"
+
+def test_unchanged_row_then_changed_repeat_in_later_chunk_is_a_duplicate(db):
+    import_polygon_rows(db, [make_row("RC1", "uuid-1")], "test")
+    rows = [make_row("RC1", "uuid-1"), make_row("RC2", "uuid-2"), make_row("RC1", "uuid-1", farmer_name="Late Copy")]
+    summary = import_polygon_rows(db, rows, "test", update_changed=True, chunk_size=2)
+    assert summary["updated_changed"] == 0
+    assert summary["skipped_duplicate"] == 2
+    assert _record(db, "RC1")["farmer_name"] == "Ramesh Patil"
+
+@pytest.mark.parametrize("update_changed", [False, True])
+def test_run_codes_are_kept_only_while_importing_with_update_changed(db, update_changed):
+    def table_exists():
+        db.cursor.execute("SELECT COUNT(*) FROM sqlite_temp_master WHERE name = 'import_run_codes'")
+        return db.cursor.fetchone()[0] == 1
+    seen_during_import = []
+    progress = lambda *counts: seen_during_import.append(table_exists())
+    import_polygon_rows(db, [make_row("RC1", "uuid-1"), make_row("RC2", "uuid-2")], "test",
+                        progress_callback=progress, chunk_size=1, update_changed=update_changed)
+    assert seen_during_import == [update_changed, update_changed]
+    assert not table_exists()
+
+def test_bulk_update_rolls_back_rows_without_hash(db):
+    import_polygon_rows(db, [make_row("RC1", "uuid-1")], "test")
+    record = _record(db, "RC1")
+    assert db.update_polygon_data_bulk([{"response_code": "RC1", "farmer_name": "No Hash"}]) is None
+    assert _record(db, "RC1")["farmer_name"] == record["farmer_name"]
+
+def test_preview_treats_identical_legacy_record_as_duplicate(db):
+    rows = [make_row("RC1", "uuid-1"), make_row("RC2", "uuid-2")]
+    import_polygon_rows(db, rows, "test")
+    _make_legacy(db, "RC1")
+    _make_legacy(db, "RC2")
+
+    preview = preview_import(db, [rows[0], make_row("RC2", "uuid-2", farmer_name="Corrected")], "test")
+    assert preview["categories"]["duplicate"] == 1
+    assert preview["categories"]["changed"] == 1
+    summary = apply_import_preview(db, preview, "csv", "test", update_changed=True)
+    assert summary["updated_changed"] == 1
+    assert _record(db, "RC2")["farmer_name"] == "Corrected"
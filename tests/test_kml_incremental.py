@@ -0,0 +1,83 @@
+# File: DilasaKMLTool_v4/tests/test_kml_incremental.py
+# ----------------------------------------------------------------------
+# One KMZ per district: districts whose names differ only in characters not allowed in file names
+# (or the empty district and one named "No District") get files of their own, and removing one
+# district never deletes another's file, also when an older manifest gave them the same file.
+import json
+import os
+import zipfile
+
+import pytest
+
+from core.data_processor import CSV_HEADERS
+from core.import_pipeline import import_polygon_rows
+from core.kml_incremental import DISTRICT_KMZ_MANIFEST_FILE_NAME, district_kmz_file_name, export_district_kmz
+from database.db_manager import DatabaseManager
+
+DISTRICTS = ("A/B", "A_B", "", "No District")
+
+def test_district_file_names_are_distinct():
+    file_names = [district_kmz_file_name(district) for district in (*DISTRICTS, "A:B", "A B ")]
+    assert len(set(file_names)) == len(file_names)
+    assert district_kmz_file_name("Nashik") == "District_Nashik.kmz" # Clean names are unchanged
+
+def _csv_row(number, district):
+    row = {CSV_HEADERS["uuid"]: f"uuid-{number}", CSV_HEADERS["response_code"]: f"RC{number}",
+           CSV_HEADERS["farmer_name"]: "Test Farmer", CSV_HEADERS["village"]: "Khedgaon", CSV_HEADERS["block"]: "Dindori",
+           CSV_HEADERS["district"]: district, CSV_HEADERS["area"]: "1.00"}
+    easting = 533000 + 200 * number
+    for n, (d_east, d_north) in enumerate(((0, 0), (80, 0), (80, 60), (0, 60)), start=1):
+        row[CSV_HEADERS[f"p{n}_utm"]] = f"43Q {easting + d_east} {2196000 + d_north}"
+        row[CSV_HEADERS[f"p{n}_alt"]] = "600.0"
+    return row
+
+@pytest.fixture
+def db(tmp_path):
+    db_manager = DatabaseManager(db_file_path=str(tmp_path / "test.db"))
+    # District number i gets i + 1 plots, so every KMZ can be told apart by its placemark count
+    rows = [_csv_row(10 * i + n, district) for i, district in enumerate(DISTRICTS) for n in range(i + 1)]
+    assert import_polygon_rows(db_manager, rows, "test")["new_added"] == len(rows)
+    yield db_manager
+    db_manager.close()
+
+def _placemark_counts(output_folder):
+    counts = {}
+    for file_name in os.listdir(output_folder):
+        if file_name.endswith(".kmz"):
+            with zipfile.ZipFile(os.path.join(output_folder, file_name)) as kmz_file:
+                counts[file_name] = kmz_file.read("doc.kml").decode("utf-8").count("<Placemark")
+    return counts
+
+def _delete_district(db_manager, district):
+    db_manager.cursor.execute("SELECT id FROM polygon_data WHERE district = ?", (district,))
+    db_manager.delete_polygon_data([record_id for (record_id,) in db_manager.cursor.fetchall()])
+
+def test_each_district_keeps_its_own_kmz(db, tmp_path):
+    output_folder = str(tmp_path / "kmz")
+    summary = export_district_kmz(db, output_folder)
+    assert summary["districts_written"] == len(DISTRICTS)
+    assert _placemark_counts(output_folder) == {district_kmz_file_name(district): i + 1 for i, district in enumerate(DISTRICTS)}
+
+    _delete_district(db, "A/B")
+    _delete_district(db, "")
+    summary = export_district_kmz(db, output_folder)
+    assert summary["removed"] == 2
+    assert summary["districts_unchanged"] == 2
+    assert _placemark_counts(output_folder) == {district_kmz_file_name("A_B"): 2, district_kmz_file_name("No District"): 4}
+
+def test_files_shared_in_an_older_manifest_are_rewritten_not_deleted(db, tmp_path):
+    output_folder = str(tmp_path / "kmz")
+    export_district_kmz(db, output_folder)
+    # As written before names were made distinct: "A/B" and "A_B" both in District_A_B.kmz, holding "A/B"'s plot
+    manifest_path = os.path.join(output_folder, DISTRICT_KMZ_MANIFEST_FILE_NAME)
+    with open(manifest_path, encoding="utf-8") as manifest_file:
+        manifest = json.load(manifest_file)
+    os.replace(os.path.join(output_folder, district_kmz_file_name("A/B")), os.path.join(output_folder, "District_A_B.kmz"))
+    manifest["records"]["A/B"]["file"] = "District_A_B.kmz"
+    with open(manifest_path, "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file)
+
+    _delete_district(db, "A/B")
+    summary = export_district_kmz(db, output_folder)
+    assert summary["districts_written"] == 1 # "A_B", whose file held the other district's plot
+    assert _placemark_counts(output_folder)["District_A_B.kmz"] == 2
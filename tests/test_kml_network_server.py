@@ -0,0 +1,67 @@
+# File: DilasaKMLTool_v4/tests/test_kml_network_server.py
+# ----------------------------------------------------------------------
+# Live NetworkLink server: polls of /polygons.kml and its chunks are served from the database
+# without running table creation or schema migration DDL on every request.
+import urllib.request
+
+import pytest
+
+from core.data_processor import CSV_HEADERS
+from core.import_pipeline import import_polygon_rows
+from core.kml_network_server import CHUNK_PATH_PREFIX, POLYGONS_PATH, KMLNetworkLinkServer
+from database.db_manager import DatabaseManager
+
+RECORD_COUNT = 3
+
+def _csv_row(number):
+    row = {CSV_HEADERS["uuid"]: f"uuid-{number}", CSV_HEADERS["response_code"]: f"RC{number}",
+           CSV_HEADERS["farmer_name"]: "Test Farmer", CSV_HEADERS["village"]: "Khedgaon", CSV_HEADERS["block"]: "Dindori",
+           CSV_HEADERS["district"]: "Nashik", CSV_HEADERS["area"]: "1.00"}
+    easting = 533000 + 5000 * number
+    for n, (d_east, d_north) in enumerate(((0, 0), (80, 0), (80, 60), (0, 60)), start=1):
+        row[CSV_HEADERS[f"p{n}_utm"]] = f"43Q {easting + d_east} {2196000 + d_north}"
+        row[CSV_HEADERS[f"p{n}_alt"]] = "600.0"
+    return row
+
+@pytest.fixture
+def db_file_path(tmp_path):
+    db_file_path = str(tmp_path / "test.db")
+    db_manager = DatabaseManager(db_file_path=db_file_path)
+    import_polygon_rows(db_manager, [_csv_row(number) for number in range(RECORD_COUNT)], "test")
+    db_manager.close()
+    return db_file_path
+
+@pytest.fixture
+def schema_calls(monkeypatch):
+    calls = []
+    for method_name in ("_create_tables", "_migrate_schema"):
+        original = getattr(DatabaseManager, method_name)
+        def counting(self, _original=original, _name=method_name):
+            calls.append(_name)
+            return _original(self)
+        monkeypatch.setattr(DatabaseManager, method_name, counting)
+    return calls
+
+def _get(url):
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return response.read().decode("utf-8")
+
+@pytest.mark.parametrize("chunk_size", [RECORD_COUNT, 1])
+def test_polls_run_no_schema_ddl(db_file_path, schema_calls, chunk_size):
+    server = KMLNetworkLinkServer(db_file_path, chunk_size=chunk_size)
+    server.start()
+    try:
+        server.set_record_ids(range(1, RECORD_COUNT + 1))
+        for _poll in range(3):
+            server.notify_data_changed() # A new version every poll: the document is rebuilt from the database
+            polygons_kml = _get(server.base_url + POLYGONS_PATH)
+        if chunk_size < RECORD_COUNT:
+            chunk_texts = [_get(f"{server.base_url}{CHUNK_PATH_PREFIX}{server.current_version()}/{index}.kml")
+                           for index in range(RECORD_COUNT)]
+            assert polygons_kml.count("<NetworkLink") == RECORD_COUNT
+            assert sum(text.count("<Placemark") for text in chunk_texts) == RECORD_COUNT
+        else:
+            assert polygons_kml.count("<Placemark") == RECORD_COUNT
+    finally:
+        server.stop()
+    assert schema_calls == []
@@ -0,0 +1,82 @@
+# File: DilasaKMLTool_v4/tests/test_kml_superoverlay.py
+# ----------------------------------------------------------------------
+# Super-overlay tile layout: every node of an admin layout (villages numbered past 9, a large
+# village split by quadtree below them) gets its own tile file, in a folder and in a KMZ.
+import os
+import zipfile
+
+import numpy as np
+import pytest
+
+from core.data_processor import CSV_HEADERS
+from core.import_pipeline import import_polygon_rows
+from core.kml_superoverlay import _TileNode, _split_admin, export_super_overlay
+from database.db_manager import DatabaseManager
+
+VILLAGE_COUNT = 12
+LARGE_VILLAGE = "Village 01" # Tile key '_0_0_1': its quadrants must not take the keys of villages 10 and 11
+LARGE_VILLAGE_PLOTS = 6
+TILE_PLACEMARKS = 2
+
+def _plots():
+    """(village, easting, northing) of one plot per village plus the extra plots of LARGE_VILLAGE, spread out."""
+    plots = [(f"Village {number:02d}", 533000 + 1000 * number, 2196000) for number in range(VILLAGE_COUNT)]
+    plots += [(LARGE_VILLAGE, 540000 + 500 * (n % 3), 2200000 + 500 * (n // 3)) for n in range(LARGE_VILLAGE_PLOTS)]
+    return plots
+
+def _collect_keys(node):
+    keys, pending = [], [node]
+    while pending:
+        node = pending.pop()
+        keys.append(node.key)
+        pending.extend(node.children)
+    return keys
+
+def test_admin_layout_keys_are_unique():
+    plots = _plots()
+    admin_names = [("Nashik", "Dindori", village) for village, _easting, _northing in plots]
+    centres = np.asarray([(73.0 + easting / 1e6, 19.0 + northing / 1e6) for _village, easting, northing in plots])
+    root = _TileNode("", "", np.arange(len(plots)))
+    _split_admin(root, admin_names, centres, np.hstack((centres, centres)), TILE_PLACEMARKS)
+    keys = _collect_keys(root)
+    assert len(keys) == len(set(keys))
+    assert any(len(node.children) > 1 for node in root.children[0].children[0].children) # The large village was split
+
+def _csv_row(number, village, easting, northing):
+    row = {CSV_HEADERS["uuid"]: f"uuid-{number}", CSV_HEADERS["response_code"]: f"RC{number}",
+           CSV_HEADERS["farmer_name"]: "Test Farmer", CSV_HEADERS["village"]: village, CSV_HEADERS["block"]: "Dindori",
+           CSV_HEADERS["district"]: "Nashik", CSV_HEADERS["area"]: "1.00"}
+    for n, (d_east, d_north) in enumerate(((0, 0), (80, 0), (80, 60), (0, 60)), start=1):
+        row[CSV_HEADERS[f"p{n}_utm"]] = f"43Q {easting + d_east} {northing + d_north}"
+        row[CSV_HEADERS[f"p{n}_alt"]] = "600.0"
+    return row
+
+@pytest.fixture
+def db(tmp_path):
+    db_manager = DatabaseManager(db_file_path=str(tmp_path / "test.db"))
+    rows = [_csv_row(number, *plot) for number, plot in enumerate(_plots())]
+    assert import_polygon_rows(db_manager, rows, "test")["new_added"] == len(rows)
+    yield db_manager
+    db_manager.close()
+
+def _all_ids(db_manager):
+    db_manager.cursor.execute("SELECT id FROM polygon_data ORDER BY id")
+    return [record_id for (record_id,) in db_manager.cursor.fetchall()]
+
+def test_admin_export_writes_every_tile_to_its_own_file(db, tmp_path):
+    record_ids = _all_ids(db)
+    output_path = str(tmp_path / "overlay")
+    summary = export_super_overlay(db, record_ids, output_path, partition="admin", tile_placemarks=TILE_PLACEMARKS)
+    assert sorted(summary["exported_ids"]) == record_ids
+    tile_files = os.listdir(os.path.join(output_path, "tiles"))
+    assert len(tile_files) + 1 == summary["tiles"] # Plus doc.kml
+
+def test_admin_export_kmz_has_no_duplicate_entries(db, tmp_path):
+    record_ids = _all_ids(db)
+    output_path = str(tmp_path / "overlay.kmz")
+    summary = export_super_overlay(db, record_ids, output_path, partition="admin", package_kmz=True,
+                                   tile_placemarks=TILE_PLACEMARKS)
+    assert sorted(summary["exported_ids"]) == record_ids
+    with zipfile.ZipFile(output_path) as kmz_file:
+        entry_names = kmz_file.namelist()
+    assert len(entry_names) == len(set(entry_names)) == summary["tiles"]
@@ -0,0 +1,133 @@
+# File: DilasaKMLTool_v4/ui/background_jobs.py
+# ----------------------------------------------------------------------
+import sqlite3
+
+from PySide6.QtCore import QObject, QThread, QTimer, Signal
+
+from database.db_manager import DatabaseManager
+
+SCHEDULER_POLL_MS = 30 * 1000 # How often due jobs are looked for
+JOB_STOP_WAIT_MS = 2000 # stop() blocks the GUI at most this long for a cancelled job to end
+
+
+class ScheduledJobWorker(QObject):
+    """
+    Runs core.job_scheduler.execute_job in a QThread (moveToThread), on its own DB connection: SQLite
+    connections can't be shared across threads. cancel() may be called from the GUI thread.
+    """
+    log = Signal(str, str) # message, level
+    finished = Signal(dict) # The job_runs row of the run ({} if it could not run at all)
+
+    def __init__(self, db_file_path, job, trigger):
+        super().__init__()
+        self.db_file_path, self.job, self.trigger = db_file_path, job, trigger
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        from core.job_scheduler import execute_job
+        try:
+            db_manager = DatabaseManager(db_file_path=self.db_file_path)
+        except sqlite3.Error as e:
+            self.log.emit(f"Scheduled job '{self.job['name']}' could not open the database: {e}", "error")
+            self.finished.emit({})
+            return
+        try:
+            run = execute_job(db_manager, self.job, self.trigger, log_callback=self._log_from_job,
+                              should_cancel=lambda: self._cancelled)
+        finally:
+            db_manager.close()
+        self.finished.emit(run)
+
+    def _log_from_job(self, message, level="info"):
+        if level in ("error", "warning"): self.log.emit(message, level) # Per-row info messages would flood the GUI log
+
+
+class BackgroundJobScheduler(QObject):
+    """
+    Runs the enabled scheduled_jobs of the app's database when they are due, one at a time, each in a
+    worker thread, so the GUI stays responsive. Due jobs are looked for every SCHEDULER_POLL_MS (and
+    right after a run). run_now() queues a job regardless of its schedule.
+    """
+    job_started = Signal(dict) # The job
+    job_finished = Signal(dict) # The job_runs row of the run
+    job_log = Signal(str, str) # message, level
+    stopped = Signal() # The job still running when stop() returned False has ended
+
+    def __init__(self, db_manager, parent=None):
+        super().__init__(parent)
+        self.db_manager = db_manager # GUI-thread connection: only reads jobs here
+        self._manual_job_ids = []
+        self._thread = self._worker = self._running_job = None
+        self._stopping = False
+        self._poll_timer = QTimer(self)
+        self._poll_timer.setInterval(SCHEDULER_POLL_MS)
+        self._poll_timer.timeout.connect(self.check_due_jobs)
+
+    def start(self):
+        self._poll_timer.start()
+        QTimer.singleShot(0, self.check_due_jobs)
+
+    def stop(self, wait_ms=JOB_STOP_WAIT_MS):
+        """
+        Stops polling and cancels the running job (an import resumes from its checkpoint next time).
+        Returns False if the job has not ended within wait_ms: it is finishing its current step (at most
+        a chunk, a district or a job fetch timeout) and stopped is emitted once it has. Its thread must
+        not be destroyed before then.
+        """
+        self._poll_timer.stop()
+        if self._thread is None: return True
+        self._worker.cancel(); self._thread.quit() # The thread's event loop ends once the worker returns
+        if not self._thread.wait(wait_ms):
+            self._stopping = True
+            return False
+        self._end_run()
+        return True
+
+    def is_busy(self):
+        return self._thread is not None
+
+    def running_job(self):
+        return self._running_job
+
+    def run_now(self, job_id):
+        if job_id not in self._manual_job_ids: self._manual_job_ids.append(job_id)
+        self.check_due_jobs()
+
+    def check_due_jobs(self):
+        if self._thread is not None: return # One job at a time; checked again when it ends
+        from core.job_scheduler import due_jobs
+        job, trigger = None, "schedule"
+        while self._manual_job_ids and job is None:
+            job, trigger = self.db_manager.get_scheduled_job(self._manual_job_ids.pop(0)), "manual"
+        if job is None:
+            jobs = due_jobs(self.db_manager)
+            if not jobs: return
+            job, trigger = jobs[0], "schedule"
+        self._running_job = job
+        worker = ScheduledJobWorker(self.db_manager.db_path, job, trigger)
+        thread = QThread(self)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        # Bound methods of GUI-thread objects: Qt queues these calls to the GUI thread
+        worker.log.connect(self.job_log)
+        worker.finished.connect(self._on_worker_finished)
+        self._thread, self._worker = thread, worker
+        self.job_started.emit(job)
+        thread.start()
+
+    def _end_run(self):
+        self._thread.quit(); self._thread.wait()
+        self._worker.deleteLater(); self._thread.deleteLater()
+        self._thread = self._worker = self._running_job = None
+
+    def _on_worker_finished(self, run):
+        if self._thread is None: return # Already ended by stop()
+        self._end_run()
+        if self._stopping:
+            self._stopping = False
+            self.stopped.emit(); return
+        self.job_finished.emit(run)
+        if self._poll_timer.isActive(): QTimer.singleShot(0, self.check_due_jobs) # Jobs that came due meanwhile
@@ -0,0 +1,68 @@
+# File: DilasaKMLTool_v4/ui/dialogs/csv_export_dialog.py
+# ----------------------------------------------------------------------
+from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QListWidget, QListWidgetItem,
+                               QPushButton, QCheckBox, QDialogButtonBox)
+from PySide6.QtCore import Qt
+
+from .api_sources_dialog import center_dialog
+
+class CsvExportDialog(QDialog):
+    """
+    Picks the columns of a CSV export (any polygon_data column or geometry metric, in table order)
+    and whether to gzip the file. Starts with the records table's columns checked.
+    """
+    def __init__(self, parent, available_columns, default_columns, record_count):
+        super().__init__(parent)
+        self.setWindowTitle("Export Data as CSV")
+        self.setMinimumSize(380, 480)
+        self.setModal(True)
+        self.default_columns = [column for column in default_columns if column in available_columns]
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(15, 15, 15, 15)
+        layout.setSpacing(10)
+        layout.addWidget(QLabel(f"{record_count:,} record(s) match the current filters. Columns to export:"))
+
+        self.column_list = QListWidget()
+        for column in available_columns:
+            item = QListWidgetItem(column)
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            self.column_list.addItem(item)
+        layout.addWidget(self.column_list)
+
+        preset_layout = QHBoxLayout()
+        for text, columns in (("Table Columns", self.default_columns), ("All Columns", available_columns), ("None", [])):
+            button = QPushButton(text)
+            button.clicked.connect(lambda _checked=False, columns=columns: self._check_columns(columns))
+            preset_layout.addWidget(button)
+        preset_layout.addStretch()
+        layout.addLayout(preset_layout)
+
+        self.gzip_checkbox = QCheckBox("Compress with gzip (.csv.gz)")
+        layout.addWidget(self.gzip_checkbox)
+
+        self.dialog_buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        self.dialog_buttons.accepted.connect(self.accept)
+        self.dialog_buttons.rejected.connect(self.reject)
+        layout.addWidget(self.dialog_buttons)
+
+        self.column_list.itemChanged.connect(self._update_ok_button)
+        self._check_columns(self.default_columns)
+        center_dialog(self, parent)
+
+    def _check_columns(self, columns):
+        columns = set(columns)
+        for row in range(self.column_list.count()):
+            item = self.column_list.item(row)
+            item.setCheckState(Qt.CheckState.Checked if item.text() in columns else Qt.CheckState.Unchecked)
+        self._update_ok_button()
+
+    def _update_ok_button(self, *_args):
+        self.dialog_buttons.button(QDialogButtonBox.StandardButton.Ok).setEnabled(bool(self.selected_columns()))
+
+    def selected_columns(self):
+        return [self.column_list.item(row).text() for row in range(self.column_list.count())
+                if self.column_list.item(row).checkState() == Qt.CheckState.Checked]
+
+    def use_gzip(self):
+        return self.gzip_checkbox.isChecked()
@@ -0,0 +1,105 @@
+# File: DilasaKMLTool_v4/ui/dialogs/import_history_dialog.py
+# ----------------------------------------------------------------------
+import statistics
+from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QTableView, QLabel, QComboBox,
+                               QAbstractItemView, QHeaderView, QDialogButtonBox)
+from PySide6.QtGui import QStandardItemModel, QStandardItem, QColor
+from PySide6.QtCore import Qt
+
+from .api_sources_dialog import center_dialog
+
+HISTORY_RUNS_SHOWN = 500
+BASELINE_RUNS = 10 # Previous runs of the same type the rows/s is compared with
+SLOW_RUN_RATIO = 0.5 # Runs below this share of the baseline median are highlighted
+
+class ImportHistoryDialog(QDialog):
+    """
+    Lists the import_runs ledger, newest first: outcome counts, duration, rows/s, DB size before
+    the import and per-phase times. A rows/s value well below the median of the previous runs
+    of the same type is highlighted, so throughput regressions stand out.
+    """
+    COLUMNS = ["Started", "Type", "Source", "Size (KB)", "Rows", "New", "New w/ Errors", "Updated", "Duplicates",
+               "Missing RC", "Invalid", "DB Failed", "Seconds", "Rows/s", "DB Records Before", "Phases (s)"]
+
+    def __init__(self, parent_main_window, db_manager):
+        super().__init__(parent_main_window)
+        self.db_manager = db_manager
+        self.setWindowTitle("Import History")
+        self.setMinimumSize(1000, 450)
+        self.setModal(True)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(15, 15, 15, 15)
+        layout.setSpacing(10)
+
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel("Type:"))
+        self.type_combo = QComboBox()
+        self.type_combo.addItem("All", userData=None)
+        self.type_combo.addItem("CSV", userData="csv")
+        self.type_combo.addItem("API", userData="api")
+        self.type_combo.addItem("KML", userData="kml")
+        self.type_combo.currentIndexChanged.connect(self._load_runs_into_table)
+        filter_layout.addWidget(self.type_combo)
+        filter_layout.addStretch()
+        self.summary_label = QLabel()
+        filter_layout.addWidget(self.summary_label)
+        layout.addLayout(filter_layout)
+
+        self.table_view = QTableView()
+        self.table_model = QStandardItemModel(0, len(self.COLUMNS), self)
+        self.table_model.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table_view.setModel(self.table_model)
+        self.table_view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table_view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table_view.verticalHeader().setVisible(False)
+        self.table_view.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.table_view.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.table_view)
+
+        button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Close)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+        self._load_runs_into_table()
+        center_dialog(self, parent_main_window)
+
+    @staticmethod
+    def _flag_slow_runs(runs):
+        """Returns the IDs of runs whose rows/s is below SLOW_RUN_RATIO of the median of the previous runs of the same type."""
+        slow_ids, previous_rates = set(), {}
+        for run in reversed(runs): # Oldest first
+            rates = previous_rates.setdefault(run["source_type"], [])
+            if run["rows_per_s"] and not run["cancelled"]:
+                if len(rates) >= 3 and run["rows_per_s"] < SLOW_RUN_RATIO * statistics.median(rates[-BASELINE_RUNS:]):
+                    slow_ids.add(run["id"])
+                rates.append(run["rows_per_s"])
+        return slow_ids
+
+    def _load_runs_into_table(self):
+        self.table_model.removeRows(0, self.table_model.rowCount())
+        runs = self.db_manager.get_import_runs(limit=HISTORY_RUNS_SHOWN, source_type=self.type_combo.currentData())
+        slow_ids = self._flag_slow_runs(runs)
+        for run in runs:
+            phases_text = ", ".join(f"{name} {seconds:.2f}" for name, seconds in run["phase_seconds"].items())
+            values = [run["started_at"], run["source_type"], run["source"],
+                      "" if run["byte_size"] is None else f"{run['byte_size'] / 1024:,.1f}",
+                      run["rows_total"], run["rows_new"], run["rows_new_with_errors"], run.get("rows_updated") or 0, run["rows_duplicate"],
+                      run["rows_missing_rc"], run["rows_invalid"], run["rows_failed"],
+                      "" if run["total_seconds"] is None else f"{run['total_seconds']:.2f}",
+                      "" if run["rows_per_s"] is None else f"{run['rows_per_s']:,.0f}",
+                      "" if run["db_records_before"] is None else run["db_records_before"], phases_text]
+            items = []
+            for col, value in enumerate(values):
+                item = QStandardItem(str(value) if value is not None else "")
+                if isinstance(value, int) or col in (3, 12, 13):
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                items.append(item)
+            notes = (["cancelled"] if run["cancelled"] else []) + ([f"resumed at row {run['resumed_from_row']}"] if run.get("resumed_from_row") else [])
+            if notes:
+                items[0].setText(f"{run['started_at']} ({', '.join(notes)})")
+            if run["id"] in slow_ids:
+                items[13].setBackground(QColor("#F8D7DA"))
+                items[13].setToolTip(f"Below {SLOW_RUN_RATIO:.0%} of the median rows/s of the previous {BASELINE_RUNS} runs of this type")
+            self.table_model.appendRow(items)
+        self.summary_label.setText(f"{len(runs)} run(s)" + (f", {len(slow_ids)} slow" if slow_ids else ""))
@@ -0,0 +1,93 @@
+# File: DilasaKMLTool_v4/ui/dialogs/import_preview_dialog.py
+# ----------------------------------------------------------------------
+from PySide6.QtWidgets import (QDialog, QVBoxLayout, QLabel, QTableView, QAbstractItemView, QHeaderView,
+                               QDialogButtonBox)
+from PySide6.QtGui import QStandardItemModel, QStandardItem, QFont
+from PySide6.QtCore import Qt
+
+from .api_sources_dialog import center_dialog
+
+CATEGORY_DESCRIPTIONS = {
+    "new": ("New", "Added"),
+    "changed": ("Changed", "Updated only with \"Import New + Update Changed\""),
+    "duplicate": ("Unchanged duplicate", "Skipped"),
+    "duplicate_in_batch": ("Repeated in this file", "Skipped (first occurrence is used)"),
+    "uuid_conflict": ("UUID conflict", "Skipped (UUID belongs to another Response Code)"),
+}
+
+class ImportPreviewDialog(QDialog):
+    """
+    Shows the dry-run result of core.import_pipeline.preview_import: rows per category, what
+    each action does with them, and sample rows (with the changed columns for changed records).
+    chosen_action is "new", "new_and_changed" or None (cancel) once the dialog closes.
+    """
+    def __init__(self, parent_main_window, preview, source_description):
+        super().__init__(parent_main_window)
+        self.chosen_action = None
+        self.setWindowTitle("Import Preview")
+        self.setMinimumSize(800, 500)
+        self.setModal(True)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(15, 15, 15, 15)
+        layout.setSpacing(10)
+
+        header_label = QLabel(f"Dry run of {source_description}: nothing has been written yet.")
+        header_font = QFont(); header_font.setBold(True); header_label.setFont(header_font)
+        layout.addWidget(header_label)
+        skipped_before_staging = preview["skipped_missing_rc"] + preview["skipped_invalid"]
+        details = f"{preview['processed']} rows read"
+        if skipped_before_staging:
+            details += f"; {preview['skipped_missing_rc']} without Response Code and {preview['skipped_invalid']} unreadable rows will be skipped"
+        if preview["new_with_errors"]:
+            details += f"; {preview['new_with_errors']} of the new rows have validation errors"
+        layout.addWidget(QLabel(details + "."))
+
+        categories_model = QStandardItemModel(0, 3, self)
+        categories_model.setHorizontalHeaderLabels(["Category", "Rows", "Action"])
+        for category, (label, action_text) in CATEGORY_DESCRIPTIONS.items():
+            count_item = QStandardItem(str(preview["categories"].get(category, 0)))
+            count_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+            categories_model.appendRow([QStandardItem(label), count_item, QStandardItem(action_text)])
+        layout.addWidget(self._create_table(categories_model, max_height=170))
+
+        layout.addWidget(QLabel("Sample rows:"))
+        samples_model = QStandardItemModel(0, 6, self)
+        samples_model.setHorizontalHeaderLabels(["Category", "Row", "Response Code", "Farmer", "Village", "Status / Changed Columns"])
+        for category, samples in preview["samples"].items():
+            for sample in samples:
+                detail = ", ".join(sample["changed_columns"]) if "changed_columns" in sample else sample["status"]
+                samples_model.appendRow([QStandardItem(CATEGORY_DESCRIPTIONS.get(category, (category,))[0]),
+                                         QStandardItem(str(sample["staging_row"])), QStandardItem(sample["response_code"] or ""),
+                                         QStandardItem(sample["farmer_name"] or ""), QStandardItem(sample["village_name"] or ""),
+                                         QStandardItem(detail or "")])
+        layout.addWidget(self._create_table(samples_model), 1)
+
+        categories = preview["categories"]
+        button_box = QDialogButtonBox()
+        new_button = button_box.addButton(f"Import New ({categories['new']})", QDialogButtonBox.ButtonRole.AcceptRole)
+        new_button.clicked.connect(lambda: self._choose("new"))
+        changed_button = button_box.addButton(f"Import New + Update Changed ({categories['new'] + categories['changed']})",
+                                              QDialogButtonBox.ButtonRole.AcceptRole)
+        changed_button.clicked.connect(lambda: self._choose("new_and_changed"))
+        changed_button.setEnabled(categories["changed"] > 0)
+        new_button.setEnabled(categories["new"] > 0)
+        button_box.addButton(QDialogButtonBox.StandardButton.Cancel)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+        center_dialog(self, parent_main_window)
+
+    def _create_table(self, model, max_height=None):
+        table_view = QTableView()
+        table_view.setModel(model)
+        table_view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        table_view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        table_view.verticalHeader().setVisible(False)
+        table_view.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        table_view.horizontalHeader().setStretchLastSection(True)
+        if max_height: table_view.setMaximumHeight(max_height)
+        return table_view
+
+    def _choose(self, action):
+        self.chosen_action = action
+        self.accept()
@@ -1,6 +1,7 @@
 # File: DilasaKMLTool_v4/ui/dialogs/output_mode_dialog.py
 # ----------------------------------------------------------------------
-from PySide6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QRadioButton, QButtonGroup, QDialogButtonBox, QFrame
+from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QRadioButton, QButtonGroup, QDialogButtonBox, QFrame,
+                               QComboBox, QCheckBox)
 from PySide6.QtCore import Qt
 from .api_sources_dialog import center_dialog # Re-use centering utility
 
@@ -10,6 +11,8 @@ class OutputModeDialog(QDialog):
         self.setWindowTitle("Select KML Output Mode")
         self.setModal(True)
         self.selected_mode = "single"  # Default mode
+        self.partition = "quadtree" # Super-overlay options
+        self.package_kmz = False
 
         layout = QVBoxLayout(self)
         layout.setContentsMargins(20, 20, 20, 20)
@@ -37,6 +40,40 @@ class OutputModeDialog(QDialog):
         hint_multiple = QLabel("  (Each selected valid polygon will be saved as a separate .kml file, named by its UUID)")
         hint_multiple.setStyleSheet("font-style: italic; color: grey; padding-left: 15px;")
         layout.addWidget(hint_multiple)
+
+        layout.addSpacing(10)
+
+        # Incremental Option
+        self.rb_incremental = QRadioButton("Incremental Folder Update (one KML per record)")
+        self.button_group.addButton(self.rb_incremental)
+        layout.addWidget(self.rb_incremental)
+        hint_incremental = QLabel("  (Only new or changed records are written; files of records no longer selected are deleted)")
+        hint_incremental.setStyleSheet("font-style: italic; color: grey; padding-left: 15px;")
+        layout.addWidget(hint_incremental)
+
+        layout.addSpacing(10)
+
+        # Super-overlay Option
+        self.rb_superoverlay = QRadioButton("Regionated Super-overlay (large selections)")
+        self.button_group.addButton(self.rb_superoverlay)
+        layout.addWidget(self.rb_superoverlay)
+        hint_superoverlay = QLabel("  (Many small tiles linked by regions: Google Earth only loads the plots in view)")
+        hint_superoverlay.setStyleSheet("font-style: italic; color: grey; padding-left: 15px;")
+        layout.addWidget(hint_superoverlay)
+        superoverlay_options = QHBoxLayout()
+        superoverlay_options.setContentsMargins(25, 0, 0, 0)
+        superoverlay_options.addWidget(QLabel("Tiles by:"))
+        self.partition_combo = QComboBox()
+        self.partition_combo.addItem("Location (quadtree)", userData="quadtree")
+        self.partition_combo.addItem("District > Block > Village", userData="admin")
+        superoverlay_options.addWidget(self.partition_combo)
+        self.kmz_checkbox = QCheckBox("Package as KMZ")
+        superoverlay_options.addWidget(self.kmz_checkbox)
+        superoverlay_options.addStretch()
+        layout.addLayout(superoverlay_options)
+        for option_widget in (self.partition_combo, self.kmz_checkbox):
+            option_widget.setEnabled(False)
+            self.rb_superoverlay.toggled.connect(option_widget.setEnabled)
         
         layout.addStretch()
 
@@ -52,6 +89,12 @@ class OutputModeDialog(QDialog):
     def accept_choice(self):
         if self.rb_single.isChecked():
             self.selected_mode = "single"
+        elif self.rb_incremental.isChecked():
+            self.selected_mode = "incremental"
+        elif self.rb_superoverlay.isChecked():
+            self.selected_mode = "superoverlay"
+            self.partition = self.partition_combo.currentData()
+            self.package_kmz = self.kmz_checkbox.isChecked()
         else:
             self.selected_mode = "multiple"
         self.accept()
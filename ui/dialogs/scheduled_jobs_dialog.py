@@ -0,0 +1,263 @@
+# File: DilasaKMLTool_v4/ui/dialogs/scheduled_jobs_dialog.py
+# ----------------------------------------------------------------------
+import os
+from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, QGroupBox, QTableView, QLabel, QLineEdit,
+                               QComboBox, QSpinBox, QTimeEdit, QRadioButton, QCheckBox, QPushButton, QFileDialog,
+                               QAbstractItemView, QHeaderView, QMessageBox, QDialogButtonBox)
+from PySide6.QtGui import QStandardItemModel, QStandardItem, QColor
+from PySide6.QtCore import Qt, QTime
+
+from .api_sources_dialog import center_dialog
+
+RUNS_SHOWN = 200
+JOB_TYPE_LABELS = {"sync_sources": "Sync mWater sources", "export_kml": "Export KML"}
+EXPORT_MODE_LABELS = {"incremental": "Per-record KML folder (incremental)", "district_kmz": "Consolidated KMZ per district"}
+_STATUS_COLORS = {"failed": "#F8D7DA", "cancelled": "#FFF3CD"}
+
+def describe_schedule(job):
+    return f"Daily at {job['daily_at']}" if job.get("daily_at") else f"Every {job.get('interval_minutes')} min"
+
+
+class JobEditDialog(QDialog):
+    """Edits the name, type, schedule and options of one scheduled job."""
+    def __init__(self, parent, job=None):
+        super().__init__(parent)
+        self.setWindowTitle("Edit Scheduled Job" if job else "Add Scheduled Job")
+        self.setMinimumWidth(460)
+        self.setModal(True)
+        job = job or {"job_type": "sync_sources", "interval_minutes": 30, "enabled": True, "params": {}}
+        params = job.get("params") or {}
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(15, 15, 15, 15)
+        form = QFormLayout()
+        self.name_edit = QLineEdit(job.get("name", ""))
+        form.addRow("Name:", self.name_edit)
+        self.type_combo = QComboBox()
+        for job_type, label in JOB_TYPE_LABELS.items(): self.type_combo.addItem(label, userData=job_type)
+        self.type_combo.setCurrentIndex(max(self.type_combo.findData(job.get("job_type")), 0))
+        form.addRow("Job:", self.type_combo)
+
+        schedule_layout = QHBoxLayout()
+        self.interval_radio = QRadioButton("Every")
+        self.interval_spin = QSpinBox(); self.interval_spin.setRange(1, 7 * 24 * 60); self.interval_spin.setSuffix(" min")
+        self.interval_spin.setValue(int(job.get("interval_minutes") or 30))
+        self.daily_radio = QRadioButton("Daily at")
+        self.daily_time_edit = QTimeEdit(); self.daily_time_edit.setDisplayFormat("HH:mm")
+        self.daily_time_edit.setTime(QTime.fromString(job["daily_at"], "HH:mm") if job.get("daily_at") else QTime(2, 0))
+        (self.daily_radio if job.get("daily_at") else self.interval_radio).setChecked(True)
+        for widget in (self.interval_radio, self.interval_spin, self.daily_radio, self.daily_time_edit): schedule_layout.addWidget(widget)
+        schedule_layout.addStretch()
+        form.addRow("Schedule:", schedule_layout)
+        self.enabled_checkbox = QCheckBox("Enabled"); self.enabled_checkbox.setChecked(bool(job.get("enabled", True)))
+        form.addRow("", self.enabled_checkbox)
+        layout.addLayout(form)
+
+        self.sync_group = QGroupBox("Sync Options")
+        sync_layout = QVBoxLayout(self.sync_group)
+        self.sources_edit = QLineEdit(", ".join(str(source) for source in params.get("sources", [])))
+        self.sources_edit.setPlaceholderText("All configured sources (or titles/IDs, comma-separated)")
+        sync_layout.addWidget(self.sources_edit)
+        self.if_changed_checkbox = QCheckBox("Skip sources that did not change since the last sync (ETag)")
+        self.if_changed_checkbox.setChecked(params.get("if_changed", True))
+        sync_layout.addWidget(self.if_changed_checkbox)
+        self.update_changed_checkbox = QCheckBox("Update changed records")
+        self.update_changed_checkbox.setChecked(params.get("update_changed", False))
+        sync_layout.addWidget(self.update_changed_checkbox)
+        layout.addWidget(self.sync_group)
+
+        self.export_group = QGroupBox("Export Options")
+        export_layout = QFormLayout(self.export_group)
+        folder_layout = QHBoxLayout()
+        self.output_folder_edit = QLineEdit(params.get("output_folder", ""))
+        browse_button = QPushButton("Browse...")
+        browse_button.clicked.connect(self._browse_output_folder)
+        folder_layout.addWidget(self.output_folder_edit, 1); folder_layout.addWidget(browse_button)
+        export_layout.addRow("Folder:", folder_layout)
+        self.export_mode_combo = QComboBox()
+        for mode, label in EXPORT_MODE_LABELS.items(): self.export_mode_combo.addItem(label, userData=mode)
+        self.export_mode_combo.setCurrentIndex(max(self.export_mode_combo.findData(params.get("mode", "incremental")), 0))
+        export_layout.addRow("Output:", self.export_mode_combo)
+        self.mark_exported_checkbox = QCheckBox("Count written records as exported")
+        self.mark_exported_checkbox.setChecked(params.get("mark_exported", True))
+        export_layout.addRow("", self.mark_exported_checkbox)
+        layout.addWidget(self.export_group)
+
+        button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        button_box.accepted.connect(self._accept_if_valid)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+        self.type_combo.currentIndexChanged.connect(self._show_type_options)
+        self._show_type_options()
+        center_dialog(self, parent)
+
+    def _show_type_options(self, *_args):
+        self.sync_group.setVisible(self.type_combo.currentData() == "sync_sources")
+        self.export_group.setVisible(self.type_combo.currentData() == "export_kml")
+        self.adjustSize()
+
+    def _browse_output_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Select Export Folder", self.output_folder_edit.text() or os.path.expanduser("~/Documents"))
+        if folder: self.output_folder_edit.setText(folder)
+
+    def get_job(self):
+        """The edited job as scheduled_jobs columns (params as a dict)."""
+        job_type = self.type_combo.currentData()
+        if job_type == "sync_sources":
+            params = {"if_changed": self.if_changed_checkbox.isChecked(), "update_changed": self.update_changed_checkbox.isChecked()}
+            sources = [source.strip() for source in self.sources_edit.text().split(",") if source.strip()]
+            if sources: params["sources"] = sources
+        else:
+            params = {"output_folder": self.output_folder_edit.text().strip(), "mode": self.export_mode_combo.currentData(),
+                      "mark_exported": self.mark_exported_checkbox.isChecked()}
+        daily = self.daily_radio.isChecked()
+        return {"name": self.name_edit.text().strip(), "job_type": job_type, "enabled": self.enabled_checkbox.isChecked(),
+                "interval_minutes": None if daily else self.interval_spin.value(),
+                "daily_at": self.daily_time_edit.time().toString("HH:mm") if daily else None, "params": params}
+
+    def _accept_if_valid(self):
+        from core.job_scheduler import validate_job
+        try: validate_job(self.get_job())
+        except ValueError as e: QMessageBox.warning(self, "Scheduled Job", str(e)); return
+        self.accept()
+
+
+class ScheduledJobsDialog(QDialog):
+    """
+    Lists the scheduled background jobs (next start, consecutive failures) and their run history,
+    newest first. Jobs can be added, edited, deleted and started right away; the history refreshes
+    as runs finish.
+    """
+    JOB_COLUMNS = ["ID", "Name", "Job", "Schedule", "Enabled", "Next Run", "Failures"]
+    RUN_COLUMNS = ["Started", "Job", "Trigger", "Status", "Seconds", "Message"]
+
+    def __init__(self, parent_main_window, db_manager, job_scheduler):
+        super().__init__(parent_main_window)
+        self.db_manager, self.job_scheduler = db_manager, job_scheduler
+        self.setWindowTitle("Scheduled Jobs")
+        self.setMinimumSize(900, 560)
+        self.setModal(True)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(15, 15, 15, 15)
+        layout.setSpacing(10)
+
+        self.jobs_view, self.jobs_model = self._create_table(self.JOB_COLUMNS)
+        self.jobs_view.setColumnHidden(0, True)
+        self.jobs_view.selectionModel().selectionChanged.connect(self._update_buttons)
+        self.jobs_view.doubleClicked.connect(self._edit_job)
+        layout.addWidget(self.jobs_view, 2)
+
+        job_buttons = QHBoxLayout()
+        self.add_button = QPushButton("Add Job...")
+        self.add_button.clicked.connect(self._add_job)
+        self.edit_button = QPushButton("Edit...")
+        self.edit_button.clicked.connect(self._edit_job)
+        self.delete_button = QPushButton("Delete")
+        self.delete_button.clicked.connect(self._delete_job)
+        self.run_now_button = QPushButton("Run Now")
+        self.run_now_button.clicked.connect(self._run_now)
+        for button in (self.add_button, self.edit_button, self.delete_button, self.run_now_button): job_buttons.addWidget(button)
+        job_buttons.addStretch()
+        self.status_label = QLabel()
+        job_buttons.addWidget(self.status_label)
+        layout.addLayout(job_buttons)
+
+        layout.addWidget(QLabel("Run history:"))
+        self.runs_view, self.runs_model = self._create_table(self.RUN_COLUMNS)
+        layout.addWidget(self.runs_view, 3)
+
+        button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Close)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+        self.job_scheduler.job_started.connect(self._refresh)
+        self.job_scheduler.job_finished.connect(self._refresh)
+        self._refresh()
+        center_dialog(self, parent_main_window)
+
+    def _create_table(self, columns):
+        table_view = QTableView()
+        table_model = QStandardItemModel(0, len(columns), self)
+        table_model.setHorizontalHeaderLabels(columns)
+        table_view.setModel(table_model)
+        table_view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        table_view.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        table_view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        table_view.verticalHeader().setVisible(False)
+        table_view.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        table_view.horizontalHeader().setStretchLastSection(True)
+        return table_view, table_model
+
+    def done(self, result):
+        # The scheduler outlives the dialog
+        self.job_scheduler.job_started.disconnect(self._refresh)
+        self.job_scheduler.job_finished.disconnect(self._refresh)
+        super().done(result)
+
+    def _refresh(self, *_args):
+        selected_job_id = self._selected_job_id()
+        self.jobs_model.removeRows(0, self.jobs_model.rowCount())
+        for job in self.db_manager.get_scheduled_jobs():
+            values = [job["id"], job["name"], JOB_TYPE_LABELS.get(job["job_type"], job["job_type"]), describe_schedule(job),
+                      "Yes" if job["enabled"] else "No", job["next_run_at"] or "", job["consecutive_failures"] or 0]
+            self.jobs_model.appendRow([QStandardItem(str(value)) for value in values])
+            if job["id"] == selected_job_id: self.jobs_view.selectRow(self.jobs_model.rowCount() - 1)
+
+        self.runs_model.removeRows(0, self.runs_model.rowCount())
+        for run in self.db_manager.get_job_runs(limit=RUNS_SHOWN):
+            values = [run["started_at"], run["job_name"], run["trigger"], run["status"],
+                      "" if run["seconds"] is None else f"{run['seconds']:.1f}", run["message"] or ""]
+            items = [QStandardItem(str(value)) for value in values]
+            items[4].setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+            items[5].setToolTip(run["message"] or "")
+            if run["status"] in _STATUS_COLORS:
+                for item in items: item.setBackground(QColor(_STATUS_COLORS[run["status"]]))
+            self.runs_model.appendRow(items)
+
+        running_job = self.job_scheduler.running_job()
+        self.status_label.setText(f"Running: {running_job['name']}" if running_job else "Idle")
+        self._update_buttons()
+
+    def _selected_job_id(self):
+        rows = self.jobs_view.selectionModel().selectedRows()
+        return int(self.jobs_model.item(rows[0].row(), 0).text()) if rows else None
+
+    def _update_buttons(self, *_args):
+        has_selection = self._selected_job_id() is not None
+        for button in (self.edit_button, self.delete_button, self.run_now_button): button.setEnabled(has_selection)
+
+    def _save_job(self, job, job_id=None):
+        from core.job_scheduler import schedule_job
+        if schedule_job(self.db_manager, job, job_id) is None:
+            QMessageBox.warning(self, "Database Error", "Failed to save the job. Its name might already be in use.")
+        self._refresh()
+
+    def _add_job(self):
+        edit_dialog = JobEditDialog(self)
+        if edit_dialog.exec() == QDialog.DialogCode.Accepted: self._save_job(edit_dialog.get_job())
+
+    def _edit_job(self, *_args):
+        job_id = self._selected_job_id()
+        job = self.db_manager.get_scheduled_job(job_id) if job_id is not None else None
+        if job is None: return
+        edit_dialog = JobEditDialog(self, job)
+        if edit_dialog.exec() == QDialog.DialogCode.Accepted: self._save_job(edit_dialog.get_job(), job_id)
+
+    def _delete_job(self):
+        job_id = self._selected_job_id()
+        if job_id is None: return
+        running_job = self.job_scheduler.running_job()
+        if running_job and running_job["id"] == job_id:
+            QMessageBox.information(self, "Scheduled Jobs", "This job is running. Delete it once the run has finished."); return
+        if QMessageBox.question(self, "Confirm Delete", "Delete the selected job and its run history?",
+                                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No) == QMessageBox.StandardButton.Yes:
+            if not self.db_manager.delete_scheduled_job(job_id): QMessageBox.warning(self, "Database Error", "Failed to delete the job.")
+            self._refresh()
+
+    def _run_now(self):
+        job_id = self._selected_job_id()
+        if job_id is None: return
+        self.job_scheduler.run_now(job_id)
+        self._refresh()
@@ -3,8 +3,7 @@
 import os 
 import sys 
 import csv
-import utm 
-import tempfile # Added for _trigger_ge_polygon_upload
+import sqlite3
 import subprocess # Added for _trigger_ge_polygon_upload
 
 from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QTableView,
@@ -12,24 +11,26 @@ from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, Q
                                QAbstractItemView, QHeaderView, QMessageBox, QFileDialog, QComboBox,
                                QSizePolicy, QTextEdit, QInputDialog, QLineEdit, QDateEdit, QGridLayout,
                                QCheckBox, QGroupBox, QStackedWidget, QApplication, QStyledItemDelegate,
-                               QDialog, QProgressBar) # Added QDialog, QProgressBar
+                               QDialog, QProgressBar, QProgressDialog, QSpinBox) # Added QDialog, QProgressBar
 from PySide6.QtGui import QPixmap, QIcon, QAction, QStandardItemModel, QStandardItem, QFont, QColor
-from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer, QSize, QSortFilterProxyModel, QDate
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer, QSize, QSortFilterProxyModel, QDate, Signal, QObject, QThread
 
 from database.db_manager import DatabaseManager
-from core.utils import resource_path
-from core.data_processor import process_csv_row_data, CSV_HEADERS 
-from core.api_handler import fetch_data_from_mwater_api
-from core.kml_generator import add_polygon_to_kml_object 
-import simplekml # Already present, used for KML generation
+from core.utils import resource_path, StartupProfiler
+from core.lru_cache import LRUCache
+from core import perf
 import datetime 
+# core.api_handler (requests), core.kml_generator and simplekml are imported inside the
+# handlers that use them to keep them off the startup path.
 
 # Assuming dialogs are in their own files and correctly imported
 from .dialogs.api_sources_dialog import APISourcesDialog 
 # from .dialogs.duplicate_dialog import DuplicateDialog # Removed as per previous subtask
 from .dialogs.output_mode_dialog import OutputModeDialog 
+from .dialogs.import_history_dialog import ImportHistoryDialog
+from .dialogs.import_preview_dialog import ImportPreviewDialog
 from .widgets.map_view_widget import MapViewWidget
-from .widgets.google_earth_webview_widget import GoogleEarthWebViewWidget 
+# GoogleEarthWebViewWidget is imported when the GE view is first toggled on (see _ensure_ge_view_widget)
 
 
 # Constants 
@@ -43,6 +44,8 @@ SUCCESS_COLOR_MW = "#388E3C"
 FG_COLOR_MW = "#333333"        
 ORGANIZATION_TAGLINE_MW = "Developed by Dilasa Janvikash Pratishthan to support community upliftment"
 
+AREA_DEVIATION_WARNING_PCT = 20 # Area Dev. % values beyond this are shown in red
+
 # --- Table Model with Checkbox Support ---
 class PolygonTableModel(QAbstractTableModel):
     CHECKBOX_COL = 0
@@ -55,6 +58,8 @@ class PolygonTableModel(QAbstractTableModel):
     DATE_ADDED_COL = 7         # Was 6
     EXPORT_COUNT_COL = 8       # Was 7
     LAST_EXPORTED_COL = 9      # Was 8
+    AREA_COL = 10              # Computed by core.geometry
+    AREA_DEVIATION_COL = 11
 
     def __init__(self, data_list=None, parent=None, db_manager_instance=None): 
         super().__init__(parent)
@@ -62,7 +67,7 @@ class PolygonTableModel(QAbstractTableModel):
         self._data = []
         self._check_states = {}
         self._headers = ["", "ID", "Evaluation Status", "Status", "UUID", "Farmer Name", "Village",
-                         "Date Added", "Export Count", "Last Exported"]
+                         "Date Added", "Export Count", "Last Exported", "Area (ac)", "Area Dev. %"]
         if data_list: self.update_data(data_list)
 
     def rowCount(self, parent=QModelIndex()): return len(self._data)
@@ -90,6 +95,8 @@ class PolygonTableModel(QAbstractTableModel):
             elif col == self.DATE_ADDED_COL: value = record[5]
             elif col == self.EXPORT_COUNT_COL: value = record[6]
             elif col == self.LAST_EXPORTED_COL: value = record[7]
+            elif col == self.AREA_COL: return "" if record[9] is None else f"{record[9]:.2f}"
+            elif col == self.AREA_DEVIATION_COL: return "" if record[10] is None else f"{record[10]:+.1f}"
             else: return None
 
             if col == self.EXPORT_COUNT_COL and value is None: return "0" 
@@ -116,10 +123,13 @@ class PolygonTableModel(QAbstractTableModel):
                 return color
             
         elif role == Qt.ItemDataRole.TextAlignmentRole:
+            if col in (self.AREA_COL, self.AREA_DEVIATION_COL): return Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
             return Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter if col != self.CHECKBOX_COL else Qt.AlignmentFlag.AlignCenter
         elif role == Qt.ItemDataRole.ForegroundRole: 
             if col == self.STATUS_COL and record[1] and "error" in str(record[1]).lower():
                 return QColor("red")
+            if col == self.AREA_DEVIATION_COL and record[10] is not None and abs(record[10]) > AREA_DEVIATION_WARNING_PCT:
+                return QColor("red")
         elif role == Qt.ItemDataRole.FontRole and col != self.CHECKBOX_COL: 
              return QFont("Segoe UI", 9)
         return None
@@ -229,6 +239,7 @@ class PolygonFilterProxyModel(QSortFilterProxyModel):
         self.filter_before_date_added = None 
         self.filter_export_status = "All" 
         self.filter_error_status = "All"  
+        self.filter_area_deviation_over = 0 # Percent; 0 = off
 
     def set_uuid_filter(self, text):
         self.filter_uuid_text = text.lower()
@@ -247,12 +258,16 @@ class PolygonFilterProxyModel(QSortFilterProxyModel):
         self.filter_error_status = status
         self.invalidateFilter()
 
+    def set_area_deviation_filter(self, threshold_pct):
+        self.filter_area_deviation_over = threshold_pct
+        self.invalidateFilter()
+
     def filterAcceptsRow(self, source_row, source_parent):
         source_model = self.sourceModel()
         assert isinstance(source_model, PolygonTableModel), "Source model must be PolygonTableModel"
         if not source_model or source_row >= len(source_model._data): return False # type: ignore
         record = source_model._data[source_row] # type: ignore
-        if not record or len(record) < 9: # Ensure record has enough elements for all columns including evaluation_status
+        if not record or len(record) < 11: # Ensure record has enough elements for all columns including the geometry metrics
             return False 
 
         if self.filter_uuid_text:
@@ -264,7 +279,7 @@ class PolygonFilterProxyModel(QSortFilterProxyModel):
         date_added_str = record[5]
         if date_added_str:
             try:
-                row_date_added = QDate.fromString(date_added_str.split(" ")[0], "yyyy-MM-dd")
+                row_date_added = QDate.fromString(str(date_added_str)[:10], "yyyy-MM-dd")
                 if row_date_added.isValid():
                     if self.filter_after_date_added and row_date_added < self.filter_after_date_added: return False
                     if self.filter_before_date_added and row_date_added > self.filter_before_date_added: return False
@@ -279,6 +294,9 @@ class PolygonFilterProxyModel(QSortFilterProxyModel):
         status_val = str(record[1]).lower()
         if self.filter_error_status == "Error Records" and "error" not in status_val: return False
         if self.filter_error_status == "Valid Records" and "error" in status_val: return False
+
+        # Area deviation from the proposed area (percent) is at index 10; records without one don't match
+        if self.filter_area_deviation_over and (record[10] is None or abs(record[10]) <= self.filter_area_deviation_over): return False
             
         return True
 
@@ -313,6 +331,7 @@ class APIImportProgressDialog(QDialog):
         self.setModal(True)
         self.setMinimumWidth(400) 
         self._was_cancelled = False
+        self.new_added_caption = "New Records Added" # "Rows Staged" for import previews
 
         layout = QVBoxLayout(self)
 
@@ -350,27 +369,70 @@ class APIImportProgressDialog(QDialog):
         else:
             self.progress_bar.setRange(0, 100) 
 
-    def update_progress(self, processed_count, skipped_count, new_added_count):
+    def set_total_bytes(self, total_bytes):
+        """For streamed files: the row count is unknown, so progress is the share of the file read."""
+        self.total_label.setText(f"File Size: {total_bytes / (1024 * 1024):,.1f} MB")
+        self.progress_bar.setRange(0, 1000)
+
+    def update_progress(self, processed_count, skipped_count, new_added_count, fraction_read=None):
         self.processed_label.setText(f"Records Processed (Attempted): {processed_count}")
-        self.new_added_label.setText(f"New Records Added: {new_added_count}")
+        self.new_added_label.setText(f"{self.new_added_caption}: {new_added_count}")
         self.skipped_label.setText(f"Records Skipped (Duplicates/Errors): {skipped_count}")
         
-        self.progress_bar.setValue(processed_count) 
+        self.progress_bar.setValue(int(fraction_read * 1000) if fraction_read is not None else processed_count) 
         QApplication.processEvents() 
 
     def was_cancelled(self):
         return self._was_cancelled 
 
 
+# --- Background CSV Export ---
+class CsvExportWorker(QObject):
+    """
+    Runs core.csv_exporter.export_polygon_csv in a QThread (moveToThread), on its own DB connection:
+    SQLite connections can't be shared across threads. cancel() may be called from the GUI thread.
+    """
+    progress = Signal(int) # Rows written so far
+    finished = Signal(dict) # export_polygon_csv summary (also when cancelled)
+    failed = Signal(str)
+
+    def __init__(self, db_file_path, output_path, columns, filters, use_gzip):
+        super().__init__()
+        self.db_file_path, self.output_path = db_file_path, output_path
+        self.columns, self.filters, self.use_gzip = columns, filters, use_gzip
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        from core.csv_exporter import export_polygon_csv
+        db_manager = None
+        try:
+            db_manager = DatabaseManager(db_file_path=self.db_file_path)
+            summary = export_polygon_csv(db_manager, self.output_path, self.columns, self.filters, use_gzip=self.use_gzip,
+                                         progress_callback=lambda rows: (self.progress.emit(rows), not self._cancelled)[1])
+        except (OSError, ValueError, sqlite3.Error) as e:
+            self.failed.emit(str(e))
+        else:
+            self.finished.emit(summary)
+        finally:
+            if db_manager: db_manager.close()
+
+
 class MainWindow(QMainWindow):
-    def __init__(self):
+    startup_ready = Signal() # Emitted once the table is loaded and the window can be shown
+
+    def __init__(self, startup_profiler=None):
         super().__init__()
+        self.startup_profiler = startup_profiler or StartupProfiler(enabled=False)
         self.setWindowTitle(f"{APP_NAME_MW} - {APP_VERSION_MW}")
         self.app_icon_path = resource_path(APP_ICON_FILE_NAME_MW) 
         if os.path.exists(self.app_icon_path): self.setWindowIcon(QIcon(self.app_icon_path))
         else: print(f"Warning: Main window icon '{self.app_icon_path}' not found.")
         try: self.db_manager = DatabaseManager()
         except Exception as e: QMessageBox.critical(self, "DB Error", f"DB init failed: {e}\nExiting."); sys.exit(1) 
+        self.startup_profiler.mark("Database opened")
         
         self.resize(1200, 800); self._center_window() 
         self._create_main_layout()
@@ -378,13 +440,55 @@ class MainWindow(QMainWindow):
         self._create_menus_and_toolbar() 
         self._create_status_bar() # Corrected: Call the renamed method
         
-        self.current_temp_kml_path = None
         self.show_ge_instructions_popup_again = True
+        self.google_earth_view_widget = None # Created on first use by _ensure_ge_view_widget
+        self.kml_link_server = None # Local Network Link server, started from the KML menu
+        from .background_jobs import BackgroundJobScheduler
+        self.job_scheduler = BackgroundJobScheduler(self.db_manager, self) # Started once the table is loaded
+        self.job_scheduler.job_started.connect(self._on_scheduled_job_started)
+        self.job_scheduler.job_log.connect(self.log_message)
+        self.job_scheduler.job_finished.connect(self._on_scheduled_job_finished)
+        self._live_link_sync_timer = QTimer(self)
+        self._live_link_sync_timer.setSingleShot(True)
+        self._live_link_sync_timer.setInterval(300) # Coalesce bursts of check/filter changes
+        self._live_link_sync_timer.timeout.connect(self._push_live_link_selection)
+        # Selection rendering is debounced; neighbours of the rendered row are prefetched
+        self._selection_render_timer = QTimer(self)
+        self._selection_render_timer.setSingleShot(True)
+        self._selection_render_timer.setInterval(120)
+        self._selection_render_timer.timeout.connect(self._render_current_selection)
+        self._selection_prefetch_cache = LRUCache(max_entries=8) # db_id -> {"record", "map_coords"}
+        self._prefetch_queue = []
+        self.performance_panel = None # Dock created on first use (View > Performance Panel)
 
         self._setup_main_content_area() 
+        self.startup_profiler.mark("Main window widgets built")
+        # Table load runs from the event loop so the caller can connect to startup_ready first
+        QTimer.singleShot(0, self._complete_startup)
+
+    def _complete_startup(self):
         self.load_data_into_table() 
-        
+        self.startup_profiler.mark("Table data loaded")
         self.log_message(f"{APP_NAME_MW} {APP_VERSION_MW} started. DB at: {self.db_manager.db_path}", "info")
+        self.job_scheduler.start()
+        self.startup_ready.emit()
+
+    def start_deferred_views(self):
+        """Builds the map web view once the window is on screen (called by main_app after show)."""
+        def _build_map_view():
+            self.map_view_widget.ensure_initialized()
+            self.startup_profiler.mark("Map view created")
+            self.startup_profiler.report()
+        QTimer.singleShot(0, _build_map_view)
+
+    def _ensure_ge_view_widget(self):
+        """Creates the Google Earth view and adds it to the map stack the first time it is needed."""
+        if self.google_earth_view_widget is None:
+            from .widgets.google_earth_webview_widget import GoogleEarthWebViewWidget
+            self.google_earth_view_widget = GoogleEarthWebViewWidget(self)
+            self.google_earth_view_widget.setMinimumWidth(300)
+            self.map_stack.addWidget(self.google_earth_view_widget)
+        return self.google_earth_view_widget
 
 
     def _center_window(self):
@@ -428,6 +532,14 @@ class MainWindow(QMainWindow):
         self.export_data_action = QAction(QIcon.fromTheme("document-save-as", QIcon(self.app_icon_path)), "Export Displayed Data as &CSV...", self)
         self.export_data_action.triggered.connect(self.handle_export_displayed_data_csv)
         file_menu.addAction(self.export_data_action)
+        self.export_gpkg_action = QAction("Export Checked/Filtered as &GeoPackage...", self)
+        self.export_gpkg_action.setStatusTip("Write checked (or all filtered) valid polygons to a GeoPackage with a spatial index, for QGIS/GDAL")
+        self.export_gpkg_action.triggered.connect(self.handle_export_geopackage)
+        file_menu.addAction(self.export_gpkg_action)
+        self.export_geojson_action = QAction("Export Checked/Filtered as Geo&JSON...", self)
+        self.export_geojson_action.setStatusTip("Write checked (or all filtered) valid polygons as GeoJSON or newline-delimited GeoJSON, optionally gzipped")
+        self.export_geojson_action.triggered.connect(self.handle_export_geojson)
+        file_menu.addAction(self.export_geojson_action)
         file_menu.addSeparator()
         exit_action = QAction(QIcon.fromTheme("application-exit"), "E&xit", self) 
         exit_action.setShortcut("Ctrl+Q"); exit_action.setStatusTip("Exit application")
@@ -437,6 +549,22 @@ class MainWindow(QMainWindow):
         self.import_csv_action = QAction(QIcon.fromTheme("document-open"),"Import &CSV...", self)
         self.import_csv_action.triggered.connect(self.handle_import_csv)
         data_menu.addAction(self.import_csv_action)
+
+        self.import_kml_action = QAction("Import &KML/KMZ...", self)
+        self.import_kml_action.setStatusTip("Import polygon placemarks, e.g. plots digitized in Google Earth or KML exported by this tool")
+        self.import_kml_action.triggered.connect(self.handle_import_kml)
+        data_menu.addAction(self.import_kml_action)
+
+        self.preview_csv_action = QAction("Pre&view CSV Import...", self)
+        self.preview_csv_action.setStatusTip("Dry run: show new, changed, duplicate and conflicting rows before importing")
+        self.preview_csv_action.triggered.connect(self.handle_preview_csv_import)
+        data_menu.addAction(self.preview_csv_action)
+
+        self.update_changed_action = QAction("&Update Changed Records on Import", self)
+        self.update_changed_action.setCheckable(True)
+        self.update_changed_action.setStatusTip("CSV/API imports also overwrite existing records whose source row changed "
+                                                "(export counts and evaluation status are kept)")
+        data_menu.addAction(self.update_changed_action)
         
         self.fetch_api_action = QAction(QIcon.fromTheme("network-transmit-receive"), "&Fetch from API...", self) 
         self.fetch_api_action.triggered.connect(self.handle_fetch_from_api)
@@ -445,6 +573,26 @@ class MainWindow(QMainWindow):
         self.manage_api_action = QAction(QIcon.fromTheme("preferences-system"),"Manage A&PI Sources...", self)
         self.manage_api_action.triggered.connect(self.handle_manage_api_sources)
         data_menu.addAction(self.manage_api_action)
+
+        self.import_history_action = QAction("Import &History...", self)
+        self.import_history_action.setStatusTip("Show past imports with per-phase timings and rows/s")
+        self.import_history_action.triggered.connect(self.handle_show_import_history)
+        data_menu.addAction(self.import_history_action)
+
+        self.scheduled_jobs_action = QAction("Scheduled &Jobs...", self)
+        self.scheduled_jobs_action.setStatusTip("Sync API sources and export KML automatically in the background, and see past runs")
+        self.scheduled_jobs_action.triggered.connect(self.handle_manage_scheduled_jobs)
+        data_menu.addAction(self.scheduled_jobs_action)
+
+        self.reprocess_action = QAction("&Reprocess All from Archive...", self)
+        self.reprocess_action.setStatusTip("Re-validate every record from its archived source row, without fetching or importing again")
+        self.reprocess_action.triggered.connect(self.handle_reprocess_all)
+        data_menu.addAction(self.reprocess_action)
+
+        self.recompute_geometry_action = QAction("Recompute &Geometry Metrics", self)
+        self.recompute_geometry_action.setStatusTip("Recompute area, perimeter, centroid and area deviation of every valid polygon")
+        self.recompute_geometry_action.triggered.connect(self.handle_recompute_geometry)
+        data_menu.addAction(self.recompute_geometry_action)
         data_menu.addSeparator()
         self.delete_checked_action = QAction(QIcon.fromTheme("edit-delete"),"Delete Checked Rows...", self) 
         self.delete_checked_action.triggered.connect(self.handle_delete_checked_rows) 
@@ -457,12 +605,22 @@ class MainWindow(QMainWindow):
         self.generate_kml_action = QAction(QIcon.fromTheme("document-export"),"&Generate KML for Checked Rows...", self) 
         self.generate_kml_action.triggered.connect(self.handle_generate_kml) 
         kml_menu.addAction(self.generate_kml_action)
+        kml_menu.addSeparator()
+        self.live_ge_link_action = QAction("Live Google Earth &Link (Checked/Filtered)", self)
+        self.live_ge_link_action.setCheckable(True)
+        self.live_ge_link_action.setStatusTip("Serve checked (or all filtered) polygons to Google Earth through a local Network Link")
+        self.live_ge_link_action.toggled.connect(self._handle_live_ge_link_toggle)
+        kml_menu.addAction(self.live_ge_link_action)
 
         self.view_menu = menubar.addMenu("&View")
         self.toggle_ge_view_action = QAction("Google Earth View", self)
         self.toggle_ge_view_action.setCheckable(True)
         self.toggle_ge_view_action.toggled.connect(self._handle_ge_view_toggle)
         self.view_menu.addAction(self.toggle_ge_view_action)
+        self.performance_panel_action = QAction("&Performance Panel", self)
+        self.performance_panel_action.setStatusTip("Show timing spans, throughput and DB statement counts")
+        self.performance_panel_action.triggered.connect(self._show_performance_panel)
+        self.view_menu.addAction(self.performance_panel_action)
 
         help_menu = menubar.addMenu("&Help"); 
         self.about_action = QAction(QIcon.fromTheme("help-about"),"&About", self)
@@ -527,13 +685,15 @@ class MainWindow(QMainWindow):
         filter_layout.addWidget(QLabel("Date Added After:"), 1, 0)
         self.date_added_after_edit = QDateEdit(); self.date_added_after_edit.setCalendarPopup(True)
         self.date_added_after_edit.setDisplayFormat("yyyy-MM-dd"); self.date_added_after_edit.clear() 
-        self.date_added_after_edit.setSpecialValueText(" "); self.date_added_after_edit.dateChanged.connect(self.apply_filters)
+        self.date_added_after_edit.setSpecialValueText(" "); self.date_added_after_edit.setDate(self.date_added_after_edit.minimumDate())
+        self.date_added_after_edit.dateChanged.connect(self.apply_filters)
         filter_layout.addWidget(self.date_added_after_edit, 1, 1)
 
         filter_layout.addWidget(QLabel("Before:"), 1, 2)
         self.date_added_before_edit = QDateEdit(); self.date_added_before_edit.setCalendarPopup(True)
         self.date_added_before_edit.setDisplayFormat("yyyy-MM-dd"); self.date_added_before_edit.clear()
-        self.date_added_before_edit.setSpecialValueText(" "); self.date_added_before_edit.dateChanged.connect(self.apply_filters)
+        self.date_added_before_edit.setSpecialValueText(" "); self.date_added_before_edit.setDate(self.date_added_before_edit.minimumDate())
+        self.date_added_before_edit.dateChanged.connect(self.apply_filters)
         filter_layout.addWidget(self.date_added_before_edit, 1, 3)
 
         filter_layout.addWidget(QLabel("Export Status:"), 2, 0)
@@ -546,6 +706,13 @@ class MainWindow(QMainWindow):
         self.error_status_combo.currentIndexChanged.connect(self.apply_filters)
         filter_layout.addWidget(self.error_status_combo, 2, 3)
 
+        filter_layout.addWidget(QLabel("Area Deviates Over:"), 3, 0)
+        self.area_deviation_spin = QSpinBox(); self.area_deviation_spin.setRange(0, 1000); self.area_deviation_spin.setSuffix(" %")
+        self.area_deviation_spin.setSpecialValueText("Off"); self.area_deviation_spin.setSingleStep(5)
+        self.area_deviation_spin.setToolTip("Computed polygon area differs from the proposed area by more than this")
+        self.area_deviation_spin.valueChanged.connect(self.apply_filters)
+        filter_layout.addWidget(self.area_deviation_spin, 3, 1)
+
         clear_filters_button = QPushButton("Clear Filters")
         clear_filters_button.clicked.connect(self.clear_filters)
         filter_layout.addWidget(clear_filters_button, 0, 4, Qt.AlignmentFlag.AlignRight) 
@@ -566,33 +733,36 @@ class MainWindow(QMainWindow):
         if not hasattr(self, 'filter_proxy_model'): return
         self.filter_proxy_model.set_uuid_filter(self.uuid_filter_edit.text())
         
-        after_date = self.date_added_after_edit.date() if self.date_added_after_edit.text().strip() and self.date_added_after_edit.date().isValid() else None
-        before_date = self.date_added_before_edit.date() if self.date_added_before_edit.text().strip() and self.date_added_before_edit.date().isValid() else None
-        self.filter_proxy_model.set_date_added_filter(after_date, before_date)
+        self.filter_proxy_model.set_date_added_filter(self._filter_panel_date(self.date_added_after_edit), self._filter_panel_date(self.date_added_before_edit))
         
         self.filter_proxy_model.set_export_status_filter(self.export_status_combo.currentText())
         self.filter_proxy_model.set_error_status_filter(self.error_status_combo.currentText())
+        self.filter_proxy_model.set_area_deviation_filter(self.area_deviation_spin.value())
+
 
+    @staticmethod
+    def _filter_panel_date(date_edit):
+        """Date of a filter panel date edit, or None when it is blank (at its minimum date, shown as the special value text)."""
+        date = date_edit.date()
+        return date if date.isValid() and date != date_edit.minimumDate() and date_edit.text().strip() else None
 
     def clear_filters(self):
         self.uuid_filter_edit.clear()
-        self.date_added_after_edit.clear(); self.date_added_after_edit.setSpecialValueText(" ")
-        self.date_added_before_edit.clear(); self.date_added_before_edit.setSpecialValueText(" ")      
+        self.date_added_after_edit.setDate(self.date_added_after_edit.minimumDate()) # Shows the blank special value text
+        self.date_added_before_edit.setDate(self.date_added_before_edit.minimumDate())      
         self.export_status_combo.setCurrentIndex(0) 
         self.error_status_combo.setCurrentIndex(0)  
+        self.area_deviation_spin.setValue(0)
 
     def _setup_main_content_area(self):
         self.main_splitter = QSplitter(Qt.Orientation.Horizontal) 
         
-        self.map_view_widget = MapViewWidget(self) 
+        self.map_view_widget = MapViewWidget(self) # Web view is created lazily, see start_deferred_views
         self.map_view_widget.setMinimumWidth(300) 
 
-        self.google_earth_view_widget = GoogleEarthWebViewWidget(self)
-        self.google_earth_view_widget.setMinimumWidth(300)
-
         self.map_stack = QStackedWidget(self)
         self.map_stack.addWidget(self.map_view_widget) 
-        self.map_stack.addWidget(self.google_earth_view_widget) 
+        # Index 1 (Google Earth view) is added on first toggle by _ensure_ge_view_widget
         
         self.main_splitter.addWidget(self.map_stack)
 
@@ -662,6 +832,12 @@ class MainWindow(QMainWindow):
         table_layout.addWidget(self.table_view) 
         self.right_splitter.addWidget(table_container)
         self.table_view.selectionModel().selectionChanged.connect(self.on_table_selection_changed)
+        # Keep the live Google Earth link in sync with checks and filters
+        self.source_model.dataChanged.connect(self._schedule_live_link_sync)
+        self.source_model.modelReset.connect(self._schedule_live_link_sync)
+        self.filter_proxy_model.layoutChanged.connect(self._schedule_live_link_sync)
+        self.filter_proxy_model.rowsInserted.connect(self._schedule_live_link_sync)
+        self.filter_proxy_model.rowsRemoved.connect(self._schedule_live_link_sync)
 
         log_container = QWidget()
         log_layout = QVBoxLayout(log_container)
@@ -691,22 +867,50 @@ class MainWindow(QMainWindow):
         self.source_model.set_all_checkboxes(check_state)
 
     def on_table_selection_changed(self, selected, deselected):
+        # Arrowing through the table fires this for every row; only the selection that is
+        # still current when the debounce timer fires gets rendered.
+        self._selection_render_timer.start()
+
+    def _selected_proxy_row(self):
         selected_proxy_indexes = self.table_view.selectionModel().selectedRows()
-        polygon_record = None # Initialize polygon_record
-
-        if selected_proxy_indexes:
-            source_model_index = self.filter_proxy_model.mapToSource(selected_proxy_indexes[0])
-            if source_model_index.isValid():
-                db_id_item = self.source_model.data(source_model_index.siblingAtColumn(self.source_model.ID_COL))
-                try:
-                    db_id = int(db_id_item)
-                    polygon_record = self.db_manager.get_polygon_data_by_id(db_id)
-                except (ValueError, TypeError):
-                    self.log_message(f"Map/GE: Invalid ID for selected row.", "error")
-                    polygon_record = None # Ensure it's None on error
-                except Exception as e:
-                    self.log_message(f"Map/GE: Error fetching record: {e}", "error")
-                    polygon_record = None # Ensure it's None on error
+        return selected_proxy_indexes[0].row() if selected_proxy_indexes else None
+
+    def _db_id_for_proxy_row(self, proxy_row):
+        if proxy_row is None or not 0 <= proxy_row < self.filter_proxy_model.rowCount(): return None
+        try: return int(self.filter_proxy_model.data(self.filter_proxy_model.index(proxy_row, self.source_model.ID_COL)))
+        except (ValueError, TypeError): return None
+
+    def _build_selection_bundle(self, polygon_record):
+        """Full record plus its map geometry (lat/lon vertices), as kept in the prefetch cache."""
+        map_coords = None
+        if polygon_record.get('status') == 'valid_for_kml':
+            from core.kml_generator import polygon_record_to_kml_coordinates
+            try:
+                kml_ring = polygon_record_to_kml_coordinates(polygon_record)
+                if kml_ring: map_coords = [(lat, lon) for lon, lat, _alt in kml_ring[:-1]]
+            except Exception as e_conv:
+                self.log_message(f"Map: UTM conv fail {polygon_record.get('uuid')}: {e_conv}", "error")
+        return {"record": polygon_record, "map_coords": map_coords}
+
+    def _get_selection_bundle(self, db_id):
+        bundle = self._selection_prefetch_cache.get(db_id)
+        if bundle is None:
+            polygon_record = self.db_manager.get_polygon_data_by_id(db_id)
+            if polygon_record is None: return None
+            bundle = self._build_selection_bundle(polygon_record)
+            self._selection_prefetch_cache.put(db_id, bundle)
+        return bundle
+
+    def _render_current_selection(self):
+        proxy_row = self._selected_proxy_row()
+        db_id = self._db_id_for_proxy_row(proxy_row)
+        bundle = None
+        if proxy_row is not None and db_id is None:
+            self.log_message(f"Map/GE: Invalid ID for selected row.", "error")
+        elif db_id is not None:
+            try: bundle = self._get_selection_bundle(db_id)
+            except Exception as e: self.log_message(f"Map/GE: Error fetching record: {e}", "error")
+        polygon_record = bundle["record"] if bundle else None
         
         # Logic for Google Earth View
         if self.map_stack.currentIndex() == 1: # Google Earth View is active
@@ -718,18 +922,45 @@ class MainWindow(QMainWindow):
                 self.log_message("GE View: No valid polygon record selected or record not valid for KML upload.", "warning")
         # Logic for original MapViewWidget
         else:
-            if polygon_record and polygon_record.get('status') == 'valid_for_kml':
-                coords_lat_lon, utm_valid = [], True
-                for i in range(1,5):
-                    e,n=polygon_record.get(f'p{i}_easting'),polygon_record.get(f'p{i}_northing')
-                    zn,zl=polygon_record.get(f'p{i}_zone_num'),polygon_record.get(f'p{i}_zone_letter')
-                    if None in [e,n,zn,zl]: utm_valid=False; break
-                    try: lat,lon=utm.to_latlon(e,n,zn,zl); coords_lat_lon.append((lat,lon)) 
-                    except Exception as e_conv: self.log_message(f"Map: UTM conv fail {polygon_record.get('uuid')}, P{i}: {e_conv}","error"); utm_valid=False; break
-                if utm_valid and len(coords_lat_lon)==4: self.map_view_widget.display_polygon(coords_lat_lon,coords_lat_lon[0])
-                elif hasattr(self,'map_view_widget'): self.map_view_widget.clear_map()
+            if bundle and bundle["map_coords"]:
+                map_cache_key = (polygon_record.get('id'), polygon_record.get('last_modified'))
+                self.map_view_widget.display_polygon(bundle["map_coords"], bundle["map_coords"][0], cache_key=map_cache_key)
             else: # No valid selection or record not suitable for map
-                if hasattr(self,'map_view_widget'): self.map_view_widget.clear_map()
+                self.map_view_widget.clear_map()
+
+        if proxy_row is not None:
+            self._queue_neighbour_prefetch(proxy_row)
+
+    def _queue_neighbour_prefetch(self, proxy_row):
+        """
+        Loads the rows just above and below the selection into the prefetch cache and pre-renders
+        their map page (or GE KML), one small step per event-loop turn so input stays responsive.
+        """
+        neighbour_ids = [db_id for db_id in (self._db_id_for_proxy_row(proxy_row - 1), self._db_id_for_proxy_row(proxy_row + 1))
+                         if db_id is not None]
+        missing_ids = [db_id for db_id in neighbour_ids if db_id not in self._selection_prefetch_cache]
+        if missing_ids:
+            for polygon_record in self.db_manager.get_polygon_data_by_ids(missing_ids):
+                self._selection_prefetch_cache.put(polygon_record['id'], self._build_selection_bundle(polygon_record))
+        self._prefetch_queue = [(proxy_row, db_id) for db_id in neighbour_ids]
+        QTimer.singleShot(0, self._run_next_prefetch_step)
+
+    def _run_next_prefetch_step(self):
+        if not self._prefetch_queue: return
+        origin_row, db_id = self._prefetch_queue.pop(0)
+        if self._selected_proxy_row() != origin_row or self._selection_render_timer.isActive():
+            self._prefetch_queue = [] # Selection moved on; its own render queues new neighbours
+            return
+        bundle = self._selection_prefetch_cache.get(db_id)
+        if bundle and bundle["record"].get('status') == 'valid_for_kml':
+            polygon_record = bundle["record"]
+            if self.map_stack.currentIndex() == 1:
+                self._get_or_build_ge_kml_url(polygon_record)
+            elif bundle["map_coords"]:
+                self.map_view_widget.prerender_polygon(bundle["map_coords"], bundle["map_coords"][0],
+                                                       cache_key=(polygon_record.get('id'), polygon_record.get('last_modified')))
+        if self._prefetch_queue:
+            QTimer.singleShot(0, self._run_next_prefetch_step)
 
     def refresh_api_source_dropdown(self):
         if hasattr(self, 'api_source_combo_toolbar'):
@@ -744,114 +975,320 @@ class MainWindow(QMainWindow):
     def handle_manage_api_sources(self):
         dialog = APISourcesDialog(self, self.db_manager); dialog.exec(); self.refresh_api_source_dropdown() 
 
+    def handle_show_import_history(self):
+        ImportHistoryDialog(self, self.db_manager).exec()
+
+    def handle_manage_scheduled_jobs(self):
+        from .dialogs.scheduled_jobs_dialog import ScheduledJobsDialog
+        ScheduledJobsDialog(self, self.db_manager, self.job_scheduler).exec()
+
+    def _on_scheduled_job_started(self, job):
+        self.log_message(f"Scheduled job '{job['name']}' started.", "info")
+
+    def _on_scheduled_job_finished(self, run):
+        if not run: return # Could not run at all; already logged
+        level = {"ok": "success", "failed": "error"}.get(run["status"], "info")
+        self.log_message(f"Scheduled job '{run['job_name']}' {run['status']} in {run['seconds']:.1f}s: {run['message']}", level)
+        if (run.get("result") or {}).get("records_changed"): self.load_data_into_table()
+
+    def handle_reprocess_all(self):
+        archived_count = self.db_manager.count_source_rows() or 0
+        if archived_count == 0:
+            QMessageBox.information(self, "Reprocess All", "No archived source rows yet. Rows are archived when they are imported."); return
+        if QMessageBox.question(self, "Reprocess All", f"Re-validate {archived_count} record(s) from their archived source rows?\n"
+                                "Records whose status or coordinates change are updated; export counts and evaluation status are kept.",
+                                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No) != QMessageBox.StandardButton.Yes:
+            return
+        from core.source_archive import reprocess_archived_rows
+        progress_dialog = QProgressDialog("Reprocessing archived rows...", "Cancel", 0, archived_count, self)
+        progress_dialog.setWindowTitle("Reprocess All"); progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        progress_dialog.setMinimumDuration(0)
+
+        def _on_progress(done_count, total_count, changed_count):
+            progress_dialog.setValue(min(done_count, total_count))
+            progress_dialog.setLabelText(f"Reprocessed {done_count} of {total_count} rows, {changed_count} changed...")
+            QApplication.processEvents()
+            return not progress_dialog.wasCanceled()
+        try:
+            summary = reprocess_archived_rows(self.db_manager, log_callback=self.log_message, progress_callback=_on_progress)
+        finally:
+            progress_dialog.close()
+            self.load_data_into_table()
+        self.log_message(f"Reprocessed {summary['processed']} archived row(s) with {summary['workers']} worker(s): "
+                         f"{summary['changed']} changed, {summary['unreadable']} unreadable, {summary['failed_db_write']} failed to save"
+                         + (f", {summary['not_archived']} record(s) have no archived row" if summary['not_archived'] else "")
+                         + (" (cancelled)" if summary["cancelled"] else "") + f". Took {summary['seconds']:.2f}s.", "info")
+
+    def handle_recompute_geometry(self):
+        from core.geometry import update_geometry_metrics
+        result = update_geometry_metrics(self.db_manager, recompute_all=True)
+        if result is None:
+            self.log_message("Failed to save the recomputed geometry metrics.", "error"); return
+        self.log_message(f"Geometry metrics recomputed for {result['computed']} polygon(s) in {result['seconds']:.2f}s"
+                         + (f"; {result['self_intersecting']} self-intersecting." if result['self_intersecting'] else "."), "info")
+        self.load_data_into_table()
+
     def handle_import_csv(self):
         filepath, _ = QFileDialog.getOpenFileName(self, "Select CSV File", os.path.expanduser("~/Documents"), "CSV files (*.csv);;All files (*.*)")
         if not filepath: return
         self.log_message(f"Loading CSV: {filepath}", "info")
+        from core.import_pipeline import CsvFileRowStream, fingerprint_csv_file
         try:
-            with open(filepath, mode='r', encoding='utf-8-sig') as csvfile:
-                reader = csv.DictReader(csvfile)
-                self._process_imported_data(list(reader), f"CSV '{os.path.basename(filepath)}'") 
+            # Streamed: rows are read, validated and written chunk by chunk
+            row_stream = CsvFileRowStream(filepath)
+            self._process_imported_data(row_stream, f"CSV '{os.path.basename(filepath)}'", source_type="csv",
+                                        byte_size=row_stream.total_bytes, fingerprint=fingerprint_csv_file(filepath))
         except Exception as e: self.log_message(f"Error reading CSV '{filepath}': {e}", "error"); QMessageBox.critical(self, "CSV Error", f"Could not read CSV file:\n{e}")
 
+    def handle_import_kml(self):
+        filepath, _ = QFileDialog.getOpenFileName(self, "Select KML/KMZ File", os.path.expanduser("~/Documents"),
+                                                  "KML/KMZ files (*.kml *.kmz);;All files (*.*)")
+        if not filepath: return
+        self.log_message(f"Loading KML: {filepath}", "info")
+        import xml.etree.ElementTree as ET
+        import zipfile
+        from core.kml_importer import KmlPlacemarkStream
+        from core.import_pipeline import fingerprint_source_file
+        try:
+            # Streamed: placemarks are parsed, converted to UTM and written chunk by chunk
+            placemark_stream = KmlPlacemarkStream(filepath, response_code_lookup=self.db_manager.get_response_codes_for_uuids)
+            self._process_imported_data(placemark_stream, f"KML '{os.path.basename(filepath)}'", source_type="kml",
+                                        byte_size=os.path.getsize(filepath), fingerprint=fingerprint_source_file(filepath, "kml"))
+        except (OSError, ValueError, ET.ParseError, zipfile.BadZipFile) as e:
+            self.log_message(f"Error reading KML '{filepath}': {e}", "error"); QMessageBox.critical(self, "KML Error", f"Could not read KML file:\n{e}"); return
+        if placemark_stream.placemarks_without_polygon:
+            self.log_message(f"{placemark_stream.placemarks_without_polygon} placemark(s) without a polygon (points, paths...) were ignored.", "info")
+        if placemark_stream.multi_polygon_placemarks:
+            self.log_message(f"{placemark_stream.multi_polygon_placemarks} placemark(s) had several polygons; only the first of each was imported.", "info")
+
+    def handle_preview_csv_import(self):
+        filepath, _ = QFileDialog.getOpenFileName(self, "Select CSV File to Preview", os.path.expanduser("~/Documents"), "CSV files (*.csv);;All files (*.*)")
+        if not filepath: return
+        from core.import_pipeline import CsvFileRowStream, preview_import, apply_import_preview, discard_import_preview
+        source_description = f"CSV '{os.path.basename(filepath)}'"
+        self.log_message(f"Previewing import of CSV: {filepath}", "info")
+        try:
+            row_stream = CsvFileRowStream(filepath)
+            progress_dialog, on_progress = self._create_import_progress(row_stream)
+            progress_dialog.setWindowTitle("Import Preview Progress"); progress_dialog.new_added_caption = "Rows Staged"
+            try:
+                preview = preview_import(self.db_manager, row_stream, source_description,
+                                         log_callback=self.log_message, progress_callback=on_progress)
+            finally:
+                progress_dialog.close()
+        except Exception as e:
+            discard_import_preview(self.db_manager)
+            self.log_message(f"Error reading CSV '{filepath}': {e}", "error"); QMessageBox.critical(self, "CSV Error", f"Could not read CSV file:\n{e}")
+            return
+        if preview.get("error"):
+            self.log_message(f"Import preview failed: {preview['error']}", "error"); QMessageBox.warning(self, "Import Preview", preview["error"]); return
+        if preview["cancelled"]: return
+        if preview["processed"] == 0:
+            discard_import_preview(self.db_manager)
+            self.log_message(f"No data rows found in {source_description}.", "info"); return
+
+        preview_dialog = ImportPreviewDialog(self, preview, source_description)
+        if preview_dialog.exec() != QDialog.DialogCode.Accepted or not preview_dialog.chosen_action:
+            discard_import_preview(self.db_manager)
+            self.log_message(f"Import preview of {source_description} closed; nothing was imported.", "info")
+            return
+        summary = apply_import_preview(self.db_manager, preview, "csv", source_description,
+                                       update_changed=preview_dialog.chosen_action == "new_and_changed", byte_size=row_stream.total_bytes)
+        self.load_data_into_table()
+        if summary.get("error"):
+            self.log_message(f"Import from {source_description} failed: {summary['error']}", "error"); QMessageBox.warning(self, "Import Error", summary["error"]); return
+        self.log_message(f"Import from {source_description}: Attempted: {summary['processed']}, New Added: {summary['new_added']}, "
+                         f"Updated: {summary['updated_changed']}, Skipped: {summary['skipped']}.", "info")
+
+    def _create_import_progress(self, rows, resumed_rows=0):
+        """
+        Shows an import progress dialog and returns (dialog, progress_callback) for core.import_pipeline.
+        A CsvFileRowStream or KmlPlacemarkStream reports progress by bytes read, a list by rows (minus rows resumed past).
+        """
+        progress_dialog = APIImportProgressDialog(self)
+        row_stream = rows if hasattr(rows, "fraction_read") else None
+        if row_stream: progress_dialog.set_total_bytes(row_stream.total_bytes)
+        else: progress_dialog.set_total_records(len(rows) - resumed_rows)
+        progress_dialog.show()
+
+        def _on_progress(processed_count, skipped_count, new_added_count):
+            progress_dialog.update_progress(processed_count, skipped_count, new_added_count,
+                                            fraction_read=row_stream.fraction_read if row_stream else None)
+            return not progress_dialog.was_cancelled()
+        return progress_dialog, _on_progress
+
     def handle_fetch_from_api(self):
         selected_api_title = self.api_source_combo_toolbar.currentText() 
         selected_api_url = self.api_source_combo_toolbar.currentData() 
         if not selected_api_url: QMessageBox.information(self, "API Fetch", "No API source selected or URL is missing."); return
         self.log_message(f"Fetching from API: {selected_api_title}...", "info") 
-        rows_from_api, error_msg = fetch_data_from_mwater_api(selected_api_url, selected_api_title)
+        from core.api_handler import fetch_mwater_csv
+        fetch_result = fetch_mwater_csv(selected_api_url, selected_api_title)
+        rows_from_api, error_msg = fetch_result["rows"], fetch_result["error"]
         if error_msg: self.log_message(f"API Fetch Error ({selected_api_title}): {error_msg}", "error"); QMessageBox.warning(self, "API Fetch Error", error_msg); return
-        if rows_from_api is not None: self._process_imported_data(rows_from_api, selected_api_title) 
+        if rows_from_api is not None:
+            self._process_imported_data(rows_from_api, selected_api_title, source_type="api",
+                                        byte_size=fetch_result["bytes_received"], pre_phase_seconds=fetch_result["phase_seconds"],
+                                        fingerprint=f"api:{fetch_result['content_sha1']}")
         else: self.log_message(f"No data returned or error for {selected_api_title}.", "info")
 
-    def _process_imported_data(self, row_list, source_description):
-        if not row_list:
+    def _process_imported_data(self, rows, source_description, source_type="csv", byte_size=None, pre_phase_seconds=None,
+                               fingerprint=None):
+        """
+        rows is a list (API fetch) or a CsvFileRowStream / KmlPlacemarkStream, whose progress is reported by bytes read.
+        With a fingerprint the import is checkpointed, and resumes if an earlier run was cancelled.
+        "Update Changed Records on Import" makes the import also rewrite records whose source row changed.
+        """
+        if isinstance(rows, list) and not rows:
             self.log_message(f"No data rows found in {source_description}.", "info")
             return
 
-        progress_dialog = APIImportProgressDialog(self)
-        progress_dialog.set_total_records(len(row_list))
-        progress_dialog.show()
-
-        processed_in_loop = 0
-        skipped_in_loop = 0
-        new_added_in_loop = 0
-        
-        for i, original_row_dict in enumerate(row_list):
-            processed_in_loop += 1
-            rc_from_row = ""
-            for k, v in original_row_dict.items():
-                if k.lstrip('\ufeff') == CSV_HEADERS["response_code"]:
-                    rc_from_row = v.strip()
-                    break
-            
-            if not rc_from_row:
-                self.log_message(f"Row {i+1} from {source_description} skipped: Missing Response Code.", "error")
-                skipped_in_loop += 1
-                progress_dialog.update_progress(processed_in_loop, skipped_in_loop, new_added_in_loop)
-                if progress_dialog.was_cancelled(): break
-                continue
-
-            is_dup_id = self.db_manager.check_duplicate_response_code(rc_from_row)
-            if is_dup_id:
-                self.log_message(f"Skipped duplicate Response Code '{rc_from_row}'.", "info")
-                skipped_in_loop += 1
-                progress_dialog.update_progress(processed_in_loop, skipped_in_loop, new_added_in_loop)
-                if progress_dialog.was_cancelled(): break
-                continue
-
-            processed_flat = process_csv_row_data(original_row_dict)
-            cur_uuid, cur_rc = processed_flat.get("uuid"), processed_flat.get("response_code")
-
-            if not cur_uuid or not cur_rc:
-                error_detail = processed_flat.get('error_messages', 'Unknown processing error')
-                self.log_message(f"Data processing error for original RC '{rc_from_row}'. Details: {error_detail}", "error")
-                skipped_in_loop += 1
-                progress_dialog.update_progress(processed_in_loop, skipped_in_loop, new_added_in_loop)
-                if progress_dialog.was_cancelled(): break
-                continue
-            
-            processed_flat["last_modified"] = datetime.datetime.now().isoformat()
-            # Always attempt to add, overwrite is False as we skip duplicates now
-            db_result_id = self.db_manager.add_or_update_polygon_data(processed_flat, overwrite=False)
+        update_changed = self.update_changed_action.isChecked()
+        checkpoint_key = f"{fingerprint}:update-changed" if (fingerprint and update_changed) else fingerprint
+        checkpoint = self.db_manager.get_import_checkpoint(checkpoint_key) if (fingerprint and isinstance(rows, list)) else None
+        progress_dialog, _on_progress = self._create_import_progress(rows, resumed_rows=checkpoint["rows_done"] if checkpoint else 0)
 
-            if db_result_id is not None:
-                if not is_dup_id: # It was a new record if is_dup_id was None/False before DB call
-                    new_added_in_loop += 1
-            else:
-                self.log_message(f"Failed to save RC '{cur_rc}' to DB.", "error")
-                skipped_in_loop += 1 # Count as skipped if DB operation failed
-
-            progress_dialog.update_progress(processed_in_loop, skipped_in_loop, new_added_in_loop)
-            if progress_dialog.was_cancelled():
-                self.log_message("Import cancelled by user.", "info")
-                break
-        
-        progress_dialog.close()
-        self.load_data_into_table()
+        from core.import_pipeline import run_import
+        try:
+            summary = run_import(self.db_manager, rows, source_type, source_description, byte_size=byte_size,
+                                 pre_phase_seconds=pre_phase_seconds, log_callback=self.log_message, progress_callback=_on_progress,
+                                 fingerprint=fingerprint, update_changed=update_changed)
+        finally:
+            progress_dialog.close()
+            self.load_data_into_table() # Chunks written before a read error are kept
+        if summary["processed"] == 0:
+            self.log_message(f"No data rows found in {source_description}.", "info")
+            return
         self.log_message(
             f"Import from {source_description}: "
-            f"Attempted: {processed_in_loop}, "
-            f"New Added: {new_added_in_loop}, "
-            f"Skipped (Duplicates/Errors): {skipped_in_loop}.",
+            f"Attempted: {summary['processed']}, "
+            f"New Added: {summary['new_added']}, "
+            + (f"Updated: {summary['updated_changed']}, " if update_changed else "") +
+            f"Skipped (Duplicates/Errors): {summary['skipped']}. "
+            f"Took {summary['total_seconds']:.2f}s ({summary['rows_per_s'] or 0:,.0f} rows/s).",
             "info"
         )
 
-    def handle_export_displayed_data_csv(self): 
-        model_to_export = self.table_view.model() 
-        if not model_to_export or model_to_export.rowCount() == 0: QMessageBox.information(self, "Export Data", "No data displayed to export."); return
-        filepath, _ = QFileDialog.getSaveFileName(self, "Save Displayed Data As CSV", os.path.expanduser("~/Documents/dilasa_displayed_data.csv"), "CSV Files (*.csv)")
+    def _current_filter_spec(self):
+        """The filter panel as a filter spec (see DatabaseManager.build_polygon_filter_clause)."""
+        filters = {"uuid": self.uuid_filter_edit.text(),
+                   "export_status": self.export_status_combo.currentText(),
+                   "error_status": self.error_status_combo.currentText()}
+        for key, date_edit in (("added_after", self.date_added_after_edit), ("added_before", self.date_added_before_edit)):
+            date = self._filter_panel_date(date_edit)
+            if date is not None: filters[key] = date.toString("yyyy-MM-dd")
+        if self.area_deviation_spin.value():
+            filters["area_deviation_over"] = self.area_deviation_spin.value()
+        return filters
+
+    def handle_export_displayed_data_csv(self):
+        """
+        Exports the records matching the filter panel, with the columns picked in CsvExportDialog,
+        straight from SQL in a background thread (CsvExportWorker): the table model is not read,
+        so any column can be exported and the window stays responsive on large exports.
+        """
+        if getattr(self, '_csv_export_thread', None) is not None:
+            QMessageBox.information(self, "Export Data", "A CSV export is already running."); return
+        from core.csv_exporter import csv_export_columns, CSV_EXPORT_TABLE_COLUMNS
+        from .dialogs.csv_export_dialog import CsvExportDialog
+        filters = self._current_filter_spec()
+        record_count = self.db_manager.count_polygon_records(filters) or 0
+        if record_count == 0: QMessageBox.information(self, "Export Data", "No records match the current filters."); return
+        export_dialog = CsvExportDialog(self, csv_export_columns(self.db_manager), CSV_EXPORT_TABLE_COLUMNS, record_count)
+        if not export_dialog.exec(): return
+        use_gzip = export_dialog.use_gzip()
+        default_name = "dilasa_displayed_data.csv" + (".gz" if use_gzip else "")
+        filepath, _ = QFileDialog.getSaveFileName(self, "Save Displayed Data As CSV", os.path.expanduser(f"~/Documents/{default_name}"),
+                                                  "Gzipped CSV Files (*.csv.gz)" if use_gzip else "CSV Files (*.csv)")
+        if not filepath: return
+
+        progress_dialog = QProgressDialog("Exporting CSV...", "Cancel", 0, record_count, self)
+        progress_dialog.setWindowTitle("Export Data"); progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        progress_dialog.setMinimumDuration(500); progress_dialog.setAutoClose(False); progress_dialog.setAutoReset(False)
+        worker = CsvExportWorker(self.db_manager.db_path, filepath, export_dialog.selected_columns(), filters, use_gzip)
+        thread = QThread(self)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        # Bound methods of GUI-thread objects: Qt queues these calls to the GUI thread
+        worker.progress.connect(progress_dialog.setValue)
+        worker.finished.connect(self._on_csv_export_finished)
+        worker.failed.connect(self._on_csv_export_failed)
+        progress_dialog.canceled.connect(worker.cancel, Qt.ConnectionType.DirectConnection) # The worker's thread is busy exporting
+        self._csv_export_thread, self._csv_export_worker, self._csv_export_progress = thread, worker, progress_dialog
+        thread.start()
+
+    def _end_csv_export(self):
+        self._csv_export_progress.close()
+        self._csv_export_thread.quit(); self._csv_export_thread.wait()
+        self._csv_export_worker.deleteLater(); self._csv_export_thread.deleteLater()
+        self._csv_export_thread = self._csv_export_worker = self._csv_export_progress = None
+
+    def _on_csv_export_finished(self, summary):
+        self._end_csv_export()
+        if summary["cancelled"]: self.log_message("CSV export cancelled.", "info"); return
+        msg = (f"{summary['rows']} record(s) exported to {summary['output_path']} "
+               f"({summary['bytes'] / (1024 * 1024):,.1f} MB) in {summary['seconds']:.2f}s.")
+        self.log_message(msg, "success"); QMessageBox.information(self, "Export Successful", msg)
+
+    def _on_csv_export_failed(self, error):
+        self._end_csv_export()
+        self.log_message(f"Error exporting data to CSV: {error}", "error"); QMessageBox.critical(self, "Export Error", f"Could not export data: {error}")
+
+    def handle_export_geopackage(self):
+        record_ids = self._collect_checked_or_filtered_ids()
+        if not record_ids: QMessageBox.information(self, "Export GeoPackage", "No records checked or displayed to export."); return
+        filepath, _ = QFileDialog.getSaveFileName(self, "Export GeoPackage", os.path.expanduser("~/Documents/dilasa_plots.gpkg"), "GeoPackage (*.gpkg)")
+        if not filepath: return
+        from core.gpkg_exporter import export_geopackage, GPKG_SOURCE_COLUMNS
+        progress_dialog = QProgressDialog("Exporting GeoPackage...", "Cancel", 0, len(record_ids), self)
+        progress_dialog.setWindowTitle("Export GeoPackage"); progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        progress_dialog.setMinimumDuration(500)
+
+        def _on_progress(done_count):
+            progress_dialog.setValue(min(done_count, len(record_ids)))
+            QApplication.processEvents()
+            return not progress_dialog.wasCanceled()
+        try:
+            records = self.db_manager.iter_polygon_records(record_ids=record_ids, columns=GPKG_SOURCE_COLUMNS, include_geometry_metrics=True)
+            summary = export_geopackage(records, filepath, progress_callback=_on_progress)
+        except (OSError, sqlite3.Error) as e:
+            self.log_message(f"GeoPackage export error: {e}", "error"); QMessageBox.critical(self, "Export Error", f"Could not write the GeoPackage:\n{e}"); return
+        finally:
+            progress_dialog.close()
+        if summary["cancelled"]: self.log_message("GeoPackage export cancelled.", "info"); return
+        msg = (f"{summary['exported']} polygon(s) exported to {filepath} in {summary['seconds']:.2f}s"
+               + (f"; {summary['skipped']} record(s) skipped (not valid for KML)." if summary['skipped'] else "."))
+        self.log_message(msg, "success" if summary["exported"] else "info"); QMessageBox.information(self, "Export GeoPackage", msg)
+
+    def handle_export_geojson(self):
+        record_ids = self._collect_checked_or_filtered_ids()
+        if not record_ids: QMessageBox.information(self, "Export GeoJSON", "No records checked or displayed to export."); return
+        filepath, _ = QFileDialog.getSaveFileName(self, "Export GeoJSON", os.path.expanduser("~/Documents/dilasa_plots.geojson"),
+                                                  "GeoJSON (*.geojson);;Newline-delimited GeoJSON (*.ndjson);;"
+                                                  "Gzipped GeoJSON (*.geojson.gz);;Gzipped newline-delimited GeoJSON (*.ndjson.gz)")
         if not filepath: return
+        from core.geojson_exporter import export_geojson, geojson_options_for_path, GEOJSON_SOURCE_COLUMNS, DEFAULT_GEOJSON_PRECISION
+        output_format, use_gzip = geojson_options_for_path(filepath)
+        progress_dialog = QProgressDialog("Exporting GeoJSON...", "Cancel", 0, len(record_ids), self)
+        progress_dialog.setWindowTitle("Export GeoJSON"); progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        progress_dialog.setMinimumDuration(500)
+
+        def _on_progress(done_count):
+            progress_dialog.setValue(min(done_count, len(record_ids)))
+            QApplication.processEvents()
+            return not progress_dialog.wasCanceled()
         try:
-            headers = self.source_model._headers 
-            with open(filepath, 'w', newline='', encoding='utf-8-sig') as csvfile:
-                writer = csv.writer(csvfile); writer.writerow(headers[1:]) 
-                for row in range(model_to_export.rowCount()):
-                    row_data = [model_to_export.data(model_to_export.index(row, col)) for col in range(1, model_to_export.columnCount())] 
-                    writer.writerow(row_data)
-            self.log_message(f"Data exported to {filepath}", "success")
-            QMessageBox.information(self, "Export Successful", f"{model_to_export.rowCount()} displayed records exported to:\n{filepath}")
-        except Exception as e: self.log_message(f"Error exporting displayed data to CSV: {e}", "error"); QMessageBox.critical(self, "Export Error", f"Could not export displayed data: {e}")
+            records = self.db_manager.iter_polygon_records(record_ids=record_ids, columns=GEOJSON_SOURCE_COLUMNS, include_geometry_metrics=True)
+            summary = export_geojson(records, filepath, output_format, precision=DEFAULT_GEOJSON_PRECISION,
+                                     use_gzip=use_gzip, progress_callback=_on_progress)
+        except OSError as e:
+            self.log_message(f"GeoJSON export error: {e}", "error"); QMessageBox.critical(self, "Export Error", f"Could not write the GeoJSON file:\n{e}"); return
+        finally:
+            progress_dialog.close()
+        if summary["cancelled"]: self.log_message("GeoJSON export cancelled.", "info"); return
+        msg = (f"{summary['exported']} polygon(s) exported to {filepath} ({summary['bytes'] / 1024:,.0f} KB) in {summary['seconds']:.2f}s"
+               + (f"; {summary['skipped']} record(s) skipped (not valid for KML)." if summary['skipped'] else "."))
+        self.log_message(msg, "success" if summary["exported"] else "info"); QMessageBox.information(self, "Export GeoJSON", msg)
 
     def handle_delete_checked_rows(self): 
         checked_ids = self.source_model.get_checked_item_db_ids()
@@ -870,68 +1307,153 @@ class MainWindow(QMainWindow):
     def handle_generate_kml(self): 
         checked_ids = self.source_model.get_checked_item_db_ids()
         if not checked_ids: QMessageBox.information(self, "Generate KML", "No records checked for KML generation."); return
-        records_data = [self.db_manager.get_polygon_data_by_id(db_id) for db_id in checked_ids]
-        valid_for_kml = [r for r in records_data if r and r.get('status') == 'valid_for_kml']
-        if not valid_for_kml: QMessageBox.information(self, "Generate KML", "Checked records are not valid for KML."); return
+        valid_count = self.db_manager.count_polygon_records_by_ids(checked_ids, status='valid_for_kml')
+        if not valid_count: QMessageBox.information(self, "Generate KML", "Checked records are not valid for KML."); return
         output_folder = QFileDialog.getExistingDirectory(self, "Select Output Folder", os.path.expanduser("~/Documents"))
         if not output_folder: self.log_message("KML generation cancelled.", "info"); return
         output_mode_dialog = OutputModeDialog(self); kml_output_mode = output_mode_dialog.get_selected_mode()
         if not kml_output_mode: self.log_message("KML gen cancelled (mode selection).", "info"); return
         self.log_message(f"Generating KMLs to: {output_folder} (Mode: {kml_output_mode})", "info")
-        files_gen, ids_gen = 0, []
+        if kml_output_mode == "superoverlay":
+            self._generate_super_overlay(checked_ids, valid_count, output_folder, output_mode_dialog.partition, output_mode_dialog.package_kmz)
+            return
+        if kml_output_mode == "incremental":
+            self._generate_incremental_kml(checked_ids, output_folder)
+            return
+        from core.kml_fragment_cache import export_cached_kml_files
         try:
-            if kml_output_mode == "single":
-                ts=datetime.datetime.now().strftime('%d.%m.%y'); fn=f"Consolidate_ALL_KML_{ts}_{len(valid_for_kml)}.kml"
-                doc=simplekml.Kml(name=f"Consolidated - {ts}")
-                for pd in valid_for_kml: 
-                    if add_polygon_to_kml_object(doc, pd): ids_gen.append(pd['id'])
-                if doc.features: doc.save(os.path.join(output_folder,fn)); files_gen=1
-            elif kml_output_mode == "multiple":
-                for pd in valid_for_kml:
-                    doc=simplekml.Kml(name=pd['uuid'])
-                    if add_polygon_to_kml_object(doc, pd): doc.save(os.path.join(output_folder,f"{pd['uuid']}.kml")); ids_gen.append(pd['id']); files_gen+=1
-            for rid in ids_gen: self.db_manager.update_kml_export_status(rid)
+            files_gen, ids_gen = export_cached_kml_files(self.db_manager, checked_ids, output_folder, kml_output_mode)
+            self.db_manager.update_kml_export_status_bulk(ids_gen)
             if ids_gen: self.load_data_into_table()
             msg=f"{files_gen} KMLs generated for {len(ids_gen)} records." if files_gen > 0 else "No KMLs generated."
             self.log_message(msg,"success" if files_gen>0 else "info"); QMessageBox.information(self,"KML Generation",msg)
         except Exception as e: self.log_message(f"KML Gen Error: {e}","error"); QMessageBox.critical(self,"KML Error",f"Error:\n{e}")
 
+    def _generate_super_overlay(self, record_ids, valid_count, output_folder, partition, package_kmz):
+        from core.kml_superoverlay import export_super_overlay, super_overlay_output_path
+        output_path = super_overlay_output_path(output_folder, valid_count, package_kmz)
+        progress_dialog = QProgressDialog("Building super-overlay layout...", "Cancel", 0, 2 * len(record_ids), self)
+        progress_dialog.setWindowTitle("Generate KML"); progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        progress_dialog.setMinimumDuration(500)
+
+        def _on_progress(phase, done_count):
+            if phase == "tiles": progress_dialog.setLabelText("Writing tiles...")
+            progress_dialog.setValue(min(done_count + (len(record_ids) if phase == "tiles" else 0), 2 * len(record_ids)))
+            QApplication.processEvents()
+            return not progress_dialog.wasCanceled()
+        try:
+            summary = export_super_overlay(self.db_manager, record_ids, output_path, partition, package_kmz, progress_callback=_on_progress)
+        except (OSError, sqlite3.Error) as e:
+            self.log_message(f"KML Gen Error: {e}", "error"); QMessageBox.critical(self, "KML Error", f"Error:\n{e}"); return
+        finally:
+            progress_dialog.close()
+        if summary["cancelled"]: self.log_message("Super-overlay generation cancelled.", "info"); return
+        self.db_manager.update_kml_export_status_bulk(summary["exported_ids"])
+        if summary["exported_ids"]: self.load_data_into_table()
+        msg = (f"Super-overlay with {len(summary['exported_ids'])} records in {summary['tiles']} KML files written to "
+               f"{summary['output_path']} in {summary['seconds']:.2f}s. Open "
+               f"{'the KMZ' if package_kmz else 'doc.kml'} in Google Earth.")
+        self.log_message(msg, "success" if summary["exported_ids"] else "info"); QMessageBox.information(self, "KML Generation", msg)
+
+    def _generate_incremental_kml(self, record_ids, output_folder):
+        from core.kml_incremental import export_kml_incremental
+        progress_dialog = QProgressDialog("Checking records against the folder manifest...", "Cancel", 0, 2 * len(record_ids), self)
+        progress_dialog.setWindowTitle("Generate KML"); progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        progress_dialog.setMinimumDuration(500)
+
+        def _on_progress(phase, done_count):
+            if phase == "write": progress_dialog.setLabelText("Writing new and changed records...")
+            progress_dialog.setValue(min(done_count + (len(record_ids) if phase == "write" else 0), 2 * len(record_ids)))
+            QApplication.processEvents()
+            return not progress_dialog.wasCanceled()
+        try:
+            summary = export_kml_incremental(self.db_manager, record_ids, output_folder, progress_callback=_on_progress)
+        except (OSError, sqlite3.Error) as e:
+            self.log_message(f"KML Gen Error: {e}", "error"); QMessageBox.critical(self, "KML Error", f"Error:\n{e}"); return
+        finally:
+            progress_dialog.close()
+        self.db_manager.update_kml_export_status_bulk(summary["written_ids"])
+        if summary["written_ids"]: self.load_data_into_table()
+        msg = (f"{len(summary['written_ids'])} KMLs written (new or changed), {summary['unchanged']} unchanged, "
+               f"{summary['removed']} removed in {summary['seconds']:.2f}s.")
+        if summary["cancelled"]: msg = "Incremental KML update cancelled. " + msg
+        self.log_message(msg, "success" if summary["written_ids"] or summary["removed"] else "info")
+        QMessageBox.information(self, "KML Generation", msg)
+
+    def _get_or_build_ge_kml_url(self, polygon_record):
+        """
+        Returns the dilasa://kml URL of the record's KML, building it only if this record version
+        is not already in the in-memory content store. Returns None if KML generation fails.
+        """
+        from .widgets.content_scheme_handler import get_content_store
+        content_store = get_content_store()
+        kml_cache_key = (polygon_record.get('id'), polygon_record.get('last_modified'), "kml")
+        kml_url = content_store.url_for_key(kml_cache_key)
+        if kml_url is None:
+            from core.kml_fragment_cache import get_placemark_fragment
+            from core.kml_generator import kml_document_text
+            cached_placemark = get_placemark_fragment(self.db_manager, polygon_record.get('id'))
+            if cached_placemark is None:
+                return None
+            uuid, placemark_fragment = cached_placemark
+            kml_url = content_store.put("kml", kml_document_text(uuid, [placemark_fragment]).encode("utf-8"),
+                                        "application/vnd.google-earth.kml+xml", cache_key=kml_cache_key)
+        return kml_url
+
     def _trigger_ge_polygon_upload(self, polygon_record):
         self.log_message(f"GE View: Processing polygon UUID {polygon_record.get('uuid')} for Google Earth upload.", "info")
+        # KML is kept in memory keyed by record version; nothing is written to disk on selection
+        kml_url = self._get_or_build_ge_kml_url(polygon_record)
+        if kml_url is None:
+            self.log_message(f"Failed to generate KML content for polygon UUID {polygon_record.get('uuid')}.", "error")
+            QMessageBox.warning(self, "KML Generation Failed", "Could not generate KML content for the selected polygon.")
+            return
+
+        self._ensure_ge_view_widget().set_pending_kml_import(kml_url, str(polygon_record.get('uuid', 'polygon')))
+        self.log_message(f"KML for UUID {polygon_record.get('uuid')} ready for Google Earth import ({kml_url.toString()}).", "info")
+
+        if self.show_ge_instructions_popup_again:
+            self._show_ge_instructions_popup()
 
-        kml_doc = simplekml.Kml(name=str(polygon_record.get('uuid', 'Polygon')))
-        if add_polygon_to_kml_object(kml_doc, polygon_record):
+    def _handle_live_ge_link_toggle(self, checked):
+        if checked:
+            from core.kml_network_server import KMLNetworkLinkServer
+            if self.kml_link_server is None:
+                self.kml_link_server = KMLNetworkLinkServer(self.db_manager.db_path)
             try:
-                # Delete old temp KML if it exists
-                if self.current_temp_kml_path and os.path.exists(self.current_temp_kml_path):
-                    try:
-                        os.remove(self.current_temp_kml_path)
-                        self.log_message(f"Old temporary KML file deleted: {self.current_temp_kml_path}", "info")
-                    except FileNotFoundError:
-                        self.log_message(f"Old temporary KML file not found for deletion: {self.current_temp_kml_path}", "warning")
-                    except PermissionError:
-                        self.log_message(f"Permission denied while deleting old temporary KML file: {self.current_temp_kml_path}", "error")
-                    except Exception as e_del:
-                        self.log_message(f"Error deleting old temporary KML file {self.current_temp_kml_path}: {e_del}", "error")
-                
-                fd, temp_kml_path = tempfile.mkstemp(suffix=".kml", prefix="ge_poly_")
-                os.close(fd) 
-                kml_doc.save(temp_kml_path)
-                self.current_temp_kml_path = temp_kml_path # Store new path
-                self.log_message(f"Temporary KML saved to: {self.current_temp_kml_path}", "info")
-
-                QApplication.clipboard().setText(self.current_temp_kml_path)
-                self.log_message("KML file path copied to clipboard.", "info")
-
-                if self.show_ge_instructions_popup_again:
-                    self._show_ge_instructions_popup()
-
-            except Exception as e_kml_save:
-                self.log_message(f"Error saving temporary KML or copying to clipboard: {e_kml_save}", "error")
-                QMessageBox.warning(self, "KML Error", f"Could not save KML or copy path: {e_kml_save}")
+                live_url = self.kml_link_server.start()
+            except OSError as e:
+                self.log_message(f"Could not start live Google Earth link server: {e}", "error")
+                QMessageBox.warning(self, "Live Link Error", f"Could not start the local server:\n{e}")
+                self.live_ge_link_action.blockSignals(True); self.live_ge_link_action.setChecked(False); self.live_ge_link_action.blockSignals(False)
+                return
+            self._push_live_link_selection()
+            QApplication.clipboard().setText(live_url)
+            self.log_message(f"Live Google Earth link started at {live_url} (copied to clipboard).", "success")
+            QMessageBox.information(self, "Live Google Earth Link",
+                                    f"Network Link URL (copied to clipboard):\n{live_url}\n\n"
+                                    "In Google Earth Pro: Add > Network Link, paste the URL as the Link and press OK.\n"
+                                    "Checked rows are served (or all filtered rows when none are checked); "
+                                    "Google Earth refreshes automatically as the selection or data changes.")
         else:
-            self.log_message(f"Failed to generate KML content for polygon UUID {polygon_record.get('uuid')}.", "error")
-            QMessageBox.warning(self, "KML Generation Failed", "Could not generate KML content for the selected polygon.")
+            if self.kml_link_server: self.kml_link_server.stop()
+            self.log_message("Live Google Earth link stopped.", "info")
+
+    def _schedule_live_link_sync(self, *args):
+        if self.kml_link_server and self.kml_link_server.is_running():
+            self._live_link_sync_timer.start()
+
+    def _collect_checked_or_filtered_ids(self):
+        """Checked rows if any are checked, otherwise every row passing the current filters."""
+        checked_ids = self.source_model.get_checked_item_db_ids()
+        if checked_ids: return checked_ids
+        id_col = self.source_model.ID_COL
+        return [int(self.filter_proxy_model.data(self.filter_proxy_model.index(row, id_col)))
+                for row in range(self.filter_proxy_model.rowCount())]
+
+    def _push_live_link_selection(self):
+        if self.kml_link_server and self.kml_link_server.is_running():
+            self.kml_link_server.set_record_ids(self._collect_checked_or_filtered_ids())
 
     def _show_ge_instructions_popup(self):
         msg_box = QMessageBox(self)
@@ -939,10 +1461,9 @@ class MainWindow(QMainWindow):
         msg_box.setTextFormat(Qt.TextFormat.PlainText) # Ensure plain text interpretation for newlines
         msg_box.setText("Instructions:\n"
                         "1. Click on the Google Earth window to focus.\n"
-                        "2. Press Ctrl+I to open the import dialog.\n"
-                        "3. Press Ctrl+V to paste the KML file path.\n"
-                        "4. Press Enter to load the KML.\n"
-                        "5. Press Ctrl+H for historical imagery view.")
+                        "2. Press Ctrl+I to import. The selected polygon's KML is supplied\n"
+                        "   to the import dialog automatically.\n"
+                        "3. Press Ctrl+H for historical imagery view.")
         
         checkbox = QCheckBox("Do not show this popup again")
         msg_box.setCheckBox(checkbox)
@@ -968,8 +1489,9 @@ class MainWindow(QMainWindow):
         self.toggle_ge_view_button.blockSignals(original_button_blocked)
 
         if checked:
-            self.map_stack.setCurrentIndex(1)
-            self.google_earth_view_widget.set_focus_on_webview()
+            ge_view_widget = self._ensure_ge_view_widget()
+            self.map_stack.setCurrentWidget(ge_view_widget)
+            ge_view_widget.set_focus_on_webview()
         else:
             self.map_stack.setCurrentIndex(0)
 
@@ -990,26 +1512,40 @@ class MainWindow(QMainWindow):
         else: print(f"LOG [{level.upper()}]: {message}")
         if hasattr(self, '_main_status_bar'): self._main_status_bar.showMessage(message, 7000 if level=="info" else 10000) # Corrected: Use the renamed variable
             
+    def _show_performance_panel(self):
+        if self.performance_panel is None:
+            from .widgets.performance_panel import PerformancePanel
+            self.performance_panel = PerformancePanel(self)
+            self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.performance_panel)
+        self.performance_panel.show()
+        self.performance_panel.raise_()
+
     def load_data_into_table(self): 
         try:
-            polygon_records = self.db_manager.get_all_polygon_data_for_display()
-            self.source_model.update_data(polygon_records) 
+            with perf.span("table.reload", "ui") as reload_span:
+                polygon_records = self.db_manager.get_all_polygon_data_for_display()
+                self._selection_prefetch_cache.clear() # Records may have been updated or deleted
+                self.source_model.update_data(polygon_records) 
+                reload_span.set_items(len(polygon_records))
+            if self.kml_link_server and self.kml_link_server.is_running():
+                self.kml_link_server.notify_data_changed() # Record contents may have changed
         except Exception as e:
             self.log_message(f"Error loading data into table: {e}", "error")
             QMessageBox.warning(self, "Load Data Error", f"Could not load polygon records: {e}")
 
+    def _close_after_scheduled_job(self):
+        if self.close(): QApplication.quit() # Closing a hidden window does not end the event loop by itself
+
     def closeEvent(self, event):
+        if getattr(self, 'job_scheduler', None) is not None and not self.job_scheduler.stop(): # A cancelled import resumes next time
+            # The cancelled job is finishing its current step: close once it has ended, without a frozen window
+            self.hide(); self.job_scheduler.stopped.connect(self._close_after_scheduled_job, Qt.ConnectionType.SingleShotConnection)
+            event.ignore(); return
         if hasattr(self, 'map_view_widget') and self.map_view_widget: self.map_view_widget.cleanup()
-        if hasattr(self, 'google_earth_view_widget') and hasattr(self.google_earth_view_widget, 'cleanup'):
+        if getattr(self, 'google_earth_view_widget', None) is not None and hasattr(self.google_earth_view_widget, 'cleanup'):
              self.google_earth_view_widget.cleanup() 
+        if getattr(self, 'kml_link_server', None) is not None: self.kml_link_server.stop()
+        if getattr(self, '_csv_export_thread', None) is not None: # Stop a running export; its partial file is removed
+            self._csv_export_worker.cancel(); self._csv_export_thread.quit(); self._csv_export_thread.wait()
         if hasattr(self, 'db_manager') and self.db_manager: self.db_manager.close()
-
-        # Clean up the last temporary KML file if it exists
-        if self.current_temp_kml_path and os.path.exists(self.current_temp_kml_path):
-            try:
-                os.remove(self.current_temp_kml_path)
-                self.log_message(f"Temporary KML file deleted on exit: {self.current_temp_kml_path}", "info")
-            except Exception as e:
-                self.log_message(f"Error deleting temporary KML file {self.current_temp_kml_path} on exit: {e}", "error")
-        
         super().closeEvent(event)
@@ -0,0 +1,91 @@
+# File: DilasaKMLTool_v4/ui/widgets/content_scheme_handler.py
+# ----------------------------------------------------------------------
+import uuid
+from PySide6.QtCore import QBuffer, QByteArray, QIODevice, QUrl
+from PySide6.QtWebEngineCore import QWebEngineUrlScheme, QWebEngineUrlSchemeHandler, QWebEngineUrlRequestJob
+
+from core.lru_cache import LRUCache
+
+DILASA_SCHEME = b"dilasa"
+MAX_CACHED_DOCUMENTS = 64
+
+def register_dilasa_url_scheme():
+    """
+    Registers the dilasa:// scheme with QtWebEngine.
+    Must be called before the QApplication is created (Qt requirement for custom schemes).
+    """
+    scheme = QWebEngineUrlScheme(DILASA_SCHEME)
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Host) # dilasa://<kind>/<token>
+    # Secure so folium pages served from it may load their https CDN scripts and tiles
+    scheme.setFlags(QWebEngineUrlScheme.Flag.SecureScheme | QWebEngineUrlScheme.Flag.CorsEnabled)
+    QWebEngineUrlScheme.registerScheme(scheme)
+
+
+class InMemoryContentStore:
+    """
+    LRU store of generated documents (map HTML, KML, GeoJSON) served under dilasa://<kind>/<token>.
+    Documents can be stored under a cache key such as (record_id, last_modified, kind), so a
+    record that has not changed is rendered once and then served from memory.
+    """
+    def __init__(self, max_entries=MAX_CACHED_DOCUMENTS):
+        self._documents = LRUCache(max_entries) # token -> (mime_type, bytes, cache_key)
+        self._tokens_by_key = {}                # cache_key -> token
+
+    def put(self, kind, content_bytes, mime_type, cache_key=None):
+        """Stores content and returns the dilasa:// QUrl that serves it."""
+        token = f"{kind}/{uuid.uuid4().hex}"
+        if cache_key is not None:
+            old_token = self._tokens_by_key.pop(cache_key, None)
+            if old_token: self._documents.pop(old_token)
+            self._tokens_by_key[cache_key] = token
+        for evicted_token, evicted_entry in self._documents.put(token, (mime_type, content_bytes, cache_key)):
+            evicted_key = evicted_entry[2]
+            if evicted_key is not None and self._tokens_by_key.get(evicted_key) == evicted_token:
+                del self._tokens_by_key[evicted_key]
+        return self.url_for_token(token)
+
+    def url_for_key(self, cache_key):
+        """Returns the dilasa:// QUrl of a cached document, or None if it is not (or no longer) cached."""
+        token = self._tokens_by_key.get(cache_key)
+        if token and token in self._documents:
+            return self.url_for_token(token)
+        return None
+
+    def get_by_url(self, url):
+        """Returns (mime_type, bytes) for a dilasa:// URL, or None."""
+        entry = self._documents.get(self.token_for_url(url))
+        return (entry[0], entry[1]) if entry else None
+
+    @staticmethod
+    def url_for_token(token):
+        return QUrl(f"{DILASA_SCHEME.decode()}://{token}")
+
+    @staticmethod
+    def token_for_url(url):
+        url = QUrl(url)
+        return f"{url.host()}{url.path()}"
+
+
+class DilasaSchemeHandler(QWebEngineUrlSchemeHandler):
+    """Answers dilasa:// requests from the in-memory content store."""
+    def __init__(self, content_store, parent=None):
+        super().__init__(parent)
+        self.content_store = content_store
+
+    def requestStarted(self, job):
+        entry = self.content_store.get_by_url(job.requestUrl())
+        if entry is None:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+            return
+        mime_type, content_bytes = entry
+        buffer = QBuffer(job) # Owned by the job, released when the request finishes
+        buffer.setData(QByteArray(content_bytes))
+        buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+        job.reply(mime_type.encode(), buffer)
+
+
+_content_store = InMemoryContentStore()
+
+def get_content_store():
+    """Returns the application-wide store shared by the map view, GE view and scheme handler."""
+    return _content_store
@@ -1,14 +1,69 @@
 # File: DilasaKMLTool_v4/ui/widgets/google_earth_webview_widget.py
 # ----------------------------------------------------------------------
+import os
+import re
 from PySide6.QtWidgets import QWidget, QVBoxLayout
 from PySide6.QtWebEngineWidgets import QWebEngineView
-from PySide6.QtWebEngineCore import QWebEngineSettings # Corrected import
-from PySide6.QtCore import QUrl, Slot, Qt # Added Qt import here
+from PySide6.QtWebEngineCore import QWebEngineSettings, QWebEnginePage # Corrected import
+from PySide6.QtCore import QUrl, Slot, Qt, QTimer # Added Qt import here
+
+from .web_engine_profile import create_page_with_shared_profile, get_web_profile_dir
+from .content_scheme_handler import get_content_store
+
+GOOGLE_EARTH_WEB_URL = "https://earth.google.com/web/"
+# After this long hidden, a frozen page is discarded to give its renderer memory back.
+# A discarded page reloads automatically when it is made active again.
+DISCARD_AFTER_HIDDEN_MS = 5 * 60 * 1000
+
+GE_IMPORT_SUBFOLDER = "ge_import"
+
+class GoogleEarthPage(QWebEnginePage):
+    """
+    Page for Google Earth Web that answers its KML file chooser (Ctrl+I) with the polygon
+    currently selected in the table. The KML is held in memory (dilasa:// content store) and
+    written to disk only at this point, as one file that replaces the previous one.
+    """
+    def __init__(self, profile, parent=None):
+        super().__init__(profile, parent)
+        self.pending_import_url = None   # dilasa://kml/<token> of the selected polygon
+        self.pending_import_name = None  # File name shown by Google Earth (the UUID)
+        self.materialized_import_path = None
+
+    def chooseFiles(self, mode, old_files, accepted_mime_types):
+        entry = get_content_store().get_by_url(self.pending_import_url) if self.pending_import_url else None
+        if entry is None:
+            return super().chooseFiles(mode, old_files, accepted_mime_types)
+        try:
+            return [self._materialize_pending_import(entry[1])]
+        except OSError as e:
+            print(f"GE View: Could not write KML for import: {e}")
+            return super().chooseFiles(mode, old_files, accepted_mime_types)
+
+    def _materialize_pending_import(self, kml_bytes):
+        self.remove_materialized_import()
+        import_dir = os.path.join(get_web_profile_dir(), GE_IMPORT_SUBFOLDER)
+        os.makedirs(import_dir, exist_ok=True)
+        safe_name = re.sub(r"[^A-Za-z0-9._-]", "_", self.pending_import_name or "polygon")
+        import_path = os.path.join(import_dir, f"{safe_name}.kml")
+        with open(import_path, "wb") as kml_file:
+            kml_file.write(kml_bytes)
+        self.materialized_import_path = import_path
+        return import_path
+
+    def remove_materialized_import(self):
+        if self.materialized_import_path and os.path.exists(self.materialized_import_path):
+            try: os.remove(self.materialized_import_path)
+            except OSError as e: print(f"GE View: Error removing KML import file: {e}")
+        self.materialized_import_path = None
+
 
 class GoogleEarthWebViewWidget(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.web_view = QWebEngineView()
+        # Shares profile (and disk HTTP cache) with MapViewWidget
+        self.ge_page = create_page_with_shared_profile(self.web_view, page_class=GoogleEarthPage)
+        self.web_view.setPage(self.ge_page)
 
         # Configure WebEngineSettings if necessary (e.g., enabling JavaScript, plugins)
         settings = self.web_view.settings()
@@ -22,12 +77,48 @@ class GoogleEarthWebViewWidget(QWidget):
         layout.addWidget(self.web_view)
         self.setLayout(layout)
 
-        # Load Google Earth Web
-        self.web_view.setUrl(QUrl("https://earth.google.com/web/"))
+        # Google Earth Web is loaded on the first showEvent, not here
+        self._earth_loaded = False
+        self._discard_timer = QTimer(self)
+        self._discard_timer.setSingleShot(True)
+        self._discard_timer.setInterval(DISCARD_AFTER_HIDDEN_MS)
+        self._discard_timer.timeout.connect(self._discard_page)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self._discard_timer.stop()
+        if not self._earth_loaded:
+            self._earth_loaded = True
+            self.web_view.setUrl(QUrl(GOOGLE_EARTH_WEB_URL))
+        else:
+            self._set_lifecycle_state(QWebEnginePage.LifecycleState.Active)
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        if self._earth_loaded:
+            # Non-active states are only accepted for hidden pages, so apply after the hide completes
+            QTimer.singleShot(0, self._freeze_page)
+            self._discard_timer.start()
+
+    def _freeze_page(self):
+        """Suspends JavaScript and rendering while the GE view is toggled off; state is kept."""
+        if not self.isVisible():
+            self._set_lifecycle_state(QWebEnginePage.LifecycleState.Frozen)
+
+    def _discard_page(self):
+        """Unloads the page after a long time hidden. It reloads when shown again."""
+        if not self.isVisible():
+            self._set_lifecycle_state(QWebEnginePage.LifecycleState.Discarded)
+
+    def _set_lifecycle_state(self, state):
+        page = self.web_view.page()
+        if page.lifecycleState() != state:
+            page.setLifecycleState(state)
 
-        # Example: Run JavaScript after the page loads (for testing)
-        # Get user agent to infer WebEngine version
-        self.web_view.page().runJavaScript("navigator.userAgent", self.js_callback)
+    def set_pending_kml_import(self, kml_url, display_name):
+        """Makes the given in-memory KML (dilasa:// URL) the file offered to Google Earth's import dialog."""
+        self.ge_page.pending_import_url = kml_url
+        self.ge_page.pending_import_name = display_name
 
     def js_callback(self, result):
         print(f"JavaScript Result: {result}")
@@ -57,13 +148,13 @@ class GoogleEarthWebViewWidget(QWidget):
 
     def cleanup(self):
         """
-        Placeholder for any cleanup logic needed for the web view.
-        For example, stopping media, clearing cache, or other resource releases.
+        Stops any pending load and the discard timer before the window closes and removes
+        the KML file handed to the last import. The disk cache belongs to the shared profile
+        and is intentionally kept.
         """
-        # self.web_view.stop() # Example: stop loading
-        # self.web_view.setUrl(QUrl("about:blank")) # Example: clear page
-        # No specific cleanup needed for QWebEngineView itself unless page-specific actions.
-        pass
+        self._discard_timer.stop()
+        self.web_view.stop()
+        self.ge_page.remove_materialized_import()
 
 if __name__ == '__main__':
     # This part is for basic testing if you run this file directly
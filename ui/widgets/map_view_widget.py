@@ -1,33 +1,62 @@
 # File: DilasaKMLTool_v4/ui/widgets/map_view_widget.py
 # ----------------------------------------------------------------------
-from PySide6.QtWidgets import QWidget, QVBoxLayout
-from PySide6.QtWebEngineWidgets import QWebEngineView
-from PySide6.QtWebEngineCore import QWebEngineSettings 
-from PySide6.QtCore import QUrl, Slot 
-import folium
-import os
-import tempfile 
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QLabel
+from PySide6.QtCore import QUrl, Slot, Qt, Signal
+
+from core import perf
+
+# folium and QtWebEngine are imported on first use (see ensure_initialized) so that
+# constructing this widget at startup costs no more than a placeholder label.
 
 class MapViewWidget(QWidget):
+    map_ready = Signal() # Emitted once the web view exists and the default map has been requested
+
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.web_view = None
+
+        self._layout = QVBoxLayout(self)
+        self._layout.setContentsMargins(0, 0, 0, 0)
+        self._placeholder_label = QLabel("Loading map...")
+        self._placeholder_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self._layout.addWidget(self._placeholder_label)
+        self.setLayout(self._layout)
+        # Map pages are served from memory under dilasa://map/<token>, see content_scheme_handler
+        self.content_store = None
+
+    def ensure_initialized(self):
+        """Creates the web view and renders the default map the first time the map is needed."""
+        if self.web_view is not None:
+            return
+        self._create_web_view()
+        self._initialize_map()
+        self.map_ready.emit()
+
+    def _create_web_view(self):
+        from PySide6.QtWebEngineWidgets import QWebEngineView
+        from PySide6.QtWebEngineCore import QWebEngineSettings
+
+        from .web_engine_profile import create_page_with_shared_profile
+        from .content_scheme_handler import get_content_store
+        self.content_store = get_content_store()
+
         self.web_view = QWebEngineView()
-        
+        self.web_view.setPage(create_page_with_shared_profile(self.web_view)) # Shared disk cache with the GE view
         settings = self.web_view.settings()
         settings.setAttribute(QWebEngineSettings.WebAttribute.JavascriptEnabled, True)
         settings.setAttribute(QWebEngineSettings.WebAttribute.LocalContentCanAccessRemoteUrls, True)
         settings.setAttribute(QWebEngineSettings.WebAttribute.ScrollAnimatorEnabled, True)
 
-        layout = QVBoxLayout(self)
-        layout.setContentsMargins(0, 0, 0, 0)
-        layout.addWidget(self.web_view)
-        self.setLayout(layout)
-        
-        self.temp_map_file = None
-        self._initialize_map()
+        self._layout.removeWidget(self._placeholder_label)
+        self._placeholder_label.deleteLater()
+        self._placeholder_label = None
+        self._layout.addWidget(self.web_view)
 
     def _initialize_map(self, lat=20.5937, lon=78.9629, zoom=5): 
         """Initializes the map with Esri Satellite as the default base layer."""
+        default_map_key = ("default_map", lat, lon, zoom)
+        if self._show_cached_map(default_map_key): return
+        import folium
         # Default to Esri Satellite
         m = folium.Map(
             location=[lat, lon], 
@@ -50,28 +79,60 @@ class MapViewWidget(QWidget):
         ).add_to(m)
 
         folium.LayerControl().add_to(m)
-        self.update_map(m)
+        self.update_map(m, cache_key=default_map_key)
 
-    def update_map(self, folium_map_object):
-        if self.temp_map_file and os.path.exists(self.temp_map_file):
-            try: os.remove(self.temp_map_file) 
-            except OSError as e: print(f"Error removing old temp map file: {e}")
-            self.temp_map_file = None 
+    def _show_cached_map(self, cache_key):
+        """Points the view at an already rendered map page. Returns False if it is not cached."""
+        if cache_key is None or self.content_store is None: return False
+        cached_url = self.content_store.url_for_key(cache_key)
+        if cached_url is None: return False
+        self.web_view.setUrl(cached_url)
+        return True
 
+    def update_map(self, folium_map_object, cache_key=None):
+        """
+        Renders the folium map to HTML in memory and loads it through the dilasa:// scheme.
+        cache_key (e.g. (record_id, last_modified)) lets an unchanged map be shown again without re-rendering.
+        """
+        if self.web_view is None:
+            self._create_web_view()
         try:
-            fd, new_temp_file_path = tempfile.mkstemp(suffix=".html", prefix="map_view_")
-            os.close(fd) 
-            self.temp_map_file = new_temp_file_path 
-            folium_map_object.save(self.temp_map_file)
-            self.web_view.setUrl(QUrl.fromLocalFile(self.temp_map_file))
+            with perf.span("map.render", "ui"):
+                html_bytes = folium_map_object.get_root().render().encode("utf-8")
+            map_url = self.content_store.put("map", html_bytes, "text/html", cache_key=cache_key)
+            self.web_view.setUrl(map_url)
         except Exception as e:
-            print(f"Error saving or loading map: {e}")
+            print(f"Error rendering or loading map: {e}")
             self.web_view.setHtml("<html><body style='display:flex;justify-content:center;align-items:center;height:100%;font-family:sans-serif;'><h1>Error loading map</h1></body></html>")
 
 
-    def display_polygon(self, polygon_coords_lat_lon, centroid_lat_lon=None, zoom_level=18):
+    def display_polygon(self, polygon_coords_lat_lon, centroid_lat_lon=None, zoom_level=18, cache_key=None):
         if not polygon_coords_lat_lon:
-            self._initialize_map(); return
+            self.clear_map(); return
+        if self.web_view is None:
+            self._create_web_view()
+        if self._show_cached_map(cache_key): return
+        with perf.span("map.build", "ui"):
+            folium_map = self._build_polygon_map(polygon_coords_lat_lon, centroid_lat_lon, zoom_level)
+        self.update_map(folium_map, cache_key=cache_key)
+
+    def prerender_polygon(self, polygon_coords_lat_lon, centroid_lat_lon=None, zoom_level=18, cache_key=None):
+        """
+        Renders a polygon map into the content store without showing it, so a later
+        display_polygon with the same cache_key is instant. Used for neighbour prefetch.
+        """
+        if self.content_store is None or cache_key is None or not polygon_coords_lat_lon: return
+        if self.content_store.url_for_key(cache_key) is not None: return
+        try:
+            with perf.span("map.prerender", "ui"):
+                folium_map = self._build_polygon_map(polygon_coords_lat_lon, centroid_lat_lon, zoom_level)
+                html_bytes = folium_map.get_root().render().encode("utf-8")
+            self.content_store.put("map", html_bytes, "text/html", cache_key=cache_key)
+        except Exception as e:
+            print(f"Error pre-rendering map: {e}")
+
+    def _build_polygon_map(self, polygon_coords_lat_lon, centroid_lat_lon, zoom_level):
+        import folium
 
         center_loc = centroid_lat_lon if centroid_lat_lon else polygon_coords_lat_lon[0]
         
@@ -106,14 +167,15 @@ class MapViewWidget(QWidget):
             folium.Marker(location=center_loc, tooltip="Polygon Area").add_to(m)
 
         folium.LayerControl().add_to(m)
-        self.update_map(m)
+        return m
 
     def clear_map(self):
-        self._initialize_map()
+        if self.web_view is None:
+            self.ensure_initialized() # First use: also renders the default map
+        else:
+            self._initialize_map()
 
     def cleanup(self):
-        if self.temp_map_file and os.path.exists(self.temp_map_file):
-            try: os.remove(self.temp_map_file)
-            except OSError as e: print(f"Error removing temp map file during cleanup: {e}")
-        self.temp_map_file = None
-
+        # Map pages live only in the in-memory content store; stop any pending load.
+        if self.web_view is not None:
+            self.web_view.stop()
@@ -0,0 +1,125 @@
+# File: DilasaKMLTool_v4/ui/widgets/performance_panel.py
+# ----------------------------------------------------------------------
+import os
+from PySide6.QtWidgets import (QDockWidget, QWidget, QVBoxLayout, QHBoxLayout, QCheckBox, QPushButton,
+                               QLabel, QTableWidget, QTableWidgetItem, QHeaderView, QFileDialog, QSplitter,
+                               QAbstractItemView)
+from PySide6.QtCore import Qt, QTimer
+
+from core import perf
+
+REFRESH_INTERVAL_MS = 1000
+RECENT_SPANS_SHOWN = 100
+
+class PerformancePanel(QDockWidget):
+    """
+    Dock showing what core.perf records: a per-span-name summary (calls, total/avg/max time,
+    items per second), the most recent spans and counters such as DB statement counts.
+    "Record" switches recording on and off; the trace can be exported in Chrome trace format.
+    """
+    def __init__(self, parent=None):
+        super().__init__("Performance", parent)
+        self.setObjectName("PerformancePanel")
+
+        container = QWidget()
+        layout = QVBoxLayout(container)
+        layout.setContentsMargins(4, 4, 4, 4)
+
+        controls_layout = QHBoxLayout()
+        self.record_checkbox = QCheckBox("Record")
+        self.record_checkbox.setChecked(perf.is_enabled())
+        self.record_checkbox.toggled.connect(self._handle_record_toggled)
+        controls_layout.addWidget(self.record_checkbox)
+        clear_button = QPushButton("Clear")
+        clear_button.clicked.connect(self._handle_clear)
+        controls_layout.addWidget(clear_button)
+        export_button = QPushButton("Export Trace...")
+        export_button.setToolTip("Save recorded spans as a Chrome trace (open in chrome://tracing or ui.perfetto.dev)")
+        export_button.clicked.connect(self._handle_export_trace)
+        controls_layout.addWidget(export_button)
+        controls_layout.addStretch()
+        layout.addLayout(controls_layout)
+
+        self.counters_label = QLabel()
+        self.counters_label.setStyleSheet("color: #555555;")
+        layout.addWidget(self.counters_label)
+
+        splitter = QSplitter(Qt.Orientation.Vertical)
+        self.summary_table = self._create_table(["Span", "Calls", "Total ms", "Avg ms", "Max ms", "Items/s"])
+        splitter.addWidget(self.summary_table)
+        self.recent_table = self._create_table(["Recent span", "ms", "Items", "Items/s"])
+        splitter.addWidget(self.recent_table)
+        layout.addWidget(splitter, 1)
+        self.setWidget(container)
+
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setInterval(REFRESH_INTERVAL_MS)
+        self._refresh_timer.timeout.connect(self.refresh)
+        self.visibilityChanged.connect(self._handle_visibility_changed)
+        self.refresh()
+
+    @staticmethod
+    def _create_table(headers):
+        table = QTableWidget(0, len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.verticalHeader().setVisible(False)
+        table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        for col in range(1, len(headers)):
+            table.horizontalHeader().setSectionResizeMode(col, QHeaderView.ResizeMode.ResizeToContents)
+        return table
+
+    @staticmethod
+    def _fill_row(table, row, values):
+        for col, value in enumerate(values):
+            item = QTableWidgetItem(value)
+            if col > 0: item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+            table.setItem(row, col, item)
+
+    @staticmethod
+    def _rate_text(items, seconds):
+        return f"{items / seconds:,.0f}" if items and seconds > 0 else ""
+
+    def _handle_visibility_changed(self, visible):
+        # Only poll while someone is looking
+        if visible: self.refresh(); self._refresh_timer.start()
+        else: self._refresh_timer.stop()
+
+    def _handle_record_toggled(self, checked):
+        perf.set_enabled(checked)
+        self.refresh()
+
+    def _handle_clear(self):
+        perf.clear()
+        self.refresh()
+
+    def _handle_export_trace(self):
+        file_path, _ = QFileDialog.getSaveFileName(self, "Export Performance Trace",
+                                                   os.path.expanduser("~/Documents/dilasa_trace.json"), "JSON files (*.json)")
+        if not file_path: return
+        try:
+            span_count = perf.export_chrome_trace(file_path)
+            self.counters_label.setText(f"Exported {span_count} spans to {file_path}")
+        except OSError as e:
+            self.counters_label.setText(f"Trace export failed: {e}")
+
+    def refresh(self):
+        counters = perf.get_counters()
+        counter_text = ", ".join(f"{name}: {value:,}" for name, value in sorted(counters.items())) or "no counters yet"
+        state_text = "Recording" if perf.is_enabled() else "Not recording"
+        self.counters_label.setText(f"{state_text} | {counter_text}")
+
+        summary = sorted(perf.summarize_spans().items(), key=lambda item: item[1]["total_s"], reverse=True)
+        self.summary_table.setRowCount(len(summary))
+        for row, (name, stats) in enumerate(summary):
+            self._fill_row(self.summary_table, row, [
+                name, str(stats["calls"]), f"{stats['total_s'] * 1000:,.1f}",
+                f"{stats['total_s'] * 1000 / stats['calls']:,.2f}", f"{stats['max_s'] * 1000:,.1f}",
+                self._rate_text(stats["items"], stats["total_s"])])
+
+        recent = list(reversed(perf.get_recent_spans(RECENT_SPANS_SHOWN)))
+        self.recent_table.setRowCount(len(recent))
+        for row, entry in enumerate(recent):
+            self._fill_row(self.recent_table, row, [
+                entry["name"], f"{entry['dur'] * 1000:,.2f}",
+                "" if entry["items"] is None else f"{entry['items']:,}", self._rate_text(entry["items"], entry["dur"])])
@@ -0,0 +1,49 @@
+# File: DilasaKMLTool_v4/ui/widgets/web_engine_profile.py
+# ----------------------------------------------------------------------
+import os
+from PySide6.QtWidgets import QApplication
+from PySide6.QtWebEngineCore import QWebEngineProfile, QWebEnginePage
+
+from database.db_manager import DB_FOLDER_NAME_CONST
+from .content_scheme_handler import DILASA_SCHEME, DilasaSchemeHandler, get_content_store
+
+WEB_PROFILE_NAME = "DilasaKMLTool"
+WEB_PROFILE_SUBFOLDER = "web_profile"
+HTTP_CACHE_MAX_BYTES = 256 * 1024 * 1024 # Map tiles and Google Earth assets
+
+_shared_profile = None
+_scheme_handler = None # Kept referenced for the lifetime of the profile
+
+def get_web_profile_dir():
+    """Returns (and creates) the folder under the app data directory that holds web profile data."""
+    app_data_dir = os.getenv('APPDATA') or os.path.expanduser("~")
+    profile_dir = os.path.join(app_data_dir, DB_FOLDER_NAME_CONST, WEB_PROFILE_SUBFOLDER)
+    os.makedirs(profile_dir, exist_ok=True)
+    return profile_dir
+
+def get_shared_web_profile():
+    """
+    Returns the single QWebEngineProfile shared by the map view and the Google Earth view.
+    The profile is persistent (named), so cookies and a disk HTTP cache survive restarts;
+    sharing it means both views use one network/cache stack instead of two.
+    The dilasa:// scheme handler is installed on it.
+    """
+    global _shared_profile, _scheme_handler
+    if _shared_profile is None:
+        profile_dir = get_web_profile_dir()
+
+        profile = QWebEngineProfile(WEB_PROFILE_NAME, QApplication.instance())
+        profile.setPersistentStoragePath(os.path.join(profile_dir, "storage"))
+        profile.setCachePath(os.path.join(profile_dir, "cache"))
+        profile.setHttpCacheType(QWebEngineProfile.HttpCacheType.DiskHttpCache)
+        profile.setHttpCacheMaximumSize(HTTP_CACHE_MAX_BYTES)
+        profile.setPersistentCookiesPolicy(QWebEngineProfile.PersistentCookiesPolicy.AllowPersistentCookies)
+        # Generated map HTML and KML are served from memory under dilasa:// (no temp files)
+        _scheme_handler = DilasaSchemeHandler(get_content_store(), profile)
+        profile.installUrlSchemeHandler(DILASA_SCHEME, _scheme_handler)
+        _shared_profile = profile
+    return _shared_profile
+
+def create_page_with_shared_profile(parent_view, page_class=QWebEnginePage):
+    """Creates a page (QWebEnginePage or a subclass) on the shared profile, owned by the given view."""
+    return page_class(get_shared_web_profile(), parent_view)